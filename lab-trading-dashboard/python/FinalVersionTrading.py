@@ -28,7 +28,8 @@ from utils.FinalVersionTradingDB_PostgreSQL import (
     fetch_single_pair_from_db,
     check_running_trade_exists,
     fetch_squeezed_pairs_from_db_paginated,
-    fetch_non_squeezed_pairs_from_db_paginated
+    fetch_non_squeezed_pairs_from_db_paginated,
+    INTERVAL_MS
 )
 
 # Import logging functions for main signal detection
@@ -42,6 +43,10 @@ from utils.logger import (
     log_cache_performance,
     performance_monitor
 )
+from utils.rolling_stats import rolling_percentile_rank
+from utils.candle_geometry import add_candle_geometry, geometry_column, body_ratio_of_row
+from utils.lazy_frame import IndicatorRegistry, LazyIndicatorFrame
+from utils.candle_ring import CandleRingStore
 
 # Machine ID for main signal detection system
 MAIN_SIGNAL_DETECTOR_ID = "MAIN_SIGNAL_DETECTOR"
@@ -56,6 +61,9 @@ CYCLE_SLEEP_TIME = 60
 DB_TIMEOUT = 30
 MAX_RETRIES = 3
 
+# Latest 500 closed candles per (symbol, interval), topped up incrementally
+candle_rings = CandleRingStore(INTERVAL_MS, window=500)
+
 # Global shutdown flag
 shutdown_requested = False
 
@@ -187,13 +195,12 @@ def calculate_heiken_ashi_optimized(df):
 
 def candle_strength(row):
     try:
-        body_size = abs(row['ha_close'] - row['ha_open'])
-        total_range = row['ha_high'] - row['ha_low']
+        ratio = body_ratio_of_row(row, 'heiken')
         
-        if total_range == 0:
+        if pd.isna(ratio):
             return 0
         
-        return round(body_size / total_range, 2)
+        return round(ratio, 2)
         
     except Exception as e:
         log_error(e, "candle_strength", "system", machine_id=MAIN_SIGNAL_DETECTOR_ID)
@@ -201,13 +208,12 @@ def candle_strength(row):
 
 def is_strong_ha_candle_body(row, min_ratio=0.6):
     try:
-        body_size = abs(row['ha_close'] - row['ha_open'])
-        total_range = row['ha_high'] - row['ha_low']
+        ratio = body_ratio_of_row(row, 'heiken')
         
-        if total_range == 0:
+        if pd.isna(ratio):
             return False
         
-        return (body_size / total_range) >= min_ratio
+        return ratio >= min_ratio
         
     except Exception as e:
         log_error(e, "is_strong_ha_candle_body", "system", machine_id=MAIN_SIGNAL_DETECTOR_ID)
@@ -365,6 +371,47 @@ def higher_timeframe_macd_median_confirmation(main_df, df_day, df_4h, action, sy
         return None, None, None, None
 
 
+# --- Indicator column groups -------------------------------------------------
+# Groups CalculateSignals(columns=[...]) can compute on their own; the full
+# pipeline calls the same functions.
+indicator_groups = IndicatorRegistry()
+
+
+def _indicator_context(candle):
+    if candle == 'heiken':
+        return {'candle': candle, 'high_col': 'ha_high', 'low_col': 'ha_low'}
+    return {'candle': candle, 'high_col': 'high', 'low_col': 'low'}
+
+
+@indicator_groups.register('heiken_ashi', ('ha_open', 'ha_close', 'ha_high', 'ha_low', 'ha_color'))
+def _add_heiken_ashi(df, ctx):
+    if ctx['candle'] == 'heiken':
+        df = calculate_heiken_ashi_optimized(df)
+    return df
+
+
+@indicator_groups.register(
+    'swings',
+    ('swing_high', 'swing_low', 'swing_high_zone', 'swing_low_zone'),
+    requires=('heiken_ashi',),
+)
+def _add_swings(df, ctx):
+    high_col, low_col = ctx['high_col'], ctx['low_col']
+    window = 5
+    
+    # Boolean mask for swings
+    is_swing_high = df[high_col] == df[high_col].rolling(window*2+1, center=True).max()
+    is_swing_low = df[low_col] == df[low_col].rolling(window*2+1, center=True).min()
+
+    df['swing_high'] = is_swing_high
+    df['swing_low'] = is_swing_low
+
+    # Store price at swing points for zone calculations, NaN otherwise
+    df['swing_high_zone'] = np.where(is_swing_high, df[high_col], np.nan)
+    df['swing_low_zone'] = np.where(is_swing_low, df[low_col], np.nan)
+    return df
+
+
 def calculate_all_indicators_optimized(df, candle='heiken'):
     """
     Calculate all technical indicators in one optimized pass through the dataframe
@@ -375,8 +422,7 @@ def calculate_all_indicators_optimized(df, candle='heiken'):
             return df
         
         # 1. Heiken Ashi calculations (always needed for HA candles)
-        if candle == 'heiken':
-            df = calculate_heiken_ashi_optimized(df)
+        df = _add_heiken_ashi(df, _indicator_context(candle))
         
         # 2. Dynamic OHLC column selection
         if candle == 'heiken':
@@ -413,9 +459,7 @@ def calculate_all_indicators_optimized(df, candle='heiken'):
         df['BBW'] = (df['BOLL_upper_band'] - df['BOLL_lower_band']) / df['BOLL_middle_band']
         df['BBW_Increasing'] =  df['BBW'] > df['BBW'].shift(1)
         # Compute relative percentile
-        df['BBW_PERCENTILE'] = df['BBW'].rolling(100).apply(
-            lambda x: pd.Series(x).rank(pct=True).iloc[-1]
-        )
+        df['BBW_PERCENTILE'] = rolling_percentile_rank(df['BBW'], 100)
                 
         df['Volume_MA'] = talib.SMA(df['volume'], timeperiod=20)
         df['Volume_Ratio'] = df['volume'] / df['Volume_MA']
@@ -699,31 +743,15 @@ def calculate_all_indicators_optimized(df, candle='heiken'):
                                             short_by_atr, short_by_pct, short_by_bb)
         ]
         # 7. Swing highs/lows detection (Optimized)
-        window = 5
+        df = _add_swings(df, _indicator_context(candle))
         
-        # Boolean mask for swings
-        is_swing_high = df[high_col] == df[high_col].rolling(window*2+1, center=True).max()
-        is_swing_low = df[low_col] == df[low_col].rolling(window*2+1, center=True).min()
-
-        df['swing_high'] = is_swing_high
-        df['swing_low'] = is_swing_low
+        # 8. Candle geometry (body / wicks / range / body ratio) for regular and HA
+        df = add_candle_geometry(df)
 
-        # Store price at swing points for zone calculations, NaN otherwise
-        df['swing_high_zone'] = np.where(is_swing_high, df[high_col], np.nan)
-        df['swing_low_zone'] = np.where(is_swing_low, df[low_col], np.nan)
-        
-        # 8. Candle strength calculations (always use Heiken Ashi for strength)
-        if candle == 'heiken':
-            df['candle_strength'] = df.apply(lambda row: abs(row['ha_close'] - row['ha_open']) / (row['ha_high'] - row['ha_low']) if (row['ha_high'] - row['ha_low']) > 0 else 0, axis=1)
-            df['candle_strength'] = df['candle_strength'].round(2)
-            
-            df['candle_strength_bool'] = df.apply(lambda row: abs(row['ha_close'] - row['ha_open']) / (row['ha_high'] - row['ha_low']) >= 0.6 if (row['ha_high'] - row['ha_low']) > 0 else False, axis=1)
-        else:
-            # For regular candles, calculate strength using regular OHLC
-            df['candle_strength'] = df.apply(lambda row: abs(row['close'] - row['open']) / (row['high'] - row['low']) if (row['high'] - row['low']) > 0 else 0, axis=1)
-            df['candle_strength'] = df['candle_strength'].round(2)
-            
-            df['candle_strength_bool'] = df.apply(lambda row: abs(row['close'] - row['open']) / (row['high'] - row['low']) >= 0.6 if (row['high'] - row['low']) > 0 else False, axis=1)
+        # Candle strength from the body ratio of the selected candle type
+        body_ratio = df[geometry_column(candle if candle == 'heiken' else 'regular', 'body_ratio')]
+        df['candle_strength'] = body_ratio.fillna(0).round(2)
+        df['candle_strength_bool'] = body_ratio >= 0.6
         
         # 9. Total Change Added After Analysis
         # Calculate the total percentage change from open to close
@@ -739,14 +767,27 @@ def calculate_all_indicators_optimized(df, candle='heiken'):
         return df
 
 @performance_monitor("SIGNAL_PROCESSING", "CalculateSignals", machine_id=MAIN_SIGNAL_DETECTOR_ID)
-def CalculateSignals(symbol, interval, candle='heiken'):
+def CalculateSignals(symbol, interval, candle='heiken', columns=None):
+    """
+    columns: optional list of indicator columns the caller reads; only the
+    groups producing them are computed (e.g. swing zones for swing_utils).
+    """
     try:
-        df_trading = fetch_data_safe_for_machines(symbol, interval, 500)
+        df_trading = candle_rings.fetch(symbol, interval, fetch_data_safe_for_machines, 500)
         if df_trading is None or 'time' not in df_trading.columns:
             log_error("df_trading is None or missing 'time' column", "CalculateSignals", symbol)
             return None
         
         df_trading.set_index('time', inplace=True)
+
+        if columns is not None:
+            if df_trading.empty:
+                return df_trading
+            frame = LazyIndicatorFrame(
+                df_trading.copy(), indicator_groups, _indicator_context(candle),
+                lambda: calculate_all_indicators_optimized(df_trading, candle),
+            )
+            return frame.to_frame(columns)
         
         # Single optimized function call with candle parameter
         df_trading = calculate_all_indicators_optimized(df_trading, candle)
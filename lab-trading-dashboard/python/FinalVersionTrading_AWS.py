@@ -7,6 +7,7 @@ import threading
 import concurrent.futures
 
 import sys
+import os
 import warnings
 import asyncio
 import signal
@@ -34,6 +35,13 @@ from utils.FinalVersionTradingDB_PostgreSQL import (
     fetch_non_squeezed_pairs_from_db_paginated,
     getSuperTrend,
     getSuperTrendPercent,
+    INTERVAL_MS,
+    init_process_resources,
+    get_existing_pair_symbols,
+    insert_klines_bulk,
+    bulk_fetch_klines,
+    candle_store,
+    kline_catalog,
     # count_running_trades,
     # count_running_trades_negative
 )
@@ -63,6 +71,43 @@ from utils.logger import (
     performance_monitor,
     log_to_file_reject_from_api
 )
+from utils.incremental_indicators import indicator_engine
+from utils.heiken_ashi import add_heiken_ashi_columns
+from utils.rolling_stats import rolling_percentile_rank
+from utils.segment_stats import segment_stats, per_bar
+from utils.candle_geometry import (
+    add_candle_geometry,
+    candle_geometry,
+    candle_geometry_arrays,
+    geometry_column,
+    body_ratio_of_row,
+    CANDLE_KINDS,
+    GEOMETRY_FIELDS,
+)
+from utils.lazy_frame import IndicatorRegistry, LazyIndicatorFrame
+from utils.frame_cache import CandleFrameCache, last_closed_open_time
+from utils.shared_ohlcv import (
+    fetch_batch_ohlcv,
+    publish_ohlcv,
+    ensure_shared_ohlcv,
+    shared_ohlcv_frame,
+)
+from utils.worker_pool import WarmWorkerPool
+from utils.kline_stream import KlineStreamIngestor
+from utils.candle_ring import CandleRingStore, ohlcv_frame
+from utils.signal_kernels import (
+    run_bar_state_kernel,
+    run_live_divergence_kernel,
+    signal_codes,
+    labels_from_codes,
+    sparse_signal_column,
+    state_column,
+    PA_BREAK_LABELS,
+    PA_TREND_LABELS,
+    PA_CHANGE_LABELS,
+    BREAKOUT_STATE_LABELS,
+    SIGNAL_LABELS,
+)
 
 
 client = UMFutures(key=api, secret=secret)
@@ -79,6 +124,36 @@ PROCESS_TIMEOUT = 300
 CYCLE_SLEEP_TIME = 60
 DB_TIMEOUT = 30
 MAX_RETRIES = 3
+SIGNAL_CACHE_MAX_MB = 256          # byte budget of the per-process CalculateSignals frame cache
+SIGNAL_CACHE_REPORT_EVERY = 500    # lookups between hit/miss reports to log_cache_performance
+SIGNAL_CANDLE_LIMIT = 500          # candles fetched per CalculateSignals call
+NON_SQUEEZED_SHARED_INTERVALS = ('15m', '1h', '4h')   # intervals tdfi_breakout reads, prefetched per batch
+BATCH_FETCH_WORKERS = 8
+SIGNAL_POOL_WORKERS = 12
+POOL_HEALTH_CHECK_TIMEOUT = 30
+KLINE_STREAM_ENABLED = os.getenv('KLINE_STREAM', '1') != '0'   # WebSocket kline ingestor for every pairstatus pair
+KLINE_STREAM_INTERVALS = NON_SQUEEZED_SHARED_INTERVALS
+# INCREMENTAL_INDICATORS=1 steps the base indicators (HA, RSI, EMA, MACD, ADX,
+# BBANDS, StochRSI, swings) from the previous CalculateSignals call for the same
+# symbol/interval instead of recomputing them. Default '0' (off): the stepped
+# values carry the EMA/RSI warm-up from the first frame the process saw for
+# that key, so they drift from a recompute over the SIGNAL_CANDLE_LIMIT-candle
+# window (and from the backtest) until that start is long past. Only enable it
+# where that divergence is acceptable.
+INCREMENTAL_INDICATORS = os.getenv('INCREMENTAL_INDICATORS', '0') == '1'
+
+# Latest closed candles per (symbol, interval); each new candle tops a ring up
+# with a short read instead of re-reading SIGNAL_CANDLE_LIMIT rows
+candle_rings = CandleRingStore(INTERVAL_MS, window=SIGNAL_CANDLE_LIMIT)
+
+# Computed CalculateSignals frames, reused until the next candle closes
+signal_frame_cache = CandleFrameCache(
+    INTERVAL_MS,
+    max_bytes=SIGNAL_CACHE_MAX_MB * 1024 * 1024,
+    name='calculate_signals',
+    reporter=lambda **stats: log_cache_performance(machine_id=MAIN_SIGNAL_DETECTOR_ID, **stats),
+    report_every=SIGNAL_CACHE_REPORT_EVERY,
+)
 
 
 # Global SuperTrend variables
@@ -190,27 +265,9 @@ def calculate_heiken_ashi_optimized(df):
         # Ensure ascending time
         # df = df.sort_values("time").copy()
 
-        # Pine: ha_close = (o + h + l + c) / 4
-        ha_close = (df["open"] + df["high"] + df["low"] + df["close"]) / 4.0
-
-        # Pine: ha_open[0] = (open[0] + close[0]) / 2
-        ha_open = ha_close.copy()
-        ha_open.iloc[0] = (df["open"].iloc[0] + df["close"].iloc[0]) / 2.0
-
-        # Pine: ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2
-        for i in range(1, len(df)):
-            ha_open.iloc[i] = (ha_open.iloc[i-1] + ha_close.iloc[i-1]) / 2.0
-
-        # Pine: ha_high = max(high, ha_open, ha_close); ha_low = min(low, ha_open, ha_close)
-        ha_high = np.maximum(df["high"].values, np.maximum(ha_open.values, ha_close.values))
-        ha_low  = np.minimum(df["low"].values,  np.minimum(ha_open.values, ha_close.values))
-
-        df["ha_open"]  = ha_open
-        df["ha_close"] = ha_close
-        df["ha_high"]  = ha_high
-        df["ha_low"]   = ha_low
-        df["ha_color"] = np.where(df["ha_close"] >= df["ha_open"], "GREEN", "RED")
-        return df
+        # Pine: ha_close = (o + h + l + c) / 4, ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2,
+        # ha_high/ha_low = max/min(high/low, ha_open, ha_close) -- shared kernel
+        return add_heiken_ashi_columns(df)
         
     except Exception as e:
         print(f"Error in calculate_heiken_ashi_optimized: {e}")
@@ -220,13 +277,12 @@ def calculate_heiken_ashi_optimized(df):
 
 def candle_strength(row):
     try:
-        body_size = abs(row['ha_close'] - row['ha_open'])
-        total_range = row['ha_high'] - row['ha_low']
+        ratio = body_ratio_of_row(row, 'heiken')
         
-        if total_range == 0:
+        if pd.isna(ratio):
             return 0
         
-        return round(body_size / total_range, 2)
+        return round(ratio, 2)
         
     except Exception as e:
         log_error(e, "candle_strength", "system", machine_id=MAIN_SIGNAL_DETECTOR_ID)
@@ -234,13 +290,12 @@ def candle_strength(row):
 
 def is_strong_ha_candle_body(row, min_ratio=0.6):
     try:
-        body_size = abs(row['ha_close'] - row['ha_open'])
-        total_range = row['ha_high'] - row['ha_low']
+        ratio = body_ratio_of_row(row, 'heiken')
         
-        if total_range == 0:
+        if pd.isna(ratio):
             return False
         
-        return (body_size / total_range) >= min_ratio
+        return ratio >= min_ratio
         
     except Exception as e:
         log_error(e, "is_strong_ha_candle_body", "system", machine_id=MAIN_SIGNAL_DETECTOR_ID)
@@ -1104,10 +1159,274 @@ def higher_timeframe_macd_median_confirmation(main_df, df_day, df_4h, action, sy
 
 
 
-def calculate_all_indicators_optimized(df, candle='regular'):
+def _from_state(engine_cols, names, talib_fn, *args, **kwargs):
+    """
+    Take indicator column(s) from the incremental engine output when available,
+    otherwise compute them with the given TA-Lib function.
+    """
+    if engine_cols is None:
+        return talib_fn(*args, **kwargs)
+    if isinstance(names, str):
+        return engine_cols[names]
+    return tuple(engine_cols[name] for name in names)
+
+
+# --- Indicator column groups -------------------------------------------------
+# Each group adds a fixed set of columns and is registered with the groups it
+# needs, so CalculateSignals(columns=[...]) can run just the groups a caller
+# reads. calculate_all_indicators_optimized calls the same functions in its
+# usual order, so both paths produce identical values.
+indicator_groups = IndicatorRegistry()
+
+
+def _indicator_context(candle, engine_cols=None):
+    """OHLC column selection and incremental engine output shared by the groups."""
+    if candle == 'heiken':
+        open_col, high_col, low_col, close_col = 'ha_open', 'ha_high', 'ha_low', 'ha_close'
+    else:
+        open_col, high_col, low_col, close_col = 'open', 'high', 'low', 'close'
+    return {
+        'candle': candle,
+        'open_col': open_col,
+        'high_col': high_col,
+        'low_col': low_col,
+        'close_col': close_col,
+        'engine_cols': engine_cols,
+    }
+
+
+@indicator_groups.register('heiken_ashi', ('ha_open', 'ha_close', 'ha_high', 'ha_low', 'ha_color'))
+def _add_heiken_ashi(df, ctx):
+    engine_cols = ctx['engine_cols']
+    if engine_cols is not None:
+        for col in ('ha_open', 'ha_close', 'ha_high', 'ha_low'):
+            df[col] = engine_cols[col]
+        df["ha_color"] = np.where(df["ha_close"] >= df["ha_open"], "GREEN", "RED")
+    else:
+        df = calculate_heiken_ashi_optimized(df)
+    return df
+
+
+@indicator_groups.register('color', ('color',))
+def _add_color(df, ctx):
+    df['color'] = np.where(df['close'] >= df['open'], 'GREEN', 'RED')
+    return df
+
+
+@indicator_groups.register(
+    'rsi',
+    ('RSI_9', 'RSI_14', 'RSI_5', 'RSI_21', 'RSI_SIGNAL',
+     'RSI_5_21_cross_up', 'RSI_5_21_cross_down', 'RSI_CROSS_SIGNAL'),
+    requires=('heiken_ashi',),
+)
+def _add_rsi(df, ctx):
+    engine_cols, close_col = ctx['engine_cols'], ctx['close_col']
+    df['RSI_9'] = _from_state(engine_cols, 'RSI_9', talib.RSI, df[close_col], timeperiod=9)
+    df['RSI_14'] = _from_state(engine_cols, 'RSI_14', talib.RSI, df[close_col], timeperiod=14)
+
+    df['RSI_5']  = _from_state(engine_cols, 'RSI_5', talib.RSI, df[close_col], timeperiod=5)
+    df['RSI_21'] = _from_state(engine_cols, 'RSI_21', talib.RSI, df[close_col], timeperiod=21)
+
+    buy_cond = (
+        (df['RSI_5'] > 50) &
+        (df['RSI_21'] > 50) &
+        (df['RSI_5'] > df['RSI_21'])
+    )
+
+    sell_cond = (
+        (df['RSI_5'] < 50) &
+        (df['RSI_21'] < 50) &
+        (df['RSI_5'] < df['RSI_21'])
+    )
+
+    df['RSI_SIGNAL'] = np.where(
+        buy_cond, 'BUY',
+        np.where(sell_cond, 'SELL', 'NONE')
+    )
+
+    # ============================
+    # 2) RSI 5/21 CROSSOVER signal
+    # ============================
+    rsi5_prev  = df['RSI_5'].shift(1)
+    rsi21_prev = df['RSI_21'].shift(1)
+
+    # Cross UP: RSI_5 crosses above RSI_21 → bullish
+    df['RSI_5_21_cross_up'] = (
+        (rsi5_prev <= rsi21_prev) &
+        (df['RSI_5'] > df['RSI_21'])
+    )
+
+    # Cross DOWN: RSI_5 crosses below RSI_21 → bearish
+    df['RSI_5_21_cross_down'] = (
+        (rsi5_prev >= rsi21_prev) &
+        (df['RSI_5'] < df['RSI_21'])
+    )
+
+    df['RSI_CROSS_SIGNAL'] = np.where(
+        df['RSI_5_21_cross_up'],  'BUY',
+        np.where(df['RSI_5_21_cross_down'], 'SELL', 'NONE')
+    )
+    return df
+
+
+@indicator_groups.register(
+    'ema',
+    ('ema_5', 'ema_8', 'ema_9', 'ema_14', 'ema_21', 'ema_39', 'ema_50', 'ema_100'),
+    requires=('heiken_ashi',),
+)
+def _add_ema(df, ctx):
+    engine_cols, close_col = ctx['engine_cols'], ctx['close_col']
+    df['ema_5'] = _from_state(engine_cols, 'ema_5', talib.EMA, df[close_col], timeperiod=5)
+    df['ema_8'] = _from_state(engine_cols, 'ema_8', talib.EMA, df[close_col], timeperiod=8)
+    df['ema_9'] = _from_state(engine_cols, 'ema_9', talib.EMA, df[close_col], timeperiod=9)
+    df['ema_14'] = _from_state(engine_cols, 'ema_14', talib.EMA, df[close_col], timeperiod=14)
+    df['ema_21'] = _from_state(engine_cols, 'ema_21', talib.EMA, df[close_col], timeperiod=21)
+    df['ema_39'] = _from_state(engine_cols, 'ema_39', talib.EMA, df[close_col], timeperiod=39)
+    df['ema_50'] = _from_state(engine_cols, 'ema_50', talib.EMA, df[close_col], timeperiod=50)
+    df['ema_100'] = _from_state(engine_cols, 'ema_100', talib.EMA, df[close_col], timeperiod=200)
+    return df
+
+
+@indicator_groups.register('volume', ('Volume_MA', 'Volume_Ratio', 'volume_increasing'))
+def _add_volume(df, ctx):
+    df['Volume_MA'] = talib.SMA(df['volume'], timeperiod=20)
+    df['Volume_Ratio'] = df['volume'] / df['Volume_MA']
+    df['volume_increasing'] = df['volume'] > df['volume'].shift(1)
+    return df
+
+
+@indicator_groups.register(
+    'two_pole_macd',
+    ('two_pole_macd', 'two_pole_Signal_Line', 'two_pole_macdhist'),
+    requires=('heiken_ashi',),
+)
+def _add_two_pole_macd(df, ctx):
+    engine_cols, close_col = ctx['engine_cols'], ctx['close_col']
+    df['two_pole_macd'], df['two_pole_Signal_Line'], df['two_pole_macdhist'] = _from_state(
+        engine_cols, ('two_pole_macd', 'two_pole_Signal_Line', 'two_pole_macdhist'),
+        talib.MACD, df[close_col], fastperiod=13, slowperiod=21, signalperiod=9
+    )
+    return df
+
+
+@indicator_groups.register(
+    'macd_color',
+    ('two_pole_MACD_Cross_Up', 'two_pole_MACD_Cross_Down', 'Histogram_Decreasing',
+     'MACD_COLOR', 'macd_color_signal'),
+    requires=('two_pole_macd',),
+)
+def _add_macd_color(df, ctx):
+    df['two_pole_MACD_Cross_Up'] = df['two_pole_macdhist'] > 0
+    df['two_pole_MACD_Cross_Down'] = df['two_pole_macdhist'] < 0
+
+    # Detect same-side weakening
+    same_side_decreasing = (
+        ((df["two_pole_macdhist"] > 0) & (df["two_pole_macdhist"] < df["two_pole_macdhist"].shift(1))) |  # dark green from light green
+        ((df["two_pole_macdhist"] < 0) & (df["two_pole_macdhist"] > df["two_pole_macdhist"].shift(1)))    # dark red from light red
+    )
+
+    # Combine both conditions
+    df["Histogram_Decreasing"] = same_side_decreasing 
+
+    # Assign MACD_COLOR based on two_pole MACD cross and histogram decreasing
+    df['MACD_COLOR'] = np.select(
+        [
+            (df['two_pole_macd'] > df['two_pole_Signal_Line']) & ~df["Histogram_Decreasing"],  # Dark green
+            (df['two_pole_macd'] > df['two_pole_Signal_Line']) & df["Histogram_Decreasing"],   # Light green
+            (df['two_pole_macd'] < df['two_pole_Signal_Line']) & ~df["Histogram_Decreasing"],  # Dark red
+            (df['two_pole_macd'] < df['two_pole_Signal_Line']) & df["Histogram_Decreasing"],   # Light red
+        ],
+        [
+            'DARK_GREEN',
+            'LIGHT_GREEN',
+            'DARK_RED',
+            'LIGHT_RED'
+        ],
+        default='NONE'
+    )
+
+
+    # Assign BUY/SELL to macd_color_signal based on MACD_COLOR
+    # Fix: Use .astype(str) to ensure correct string comparison, and default to 'NONE'
+    df['macd_color_signal'] = np.select(
+        [
+            (df['MACD_COLOR'] == 'DARK_GREEN') | (df['MACD_COLOR'] == 'LIGHT_RED'),
+            (df['MACD_COLOR'] == 'LIGHT_GREEN') | (df['MACD_COLOR'] == 'DARK_RED')
+        ],
+        [
+            'BUY',
+            'SELL'
+        ],
+        default='NONE'
+    )
+    return df
+
+
+@indicator_groups.register('price_trend_direction', ('price_trend_direction',), requires=('heiken_ashi',))
+def _add_price_trend_direction(df, ctx):
+    close_col = ctx['close_col']
+    df['price_trend_direction'] = 'SIDEWAYS'
+    df.loc[df[close_col] > df[close_col].shift(1), 'price_trend_direction'] = 'UPTREND'
+    df.loc[df[close_col] < df[close_col].shift(1), 'price_trend_direction'] = 'DOWNTREND'
+    return df
+
+
+@indicator_groups.register(
+    'swings',
+    ('swing_high', 'swing_low', 'swing_high_zone', 'swing_low_zone'),
+    requires=('heiken_ashi',),
+)
+def _add_swings(df, ctx):
+    engine_cols, high_col, low_col = ctx['engine_cols'], ctx['high_col'], ctx['low_col']
+    window = 5
+
+    if engine_cols is not None:
+        for col in ('swing_high', 'swing_low', 'swing_high_zone', 'swing_low_zone'):
+            df[col] = engine_cols[col]
+    else:
+        is_swing_high = df[high_col] == df[high_col].rolling(window*2+1, center=True).max()
+        is_swing_low  = df[low_col]  == df[low_col].rolling(window*2+1, center=True).min()
+
+        df['swing_high'] = is_swing_high
+        df['swing_low']  = is_swing_low
+
+        df['swing_high_zone'] = np.where(is_swing_high, df[high_col], np.nan)
+        df['swing_low_zone']  = np.where(is_swing_low,  df[low_col],  np.nan)
+
+        df['swing_high_zone'] = df['swing_high_zone'].ffill()
+        df['swing_low_zone']  = df['swing_low_zone'].ffill()
+    return df
+
+
+@indicator_groups.register(
+    'candle_geometry',
+    tuple(geometry_column(kind, field) for kind in CANDLE_KINDS for field in GEOMETRY_FIELDS),
+    requires=('heiken_ashi',),
+)
+def _add_candle_geometry(df, ctx):
+    # Body / wicks / range / body ratio for regular and HA, computed once and
+    # read by candle strength, HA decision and candle labels
+    return add_candle_geometry(df)
+
+
+@indicator_groups.register('candle_strength', ('candle_strength', 'candle_strength_bool'), requires=('candle_geometry',))
+def _add_candle_strength(df, ctx):
+    candle = ctx['candle']
+    # Candle strength from the body ratio of the selected candle type
+    body_ratio = df[geometry_column(candle if candle == 'heiken' else 'regular', 'body_ratio')]
+    df['candle_strength'] = body_ratio.fillna(0).round(2)
+    df['candle_strength_bool'] = body_ratio >= 0.6
+    return df
+
+
+def calculate_all_indicators_optimized(df, candle='regular', state_key=None):
     """
     Calculate all technical indicators in one optimized pass through the dataframe
     Supports both regular and Heiken Ashi candles
+
+    state_key: optional (symbol, interval). When given, HA, the TA-Lib base
+    indicators and swings are stepped incrementally per (symbol, interval, candle)
+    instead of being recomputed over the whole frame.
     """
     try:
         if df is None or df.empty:
@@ -1116,11 +1435,15 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         # df = df.sort_values("time").set_index("time")
         df = df.sort_values("time").set_index("time", drop=False)
 
+        engine_cols = None
+        if state_key is not None:
+            engine_cols = indicator_engine.update((*state_key, candle), df, candle)
+        ctx = _indicator_context(candle, engine_cols)
 
         df_copy = df.copy()
         # 1. Heiken Ashi calculations (always needed for HA candles)
         # if candle == 'heiken':
-        df = calculate_heiken_ashi_optimized(df)
+        df = _add_heiken_ashi(df, ctx)
         
         # 2. Dynamic OHLC column selection
         if candle == 'heiken':
@@ -1135,96 +1458,40 @@ def calculate_all_indicators_optimized(df, candle='regular'):
             high_col = 'high'
             close_col = 'close'
             
-        df['color'] = np.where(df['close'] >= df['open'], 'GREEN', 'RED')
+        df = _add_color(df, ctx)
         # 3. Basic indicators (RSI, MACD, Bollinger Bands, Moving Averages)
-        df['RSI_9'] = talib.RSI(df[close_col], timeperiod=9)
-        df['RSI_14'] = talib.RSI(df[close_col], timeperiod=14)
+        df = _add_rsi(df, ctx)
 
-
-
-        df['RSI_5']  = talib.RSI(df[close_col], timeperiod=5)
-        df['RSI_21'] = talib.RSI(df[close_col], timeperiod=21)
-
-        buy_cond = (
-            (df['RSI_5'] > 50) &
-            (df['RSI_21'] > 50) &
-            (df['RSI_5'] > df['RSI_21'])
-        )
-
-        sell_cond = (
-            (df['RSI_5'] < 50) &
-            (df['RSI_21'] < 50) &
-            (df['RSI_5'] < df['RSI_21'])
-        )
-
-        df['RSI_SIGNAL'] = np.where(
-            buy_cond, 'BUY',
-            np.where(sell_cond, 'SELL', 'NONE')
-        )
-
-        # ============================
-        # 2) RSI 5/21 CROSSOVER signal
-        # ============================
-        rsi5_prev  = df['RSI_5'].shift(1)
-        rsi21_prev = df['RSI_21'].shift(1)
-
-        # Cross UP: RSI_5 crosses above RSI_21 → bullish
-        df['RSI_5_21_cross_up'] = (
-            (rsi5_prev <= rsi21_prev) &
-            (df['RSI_5'] > df['RSI_21'])
-        )
-
-        # Cross DOWN: RSI_5 crosses below RSI_21 → bearish
-        df['RSI_5_21_cross_down'] = (
-            (rsi5_prev >= rsi21_prev) &
-            (df['RSI_5'] < df['RSI_21'])
-        )
-
-        df['RSI_CROSS_SIGNAL'] = np.where(
-            df['RSI_5_21_cross_up'],  'BUY',
-            np.where(df['RSI_5_21_cross_down'], 'SELL', 'NONE')
-        )
-
-        df['ema_5'] = talib.EMA(df[close_col], timeperiod=5)
-        df['ema_8'] = talib.EMA(df[close_col], timeperiod=8)
-        df['ema_9'] = talib.EMA(df[close_col], timeperiod=9)
-        df['ema_14'] = talib.EMA(df[close_col], timeperiod=14)
-        df['ema_21'] = talib.EMA(df[close_col], timeperiod=21)
-        df['ema_39'] = talib.EMA(df[close_col], timeperiod=39)
-        df['ema_50'] = talib.EMA(df[close_col], timeperiod=50)
-        df['ema_100'] = talib.EMA(df[close_col], timeperiod=200)
+        df = _add_ema(df, ctx)
 
 
               
-        df['MACD'], df['MACD_Signal'], df['MACD_Histogram'] = talib.MACD(
-            df[close_col], fastperiod=12, slowperiod=26, signalperiod=9
+        df['MACD'], df['MACD_Signal'], df['MACD_Histogram'] = _from_state(
+            engine_cols, ('MACD', 'MACD_Signal', 'MACD_Histogram'),
+            talib.MACD, df[close_col], fastperiod=12, slowperiod=26, signalperiod=9
         )
         
-        df['BOLL_upper_band'], df['BOLL_middle_band'], df['BOLL_lower_band'] = talib.BBANDS(
-            df[close_col], timeperiod=20, nbdevup=2, nbdevdn=2, matype=MA_Type.SMA
+        df['BOLL_upper_band'], df['BOLL_middle_band'], df['BOLL_lower_band'] = _from_state(
+            engine_cols, ('BOLL_upper_band', 'BOLL_middle_band', 'BOLL_lower_band'),
+            talib.BBANDS, df[close_col], timeperiod=20, nbdevup=2, nbdevdn=2, matype=MA_Type.SMA
         )
         # ➕ Calculate BBW (Bollinger Band Width)
         df['BBW'] = (df['BOLL_upper_band'] - df['BOLL_lower_band']) / df['BOLL_middle_band']
         df['BBW_Increasing'] =  df['BBW'] > df['BBW'].shift(1)
         # Compute relative percentile
-        df['BBW_PERCENTILE'] = df['BBW'].rolling(100).apply(
-            lambda x: pd.Series(x).rank(pct=True).iloc[-1]
-        )
+        df['BBW_PERCENTILE'] = rolling_percentile_rank(df['BBW'], 100)
         
 
         
-        df['Volume_MA'] = talib.SMA(df['volume'], timeperiod=20)
-        df['Volume_Ratio'] = df['volume'] / df['Volume_MA']
-        df['volume_increasing'] = df['volume'] > df['volume'].shift(1)
+        df = _add_volume(df, ctx)
 
         
 
-        df['two_pole_macd'], df['two_pole_Signal_Line'], df['two_pole_macdhist'] = talib.MACD(
-            df[close_col], fastperiod=13, slowperiod=21, signalperiod=9
-        )
+        df = _add_two_pole_macd(df, ctx)
 
-        df['lower_two_pole_macd'], df['lower_two_pole_Signal_Line'], df['lower_two_pole_macdhist'] = talib.MACD(
-            df[close_col], fastperiod=5, slowperiod=8, signalperiod=9
+        df['lower_two_pole_macd'], df['lower_two_pole_Signal_Line'], df['lower_two_pole_macdhist'] = _from_state(
+            engine_cols, ('lower_two_pole_macd', 'lower_two_pole_Signal_Line', 'lower_two_pole_macdhist'),
+            talib.MACD, df[close_col], fastperiod=5, slowperiod=8, signalperiod=9
         )
         df['lower_two_pole_MACD_Cross_Up'] = (df['lower_two_pole_macd'] > df['lower_two_pole_Signal_Line']) & (df['lower_two_pole_macd'].shift(1) <= df['lower_two_pole_Signal_Line'].shift(1))
         df['lower_two_pole_MACD_Cross_Down'] = (df['lower_two_pole_macd'] < df['lower_two_pole_Signal_Line']) & (df['lower_two_pole_macd'].shift(1) >= df['lower_two_pole_Signal_Line'].shift(1))
@@ -1253,8 +1520,9 @@ def calculate_all_indicators_optimized(df, candle='regular'):
             )
         )
 
-        df['34_144_9_macd'], df['34_144_9_Signal_Line'], df['34_144_9_macdhist'] = talib.MACD(
-        df[close_col], fastperiod=34, slowperiod=144, signalperiod=9
+        df['34_144_9_macd'], df['34_144_9_Signal_Line'], df['34_144_9_macdhist'] = _from_state(
+        engine_cols, ('34_144_9_macd', '34_144_9_Signal_Line', '34_144_9_macdhist'),
+        talib.MACD, df[close_col], fastperiod=34, slowperiod=144, signalperiod=9
         )
 
         df['34_144_9_macd_pos'] = np.where(
@@ -1307,8 +1575,9 @@ def calculate_all_indicators_optimized(df, candle='regular'):
 
 
 
-        df['200_macd'], df['200_Signal_Line'], df['200_macdhist'] = talib.MACD(
-        df[close_col], fastperiod=100, slowperiod=200, signalperiod=50
+        df['200_macd'], df['200_Signal_Line'], df['200_macdhist'] = _from_state(
+        engine_cols, ('200_macd', '200_Signal_Line', '200_macdhist'),
+        talib.MACD, df[close_col], fastperiod=100, slowperiod=200, signalperiod=50
         )
             
         df['200_macd_Cross_Up'] = df['200_macdhist'] > 0     # histogram green
@@ -1364,49 +1633,7 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         # df['two_pole_MACD_Cross_Up'] = (df['two_pole_macd'] > df['two_pole_Signal_Line']) & (df['two_pole_macd'].shift(1) <= df['two_pole_Signal_Line'].shift(1))
         # df['two_pole_MACD_Cross_Down'] = (df['two_pole_macd'] < df['two_pole_Signal_Line']) & (df['two_pole_macd'].shift(1) >= df['two_pole_Signal_Line'].shift(1))
 
-        df['two_pole_MACD_Cross_Up'] = df['two_pole_macdhist'] > 0
-        df['two_pole_MACD_Cross_Down'] = df['two_pole_macdhist'] < 0
-
-        # Detect same-side weakening
-        same_side_decreasing = (
-            ((df["two_pole_macdhist"] > 0) & (df["two_pole_macdhist"] < df["two_pole_macdhist"].shift(1))) |  # dark green from light green
-            ((df["two_pole_macdhist"] < 0) & (df["two_pole_macdhist"] > df["two_pole_macdhist"].shift(1)))    # dark red from light red
-        )
-
-        # Combine both conditions
-        df["Histogram_Decreasing"] = same_side_decreasing 
-
-        # Assign MACD_COLOR based on two_pole MACD cross and histogram decreasing
-        df['MACD_COLOR'] = np.select(
-            [
-                (df['two_pole_macd'] > df['two_pole_Signal_Line']) & ~df["Histogram_Decreasing"],  # Dark green
-                (df['two_pole_macd'] > df['two_pole_Signal_Line']) & df["Histogram_Decreasing"],   # Light green
-                (df['two_pole_macd'] < df['two_pole_Signal_Line']) & ~df["Histogram_Decreasing"],  # Dark red
-                (df['two_pole_macd'] < df['two_pole_Signal_Line']) & df["Histogram_Decreasing"],   # Light red
-            ],
-            [
-                'DARK_GREEN',
-                'LIGHT_GREEN',
-                'DARK_RED',
-                'LIGHT_RED'
-            ],
-            default='NONE'
-        )
-
-
-        # Assign BUY/SELL to macd_color_signal based on MACD_COLOR
-        # Fix: Use .astype(str) to ensure correct string comparison, and default to 'NONE'
-        df['macd_color_signal'] = np.select(
-            [
-                (df['MACD_COLOR'] == 'DARK_GREEN') | (df['MACD_COLOR'] == 'LIGHT_RED'),
-                (df['MACD_COLOR'] == 'LIGHT_GREEN') | (df['MACD_COLOR'] == 'DARK_RED')
-            ],
-            [
-                'BUY',
-                'SELL'
-            ],
-            default='NONE'
-        )
+        df = _add_macd_color(df, ctx)
 
         lower_same_side_decreasing = (
             ((df["lower_two_pole_macdhist"] > 0) & (df["lower_two_pole_macdhist"] < df["lower_two_pole_macdhist"].shift(1))) |  # dark green from light green
@@ -1469,7 +1696,7 @@ def calculate_all_indicators_optimized(df, candle='regular'):
 
         
         
-        df['ADX'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=14)
+        df['ADX'] = _from_state(engine_cols, 'ADX', talib.ADX, df['high'], df['low'], df['close'], timeperiod=14)
 
 
 
@@ -1522,36 +1749,12 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         # ------------------------------------------------------------------
         # 3) For each wave: peak distance from 0 and "curve vs flat"
         # ------------------------------------------------------------------
-        df['macd_wave_peak_abs'] = np.nan      # max |hist| in this wave
-        df['macd_wave_is_curve'] = False       # True = proper curve (rise+fall)
-
-        for wid, grp in df.groupby(wave_id):
-            idx  = grp.index
-            vals = hist_abs.loc[idx].values
-
-            if len(vals) == 0:
-                continue
-
-            peak_abs = vals.max()
-            curve = False
-
-            # We only consider it a real "curve" if:
-            # - at least 3 bars in the wave
-            # - peak is inside (not first/last bar)
-            # - there is some increase before peak and some decrease after
-            if len(vals) >= 3:
-                peak_pos = vals.argmax()            # index in 0..len-1
-                if 0 < peak_pos < len(vals) - 1:    # not at edges
-                    before = vals[:peak_pos+1]      # up to and incl. peak
-                    after  = vals[peak_pos:]        # from peak onwards
-
-                    incr_before = (np.diff(before) > 0).any()
-                    decr_after  = (np.diff(after)  < 0).any()
-
-                    curve = incr_before and decr_after
-
-            df.loc[idx, 'macd_wave_peak_abs'] = peak_abs
-            df.loc[idx, 'macd_wave_is_curve'] = curve
+        # A wave is a "curve" when it has at least 3 bars, its peak is
+        # inside (not first/last bar), and |hist| rises before the peak and
+        # falls after it. All waves are measured at once (no groupby).
+        waves = segment_stats(hist_abs.to_numpy(dtype=float), wave_id.to_numpy())
+        df['macd_wave_peak_abs'] = per_bar(waves['peak'], waves['length'])       # max |hist| in this wave
+        df['macd_wave_is_curve'] = per_bar(waves['is_curve'], waves['length'])   # True = proper curve (rise+fall)
 
         # ------------------------------------------------------------------
         # 4) At each NEW crossover, read the PREVIOUS wave's stats
@@ -1650,9 +1853,7 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         )
 
         # Fix: Assign trend_direction for each row based on close price vs previous close
-        df['price_trend_direction'] = 'SIDEWAYS'
-        df.loc[df[close_col] > df[close_col].shift(1), 'price_trend_direction'] = 'UPTREND'
-        df.loc[df[close_col] < df[close_col].shift(1), 'price_trend_direction'] = 'DOWNTREND'
+        df = _add_price_trend_direction(df, ctx)
 
 
         # Zero Lag EMA calculation 
@@ -1783,17 +1984,7 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         # 7. Swing highs/lows detection (Optimized)
         window = 5
         
-        is_swing_high = df[high_col] == df[high_col].rolling(window*2+1, center=True).max()
-        is_swing_low  = df[low_col]  == df[low_col].rolling(window*2+1, center=True).min()
-
-        df['swing_high'] = is_swing_high
-        df['swing_low']  = is_swing_low
-
-        df['swing_high_zone'] = np.where(is_swing_high, df[high_col], np.nan)
-        df['swing_low_zone']  = np.where(is_swing_low,  df[low_col],  np.nan)
-
-        df['swing_high_zone'] = df['swing_high_zone'].ffill()
-        df['swing_low_zone']  = df['swing_low_zone'].ffill()
+        df = _add_swings(df, ctx)
 
 
         # ============================================================
@@ -1857,19 +2048,9 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         df['ema_5_8_cross_ema100_down'] = both_below_100 & (~prev_both_below_100)
 
         # 3) State: first & second BUY and SELL after regime start
+        #    (rank 0 = none, 1 = first buy, 2 = second buy; signal 'BUY'/'SELL' only on those bars)
 
-        df['ema_5_8_buy_rank']  = 0        # 0 = none, 1 = first buy, 2 = second buy
-        df['ema_5_8_buy_signal']  = 'NONE' # 'BUY' only on those bars
-
-        df['ema_5_8_sell_rank'] = 0        # 0 = none, 1 = first sell, 2 = second sell
-        df['ema_5_8_sell_signal'] = 'NONE' # 'SELL' only on those bars
-
-        buy_regime  = False
-        sell_regime = False
-        buy_count   = 0
-        sell_count  = 0
-
-                # --- RSI Divergence prep (no loop yet) ------------------------------
+                # --- RSI Divergence prep ------------------------------------------
         lookback_left  = 5
         lookback_right = 5
         range_lower    = 5
@@ -1887,311 +2068,63 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         pivot_low  = (rsi_series == rsi_min)
         pivot_high = (rsi_series == rsi_max)
 
-        # Init divergence columns
-        df['rsi_bull_div'] = False
-        df['rsi_bear_div'] = False
-        df['RSI_30_70']    = False   # start pivot in 30/70 zone
-
-        # Numpy views for the single loop
-        rsi_vals   = rsi_series.to_numpy()
-        low_vals   = price_low.to_numpy()
-        high_vals  = price_high.to_numpy()
-        pl_vals    = pivot_low.to_numpy()
-        ph_vals    = pivot_high.to_numpy()
-
-        # --- Init columns used by loop -------------------------------------
-        df['RSI_9_MACD']          = np.nan
-        df['TAKEACTION']          = np.nan
-        df['breakout_entry']      = np.nan   # 'BUY' / 'SELL'
-        df['breakout_long_state'] = np.nan
-        df['breakout_short_state']= np.nan
-        df['DIVERGEN_SIGNAL']     = np.nan   # raw (non-live) structure-break
-
-        # state machines
-        state_rsi_macd       = None    # 'BUY' / 'SELL' / None  (RSI→MACD logic)
-        state_breakout_long  = 'IDLE'  # 'IDLE','WAIT_PULLBACK','WAIT_MACD'
-        state_breakout_short = 'IDLE'  # same for short side
-
-        # RSI divergence state: last pivot indices
-        prev_low_idx  = None   # last RSI pivot low index
-        prev_high_idx = None   # last RSI pivot high index
-
-            # *** ADD THESE TWO LINES ***
-        pending_div_type  = None     # 'BULL' or 'BEAR' for RAW divergence
-        pending_div_level = np.nan   # swing level for RAW divergence
-        # ****************************
-
         # Flag: divergence that starts from classic 30/70 RSI zones
         RSI_OVERSOLD   = 30
         RSI_OVERBOUGHT = 70
 
+        # ---------- MAIN STATE MACHINE OVER BARS ---------------------------
+        # ema 5/8 regime ranks, PA trend (confirmed swings + structure break),
+        # RAW divergence (with 30/70 tagging) -> structure break,
+        # RSI_9 -> MACD TAKEACTION, breakout -> pullback -> MACD entries.
+        # Runs as one array kernel; columns are written once below.
+        states = run_bar_state_kernel(
+            close=df[close_col].to_numpy(),
+            ema_100=df['ema_100'].to_numpy(),
+            swing_high_zone=df['swing_high_zone'].to_numpy(),
+            swing_low_zone=df['swing_low_zone'].to_numpy(),
+            rsi_9=df['RSI_9'].to_numpy(),
+            macd_cross=signal_codes(df['two_pole_MACD_CrossOver'].to_numpy()),
+            both_above_100=both_above_100.to_numpy(),
+            both_below_100=both_below_100.to_numpy(),
+            cross_ema100_up=df['ema_5_8_cross_ema100_up'].to_numpy(),
+            cross_ema100_down=df['ema_5_8_cross_ema100_down'].to_numpy(),
+            ema58_cross_up=df['ema_5_8_cross_up'].to_numpy(),
+            ema58_cross_down=df['ema_5_8_cross_down'].to_numpy(),
+            pa_sh=df['pa_swing_high'].to_numpy(dtype=bool),
+            pa_sl=df['pa_swing_low'].to_numpy(dtype=bool),
+            pa_sh_price=df['pa_swing_high_price'].to_numpy(dtype=np.float64),
+            pa_sl_price=df['pa_swing_low_price'].to_numpy(dtype=np.float64),
+            consolidating=df['consolidating'].to_numpy(dtype=bool),
+            rsi_14=rsi_series.to_numpy(),
+            low=price_low.to_numpy(),
+            high=price_high.to_numpy(),
+            pivot_low=pivot_low.to_numpy(),
+            pivot_high=pivot_high.to_numpy(),
+            range_lower=range_lower,
+            range_upper=range_upper,
+            rsi_oversold=RSI_OVERSOLD,
+            rsi_overbought=RSI_OVERBOUGHT,
+        )
 
-        # ---- PA Trend state memory ----
-        pa_trend = 'RANGE'
-        pa_last_high = np.nan
-        pa_prev_high = np.nan
-        pa_last_low  = np.nan
-        pa_prev_low  = np.nan
-
-        # Numpy for speed
-        pa_sh = df['pa_swing_high'].to_numpy(dtype=bool)
-        pa_sl = df['pa_swing_low'].to_numpy(dtype=bool)
-        pa_sh_price = df['pa_swing_high_price'].to_numpy(dtype=np.float64)
-        pa_sl_price = df['pa_swing_low_price'].to_numpy(dtype=np.float64)
-
-        idx_pa_break  = df.columns.get_loc('PA_STRUCTURE_BREAK')
-        idx_pa_trend  = df.columns.get_loc('PA_TREND')
-        idx_pa_change = df.columns.get_loc('PA_TREND_CHANGE')
-
-
-        # ---------- MAIN LOOP OVER BARS ------------------------------------
-        # ---------- RAW divergence detection (with 30/70 tagging) ----------
-        for i in range(1, len(df)):
-
-
-        # current regime side
-            curr_both_above_100 = bool(both_above_100.iloc[i])
-            curr_both_below_100 = bool(both_below_100.iloc[i])
-
-            # ----- start regimes -----
-            if df['ema_5_8_cross_ema100_up'].iloc[i]:
-                buy_regime = True
-                buy_count  = 0    # reset buys for new up-regime
-
-            if df['ema_5_8_cross_ema100_down'].iloc[i]:
-                sell_regime = True
-                sell_count  = 0   # reset sells for new down-regime
-
-            # ----- end regimes if EMAs leave that side of ema_100 -----
-            if buy_regime and not curr_both_above_100:
-                buy_regime = False
-                buy_count  = 0
-
-            if sell_regime and not curr_both_below_100:
-                sell_regime = False
-                sell_count  = 0
-
-            # ----- inside BUY regime -----
-            if buy_regime:
-                cond_crossover_buy = bool(df['ema_5_8_cross_up'].iloc[i])
-                cond_above_100     = df[close_col].iloc[i] > df['ema_100'].iloc[i]
-
-                # Only 1st and 2nd crossover after regime start
-                if cond_crossover_buy and cond_above_100 and buy_count < 20:
-                    buy_count += 1
-                    df.iat[i, df.columns.get_loc('ema_5_8_buy_rank')]   = buy_count
-                    df.iat[i, df.columns.get_loc('ema_5_8_buy_signal')] = 'BUY'
-
-            # ----- inside SELL regime -----
-            if sell_regime:
-                cond_crossover_sell = bool(df['ema_5_8_cross_down'].iloc[i])
-                cond_below_100      = df[close_col].iloc[i] < df['ema_100'].iloc[i]
-
-                # Only 1st and 2nd crossover after regime start
-                if cond_crossover_sell and cond_below_100 and sell_count < 20:
-                    sell_count += 1
-                    df.iat[i, df.columns.get_loc('ema_5_8_sell_rank')]   = sell_count
-                    df.iat[i, df.columns.get_loc('ema_5_8_sell_signal')] = 'SELL'
-
-
-            # Common values for this bar
-            rsi_9     = df['RSI_9'].iloc[i]
-            cross     = df['two_pole_MACD_CrossOver'].iloc[i]   # 'BUY'/'SELL'/nan
-
-            close_i    = df[close_col].iloc[i]
-            ema_i      = df['ema_100'].iloc[i]
-            prev_close = df[close_col].iloc[i - 1]
-
-            last_high  = df['swing_high_zone'].iloc[i]
-            last_low   = df['swing_low_zone'].iloc[i]
-
-
-                        # ============================================================
-            # PRICE ACTION TREND update (confirmed swings + structure break)
-            # ============================================================
-            prev_pa_trend = pa_trend
-
-            # Update last/prev swing highs/lows ONLY when a new confirmed swing prints
-            if pa_sh[i] and not np.isnan(pa_sh_price[i]):
-                pa_prev_high = pa_last_high
-                pa_last_high = pa_sh_price[i]
-
-            if pa_sl[i] and not np.isnan(pa_sl_price[i]):
-                pa_prev_low = pa_last_low
-                pa_last_low = pa_sl_price[i]
-
-            # Structure break signals
-            pa_break = 'NONE'
-            if not np.isnan(pa_last_high) and close_i > pa_last_high:
-                pa_break = 'BREAK_UP'
-                pa_trend = 'UPTREND'
-            elif not np.isnan(pa_last_low) and close_i < pa_last_low:
-                pa_break = 'BREAK_DOWN'
-                pa_trend = 'DOWNTREND'
-            else:
-                # No break => use HH/HL or LH/LL
-                if (not np.isnan(pa_prev_high)) and (not np.isnan(pa_prev_low)):
-                    is_hh_hl = (pa_last_high > pa_prev_high) and (pa_last_low > pa_prev_low)
-                    is_lh_ll = (pa_last_high < pa_prev_high) and (pa_last_low < pa_prev_low)
-
-                    if is_hh_hl:
-                        pa_trend = 'UPTREND'
-                    elif is_lh_ll:
-                        pa_trend = 'DOWNTREND'
-                    else:
-                        pa_trend = 'RANGE'
-                else:
-                    pa_trend = 'RANGE'
-
-                # If consolidating and no break => RANGE (optional but recommended)
-                if bool(df['consolidating'].iloc[i]):
-                    pa_trend = 'RANGE'
-
-            # Trend change label
-            pa_change = 'NONE'
-            if pa_trend != prev_pa_trend:
-                pa_change = 'UP' if pa_trend == 'UPTREND' else ('DOWN' if pa_trend == 'DOWNTREND' else 'NONE')
-
-            # Write to df
-            df.iat[i, idx_pa_break]  = pa_break
-            df.iat[i, idx_pa_trend]  = pa_trend
-            df.iat[i, idx_pa_change] = pa_change
-
-
-            # ----------------- RAW divergence (future-aware) ----------------
-            # Bullish divergence: RSI higher low, price lower low
-            if pl_vals[i]:
-                if prev_low_idx is not None:
-                    dist = i - prev_low_idx
-                    if range_lower <= dist <= range_upper:
-                        rsi_higher_low  = rsi_vals[i]  > rsi_vals[prev_low_idx]
-                        price_lower_low = low_vals[i]  < low_vals[prev_low_idx]
-                        if rsi_higher_low and price_lower_low:
-                            df.iloc[i, df.columns.get_loc('rsi_bull_div')] = True
-
-                            # mark if starting pivot was oversold
-                            if rsi_vals[prev_low_idx] < RSI_OVERSOLD:
-                                df.iloc[i, df.columns.get_loc('RSI_30_70')] = True
-
-                prev_low_idx = i
-
-            # Bearish divergence: RSI lower high, price higher high
-            if ph_vals[i]:
-                if prev_high_idx is not None:
-                    dist = i - prev_high_idx
-                    if range_lower <= dist <= range_upper:
-                        rsi_lower_high    = rsi_vals[i]   < rsi_vals[prev_high_idx]
-                        price_higher_high = high_vals[i]  > high_vals[prev_high_idx]
-                        if rsi_lower_high and price_higher_high:
-                            df.iloc[i, df.columns.get_loc('rsi_bear_div')] = True
-
-                            # mark if starting pivot was overbought
-                            if rsi_vals[prev_high_idx] > RSI_OVERBOUGHT:
-                                df.iloc[i, df.columns.get_loc('RSI_30_70')] = True
-
-                prev_high_idx = i
-
-            # ============================================================
-            # (0.1) Divergence → wait for structure break (RAW VERSION)
-            #       - On bullish divergence: wait for close > last swing HIGH
-            #       - On bearish divergence: wait for close < last swing LOW
-            # ============================================================
-            if df['rsi_bull_div'].iloc[i]:
-                pending_div_type  = 'BULL'
-                pending_div_level = last_high    # swing high at divergence bar
-
-            elif df['rsi_bear_div'].iloc[i]:
-                pending_div_type  = 'BEAR'
-                pending_div_level = last_low     # swing low at divergence bar
-
-            # If we are armed, watch for price to break the reference swing
-            if pending_div_type == 'BULL':
-                if close_i > pending_div_level:
-                    df.iloc[i, df.columns.get_loc('DIVERGEN_SIGNAL')] = 'BUY'
-                    pending_div_type  = None
-                    pending_div_level = np.nan
-
-            elif pending_div_type == 'BEAR':
-                if close_i < pending_div_level:
-                    df.iloc[i, df.columns.get_loc('DIVERGEN_SIGNAL')] = 'SELL'
-                    pending_div_type  = None
-                    pending_div_level = np.nan
-
-            # ================================================================
-            # (A) RSI → MACD TAKEACTION (your old logic)
-            # ================================================================
-            if rsi_9 > 70:
-                state_rsi_macd = 'SELL'
-            elif rsi_9 < 30:
-                state_rsi_macd = 'BUY'
-
-            if state_rsi_macd is not None and cross == state_rsi_macd:
-                # Fire TAKEACTION on matching crossover
-                df.iloc[i, df.columns.get_loc('TAKEACTION')] = state_rsi_macd
-                state_rsi_macd = None
-
-            # store current RSI_9_MACD state (for debugging / analysis)
-            df.iloc[i, df.columns.get_loc('RSI_9_MACD')] = state_rsi_macd
-
-            # ================================================================
-            # (B1) Long breakout → pullback → MACD BUY
-            # ================================================================
-            breakout_long = (
-                (close_i > ema_i) and
-                (close_i > last_high) and
-                ((prev_close <= ema_i) or (prev_close <= last_high))
-            )
+        df['ema_5_8_buy_rank']    = states['buy_rank']
+        df['ema_5_8_buy_signal']  = np.where(states['buy_rank'] > 0, 'BUY', 'NONE')
+        df['ema_5_8_sell_rank']   = states['sell_rank']
+        df['ema_5_8_sell_signal'] = np.where(states['sell_rank'] > 0, 'SELL', 'NONE')
 
-            if state_breakout_long == 'IDLE':
-                if breakout_long:
-                    state_breakout_long = 'WAIT_PULLBACK'
-
-            elif state_breakout_long == 'WAIT_PULLBACK':
-                # Pullback DOWN to EMA
-                if close_i <= ema_i:
-                    state_breakout_long = 'WAIT_MACD'
-                # Optional invalidation: too deep under EMA
-                elif close_i < ema_i * 0.99:
-                    state_breakout_long = 'IDLE'
-
-            elif state_breakout_long == 'WAIT_MACD':
-                if cross == 'BUY':
-                    df.iloc[i, df.columns.get_loc('breakout_entry')] = 'BUY'
-                    state_breakout_long = 'IDLE'
-                elif close_i < ema_i * 0.99:
-                    state_breakout_long = 'IDLE'
-
-            # ================================================================
-            # (B2) Short breakout → pullback → MACD SELL
-            # ================================================================
-            breakout_short = (
-                (close_i < ema_i) and
-                (close_i < last_low) and
-                ((prev_close >= ema_i) or (prev_close >= last_low))
-            )
+        df['PA_STRUCTURE_BREAK'] = labels_from_codes(states['pa_break'], PA_BREAK_LABELS)
+        df['PA_TREND']           = labels_from_codes(states['pa_trend'], PA_TREND_LABELS)
+        df['PA_TREND_CHANGE']    = labels_from_codes(states['pa_change'], PA_CHANGE_LABELS)
 
-            if state_breakout_short == 'IDLE':
-                if breakout_short:
-                    state_breakout_short = 'WAIT_PULLBACK'
-
-            elif state_breakout_short == 'WAIT_PULLBACK':
-                # Pullback UP to EMA
-                if close_i >= ema_i:
-                    state_breakout_short = 'WAIT_MACD'
-                # Optional invalidation: too far above EMA
-                elif close_i > ema_i * 0.5:
-                    state_breakout_short = 'IDLE'
-
-            elif state_breakout_short == 'WAIT_MACD':
-                if cross == 'SELL':
-                    df.iloc[i, df.columns.get_loc('breakout_entry')] = 'SELL'
-                    state_breakout_short = 'IDLE'
-                elif close_i > ema_i * 0.5:
-                    state_breakout_short = 'IDLE'
-
-            # Save states for debugging / analysis
-            df.iloc[i, df.columns.get_loc('breakout_long_state')]  = state_breakout_long
-            df.iloc[i, df.columns.get_loc('breakout_short_state')] = state_breakout_short
+        df['rsi_bull_div'] = states['bull_div']
+        df['rsi_bear_div'] = states['bear_div']
+        df['RSI_30_70']    = states['rsi_30_70']   # start pivot in 30/70 zone
+
+        df['RSI_9_MACD']          = state_column(states['rsi_macd_state'], SIGNAL_LABELS)
+        df['TAKEACTION']          = sparse_signal_column(states['takeaction'])
+        df['breakout_entry']      = sparse_signal_column(states['breakout_entry'])   # 'BUY' / 'SELL'
+        df['breakout_long_state'] = state_column(states['breakout_long_state'], BREAKOUT_STATE_LABELS)
+        df['breakout_short_state']= state_column(states['breakout_short_state'], BREAKOUT_STATE_LABELS)
+        df['DIVERGEN_SIGNAL']     = sparse_signal_column(states['div_signal'])   # raw (non-live) structure-break
 
         # ---------- AFTER LOOP: labels & LIVE-safe divergence ---------------
 
@@ -2238,35 +2171,14 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         df['last_divergenen_time'] =  df['last_divergenen_time_live'] 
 
         # LIVE divergence → structure-break entry signal
-        df['DIVERGEN_SIGNAL_LIVE'] = np.nan
-
-        pending_div_type  = None     # 'BULL' or 'BEAR'
-        pending_div_level = np.nan   # swing level to break
-
-        for i in range(len(df)):
-            close_i   = df[close_col].iloc[i]
-            last_high = df['swing_high_zone'].iloc[i]
-            last_low  = df['swing_low_zone'].iloc[i]
-
-            # Arm on LIVE divergence, not raw
-            if df['rsi_bull_div_live'].iloc[i]:
-                pending_div_type  = 'BULL'
-                pending_div_level = last_high     # need break above this
-
-            elif df['rsi_bear_div_live'].iloc[i]:
-                pending_div_type  = 'BEAR'
-                pending_div_level = last_low      # need break below this
-
-            # Wait for structure break after divergence is confirmed
-            if pending_div_type == 'BULL' and close_i > pending_div_level:
-                df.iloc[i, df.columns.get_loc('DIVERGEN_SIGNAL_LIVE')] = 'BUY'
-                pending_div_type  = None
-                pending_div_level = np.nan
-
-            elif pending_div_type == 'BEAR' and close_i < pending_div_level:
-                df.iloc[i, df.columns.get_loc('DIVERGEN_SIGNAL_LIVE')] = 'SELL'
-                pending_div_type  = None
-                pending_div_level = np.nan
+        # Arm on LIVE divergence (not raw), fire when price breaks the swing level
+        df['DIVERGEN_SIGNAL_LIVE'] = sparse_signal_column(run_live_divergence_kernel(
+            df[close_col].to_numpy(),
+            df['swing_high_zone'].to_numpy(),
+            df['swing_low_zone'].to_numpy(),
+            df['rsi_bull_div_live'].to_numpy(dtype=bool),
+            df['rsi_bear_div_live'].to_numpy(dtype=bool),
+        ))
 
         # Simple final breakout label
         df['BREAKOUT_SIGNAL'] = np.where(
@@ -2277,18 +2189,10 @@ def calculate_all_indicators_optimized(df, candle='regular'):
 
         # =====================================================================
         
-        # 8. Candle strength calculations (always use Heiken Ashi for strength)
-        if candle == 'heiken':
-            df['candle_strength'] = df.apply(lambda row: abs(row['ha_close'] - row['ha_open']) / (row['ha_high'] - row['ha_low']) if (row['ha_high'] - row['ha_low']) > 0 else 0, axis=1)
-            df['candle_strength'] = df['candle_strength'].round(2)
-            
-            df['candle_strength_bool'] = df.apply(lambda row: abs(row['ha_close'] - row['ha_open']) / (row['ha_high'] - row['ha_low']) >= 0.6 if (row['ha_high'] - row['ha_low']) > 0 else False, axis=1)
-        else:
-            # For regular candles, calculate strength using regular OHLC
-            df['candle_strength'] = df.apply(lambda row: abs(row['close'] - row['open']) / (row['high'] - row['low']) if (row['high'] - row['low']) > 0 else 0, axis=1)
-            df['candle_strength'] = df['candle_strength'].round(2)
-            
-            df['candle_strength_bool'] = df.apply(lambda row: abs(row['close'] - row['open']) / (row['high'] - row['low']) >= 0.6 if (row['high'] - row['low']) > 0 else False, axis=1)
+        # 8. Candle geometry (body / wicks / range / body ratio) for regular and HA,
+        #    computed once and read by candle strength, HA decision and candle labels
+        df = _add_candle_geometry(df, ctx)
+        df = _add_candle_strength(df, ctx)
     
     
     # 9. Total Change Added After Analysis
@@ -2304,14 +2208,14 @@ def calculate_all_indicators_optimized(df, candle='regular'):
 
 
         # --- EMA calculations ---
-        df['ema8_high'] = talib.EMA(df['high'], timeperiod=8)
-        df['ema8_low'] = talib.EMA(df['low'], timeperiod=8)
+        df['ema8_high'] = _from_state(engine_cols, 'ema8_high', talib.EMA, df['high'], timeperiod=8)
+        df['ema8_low'] = _from_state(engine_cols, 'ema8_low', talib.EMA, df['low'], timeperiod=8)
 
-        df['ema34_high'] = talib.EMA(df['high'], timeperiod=34)
-        df['ema34_low'] = talib.EMA(df['low'], timeperiod=34)
+        df['ema34_high'] = _from_state(engine_cols, 'ema34_high', talib.EMA, df['high'], timeperiod=34)
+        df['ema34_low'] = _from_state(engine_cols, 'ema34_low', talib.EMA, df['low'], timeperiod=34)
 
-        df['ema144_close'] = talib.EMA(df['close'], timeperiod=144)
-        df['ema233_close'] = talib.EMA(df['close'], timeperiod=233)
+        df['ema144_close'] = _from_state(engine_cols, 'ema144_close', talib.EMA, df['close'], timeperiod=144)
+        df['ema233_close'] = _from_state(engine_cols, 'ema233_close', talib.EMA, df['close'], timeperiod=233)
 
         # --- Buy and Sell Conditions ---
         df['3ema_buy_signal'] = (
@@ -2440,20 +2344,23 @@ def calculate_all_indicators_optimized(df, candle='regular'):
         # timeperiod    = RSI length
         # fastk_period  = Stoch length
         # fastd_period  = first smoothing (we'll treat as pre-smoothing)
-        srsi_k_raw, srsi_d_raw = talib.STOCHRSI(
-            df[close_col],
-            timeperiod=rsi_length,
-            fastk_period=stoch_length,
-            fastd_period=k_smooth,
-            fastd_matype=MA_Type.SMA
-        )
+        if engine_cols is not None:
+            srsi_k_raw = engine_cols['stochrsi_k_raw']
+        else:
+            srsi_k_raw, srsi_d_raw = talib.STOCHRSI(
+                df[close_col],
+                timeperiod=rsi_length,
+                fastk_period=stoch_length,
+                fastd_period=k_smooth,
+                fastd_matype=MA_Type.SMA
+            )
 
         # Map to TradingView-style K,D with extra smoothing:
         #  - stochrsi_k = SMA(raw_k, 3)
         #  - stochrsi_d = SMA(stochrsi_k, 3)
         df['stochrsi_k_raw'] = srsi_k_raw
-        df['stochrsi_k']     = talib.SMA(df['stochrsi_k_raw'], timeperiod=k_smooth)
-        df['stochrsi_d']     = talib.SMA(df['stochrsi_k'],      timeperiod=d_smooth)
+        df['stochrsi_k']     = _from_state(engine_cols, 'stochrsi_k', talib.SMA, df['stochrsi_k_raw'], timeperiod=k_smooth)
+        df['stochrsi_d']     = _from_state(engine_cols, 'stochrsi_d', talib.SMA, df['stochrsi_k'],      timeperiod=d_smooth)
 
 
 
@@ -3055,18 +2962,17 @@ def build_ha_decision_df_single(
         out[time_col] = pd.to_datetime(out[time_col], utc=True, errors="coerce")
         out = out.dropna(subset=[time_col]).sort_values(time_col).reset_index(drop=True)
 
-    o, h, l, c = out["ha_open"], out["ha_high"], out["ha_low"], out["ha_close"]
+    o, c = out["ha_open"], out["ha_close"]
+    geometry = candle_geometry(out, 'heiken')
 
-    rng  = (h - l).replace(0, np.nan)
-    body = (c - o).abs()
-
-    up_w = h - np.maximum(c, o)
-    dn_w = np.minimum(c, o) - l
+    rng  = geometry['range'].replace(0, np.nan)
+    up_w = geometry['upper_wick']
+    dn_w = geometry['lower_wick']
 
     is_green = c >= o
     is_red   = ~is_green
 
-    body_r = (body / rng).clip(0, 1)
+    body_r = geometry['body_ratio'].clip(0, 1)
     up_r   = (up_w / rng).fillna(0)
     dn_r   = (dn_w / rng).fillna(0)
 
@@ -3161,20 +3067,20 @@ def label_candle_types_regular(
     # ======================================================
     # ✅ Long wick detection (NEW)
     # ======================================================
-    o_s = df[open_col].astype(float)
-    h_s = df[high_col].astype(float)
-    l_s = df[low_col].astype(float)
-    c_s = df[close_col].astype(float)
+    if (open_col, high_col, low_col, close_col) == CANDLE_KINDS['regular'][1:]:
+        geometry = candle_geometry(df, 'regular')
+    else:
+        geometry = candle_geometry_arrays(df[open_col], df[high_col], df[low_col], df[close_col])
 
-    body = (c_s - o_s).abs()
-    rng  = (h_s - l_s)
+    body = pd.Series(np.asarray(geometry['body']), index=df.index)
+    rng  = pd.Series(np.asarray(geometry['range']), index=df.index)
 
     # avoid division issues on tiny candles
     body_safe = body.clip(lower=1e-9)
     rng_safe  = rng.clip(lower=1e-9)
 
-    lower_wick = np.minimum(o_s, c_s) - l_s
-    upper_wick = h_s - np.maximum(o_s, c_s)
+    lower_wick = geometry['lower_wick']
+    upper_wick = geometry['upper_wick']
 
     long_lower_wick = (lower_wick >= wick_body_ratio * body_safe) & (lower_wick >= wick_range_ratio * rng_safe)
     long_upper_wick = (upper_wick >= wick_body_ratio * body_safe) & (upper_wick >= wick_range_ratio * rng_safe)
@@ -3522,16 +3428,70 @@ def tdfi_assign_state_talib(
 
     return df.assign(tdfi_state=tdfi_state)
 
+def lazy_indicator_frame(df, candle='regular', state_key=None):
+    """
+    LazyIndicatorFrame over a raw OHLCV frame: registered column groups run on
+    first access, anything else falls back to calculate_all_indicators_optimized.
+    """
+    prepared = df.sort_values("time").set_index("time", drop=False)
+    engine_cols = None
+    if state_key is not None:
+        engine_cols = indicator_engine.update((*state_key, candle), prepared, candle)
+    return LazyIndicatorFrame(
+        prepared,
+        indicator_groups,
+        _indicator_context(candle, engine_cols),
+        lambda: calculate_all_indicators_optimized(df, candle, state_key=state_key),
+    )
+
+
+def _batch_candles(symbol, interval):
+    """Candles from the shared batch store (ProcessPool workers), None when not published or stale."""
+    interval_ms = INTERVAL_MS.get(interval)
+    if not interval_ms:
+        return None
+    return shared_ohlcv_frame(symbol, interval, min_time_ms=last_closed_open_time(interval_ms))
+
+
 @performance_monitor("SIGNAL_PROCESSING", "CalculateSignals", machine_id=MAIN_SIGNAL_DETECTOR_ID)
-def CalculateSignals(symbol, interval, candle='regular'):
+def CalculateSignals(symbol, interval, candle='regular', columns=None):
+    """
+    columns: optional list of indicator columns the caller reads. Only the
+    groups producing them (plus their dependencies) are computed; the returned
+    frame holds the OHLCV data and those columns.
+
+    Frames are cached per (symbol, interval, candle, last closed candle), so
+    repeated calls within one candle skip the DB fetch and the recompute.
+    """
     try:
-        df_trading = fetch_data_safe(symbol, interval, 500)
+        cache_key = signal_frame_cache.key(symbol, interval, candle)
+        return signal_frame_cache.get_or_compute(
+            cache_key, lambda: _calculate_signals_uncached(symbol, interval, candle, columns), columns
+        )
+    except Exception as e:
+        log_error(e, 'CalculateSignals cache', symbol)
+        return _calculate_signals_uncached(symbol, interval, candle, columns)
+
+
+def _calculate_signals_uncached(symbol, interval, candle='regular', columns=None):
+    try:
+        df_trading = _batch_candles(symbol, interval)
+        if df_trading is None:
+            df_trading = candle_rings.fetch(symbol, interval, fetch_data_safe, SIGNAL_CANDLE_LIMIT)
         if df_trading is None or 'time' not in df_trading.columns:
             log_error("df_trading is None or missing 'time' column", "CalculateSignals", symbol)
             return None
+
+        state_key = (symbol, interval) if INCREMENTAL_INDICATORS else None
+        if columns is not None:
+            if df_trading.empty:
+                return df_trading
+            return lazy_indicator_frame(df_trading, candle, state_key=state_key).to_frame(columns)
         
-        # Single optimized function call with candle parameter
-        df_trading = calculate_all_indicators_optimized(df_trading, candle)
+        # Single optimized function call with candle parameter; with
+        # INCREMENTAL_INDICATORS=1 base indicators are stepped from the previous
+        # call's state for this symbol/interval
+        df_trading = calculate_all_indicators_optimized(df_trading, candle, state_key=state_key)
 
         
         
@@ -3944,7 +3904,7 @@ def follow_overall_ema_trend(pair_info):
 
 def process_action_for_overall_ema_trend(pair,action):
     try:
-        df = CalculateSignals(pair, '15m','heiken')
+        df = CalculateSignals(pair, '15m','heiken', columns=['ha_color', 'ha_close', 'ema_9'])
         if df is None or df.empty:
             return False
         
@@ -4974,10 +4934,10 @@ def tdfi_breakout(pair_info, check_exists: bool = False):
         last_swing_high_zone_15m = previous_row_15m['swing_high_zone']
         last_swing_low_zone_15m = previous_row_15m['swing_low_zone']
 
-        lower_wick_15m = min(last_open_15m, last_close_15m) - last_low_15m
-        upper_wick_15m = last_high_15m - max(last_open_15m, last_close_15m)
+        lower_wick_15m = previous_row_15m['candle_lower_wick']
+        upper_wick_15m = previous_row_15m['candle_upper_wick']
         
-        candle_body_15m  = abs(last_close_15m - last_open_15m)
+        candle_body_15m  = previous_row_15m['candle_body']
         last_Volume_Ratio_15m = previous_row_15m['Volume_Ratio']
         vol_ok = (last_Volume_Ratio_15m >= 1.5)
         
@@ -5275,8 +5235,9 @@ def tdfi_Strategy(pair_info):
         log_error(e, "tdfi_Strategy", symbol, machine_id=MAIN_SIGNAL_DETECTOR_ID)
         return None,None,None,None,None,None,None
 
-def process_non_squeezed_pair_with_signal(pair_info):
+def process_non_squeezed_pair_with_signal(pair_info, ohlcv_manifest=None):
     try:
+        ensure_shared_ohlcv(ohlcv_manifest)
         symbol = pair_info['pair']     
         result = tdfi_Strategy(pair_info)
         # if result is not None and isinstance(result, tuple) and len(result) == 7:
@@ -5303,10 +5264,144 @@ def setSuperTrend():
         log_error(e, "setSuperTrend", "N/A", machine_id=MAIN_SIGNAL_DETECTOR_ID)
     
 
+def init_signal_worker():
+    """Per-worker setup for the persistent signal pool: own DB engine and Binance clients."""
+    global client
+    try:
+        init_process_resources()
+        client = UMFutures(key=api, secret=secret)
+    except Exception as e:
+        print(f"❌ Error initializing signal worker {os.getpid()}: {e}")
+        log_error(e, "init_signal_worker", "worker", machine_id=MAIN_SIGNAL_DETECTOR_ID)
+
+
+signal_worker_pool = None
+_signal_worker_pool_lock = threading.Lock()
+
+
+def get_signal_worker_pool():
+    """The process-wide warm worker pool shared by the main loop and trading_runner_final."""
+    global signal_worker_pool
+    with _signal_worker_pool_lock:
+        if signal_worker_pool is None:
+            signal_worker_pool = WarmWorkerPool(
+                SIGNAL_POOL_WORKERS,
+                initializer=init_signal_worker,
+                name='signal_pool',
+                max_consecutive_crashes=MAX_CONSECUTIVE_CRASHES,
+                health_timeout=POOL_HEALTH_CHECK_TIMEOUT,
+                on_error=lambda e, context: log_error(e, context, "worker_pool", machine_id=MAIN_SIGNAL_DETECTOR_ID),
+            )
+        return signal_worker_pool
+
+
+def check_signal_worker_pool():
+    """Health check of the warm pool (replaced if broken); no-op before it has started."""
+    if signal_worker_pool is None:
+        return True
+    healthy = signal_worker_pool.health_check()
+    print(f"🩺 Signal pool {'healthy' if healthy else 'replaced'}: {signal_worker_pool.stats()}")
+    return healthy
+
+
+def shutdown_signal_worker_pool():
+    global signal_worker_pool
+    with _signal_worker_pool_lock:
+        pool, signal_worker_pool = signal_worker_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, terminate=True)
+
+
+kline_stream = None
+_kline_stream_lock = threading.Lock()
+
+
+def _seed_kline_stream(symbols, interval, limit):
+    """Stored candles for the ring buffers; series without a table yet start empty."""
+    stored = [symbol for symbol in symbols if kline_catalog.exists(symbol, interval)]
+    return candle_store.fetch_latest_many(stored, interval, limit) if stored else None
+
+
+def start_kline_stream():
+    """Start the WebSocket kline ingestor for every pair in pairstatus (KLINE_STREAM=0 disables it)."""
+    global kline_stream
+    if not KLINE_STREAM_ENABLED:
+        return None
+    with _kline_stream_lock:
+        if kline_stream is not None and kline_stream.running:
+            return kline_stream
+        symbols = list(get_existing_pair_symbols() or [])
+        if not symbols:
+            print("⚠️ No pairs in pairstatus, kline stream not started")
+            return None
+        kline_stream = KlineStreamIngestor(
+            {interval: INTERVAL_MS[interval] for interval in KLINE_STREAM_INTERVALS},
+            insert_bulk=insert_klines_bulk,
+            seed=_seed_kline_stream,
+            ring_size=SIGNAL_CANDLE_LIMIT,
+            on_error=lambda e, context: log_error(e, context, "kline_stream", machine_id=MAIN_SIGNAL_DETECTOR_ID),
+        ).start(symbols)
+        return kline_stream
+
+
+def refresh_kline_stream():
+    """Resubscribe when the pairstatus pair list changed; restart a stopped ingestor."""
+    if kline_stream is None or not kline_stream.running:
+        return start_kline_stream()
+    symbols = list(get_existing_pair_symbols() or [])
+    if symbols and kline_stream.resubscribe(symbols):
+        print(f"🔄 Kline stream resubscribed for {len(symbols)} pairs")
+    print(f"📡 Kline stream: {kline_stream.stats}")
+    return kline_stream
+
+
+def stop_kline_stream():
+    global kline_stream
+    with _kline_stream_lock:
+        stream, kline_stream = kline_stream, None
+    if stream is not None:
+        stream.stop()
+
+
+def fetch_candles(symbol, interval, limit):
+    """Latest closed candles from the kline stream's ring buffer, REST/DB (fetch_data_safe) when it is not current."""
+    if kline_stream is not None and kline_stream.running and interval in INTERVAL_MS:
+        df = kline_stream.frame(symbol, interval, limit, min_last_ms=last_closed_open_time(INTERVAL_MS[interval]))
+        if df is not None:
+            return df
+    return fetch_data_safe(symbol, interval, limit)
+
+
+def bulk_prefetch_candles(keys, limit):
+    """
+    Batch prefetch: frames from the kline stream rings, then a single bulk DB
+    query for the rest; only series whose last closed candle is stored are
+    kept, the others go through fetch_candles.
+    """
+    frames = {}
+    pending = []
+    for symbol, interval in keys:
+        df = None
+        if kline_stream is not None and kline_stream.running and interval in INTERVAL_MS:
+            df = kline_stream.frame(symbol, interval, limit, min_last_ms=last_closed_open_time(INTERVAL_MS[interval]))
+        if df is not None:
+            frames[(symbol, interval)] = df
+        elif interval in INTERVAL_MS:
+            pending.append((symbol, interval))
+    if not pending:
+        return frames
+
+    intervals = dict.fromkeys(interval for _, interval in pending)
+    arrays = bulk_fetch_klines([symbol for symbol, _ in pending], {interval: limit for interval in intervals}, as_arrays=True)
+    expected = {interval: last_closed_open_time(INTERVAL_MS[interval]) for interval in intervals}
+    for key in pending:
+        series = arrays.get(key)
+        if series is not None and len(series['time']) and series['time'][-1] >= expected[key[1]]:
+            frames[key] = ohlcv_frame(series)
+    return frames
+
+
 def start_non_squeezed_pairs_loop(offset=0, limit=10):
-    consecutive_crashes = 0
-    max_consecutive_crashes = MAX_CONSECUTIVE_CRASHES
-    
     # Run only one cycle instead of infinite loop
     try:
         cycle_start_time = time.time()
@@ -5325,62 +5420,49 @@ def start_non_squeezed_pairs_loop(offset=0, limit=10):
 
         # print(f"🧠 Running PriceAction for {len(pairs_info)} non-squeezed pairs...")
 
-        #max_workers = get_dynamic_workers(len(pairs_info))
-        max_workers = 12
-        
-        if consecutive_crashes >= max_consecutive_crashes:
-            print(f"🔄 Using ThreadPoolExecutor with {max_workers} workers (fallback due to crashes).")
-            executor_class = concurrent.futures.ThreadPoolExecutor
-        else:
-            print(f"🚀 Using ProcessPoolExecutor with {max_workers} workers (reduced for stability).")
-            executor_class = concurrent.futures.ProcessPoolExecutor
+        pool = get_signal_worker_pool()
+        print(f"🚀 Using warm {pool.executor_type} with {pool.max_workers} workers.")
 
         batch_start_time = time.time()
-        with executor_class(max_workers=max_workers) as executor:
-            futures = [executor.submit(process_non_squeezed_pair_with_signal, pair_info) for pair_info in pairs_info]
-            
-            completed_count = 0
-            error_count = 0
-            crash_count = 0
-            
-            for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
-                try:
-                    future.result(timeout=PROCESS_TIMEOUT)
-                    completed_count += 1
-                except concurrent.futures.TimeoutError:
-                    print(f"⏰ Timeout for pair {pairs_info[i-1].get('pair', 'unknown')} after 5 minutes")
-                    error_count += 1
-                except Exception as e:
-                    error_msg = str(e)
-                    if "terminated abruptly" in error_msg:
-                        crash_count += 1
-                        print(f"💥 Process crash for pair {pairs_info[i-1].get('pair', 'unknown')}: {e}")
-                    else:
-                        print(f"❌ Error in process for pair {pairs_info[i-1].get('pair', 'unknown')}: {e}")
-                    log_error(e, "start_non_squeezed_pairs_loop_future", pairs_info[i-1].get('pair', 'unknown'), machine_id=MAIN_SIGNAL_DETECTOR_ID)
-                    error_count += 1
-            
-            print(f"📊 Non-squeezed batch completed: {completed_count} successful, {error_count} errors, {crash_count} crashes")
-            
-            # Log batch processing performance
-            total_processing_time_ms = int((time.time() - batch_start_time) * 1000)
-            log_batch_processing(
-                batch_type="NON_SQUEEZED_PAIRS",
-                batch_size=len(pairs_info),
-                successful_count=completed_count,
-                error_count=error_count,
-                crash_count=crash_count,
-                total_processing_time_ms=total_processing_time_ms,
-                executor_type=executor_class.__name__,
-                worker_count=max_workers,
-                machine_id=MAIN_SIGNAL_DETECTOR_ID
+
+        # Fetch the batch's candles once and share them with the workers
+        frames = fetch_batch_ohlcv(
+            fetch_candles,
+            [pair_info['pair'] for pair_info in pairs_info],
+            NON_SQUEEZED_SHARED_INTERVALS,
+            SIGNAL_CANDLE_LIMIT,
+            max_workers=BATCH_FETCH_WORKERS,
+            bulk=bulk_prefetch_candles,
+        )
+        shared_batch = publish_ohlcv(frames)
+        manifest = shared_batch.manifest if shared_batch is not None else None
+        if shared_batch is not None:
+            print(f"📦 Shared {len(shared_batch)} OHLCV series ({shared_batch.nbytes / (1024 * 1024):.2f} MB) in {time.time() - batch_start_time:.2f}s")
+
+        try:
+            batch = pool.run_batch(
+                process_non_squeezed_pair_with_signal, pairs_info, manifest,
+                timeout=PROCESS_TIMEOUT, label=lambda pair_info: pair_info.get('pair', 'unknown'),
             )
-            
-            if crash_count > 0:
-                consecutive_crashes += 1
-                print(f"⚠️ Consecutive crashes: {consecutive_crashes}/{max_consecutive_crashes}")
-            else:
-                consecutive_crashes = 0
+        finally:
+            if shared_batch is not None:
+                shared_batch.close()
+
+        error_count = batch['errors'] + batch['timeouts']
+        print(f"📊 Non-squeezed batch completed: {batch['completed']} successful, {error_count} errors, {batch['crashes']} crashes")
+
+        # Log batch processing performance
+        log_batch_processing(
+            batch_type="NON_SQUEEZED_PAIRS",
+            batch_size=len(pairs_info),
+            successful_count=batch['completed'],
+            error_count=error_count,
+            crash_count=batch['crashes'],
+            total_processing_time_ms=int((time.time() - batch_start_time) * 1000),
+            executor_type=batch['executor_type'],
+            worker_count=batch['worker_count'],
+            machine_id=MAIN_SIGNAL_DETECTOR_ID
+        )
 
         total_processing_time = time.time() - batch_start_time
         print(f"📊 Total processing time: {total_processing_time:.2f}s for {len(pairs_info)} non-squeezed pairs")
@@ -5402,7 +5484,9 @@ def main():
     
     try:
         print("🚀 Starting Trading Bot with ProcessPoolExecutor Architecture...")
-        print("📊 Pairs will be fetched from database and processed with ProcessPoolExecutor")
+        print("📊 Pairs will be fetched from database and processed with a warm ProcessPoolExecutor")
+        get_signal_worker_pool().start()
+        start_kline_stream()
 
         print("🎯 Starting Squeezed Pairs Processing Loop...")
         
@@ -5420,15 +5504,21 @@ def main():
             # Log system health every 5 minutes (300 seconds)
             if health_check_counter >= 300:
                 log_system_health(machine_id=MAIN_SIGNAL_DETECTOR_ID)
+                check_signal_worker_pool()
+                refresh_kline_stream()
                 health_check_counter = 0
             
 
         non_squeezed_thread.join(timeout=10)
+        shutdown_signal_worker_pool()
+        stop_kline_stream()
         print("🛑 Shutdown complete.")
 
     except KeyboardInterrupt:
         print("🛑 Shutdown requested by user.")
         shutdown_requested = True
+        shutdown_signal_worker_pool()
+        stop_kline_stream()
     except Exception as e:
         log_error(e, 'main', 'Fatal crash', machine_id=MAIN_SIGNAL_DETECTOR_ID)
         print(f"❌ Fatal error in main loop: {e}")
@@ -4,9 +4,11 @@ import time
 import threading
 import queue
 from data_handler import DataHandler
-from core.ws_handler import WebSocketHandler
-from utils.global_store import all_pairs, active_threads, message_queues
+from core.ws_handler import WebSocketHandler, UID_WORKER_MODE, uid_scheduler, mark_price_slots
+from utils.global_store import all_pairs, all_pairs_locks, active_threads, message_queues
 from utils.logger import log_error, log_info
+from utils.pair_index import index_pair
+from utils.utils import get_lock
 from machine_id import get_machine_id
 # from utils.Final_olab_database import olab_update_single_uid_in_table
 
@@ -26,6 +28,9 @@ class BotManager:
             return
             
         self.last_thread_check = current_time
+        if UID_WORKER_MODE != "thread":
+            log_info(f"BotManager.monitor_threads: [UID_SCHEDULER] {uid_scheduler.stats()}")
+        log_info(f"BotManager.monitor_threads: [MARK_PRICE_SLOTS] {mark_price_slots.stats()}")
         
         dead_threads = []
         for uid, thread in active_threads.items():
@@ -40,9 +45,7 @@ class BotManager:
                 message_queues[uid] = queue.Queue()
                 print(f"🔄 Restarting dead thread for UID: {uid}")
                 
-                t = threading.Thread(target=self.ws_handler.worker, args=(uid,), daemon=True)
-                t.start()
-                active_threads[uid] = t
+                self.ws_handler.start_worker(uid)
                 print(f"✅ Restarted worker for UID: {uid}")
                 log_info(f"BotManager.monitor_threads: [RESTARTED] UID: {uid}", uid=uid)
 
@@ -64,14 +67,15 @@ class BotManager:
                 removed_uids = last_known_uids - current_uids
 
                 for uid in new_uids:
-                    if uid not in active_threads or not active_threads[uid].is_alive():
-                        message_queues[uid] = queue.Queue()
-                        all_pairs[uid] = uid_data[uid]
+                    # Event mode has no per-UID thread: a UID already on the scheduler
+                    # keeps its all_pairs entry (workers may be holding it)
+                    if not self.ws_handler.has_worker(uid):
+                        with get_lock(all_pairs_locks, uid):
+                            all_pairs[uid] = uid_data[uid]
+                        index_pair(uid, uid_data[uid])
                         print(f"✅ Processing UID that is not in active thread: {uid}")
 
-                        t = threading.Thread(target=self.ws_handler.worker, args=(uid,), daemon=True)
-                        t.start()
-                        active_threads[uid] = t
+                        self.ws_handler.start_worker(uid)
                         print(f"\U0001F195 Started worker for UID: {uid}")
                         log_info(f"BotManager.run() 1: [NEW] UID: {uid} started | all_pairs[uid]: {all_pairs.get(uid)}", uid=uid)
 
@@ -7,6 +7,14 @@ import numpy as np
 from FinalVersionTrading_AWS import   CalculateSignals,placeOrder
 from utils.logger import log_event, log_error
 
+# Indicator columns each ProfitBooker check reads; CalculateSignals only
+# computes these (and their dependencies) instead of the full frame.
+BOOK_PROFIT_15M_COLUMNS = ['RSI_9', 'ha_color', 'volume_increasing', 'macd_color_signal', 'price_trend_direction']
+BOOK_PROFIT_5M_COLUMNS = ['ha_color', 'volume_increasing']
+BREAKOUT_LEVEL_COLUMNS = ['ha_high', 'ha_low']
+CLOSE_CHECK_COLUMNS = ['ha_color', 'volume_increasing', 'Volume_MA', 'RSI_9']
+CLOSE_CONFIRM_COLUMNS = ['RSI_9', 'volume_increasing', 'price_trend_direction', 'macd_color_signal']
+
 class ProfitBooker:
     """
     Class to encapsulate the logic for booking profit based on multi-timeframe analysis.
@@ -32,7 +40,7 @@ class ProfitBooker:
             log_event(symbol, "ProfitBooker.book_profit", f"Running BookProfit for {symbol} | Interval: {interval} | Main Action: {action} | Price: {currentprice}", 0)
 
             # Step 1: Load 15m data
-            df_15m = self.CalculateSignals(symbol, '15m''heiken')
+            df_15m = self.CalculateSignals(symbol, '15m', 'heiken', columns=BOOK_PROFIT_15M_COLUMNS)
           
             if df_15m is None or getattr(df_15m, 'empty', False):
                 log_event(symbol, "ProfitBooker.book_profit", "15m DataFrame is empty. Exiting.", 0)
@@ -49,7 +57,7 @@ class ProfitBooker:
                     (macd_color_signal == 'SELL')):
                     log_event(symbol, "ProfitBooker.book_profit", "RSI 70-80 and volume decreasing on 15m, checking 5m...", 0)
 
-                    df_5m = self.CalculateSignals(symbol, '5m', 'heiken')
+                    df_5m = self.CalculateSignals(symbol, '5m', 'heiken', columns=BOOK_PROFIT_5M_COLUMNS)
                    
                     if df_5m is None or getattr(df_5m, 'empty', False):
                         log_event(symbol, "ProfitBooker.book_profit", "5m DataFrame is empty. Exiting.", 0)
@@ -60,7 +68,7 @@ class ProfitBooker:
                     if not volume_increasing_5m or candle_color_5m == 'RED':    
                         log_event(symbol, "ProfitBooker.book_profit", "Volume decreasing on 5m, checking 1m...", 0)
 
-                        df_1m = self.CalculateSignals(symbol, '1m', 'heiken')
+                        df_1m = self.CalculateSignals(symbol, '1m', 'heiken', columns=BREAKOUT_LEVEL_COLUMNS)
                        
                         if df_1m is None or getattr(df_1m, 'empty', False):
                             log_event(symbol, "ProfitBooker.book_profit", "1m DataFrame is empty. Exiting.", 0)
@@ -77,7 +85,7 @@ class ProfitBooker:
                 elif rsi_15 > 80 and not volume_increasing:
                     log_event(symbol, "ProfitBooker.book_profit", "RSI > 80 and volume decreasing on 15m, checking 1m...", 0)
 
-                    df_1m = self.CalculateSignals(symbol, '1m', 'heiken')
+                    df_1m = self.CalculateSignals(symbol, '1m', 'heiken', columns=BREAKOUT_LEVEL_COLUMNS)
                    
                     if df_1m is None or getattr(df_1m, 'empty', False):
                         log_event(symbol, "ProfitBooker.book_profit", "1m DataFrame is empty. Exiting.", 0)
@@ -95,7 +103,7 @@ class ProfitBooker:
                 if (20 < rsi_15 < 30 and not volume_increasing) or (candle_color == 'GREEN') or (macd_color_signal == 'BUY'):
                     log_event(symbol, "ProfitBooker.book_profit", "RSI 20-30 and volume decreasing on 15m, checking 5m...", 0)
 
-                    df_5m = self.CalculateSignals(symbol, '5m', 'heiken')
+                    df_5m = self.CalculateSignals(symbol, '5m', 'heiken', columns=BOOK_PROFIT_5M_COLUMNS)
                   
                     if df_5m is None or getattr(df_5m, 'empty', False):
                         log_event(symbol, "ProfitBooker.book_profit", "5m DataFrame is empty. Exiting.", 0)
@@ -106,7 +114,7 @@ class ProfitBooker:
                     if not volume_increasing_5m or candle_color_5m == 'GREEN':
                         log_event(symbol, "ProfitBooker.book_profit", "Volume decreasing on 5m, checking 1m...", 0)
 
-                        df_1m = self.CalculateSignals(symbol, '1m', 'heiken')
+                        df_1m = self.CalculateSignals(symbol, '1m', 'heiken', columns=BREAKOUT_LEVEL_COLUMNS)
                      
                         if df_1m is None or getattr(df_1m, 'empty', False):
                             log_event(symbol, "ProfitBooker.book_profit", "1m DataFrame is empty. Exiting.", 0)
@@ -123,7 +131,7 @@ class ProfitBooker:
                 elif rsi_15 < 20 and (not volume_increasing or candle_color == 'GREEN'):
                     log_event(symbol, "ProfitBooker.book_profit", "RSI < 20 and volume decreasing on 15m, checking 1m...", 0)
 
-                    df_1m = self.CalculateSignals(symbol, '1m', 'heiken')
+                    df_1m = self.CalculateSignals(symbol, '1m', 'heiken', columns=BREAKOUT_LEVEL_COLUMNS)
                    
                     if df_1m is None or getattr(df_1m, 'empty', False):
                         log_event(symbol, "ProfitBooker.book_profit", "1m DataFrame is empty. Exiting.", 0)
@@ -163,7 +171,7 @@ class ProfitBooker:
         for interval in intervals:
             try:
                 log_event(symbol, "ProfitBooker.should_close_trade_multi", f"Analyzing {symbol} for close signal", 0)
-                df = self.CalculateSignals(symbol, interval, 'heiken')
+                df = self.CalculateSignals(symbol, interval, 'heiken', columns=CLOSE_CHECK_COLUMNS)
                
                 if df is None or len(df) < 2:
                     log_event(symbol, "ProfitBooker.should_close_trade_multi", f"[{interval}] ❌ Dataframe empty or too short for {symbol}", 0)
@@ -218,7 +226,7 @@ class ProfitBooker:
             final_confirmed = False
 
             try:
-                df_3m = self.CalculateSignals(symbol, '3m', 'heiken')
+                df_3m = self.CalculateSignals(symbol, '3m', 'heiken', columns=CLOSE_CONFIRM_COLUMNS)
                 if df_3m is not None and len(df_3m) >= 2:
                   
                     rsi_3m_over_sold = df_3m['RSI_9'].iloc[-1] < 30 or df_3m['RSI_9'].iloc[-2] < 30 
@@ -238,7 +246,7 @@ class ProfitBooker:
                 log_error(e, 'ProfitBooker.confirm_and_close.3m', symbol)
 
             try:
-                df_1m = self.CalculateSignals(symbol, '1m', 'heiken')
+                df_1m = self.CalculateSignals(symbol, '1m', 'heiken', columns=CLOSE_CONFIRM_COLUMNS)
                 if df_1m is not None and len(df_1m) >= 2:
                  
                     rsi_1m_over_sold = df_1m['RSI_9'].iloc[-1] < 30 or df_1m['RSI_9'].iloc[-2] < 30 
@@ -14,6 +14,7 @@ from utils.global_store import (
 )
 from utils.logger import log_error, safe_print
 from utils.utils import get_lock
+from utils.pair_index import unindex_pair
 
 
 def deleteFromGlobalList(uid):
@@ -21,6 +22,7 @@ def deleteFromGlobalList(uid):
         with get_lock(all_pairs_locks, uid):
             if uid in all_pairs:
                 del all_pairs[uid]
+            unindex_pair(uid)
 
         with get_lock(analysis_tracker_locks, uid):
             if uid in analysis_tracker:
@@ -19,7 +19,7 @@ from core.book_profit import ProfitBooker
 profit_booker = ProfitBooker(CalculateSignals)
 from utils.utils import get_default_analysis_tracker
 from datetime import timedelta
-from utils.Final_olab_database import sql_helper
+from utils.Final_olab_database import trade_state
 from core.deleteFromGlobalList import deleteFromGlobalList
 
 
@@ -90,18 +90,10 @@ def setlastpairPrice(uid, current_price):
 
             machine_id = get_machine_id()
             
-            # Fetch updated_at directly from database to get the actual value
-            db_updated_at = None
-            try:
-                query = f"SELECT updated_at FROM {machine_id.lower()} WHERE unique_id = :uid"
-                result = sql_helper.fetch_one(query, {"uid": uid})
-                if result and result[0] is not None:
-                    db_updated_at = result[0]
-            except Exception as e:
-                log_error(e, "setlastpairPrice - fetch updated_at from DB", uid)
-                db_updated_at = None
+            # Database updated_at from the synced trade state (no query under the lock)
+            db_updated_at = trade_state.updated_at(machine_id.lower(), uid)
             
-            # Use database value as source of truth, fallback to in-memory if DB query fails
+            # Use database value as source of truth, fallback to in-memory if the UID is not synced yet
             invest_updated_time = db_updated_at if db_updated_at is not None else invest_updated_time
 
          
@@ -251,7 +243,7 @@ def setlastpairPrice(uid, current_price):
             print(f'{uid}trade type is not running anymore')
             return
 
-        # Use database value as source of truth (invest_updated_time loaded at line 63)
+        # Use database value as source of truth (invest_updated_time loaded from trade_state above)
         # The in-memory all_pairs might be out of sync with database
         # Only use all_pairs value if it's more recent than database value (updated in this session)
         with get_lock(all_pairs_locks, uid):
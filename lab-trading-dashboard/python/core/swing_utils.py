@@ -7,6 +7,9 @@ from machine_id import get_machine_id
 from utils.Final_olab_database import olab_update_single_uid_in_table
 from utils.utils import get_lock, get_default_analysis_tracker
 
+# Swing helpers only read the zone columns, so CalculateSignals skips the rest
+SWING_COLUMNS = ['swing_high_zone', 'swing_low_zone']
+
 def get_safe_swing_point(uid, swing_type, current_price, pair):
     """
     Get a valid hedge swing point:
@@ -15,7 +18,7 @@ def get_safe_swing_point(uid, swing_type, current_price, pair):
     try:
         intervals = ['15m', '30m', '1h', '4h', '1d']
         for interval in intervals:
-            df = CalculateSignals(pair, interval)
+            df = CalculateSignals(pair, interval, columns=SWING_COLUMNS)
             if df is not None:
                 if swing_type == "high":
                     result = get_high_swings_zones(df)
@@ -39,7 +42,7 @@ def get_safe_swing_point(uid, swing_type, current_price, pair):
 
 def update_swing_dictonary(uid, pair):
     try:
-        df = CalculateSignals(pair, '15m')
+        df = CalculateSignals(pair, '15m', columns=SWING_COLUMNS)
         if df is not None:
             low_result = get_low_swings_zones(df)
             high_result = get_high_swings_zones(df)
@@ -62,7 +65,7 @@ def refresh_swing_points(uid, current_price, pair):
         found_high = found_low = False
         latest_open = latest_close = latest_high = latest_low = None
         for interval in intervals:
-            df = CalculateSignals(pair, interval)
+            df = CalculateSignals(pair, interval, columns=SWING_COLUMNS)
             if df is not None:
                 if latest_open is None:
                     latest_open = df['open'].iloc[-1]
@@ -1,7 +1,6 @@
 # core/ws_handler.py
 
 import asyncio
-import json
 import queue
 import threading
 import time
@@ -29,6 +28,9 @@ from utils.global_store import (
 )
 from utils.logger import log_info, log_error, utc_now
 from utils.utils import get_lock, get_default_analysis_tracker
+from utils.pair_index import uids_for_symbol
+from utils.uid_scheduler import CoalescingUIDScheduler
+from utils.mark_price_slots import LatestPriceSlots, parse
 from machine_id import get_machine_id
 from utils.main_binance import getQuantity
 from core.place_order import PlaceOrderFromFlatMarketSignal
@@ -40,15 +42,49 @@ executor = ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4)
 
 hedge_thread_locks = {}
 monitor_locks = {}
+uid_steps = {}
+
+# 'event': UIDs run on uid_scheduler's pool when their mark price moves
+# 'thread': the old loop, one sleeping worker thread per UID
+UID_WORKER_MODE = os.getenv("UID_WORKER_MODE", "event")
+uid_scheduler = CoalescingUIDScheduler(
+    workers=int(os.getenv("UID_WORKER_POOL", min(32, (os.cpu_count() or 1) * 4))),
+    idle_interval=float(os.getenv("UID_IDLE_INTERVAL", 5)),
+    name="uid_scheduler",
+    on_error=log_error,
+)
+# Listener -> dispatch hand-off: the socket loop only parses and publishes
+mark_price_slots = LatestPriceSlots(name="mark_price_slots", on_error=log_error)
 
 class WebSocketHandler:
     def __init__(self):
         self.ws_url = BINANCE_WS_URL
         self.running_flags = {}  # Add per-UID running flags
 
+    def start_worker(self, uid):
+        """Schedule uid on the event pool, or start its worker thread in thread mode."""
+        if UID_WORKER_MODE != "thread":
+            uid_scheduler.start(self.handle_uid)
+            uid_scheduler.wake(uid)
+            return True
+        if uid not in active_threads or not active_threads[uid].is_alive():
+            message_queues[uid] = queue.Queue()
+            t = threading.Thread(target=self.worker, args=(uid,), daemon=True)
+            t.start()
+            active_threads[uid] = t
+            return True
+        return False
+
+    def has_worker(self, uid):
+        """True while uid is scheduled on the event pool, or has a live worker thread in thread mode."""
+        if UID_WORKER_MODE != "thread":
+            return uid_scheduler.is_scheduled(uid)
+        return uid in active_threads and active_threads[uid].is_alive()
+
     def stop_worker(self, uid):
         # Signal the worker thread for this UID to stop
         self.running_flags[uid] = False
+        uid_scheduler.discard(uid)
 
     def worker(self, uid):
         log_info(f"WORKER STARTED for {uid}")
@@ -57,171 +93,183 @@ class WebSocketHandler:
         log_info(f"step1: 🤮 Worker started for UID: {uid} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
         print(f"🤮 Worker started for UID: {uid}")
 
-        monitor_lock = monitor_locks.setdefault(uid, threading.Lock())
-
-        # Removed separate simulation wrapper/thread; executing trade action inline in worker
-
         step = 5
         while self.running_flags.get(uid, False):
-            # Always fetch latest details and trade_type at the start of the loop
-            with get_lock(all_pairs_locks, uid):
-                details = all_pairs.get(uid)
-            trade_type = details.get("type") if details else None
-            log_info(f"[LOOP_FETCH] UID: {uid} trade_type: {trade_type} | details: {details}", uid=uid)
+            step, delay = self.process_uid(uid, step)
+            time.sleep(delay)  # Throttle the worker loop
+        trade_type = (all_pairs.get(uid) or {}).get("type")
+        # Cleanup after thread stops
+        log_info(f"step{step}: 🛑 Worker stopped for UID: {uid} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+        print(f"🛑 Worker stopped for UID: {uid}")
+        log_info(f"WORKER EXITED for {uid}")
 
-            log_info(f"step{step}: [WORKER_LOOP] UID: {uid} is active | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+    def process_uid(self, uid, step=5):
+        """One pass of the trade logic for uid; returns (step, seconds to wait before the next pass)."""
+        monitor_lock = monitor_locks.setdefault(uid, threading.Lock())
+        delay = 1
+        # Always fetch latest details and trade_type at the start of the loop
+        with get_lock(all_pairs_locks, uid):
+            details = all_pairs.get(uid)
+        trade_type = details.get("type") if details else None
+        log_info(f"[LOOP_FETCH] UID: {uid} trade_type: {trade_type} | details: {details}", uid=uid)
+
+        log_info(f"step{step}: [WORKER_LOOP] UID: {uid} is active | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+        step += 1
+        try:
+            # ✅ Get current price
+            with get_lock(analysis_tracker_locks, uid):
+                current_price = analysis_tracker.get(uid, {}).get("Current_Price")
+                log_info(f"step{step}: [PRICE_CHECK] UID: {uid}, current_price: {current_price} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
             step += 1
-            try:
-                # ✅ Get current price
-                with get_lock(analysis_tracker_locks, uid):
-                    current_price = analysis_tracker.get(uid, {}).get("Current_Price")
-                    log_info(f"step{step}: [PRICE_CHECK] UID: {uid}, current_price: {current_price} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+
+            # For hedge_release records, process immediately without waiting for price
+            if trade_type == "hedge_release":
+                log_info(f"step{step}: [HEDGE_RELEASE_PROCESS] UID: {uid} processing hedge_release immediately | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                 step += 1
+                # Process hedge_release logic here (will be handled in the elif below)
+            elif not current_price or current_price <= 0:
+                log_info(f"step{step}: [WAIT] UID: {uid} waiting for valid price | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                step += 1
+                return step, 1
 
-                # For hedge_release records, process immediately without waiting for price
-                if trade_type == "hedge_release":
-                    log_info(f"step{step}: [HEDGE_RELEASE_PROCESS] UID: {uid} processing hedge_release immediately | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                    step += 1
-                    # Process hedge_release logic here (will be handled in the elif below)
-                elif not current_price or current_price <= 0:
-                    log_info(f"step{step}: [WAIT] UID: {uid} waiting for valid price | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                    step += 1
-                    time.sleep(1)
-                    continue
+            # Defer trade action execution to the RUNNING branch below to avoid duplicate calls per loop
 
-                # Defer trade action execution to the RUNNING branch below to avoid duplicate calls per loop
+            # ✅ Run lightweight async tasks
+            # Only submit signal_engine if 3 minutes have passed since last check
+            now = utc_now()
+            last_signal_check = last_5min_check_time.get(uid)
+            if not last_signal_check or (now - last_signal_check).total_seconds() >= 60:
+                log_info(f"step{step}: [SIGNAL_ENGINE] Submitting Current_Analysis for UID: {uid} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                step += 1
+                # executor.submit(Current_Analysis, all_pairs, current_price, uid)
+                last_5min_check_time[uid] = now
 
-                # ✅ Run lightweight async tasks
-                # Only submit signal_engine if 3 minutes have passed since last check
-                now = utc_now()
-                last_signal_check = last_5min_check_time.get(uid)
-                if not last_signal_check or (now - last_signal_check).total_seconds() >= 60:
-                    log_info(f"step{step}: [SIGNAL_ENGINE] Submitting Current_Analysis for UID: {uid} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                    step += 1
-                    # executor.submit(Current_Analysis, all_pairs, current_price, uid)
-                    last_5min_check_time[uid] = now
+            # details and trade_type already fetched at loop start
+            log_info(f"step{step}: [DETAILS_FETCHED] UID: {uid} details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+            step += 1
 
-                # details and trade_type already fetched at loop start
-                log_info(f"step{step}: [DETAILS_FETCHED] UID: {uid} details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+            if not details:
+                log_error(Exception(uid), "worker", uid)
+                log_info(f"step{step}: [NO_DETAILS] UID: {uid} details missing | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                 step += 1
-
-                if not details:
-                    log_error(Exception(uid), "worker", uid)
-                    log_info(f"step{step}: [NO_DETAILS] UID: {uid} details missing | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                    step += 1
-                    time.sleep(1)
-                    continue
-                # Log before checking running logic
-                log_info(f"[CHECK_RUNNING] UID: {uid} about to check running logic | trade_type: {trade_type}", uid=uid)
-
-                if trade_type == "assign":
-                    log_info(f"step{step}: [ASSIGN] UID: {uid} about to check running logic | trade_type: {trade_type}", uid=uid)
-
-                    pair = details.get("pair")
-                    action = details.get("action")
-                    interval = details.get("interval")
-                    hedge = details.get("hedge", False)
-                    stop_price = details.get("stop_price")
-                    investment = details.get("investment")
-
-                    if pair is not None and investment is not None:
-                        result = getQuantity(pair, investment)
-                        if result is not None and hasattr(result, '__iter__') and len(result) >= 1:
-                            quantity = result[0]
-                        else:
-                            quantity = 0
+                return step, 1
+            # Log before checking running logic
+            log_info(f"[CHECK_RUNNING] UID: {uid} about to check running logic | trade_type: {trade_type}", uid=uid)
+
+            if trade_type == "assign":
+                log_info(f"step{step}: [ASSIGN] UID: {uid} about to check running logic | trade_type: {trade_type}", uid=uid)
+
+                pair = details.get("pair")
+                action = details.get("action")
+                interval = details.get("interval")
+                hedge = details.get("hedge", False)
+                stop_price = details.get("stop_price")
+                investment = details.get("investment")
+
+                if pair is not None and investment is not None:
+                    result = getQuantity(pair, investment)
+                    if result is not None and hasattr(result, '__iter__') and len(result) >= 1:
+                        quantity = result[0]
                     else:
                         quantity = 0
-                    log_info(f"step{step}: [ASSIGN] UID: {uid} calculated quantity: {quantity} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                else:
+                    quantity = 0
+                log_info(f"step{step}: [ASSIGN] UID: {uid} calculated quantity: {quantity} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                step += 1
+                if quantity == 0:
+                    details["type"] = "Close_Low_Investment"
+                    log_info(f"step{step}: [ASSIGN] UID: {uid} set to Close_Low_Investment | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                    step += 1
+                else:
+                    log_info(f"step{step}: [ASSIGN_PlaceOrderFromFlatMarketSignal] UID: {uid} placing order | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                    step += 1
+                    PlaceOrderFromFlatMarketSignal(
+                        all_pairs, uid, quantity, action,
+                        "LONG" if action == "BUY" else "SHORT",
+                        current_price, hedge,
+                        interval, stop_price, 1, 0
+                    )
+                    log_info(f"step{step}: [After_PlaceOrderFromFlatMarketSignal] UID: {uid} placing order | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                     step += 1
-                    if quantity == 0:
-                        details["type"] = "Close_Low_Investment"
-                        log_info(f"step{step}: [ASSIGN] UID: {uid} set to Close_Low_Investment | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+
+            elif not details.get("hedge", False) :#trade_type == "running":
+                log_info(f"[ENTER_RUNNING] UID: {uid} entering running logic | trade_type: {trade_type}", uid=uid)
+                log_info(f"step{step}: [RUNNING] UID: {uid} entering running logic | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                step += 1
+                # ✅ Monitor hedge/single position
+                if details.get("hedge", False):
+                    if monitor_lock.locked():
+                        log_info(f"step{step}: [RUNNING] UID: {uid} monitor_lock locked, waiting | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                         step += 1
-                    else:
-                        log_info(f"step{step}: [ASSIGN_PlaceOrderFromFlatMarketSignal] UID: {uid} placing order | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                        return step, 0.1
+                    # with monitor_lock:
+                    #     if not details.get("hedge_1_1_bool", False):
+                    #         log_info(f"step{step}: [RUNNING] UID: {uid} monitoring hedge position | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                    #         step += 1
+                    #         monitor_hedge_position(uid, current_price)
+                    # if details.get("hedge_1_1_bool", False):
+                    #     log_info(f"step{step}: [RUNNING] UID: {uid} checking and releasing hedge | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                    #     step += 1
+                        # check_and_release_hedge(uid,current_price)  # Removed: now called from signal_engine after signal
+                else:
+                    if monitor_lock.locked():
+                        log_info(f"step{step}: [RUNNING] UID: {uid} monitor_lock locked, waiting | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                         step += 1
-                        PlaceOrderFromFlatMarketSignal(
-                            all_pairs, uid, quantity, action,
-                            "LONG" if action == "BUY" else "SHORT",
-                            current_price, hedge,
-                            interval, stop_price, 1, 0
-                        )
-                        log_info(f"step{step}: [After_PlaceOrderFromFlatMarketSignal] UID: {uid} placing order | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                        return step, 0.1
+                    with monitor_lock:
+                        log_info(f"step{step}: [RUNNING] UID: {uid} monitoring single position | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                         step += 1
-
-                elif not details.get("hedge", False) :#trade_type == "running":
-                    log_info(f"[ENTER_RUNNING] UID: {uid} entering running logic | trade_type: {trade_type}", uid=uid)
-                    log_info(f"step{step}: [RUNNING] UID: {uid} entering running logic | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                    step += 1
-                    # ✅ Monitor hedge/single position
-                    if details.get("hedge", False):
-                        if monitor_lock.locked():
-                            log_info(f"step{step}: [RUNNING] UID: {uid} monitor_lock locked, waiting | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                            step += 1
-                            time.sleep(0.1)
-                            continue
-                        # with monitor_lock:
-                        #     if not details.get("hedge_1_1_bool", False):
-                        #         log_info(f"step{step}: [RUNNING] UID: {uid} monitoring hedge position | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                        #         step += 1
-                        #         monitor_hedge_position(uid, current_price)
-                        # if details.get("hedge_1_1_bool", False):
-                        #     log_info(f"step{step}: [RUNNING] UID: {uid} checking and releasing hedge | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                        #     step += 1
-                            # check_and_release_hedge(uid,current_price)  # Removed: now called from signal_engine after signal
-                    else:
-                        if monitor_lock.locked():
-                            log_info(f"step{step}: [RUNNING] UID: {uid} monitor_lock locked, waiting | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                        # monitor_single_position(uid, current_price)
+                        if not details.get("hedge", False):
+                            log_info(f"step{step}: [SET_LAST_PRICE] UID: {uid} updating last price | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                             step += 1
-                            time.sleep(0.1)
-                            continue
-                        with monitor_lock:
-                            log_info(f"step{step}: [RUNNING] UID: {uid} monitoring single position | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                            step += 1
-                            # monitor_single_position(uid, current_price)
-                            if not details.get("hedge", False):
-                                log_info(f"step{step}: [SET_LAST_PRICE] UID: {uid} updating last price | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                                step += 1
-                                executor.submit(setlastpairPrice, uid, current_price)
+                            executor.submit(setlastpairPrice, uid, current_price)
 
-                    log_info(f"step{step}: [ACTION_CHECK] UID: {uid}, details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                log_info(f"step{step}: [ACTION_CHECK] UID: {uid}, details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+                step += 1
+                # Only run trade action if not a 1:1 hedge and details exist
+                should_run_action = bool(details) and not details.get('hedge_1_1_bool', False)
+                if should_run_action and trade_type == "running":
+                    log_info(f"step{step}: [TRADE_ACTION] Executing trade action for UID: {uid} (hedge_1_1_bool is False), details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                     step += 1
-                    # Only run trade action if not a 1:1 hedge and details exist
-                    should_run_action = bool(details) and not details.get('hedge_1_1_bool', False)
-                    if should_run_action and trade_type == "running":
-                        log_info(f"step{step}: [TRADE_ACTION] Executing trade action for UID: {uid} (hedge_1_1_bool is False), details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                        step += 1
-                        try:
-                            test_simulation_handle_trade_action(uid, current_price)
-                        except Exception as e:
-                            log_error(e, "trade_action", uid)
-                    else:
-                        log_info(f"step{step}: [ACTION_SKIP] Not executing trade action for UID: {uid} (hedge_1_1_bool is True), details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-                        step += 1
-                elif trade_type == "hedge_release":
-                    with get_lock(all_pairs_locks, uid):
-                        all_pairs[uid]["type"] = "running"
-                        all_pairs[uid]["interval"] = '15m'
-                        # Update the database to reflect the status change
-                        machine_id = get_machine_id()
-                        olab_update_single_uid_in_table(uid, all_pairs, machine_id)
-                        log_info(f"step{step}: [HEDGE_RELEASE] Updated UID: {uid} from hedge_release to running in database- interval-update-to-15m", uid=uid)
+                    try:
+                        uid_scheduler.mark("trade_action")
+                        test_simulation_handle_trade_action(uid, current_price)
+                    except Exception as e:
+                        log_error(e, "trade_action", uid)
+                else:
+                    log_info(f"step{step}: [ACTION_SKIP] Not executing trade action for UID: {uid} (hedge_1_1_bool is True), details: {details} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
                     step += 1
-
-            except Exception as e:
-                print(f"[{utc_now()}] ❌ Error in worker({uid}):\n{str(e)}")
-                log_error(e, "worker")
-                log_info(f"step{step}: [EXCEPTION] UID: {uid} exception occurred | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+            elif trade_type == "hedge_release":
+                with get_lock(all_pairs_locks, uid):
+                    all_pairs[uid]["type"] = "running"
+                    all_pairs[uid]["interval"] = '15m'
+                    # Update the database to reflect the status change
+                    machine_id = get_machine_id()
+                    olab_update_single_uid_in_table(uid, all_pairs, machine_id)
+                    log_info(f"step{step}: [HEDGE_RELEASE] Updated UID: {uid} from hedge_release to running in database- interval-update-to-15m", uid=uid)
                 step += 1
-                time.sleep(3)
-            time.sleep(1)  # Throttle the worker loop
-            log_info(f"step{step}: [LOOP_END] UID: {uid} end of loop | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+
+        except Exception as e:
+            print(f"[{utc_now()}] ❌ Error in worker({uid}):\n{str(e)}")
+            log_error(e, "worker")
+            log_info(f"step{step}: [EXCEPTION] UID: {uid} exception occurred | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
             step += 1
-        # Cleanup after thread stops
-        log_info(f"step{step}: 🛑 Worker stopped for UID: {uid} | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
-        print(f"🛑 Worker stopped for UID: {uid}")
-        log_info(f"WORKER EXITED for {uid}")
+            delay = 4
+        log_info(f"step{step}: [LOOP_END] UID: {uid} end of loop | all_pairs[uid]: {all_pairs.get(uid)} | trade_type: {trade_type}", uid=uid)
+        step += 1
+        return step, delay
+
+    def handle_uid(self, uid, price=None):
+        """uid_scheduler entry point (event mode); False once the UID has left all_pairs."""
+        step, delay = self.process_uid(uid, uid_steps.get(uid, 5))
+        if uid not in all_pairs:
+            uid_steps.pop(uid, None)
+            return False
+        uid_steps[uid] = step
+        # Next pass no later than the thread loop's sleep, even when the price does not move
+        uid_scheduler.wake_after(uid, delay)
+        return True
 
     async def mark_price_listener(self):
         log_info("📱 Connecting to Binance WebSocket...")
@@ -233,55 +281,65 @@ class WebSocketHandler:
                     log_info("✅ WebSocket connected.")
                     print("✅ WebSocket connected.")
                     async for message in ws:
-                       
-                        self.handle_price_update(message)
+                        self.publish_prices(message)
                         last_heartbeat["main"] = time.time()
 
             except Exception as e:
                 log_error(e, f" utc_now() mark_price_listener")
                 await asyncio.sleep(5)
 
-    def handle_price_update(self, message):
-        try:
-            data = json.loads(message)
+    def _price_items(self, message):
+        data = parse(message)
 
-            if isinstance(data, list):
-                items = data
-            elif isinstance(data, dict) and "data" in data and isinstance(data["data"], list):
-                items = data["data"]
-            else:
-                print("⚠️ Unexpected format:", data)
-                return
+        if isinstance(data, list):
+            return data
+        elif isinstance(data, dict) and "data" in data and isinstance(data["data"], list):
+            return data["data"]
+        print("⚠️ Unexpected format:", data)
+        return []
 
-            for item in items:
+    def publish_prices(self, message):
+        """Socket side: parse the frame and publish prices of symbols that have trades; no locks, no dispatch."""
+        try:
+            for item in self._price_items(message):
                 symbol = item.get("s")
-                mark_price = float(item.get("p", 0))
-                with get_lock(all_pairs_locks, "global"):  # Optional: use a global lock if available
-                    pairs_snapshot = list(all_pairs.items())    
-
-                for uid, pdata in pairs_snapshot:
-                    if pdata.get("pair") == symbol:
-                       
-
-                        with get_lock(analysis_tracker_locks, uid):
-                            if uid not in analysis_tracker:
-                                analysis_tracker[uid] = get_default_analysis_tracker()
-                            analysis_tracker[uid]["Current_Price"] = mark_price
-                            log_info(f"[WS_UPDATE] Updated price for UID: {uid}, symbol: {symbol}, price: {mark_price}")
-                            # print(f"[WS_UPDATE] Updated price for UID: {uid}, symbol: {symbol}, price: {mark_price}")
-
-                        if uid not in active_threads or not active_threads[uid].is_alive():
-                            message_queues[uid] = queue.Queue()
-                            print(f"🔍 xxxxxxxxx: {uid}")
-                            t = threading.Thread(target=self.worker, args=(uid,), daemon=True)
-                            t.start()
-                            active_threads[uid] = t
-                            print(f"🔟 Started worker for UID: {uid} (from WS)")
-                            
+                if uids_for_symbol(symbol):
+                    mark_price_slots.publish(symbol, float(item.get("p", 0)), item.get("E"))
+        except Exception as e:
+            log_error(e, "publish_prices")
 
+    def handle_price_update(self, message):
+        """Parse and dispatch a frame inline (no hand-off)."""
+        try:
+            for item in self._price_items(message):
+                self.dispatch_price(item.get("s"), float(item.get("p", 0)), item.get("E"))
         except Exception as e:
             log_error(e, "handle_price_update")
 
+    def dispatch_price(self, symbol, mark_price, event_ms=None):
+        """Store the mark price for every UID trading symbol and schedule them."""
+        try:
+            for uid in uids_for_symbol(symbol):
+                with get_lock(analysis_tracker_locks, uid):
+                    if uid not in analysis_tracker:
+                        analysis_tracker[uid] = get_default_analysis_tracker()
+                    analysis_tracker[uid]["Current_Price"] = mark_price
+                    log_info(f"[WS_UPDATE] Updated price for UID: {uid}, symbol: {symbol}, price: {mark_price}")
+                    # print(f"[WS_UPDATE] Updated price for UID: {uid}, symbol: {symbol}, price: {mark_price}")
+
+                if UID_WORKER_MODE != "thread":
+                    uid_scheduler.submit(uid, mark_price, event_ms)
+                elif uid not in active_threads or not active_threads[uid].is_alive():
+                    message_queues[uid] = queue.Queue()
+                    print(f"🔍 xxxxxxxxx: {uid}")
+                    t = threading.Thread(target=self.worker, args=(uid,), daemon=True)
+                    t.start()
+                    active_threads[uid] = t
+                    print(f"🔟 Started worker for UID: {uid} (from WS)")
+
+        except Exception as e:
+            log_error(e, "dispatch_price")
+
     def run(self):
         handler = DataHandler()
         machine_id = get_machine_id()
@@ -291,13 +349,14 @@ class WebSocketHandler:
             with get_lock(all_pairs_locks, uid):
                 all_pairs[uid] = pdata
 
-            if uid not in active_threads or not active_threads[uid].is_alive():
-                message_queues[uid] = queue.Queue()
-                t = threading.Thread(target=self.worker, args=(uid,), daemon=True)
-                t.start()
-                active_threads[uid] = t
+            if self.start_worker(uid):
                 print(f"✅ Started worker for running UID: {uid}")
 
+        if UID_WORKER_MODE != "thread":
+            uid_scheduler.start(self.handle_uid)
+            print(f"✅ Event-driven UID workers: {uid_scheduler.workers} threads")
+        mark_price_slots.start(self.dispatch_price)
+
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         loop.run_until_complete(self.mark_price_listener())
@@ -2,6 +2,7 @@
 
 from utils.Final_olab_database import olab_fetch_data_from_machine,olab_fetch_hedge_data_from_machine
 from decimal import Decimal
+from utils.pair_index import index_pairs
 
 class DataHandler:
     def __init__(self):
@@ -30,6 +31,7 @@ class DataHandler:
                 }
 
             # print("✅ UID mapping created:", uid)
+        index_pairs(uid_map)   # price fan-out looks UIDs up by symbol
         return uid_map
 
     def load_running_uids(self, machine_id):
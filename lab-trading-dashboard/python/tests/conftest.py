@@ -0,0 +1,15 @@
+# tests/conftest.py
+
+"""Make the bot's modules importable as they are when it runs from this directory."""
+
+import os
+import sys
+
+PYTHON_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if PYTHON_ROOT not in sys.path:
+    sys.path.insert(0, PYTHON_ROOT)
+# Some modules import siblings top-level (e.g. keys1); after the root so the
+# `utils` package is not shadowed by utils/utils.py
+if os.path.join(PYTHON_ROOT, 'utils') not in sys.path:
+    sys.path.append(os.path.join(PYTHON_ROOT, 'utils'))
@@ -0,0 +1,114 @@
+# tests/test_binance_weight.py
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import shared_memory
+
+import pytest
+
+from utils.binance_weight import (
+    LEASE_WEIGHT, PRIORITY_BACKFILL, PRIORITY_ORDER, PRIORITY_SCANNER, BinanceWeightExhausted,
+    BinanceWeightScheduler, endpoint_weight,
+)
+
+CTX = multiprocessing.get_context('fork')
+
+
+@pytest.fixture
+def block():
+    name = f"lab_binance_weight_test_{os.getpid()}_{time.monotonic_ns()}"
+    yield name
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+    if os.path.exists(lock_path):
+        os.remove(lock_path)
+
+
+def _drain(name, results):
+    scheduler = BinanceWeightScheduler(name=name)
+    granted = 0
+    while scheduler.try_acquire(5, PRIORITY_SCANNER):
+        granted += 5
+    results.put(granted)
+
+
+def test_endpoint_weights():
+    assert endpoint_weight('GET', '/fapi/v1/klines', {'limit': '500'}) == 5
+    assert [endpoint_weight('GET', '/fapi/v1/klines', {'limit': n}) for n in (2, 499, 1000, 1500)] == [1, 2, 5, 10]
+    assert endpoint_weight('GET', '/fapi/v1/openOrders') == 40
+    assert endpoint_weight('POST', '/fapi/v1/order') == 1
+
+
+def test_processes_share_one_budget(block):
+    scheduler = BinanceWeightScheduler(name=block)
+    results = CTX.Queue()
+    workers = [CTX.Process(target=_drain, args=(block, results)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    granted = [results.get(timeout=30) for _ in workers]
+    for w in workers:
+        w.join(30)
+    cap = scheduler.caps[PRIORITY_SCANNER]
+    assert sum(granted) <= cap and scheduler.used() <= cap
+    assert not scheduler.try_acquire(5, PRIORITY_BACKFILL) and scheduler.try_acquire(5, PRIORITY_ORDER)
+
+
+def test_block_outlives_the_program_that_created_it(block):
+    # A separate interpreter has its own resource tracker, which unlinks what it tracks on exit
+    code = ("from utils.binance_weight import BinanceWeightScheduler, PRIORITY_SCANNER; "
+            f"BinanceWeightScheduler(name={block!r}).try_acquire(1, PRIORITY_SCANNER)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True, timeout=60)
+    assert BinanceWeightScheduler(name=block).used() >= 1
+
+
+def test_reported_weight_and_bans(block):
+    scheduler = BinanceWeightScheduler(name=block)
+    now = int(time.time() // 60) * 60 + 1
+    assert scheduler.try_acquire(1, PRIORITY_BACKFILL, now) and scheduler.used() == LEASE_WEIGHT
+    scheduler.observe({'X-MBX-USED-WEIGHT-1M': '1700'}, 200, now)
+    assert scheduler.used() == 1700
+    assert not scheduler.can_call(PRIORITY_BACKFILL) and scheduler.can_call(PRIORITY_SCANNER)
+    scheduler.observe({'Retry-After': '2'}, 429, now)
+    assert not scheduler.try_acquire(1, PRIORITY_ORDER, now) and scheduler.stats()['throttled'] == 1
+
+
+class _Response:
+    headers = {'X-MBX-USED-WEIGHT-1M': '3'}
+    status_code = 200
+
+
+class _Session:
+    def __init__(self):
+        self.sent = []
+
+    def request(self, method, url, *args, **kwargs):
+        self.sent.append(url)
+        return _Response()
+
+
+class _Client:
+    def __init__(self):
+        self.session = _Session()
+
+
+def test_instrumented_client_defers_requests_past_the_budget(block):
+    scheduler = BinanceWeightScheduler(name=block, limit=100)
+    client = scheduler.instrument(_Client(), PRIORITY_SCANNER, timeout=0)
+    client.session.request('GET', 'https://fapi.binance.com/fapi/v1/klines?symbol=BTCUSDT&limit=500')
+    assert len(client.session.sent) == 1
+    scheduler.observe({'X-MBX-USED-WEIGHT-1M': '95'})
+    with pytest.raises(BinanceWeightExhausted):
+        client.session.request('GET', 'https://fapi.binance.com/fapi/v1/klines?symbol=BTCUSDT&limit=500')
+    with scheduler.priority(PRIORITY_ORDER):
+        client.session.request('POST', 'https://fapi.binance.com/fapi/v1/order')
+    assert len(client.session.sent) == 2
@@ -0,0 +1,116 @@
+# tests/test_candle_disk_cache.py
+
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import candle_disk_cache as cdc
+from utils.candle_disk_cache import CandleDiskCache
+
+MINUTE = 60_000
+T0 = 1_700_000_000_000 - 1_700_000_000_000 % MINUTE
+N = 20_000
+CLOSE = np.arange(N, dtype=float)
+FULL = pd.DataFrame({'time': pd.to_datetime(T0 + np.arange(N) * MINUTE, unit='ms', utc=True),
+                     'open': CLOSE, 'high': CLOSE + 1, 'low': CLOSE - 1, 'close': CLOSE, 'volume': CLOSE * 2,
+                     'quote_volume': CLOSE * 3, 'num_trades': np.arange(N), 'taker_base_vol': CLOSE,
+                     'taker_quote_vol': CLOSE})
+
+
+class FakeDB:
+    """read_since over FULL[:end] minus `missing` row positions, in 4000-row chunks."""
+
+    def __init__(self, end=N, missing=()):
+        self.end = end
+        self.missing = set(missing)
+        self.reads = []
+
+    def __call__(self, symbol, interval, start_time, end_time=None):
+        rows = FULL.iloc[[i for i in range(self.end) if i not in self.missing]]
+        if start_time is not None:
+            rows = rows[rows['time'] >= start_time]
+        if end_time is not None:
+            rows = rows[rows['time'] < end_time]
+        self.reads.append(len(rows))
+        for i in range(0, len(rows), 4_000):
+            yield rows.iloc[i:i + 4_000]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CandleDiskCache(str(tmp_path), {'1m': MINUTE})
+
+
+def test_sync_reads_only_new_candles(cache):
+    db = FakeDB(end=15_000)
+    assert cache.sync('BTCUSDT', '1m', db) == 15_000
+    db.end = N
+    assert cache.sync('BTCUSDT', '1m', db) == 5_000
+    assert db.reads[:2] == [15_000, 5_000]
+    assert cache.sync('BTCUSDT', '1m', db) == 0
+
+
+def test_read_ranges_share_the_mapped_files(cache):
+    cache.sync('BTCUSDT', '1m', FakeDB())
+    df = cache.read('BTCUSDT', '1m')
+    assert df['time'].equals(FULL['time']) and np.array_equal(df['close'].to_numpy(), CLOSE)
+    assert df['num_trades'].dtype == np.int64
+    window = cache.read('BTCUSDT', '1m', limit=500, end_time=FULL['time'].iloc[1000])
+    assert len(window) == 500 and window['close'].iloc[-1] == 999
+    ranged = cache.read('BTCUSDT', '1m', start_time=FULL['time'].iloc[10], end_time=FULL['time'].iloc[20],
+                        columns=['close'])
+    assert list(ranged.columns) == ['time', 'close'] and ranged['close'].tolist() == list(CLOSE[10:20])
+    assert np.shares_memory(cache.read('BTCUSDT', '1m', limit=10)['close'].to_numpy(),
+                            cache.arrays('BTCUSDT', '1m')['close'])
+    assert cache.read('ETHUSDT', '1m') is None
+    cache.discard('BTCUSDT', '1m')
+    assert cache.rows('BTCUSDT', '1m') == 0 and cache.stats()['series'] == 0
+
+
+def test_hole_filled_in_the_db_is_rewritten(cache):
+    db = FakeDB(missing=range(5_000, 5_010))
+    cache.sync('BTCUSDT', '1m', db)
+    assert cache.rows('BTCUSDT', '1m') == N - 10
+    held = cache.read('BTCUSDT', '1m')                    # a reader's frame over the first generation
+    assert cache.holes('BTCUSDT', '1m') == [(T0 + 4_999 * MINUTE, T0 + 5_010 * MINUTE)]
+
+    db.missing = set()                                    # backfilled in the DB
+    assert cache.sync('BTCUSDT', '1m', db) == 0           # re-checked at most every hole_recheck_seconds
+    cache.hole_recheck_seconds = 0
+    assert cache.sync('BTCUSDT', '1m', db) == N - 5_000
+    df = cache.read('BTCUSDT', '1m')
+    assert df['time'].equals(FULL['time']) and cache.holes('BTCUSDT', '1m') == []
+    assert cache.stats()['rewrites'] == 1
+    assert len(held) == N - 10 and held['close'].iloc[5_000] == 5_010   # old maps stay readable
+
+
+def test_empty_hole_is_not_rewritten(cache):
+    cache.hole_recheck_seconds = 0
+    db = FakeDB(missing=range(100, 120))                  # e.g. a trading halt: the DB has nothing either
+    cache.sync('BTCUSDT', '1m', db)
+    assert cache.sync('BTCUSDT', '1m', db) == 0
+    assert cache.stats()['rewrites'] == 0 and len(cache.holes('BTCUSDT', '1m')) == 1
+
+
+def _sync_in_process(root, rounds):
+    cache = CandleDiskCache(root, {'1m': MINUTE})
+    for end in rounds:
+        cache.sync('BTCUSDT', '1m', FakeDB(end=end))
+
+
+@pytest.mark.skipif(cdc.fcntl is None, reason="needs fcntl for cross-process locking")
+def test_concurrent_writers_in_several_processes(tmp_path):
+    ctx = multiprocessing.get_context('fork')
+    workers = [ctx.Process(target=_sync_in_process, args=(str(tmp_path), list(range(1_000 + k, N, 1_500))))
+               for k in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(60)
+    assert all(p.exitcode == 0 for p in workers)
+    cache = CandleDiskCache(str(tmp_path), {'1m': MINUTE})
+    df = cache.read('BTCUSDT', '1m')
+    assert cache.holes('BTCUSDT', '1m') == []
+    assert np.array_equal(df['close'].to_numpy(), CLOSE[:len(df)]) and len(df) >= N - 1_500
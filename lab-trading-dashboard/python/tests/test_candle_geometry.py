@@ -0,0 +1,46 @@
+# tests/test_candle_geometry.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.candle_geometry import add_candle_geometry, body_ratio_of_row, candle_geometry
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(11)
+    n = 1000
+    close = 100 + np.cumsum(rng.normal(size=n))
+    open_ = close + rng.normal(scale=0.5, size=n)
+    high = np.maximum(open_, close) + rng.random(n)
+    low = np.minimum(open_, close) - rng.random(n)
+    flat = rng.random(n) < 0.05
+    open_[flat] = close[flat]
+    high[flat] = close[flat]
+    low[flat] = close[flat]
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close})
+
+
+def test_candle_strength_matches_the_row_wise_apply(df):
+    strength_ref = df.apply(lambda row: abs(row['close'] - row['open']) / (row['high'] - row['low'])
+                            if (row['high'] - row['low']) > 0 else 0, axis=1).round(2)
+    strong_ref = df.apply(lambda row: abs(row['close'] - row['open']) / (row['high'] - row['low']) >= 0.6
+                          if (row['high'] - row['low']) > 0 else False, axis=1)
+
+    add_candle_geometry(df, kinds=('regular',))
+    ratio = df['candle_body_ratio']
+    assert ratio.fillna(0).round(2).equals(strength_ref)
+    assert (ratio >= 0.6).equals(strong_ref)
+
+
+def test_precomputed_and_on_the_fly_geometry_agree(df):
+    computed = candle_geometry(df)
+    add_candle_geometry(df)
+    assert 'ha_body' not in df.columns                              # no Heiken Ashi columns to read
+    precomputed = candle_geometry(df)
+    for field, values in computed.items():
+        assert np.array_equal(values.to_numpy(), precomputed[field].to_numpy(), equal_nan=True)
+    row = df.iloc[3]
+    assert body_ratio_of_row(row, 'regular') == row['candle_body_ratio']
+    assert body_ratio_of_row(row.drop('candle_body_ratio'), 'regular') == pytest.approx(row['candle_body_ratio'])
@@ -0,0 +1,114 @@
+# tests/test_candle_ring.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.candle_ring import CandleRingStore, OHLCVRing
+
+MINUTE = 60_000
+T0 = 1_699_999_980_000                                    # minute-aligned
+TIMES = pd.to_datetime(T0 + np.arange(600) * MINUTE, unit='ms', utc=True)
+CLOSE = np.arange(600, dtype=float)
+FULL = pd.DataFrame({'time': TIMES, 'open': CLOSE, 'high': CLOSE + 1, 'low': CLOSE - 1,
+                     'close': CLOSE, 'volume': CLOSE * 2})
+
+
+def _db_frame(rows):
+    """Shaped like fetch_data_safe from the DB: extra columns, ascending rows on a reversed index."""
+    df = rows.iloc[::-1].copy()
+    df['quote_volume'] = 1.0
+    df['time'] = df['time'].astype('datetime64[us, UTC]')
+    return df.reset_index(drop=True)[::-1]
+
+
+def test_ring_windows_are_contiguous_read_only_views():
+    ring = OHLCVRing(8, MINUTE)
+    for i in range(20):
+        ring.append((T0 + i * MINUTE, i, i + 1, i - 1, i + 0.5, 10 * i))
+    w = ring.window(5)
+    assert list(w['close']) == [15.5, 16.5, 17.5, 18.5, 19.5] and len(ring) == 8
+    assert np.shares_memory(w['close'], ring._data) and not w['close'].flags.writeable
+    assert ring.window(9) is None
+    assert ring.window(5, min_last_ms=T0 + 20 * MINUTE) is None
+    ring.append((T0 + 19 * MINUTE, 0, 0, 0, 99.0, 0))     # newest candle updated in place
+    assert ring.window(1)['close'][0] == 99.0 and len(ring) == 8
+    ring.append((T0 + 22 * MINUTE, 0, 0, 0, 1.0, 0))      # gap: windows across it are refused
+    assert ring.window(2) is None and ring.window(1) is not None
+
+
+def test_load_appends_overlap_and_restarts_in_a_new_ring():
+    store = CandleRingStore({'1m': MINUTE})
+    assert store.load('BTCUSDT', '1m', FULL.iloc[:500]) == 500
+    assert store.load('BTCUSDT', '1m', FULL.iloc[498:503]) == 3         # overlap skipped
+    frame = store.frame('BTCUSDT', '1m', 500)
+    assert frame['close'].iloc[-1] == 502 and frame['time'].iloc[0] == TIMES[3]
+    assert np.shares_memory(frame['close'].to_numpy(), store.ring('BTCUSDT', '1m')._data)
+
+    held = store.frame('BTCUSDT', '1m', 500)
+    before = held['close'].to_numpy().copy()
+    assert store.load('BTCUSDT', '1m', FULL.iloc[550:560]) == 10         # not contiguous: restart
+    assert store.frame('BTCUSDT', '1m', 10)['close'].iloc[0] == 550
+    store.load('BTCUSDT', '1m', FULL.iloc[100:600], replace=True)
+    assert np.array_equal(held['close'].to_numpy(), before)             # handed-out views untouched
+
+
+def test_load_reads_microsecond_timestamps_in_any_order():
+    store = CandleRingStore({'1m': MINUTE})
+    store.load('BTCUSDT', '1m', _db_frame(FULL.iloc[:50]))
+    assert store.last_time('BTCUSDT', '1m') == T0 + 49 * MINUTE
+    assert store.frame('BTCUSDT', '1m', 50)['close'].iloc[0] == 0
+
+
+@pytest.fixture
+def clock():
+    return {'now_ms': T0 + 520 * MINUTE + 5_000, 'reads': [], 'source': FULL}
+
+
+def _fetch(clock):
+    def fetch(symbol, interval, limit):
+        clock['reads'].append(limit)
+        end = (clock['now_ms'] - clock['now_ms'] % MINUTE) // MINUTE - T0 // MINUTE   # candles closed so far
+        return _db_frame(clock['source'].iloc[max(end - limit, 0):end])
+    return fetch
+
+
+def test_fetch_reads_only_the_missing_candles(clock):
+    store = CandleRingStore({'1m': MINUTE})
+    first = store.fetch('BTCUSDT', '1m', _fetch(clock), now_ms=clock['now_ms'])
+    assert len(first) == 500 and first['time'].iloc[-1] == TIMES[519] and clock['reads'] == [500]
+    assert store.fetch('BTCUSDT', '1m', _fetch(clock), now_ms=clock['now_ms']) is not None
+    assert clock['reads'] == [500]                                        # same candle: no read
+    clock['now_ms'] += 2 * MINUTE
+    df = store.fetch('BTCUSDT', '1m', _fetch(clock), now_ms=clock['now_ms'])
+    assert clock['reads'] == [500, 3] and df['time'].iloc[-1] == TIMES[521] and df['close'].iloc[0] == 22
+    assert store.stats()['hits'] == 1 and store.stats()['top_ups'] == 1
+
+
+def test_fetch_returns_the_same_layout_on_every_path(clock):
+    store = CandleRingStore({'1m': MINUTE})
+    miss = store.fetch('BTCUSDT', '1m', _fetch(clock), now_ms=clock['now_ms'])
+    hit = store.fetch('BTCUSDT', '1m', _fetch(clock), now_ms=clock['now_ms'])
+    holed = clock['source'].drop(index=510)
+    clock['source'] = holed
+    copied = store.fetch('ETHUSDT', '1m', _fetch(clock), now_ms=clock['now_ms'])   # hole: no window
+    unknown = CandleRingStore({}).fetch('BTCUSDT', '1m', _fetch(clock), n=500)
+    for df in (miss, copied, unknown):
+        assert list(df.columns) == list(hit.columns) == ['time', 'open', 'high', 'low', 'close', 'volume']
+        assert df.dtypes.equals(hit.dtypes)
+        assert isinstance(df.index, pd.RangeIndex) and df['time'].is_monotonic_increasing
+    pd.testing.assert_frame_equal(miss, hit)
+    assert len(copied) == 500 and TIMES[510] not in set(copied['time'])
+
+
+def test_least_recently_used_series_are_evicted():
+    store = CandleRingStore({'1m': MINUTE}, max_series=2)
+    store.load('A', '1m', FULL.iloc[:10])
+    store.load('B', '1m', FULL.iloc[:10])
+    store.window('A', '1m', 5)
+    store.load('C', '1m', FULL.iloc[:10])
+    assert sorted(store.keys()) == [('A', '1m'), ('C', '1m')] and store.stats()['evictions'] == 1
+    unbounded = CandleRingStore({'1m': MINUTE}, max_series=None)
+    for symbol in 'ABCDE':
+        unbounded.ring(symbol, '1m')
+    assert len(unbounded.keys()) == 5
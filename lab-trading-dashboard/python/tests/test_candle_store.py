@@ -0,0 +1,161 @@
+# tests/test_candle_store.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import migrate_candles
+from utils.candle_store import (OHLCV_COLUMNS, _projection, bulk_arrays, history_chunks, kline_records,
+                                kline_table_name, make_candle_store, parse_kline_table)
+
+
+class RecordingSQL:
+    """Captures statements instead of running them."""
+
+    def __init__(self):
+        self.statements = []
+
+    def _record(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def fetch_one(self, sql, params=None):
+        self._record(sql, params)
+        if 'COUNT(*)' in sql:
+            return (3,)
+        return (7,) if 'symbol_id FROM' in sql else None
+
+    def fetch_all(self, sql, params=None):
+        self._record(sql, params)
+        if 'COUNT(*)' in sql or 'to_regclass' in sql:
+            return [(3,)]
+        return [('kline_btcusdt_15m',), ('kline_1000pepeusdt_1h',), ('kline_queue',)]
+
+    def fetch_dataframe(self, sql_query, params=None):
+        self._record(sql_query, params)
+        return pd.DataFrame()
+
+    def execute(self, sql, params=None, autocommit=False):
+        self._record(sql, params)
+        return 3
+
+    def execute_many(self, sql, param_list, autocommit=False):
+        self._record(sql, param_list)
+        return True
+
+
+@pytest.fixture
+def sql():
+    return RecordingSQL()
+
+
+KLINES = [[1_700_000_000_000, '1', '2', '0.5', '1.5', '10', 1_700_000_059_999, '15', 3, '4', '6']]
+
+
+def test_table_names_are_validated():
+    assert parse_kline_table('kline_btcusdt_15m') == ('BTCUSDT', '15m')
+    assert parse_kline_table('kline_queue') is None
+    for bad in ("BTC'; DROP", "BTC USDT"):
+        with pytest.raises(ValueError):
+            kline_table_name(bad, '1m')
+    with pytest.raises(ValueError):
+        _projection(['close; DROP TABLE x'])
+
+
+def test_list_series_skips_other_tables(sql):
+    tables = make_candle_store(sql, 'tables')
+    assert [s[:2] for s in tables.list_series()] == [('BTCUSDT', '15m'), ('1000PEPEUSDT', '1h')]
+
+
+def test_partitioned_schema(sql):
+    store = make_candle_store(sql, 'partitioned')
+    ddl = store.schema_sql(['1m', '15m', '1M'], time_partition_intervals=('1m',), months=['2025-01-01', '2025-02-15'])
+    assert any('candles_1m_202502' in s and "'2025-03-01'" in s for s in ddl)
+    assert any('candles_1mo' in s for s in ddl) and any('candles_1m_default' in s for s in ddl)
+
+
+def test_partitioned_reads_and_writes(sql):
+    store = make_candle_store(sql, 'partitioned')
+    store.insert('BTCUSDT', '1m', kline_records(KLINES))
+    store.fetch_latest('BTCUSDT', '1m', 500)
+    store.fetch_latest_many(['BTCUSDT', 'ETHUSDT'], '15m', 30)
+    inserted = sql.statements[-3]
+    assert 'ON CONFLICT (symbol_id, interval, open_time)' in inserted[0] and inserted[1][0]['symbol_id'] == 7
+    assert 'open_time AS time' in sql.statements[-2][0] and sql.statements[-2][1]['symbol_id'] == 7
+    assert 'CROSS JOIN LATERAL' in sql.statements[-1][0]
+
+    sql_text, params = store.history_sql('BTCUSDT', '1m', end_time=pd.Timestamp('2024-02-01', tz='UTC'),
+                                         columns=OHLCV_COLUMNS)
+    assert 'open_time AS time, open, high, low, close, volume' in sql_text and 'open_time < :end_time' in sql_text
+    assert params['end_time'].tzinfo is None and 'LIMIT' not in sql_text
+
+    store.fetch_latest_bulk([('BTCUSDT', '15m'), ('ETHUSDT', '1h')], {'15m': 30, '1h': 100}, ['close'])
+    bulk_sql, params = sql.statements[-1]
+    assert 'unnest(' in bulk_sql and 'BTCUSDT' not in bulk_sql and params['limits'] == [30, 100]
+
+
+def test_table_reads(sql):
+    tables = make_candle_store(sql, 'tables')
+    sql_text, params = tables.history_sql('BTCUSDT', '1m', limit=500, start_time='2024-01-01',
+                                          columns=['open', 'close', 'quote_volume'])
+    assert sql_text.startswith('SELECT * FROM (SELECT time, open, close, quotevolume FROM kline_btcusdt_1m '
+                               'WHERE TRUE AND time >= :start_time')
+    assert 'LIMIT 500' in sql_text and sql_text.endswith('ORDER BY time ASC') and set(params) == {'start_time'}
+
+    tables.fetch_latest_bulk([('BTCUSDT', '15m'), ('ETHUSDT', '1h')], {'15m': 30, '1h': 100})
+    assert 'kline_ethusdt_1h ORDER BY time DESC LIMIT 100' in sql.statements[-1][0]
+    assert sql.statements[-1][1]['s1'] == 'ETHUSDT'
+
+
+def test_every_write_path_stores_naive_utc(sql):
+    """Inserts, stage merges and the migration copy all convert to UTC explicitly."""
+    utc = "AT TIME ZONE 'UTC'"
+    statements = []
+    for backend in ('tables', 'partitioned'):
+        store = make_candle_store(sql, backend)
+        store.insert('BTCUSDT', '1m', kline_records(KLINES))
+        statements.append(sql.statements[-1][0])
+        statements.extend(store.merge_stage_sql([('BTCUSDT', '1m')]))
+    statements = [s for s in statements if 'time_ms' in s or ':time' in s]
+    assert len(statements) == 4 and all(utc in s for s in statements)
+
+    migrate_sql = make_candle_store(sql, 'partitioned').migrate_sql('kline_btcusdt_1m', 7, '1m')
+    assert "(time AT TIME ZONE :legacy_tz) AT TIME ZONE 'UTC'" in migrate_sql
+
+
+def test_bulk_arrays_and_history_chunks():
+    long_frame = pd.DataFrame({'symbol': ['A', 'A', 'A', 'B', 'B'], 'interval': ['1m', '1m', '5m', '1m', '1m'],
+                               'time': pd.to_datetime([0, 60_000, 0, 0, 60_000], unit='ms'),
+                               'close': [1, 2, 3, 4, 5]})
+    arrays = bulk_arrays(long_frame)
+    assert list(arrays) == [('A', '1m'), ('A', '5m'), ('B', '1m')]
+    assert arrays[('B', '1m')]['close'].tolist() == [4.0, 5.0]
+    assert arrays[('A', '1m')]['time'].tolist() == [0, 60_000] and arrays[('A', '5m')]['close'].dtype == np.float64
+
+    chunks = list(history_chunks([(['time', 'close', 'quotevolume'], [(pd.Timestamp('2024-01-01'), 1.0, 2.0)])],
+                                 as_arrays=True))
+    assert chunks[0]['time'][0] == 1_704_067_200_000 and 'quote_volume' in chunks[0]
+
+
+def test_migrate_is_a_dry_run_by_default(sql):
+    summary = migrate_candles.migrate(sql, {'15m': 900_000, '1h': 3_600_000})
+    assert summary['dry_run'] and summary['tables'] == 2
+    assert not any(s.startswith(('CREATE', 'INSERT')) for s, _ in sql.statements)
+
+
+def test_migrate_apply_passes_the_legacy_timezone(sql):
+    summary = migrate_candles.migrate(sql, {'15m': 900_000, '1h': 3_600_000}, dry_run=False, verify=True,
+                                      legacy_timezone='Asia/Kolkata')
+    copies = [params for s, params in sql.statements if s.startswith('INSERT INTO candles ')]
+    assert not summary['dry_run'] and summary['rows'] == 6 and summary['mismatches'] == []
+    assert copies == [{'legacy_tz': 'Asia/Kolkata'}] * 2
+
+
+def test_cli_requires_apply(monkeypatch):
+    calls = []
+    monkeypatch.setattr(migrate_candles.importlib, 'import_module',
+                        lambda name: type('db', (), {'sql_helper': None, 'INTERVAL_MS': {}}))
+    monkeypatch.setattr(migrate_candles, 'migrate', lambda *args, **kwargs: calls.append(kwargs) or {'mismatches': []})
+    assert migrate_candles.main([]) == 0
+    assert migrate_candles.main(['--apply', '--symbols', 'btcusdt']) == 0
+    assert calls[0]['dry_run'] is True and calls[1]['dry_run'] is False
+    assert calls[1]['symbols'] == {'BTCUSDT'} and calls[1]['legacy_timezone'] == 'UTC'
@@ -0,0 +1,111 @@
+# tests/test_db_updater.py
+
+import pytest
+
+from utils import db_updater
+from utils.db_updater import DBUpdater, TradeRowDiff
+from utils.Final_olab_database import TRADE_UPDATE_COLUMNS
+from utils.global_store import all_pairs
+
+
+def _row(uid, **values):
+    row = {c: 0 for c in TRADE_UPDATE_COLUMNS}
+    row.update(unique_id=uid, pair='BTCUSDT', type='running', hedge=False)
+    row.update(values)
+    return row
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Fake olab_flush_trade_rows: fails any statement containing a row with investment == 'bad'."""
+    state = {'statements': [], 'reachable': True, 'errors': [], 'noted': []}
+
+    def flush(machine_id, rows, columns):
+        state['statements'].append(sorted(row['unique_id'] for row in rows))
+        if not state['reachable'] or any(row['investment'] == 'bad' for row in rows):
+            return None
+        return len(rows)
+
+    monkeypatch.setattr(db_updater, 'olab_flush_trade_rows', flush)
+    monkeypatch.setattr(db_updater, 'olab_db_reachable', lambda: state['reachable'])
+    monkeypatch.setattr(db_updater, 'log_error', lambda error, *args: state['errors'].append((error, args)))
+    monkeypatch.setattr(db_updater, 'log_info', lambda *args: None)
+    monkeypatch.setattr(db_updater, 'trade_state',
+                        type('TradeState', (), {'note_write': lambda self, *args: state['noted'].append(args)})())
+    all_pairs.clear()
+    yield state
+    all_pairs.clear()
+
+
+def test_diff_tracks_changed_columns_and_nan():
+    diff = TradeRowDiff()
+    pairs = {'u1': _row('u1', buy_pl=float('nan')), 'u2': _row('u2')}
+    dirty = diff.diff(pairs)
+    assert set(dirty) == {'u1', 'u2'} and dirty['u1'][0]['hedge'] == 0
+    diff.mark_flushed(dirty)
+    assert diff.diff(pairs) == {}                      # NaN compares equal to NaN
+    pairs['u2']['sell_pl'] = 3.5
+    assert {uid: changed for uid, (_, changed) in diff.diff(pairs).items()} == {'u2': ['sell_pl']}
+    pairs['u3'] = {'unique_id': 'u3'}                  # incomplete row is skipped
+    assert 'u3' not in diff.diff(pairs)
+
+
+def test_bad_row_is_quarantined_and_the_rest_written(db):
+    for i in range(8):
+        all_pairs[f'u{i}'] = _row(f'u{i}')
+    all_pairs['u5']['investment'] = 'bad'
+    updater = DBUpdater()
+
+    assert updater.flush('m2') is True
+    assert updater.stats()['last_rows_written'] == 7
+    assert updater.stats()['quarantined'] == ['u5']
+    assert [args[1] for _, args in db['errors']] == ['u5']
+
+    db['statements'].clear()
+    assert updater.flush('m2') is True and db['statements'] == []     # nothing changed, u5 not retried
+    all_pairs['u5']['investment'] = 100
+    assert updater.flush('m2') is True and db['statements'] == [['u5']]
+    assert updater.stats()['quarantined'] == []
+
+
+def test_unreachable_db_keeps_rows_dirty(db):
+    all_pairs['u1'] = _row('u1')
+    all_pairs['u2'] = _row('u2')
+    db['reachable'] = False
+    updater = DBUpdater()
+    assert updater.flush('m2') is False
+    assert len(db['statements']) == 1 and updater.stats()['quarantined'] == []
+    db['reachable'] = True
+    assert updater.flush('m2') is True and updater.stats()['last_rows_written'] == 2
+
+
+def test_run_counts_failed_flushes(db, monkeypatch):
+    updater = DBUpdater(interval_seconds=0)
+    results = iter([False, False, True])
+    infos = []
+    monkeypatch.setattr(updater, 'flush', lambda machine_id: next(results))
+    monkeypatch.setattr(db_updater, 'olab_update_tmux_log', lambda name: None)
+    monkeypatch.setattr(db_updater, 'log_info', infos.append)
+
+    def stop_after_three(*_):
+        if sum('completed' in i or 'failed' in i for i in infos) == 3:
+            updater.running = False
+    monkeypatch.setattr(db_updater.shutdown_event, 'wait', stop_after_three)
+    before = updater.last_successful_update
+    updater.run()
+    outcomes = [i for i in infos if 'completed' in i or 'failed' in i]
+    assert ['failed' in i for i in outcomes] == [True, True, False]
+    assert '(2 in a row)' in outcomes[1] and updater.last_successful_update >= before
+
+
+def test_written_rows_update_trade_state(db):
+    for i in range(4):
+        all_pairs[f'u{i}'] = _row(f'u{i}', updated_at=f'2025-01-01 00:00:0{i}')
+    all_pairs['u2']['investment'] = 'bad'
+    db['reachable'] = False
+    updater = DBUpdater()
+    assert updater.flush('M2') is False and db['noted'] == []
+
+    db['reachable'] = True
+    assert updater.flush('M2') is True
+    assert sorted(db['noted']) == [('m2', f'u{i}', f'2025-01-01 00:00:0{i}') for i in (0, 1, 3)]
@@ -0,0 +1,58 @@
+# tests/test_frame_cache.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.frame_cache import CandleFrameCache, last_closed_open_time
+
+NOW = 1_700_000_000_000
+
+
+def _frame(candle_open_ms, rows=500):
+    times = pd.to_datetime(candle_open_ms - np.arange(rows)[::-1] * 60_000, unit='ms', utc=True)
+    return pd.DataFrame({'time': times, 'close': np.random.default_rng(0).random(rows)})
+
+
+@pytest.fixture
+def reports():
+    return []
+
+
+@pytest.fixture
+def cache(reports):
+    return CandleFrameCache({'1m': 60_000, '15m': 900_000}, max_bytes=50_000, report_every=5,
+                            reporter=lambda **kw: reports.append(kw))
+
+
+def test_hits_until_the_next_candle(cache, reports):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return _frame(last_closed_open_time(60_000, NOW))
+
+    key = cache.key('BTCUSDT', '1m', 'regular', NOW)
+    for _ in range(5):
+        cache.get_or_compute(key, compute)
+    assert len(calls) == 1
+    assert cache.get(key, ['close']) is not None                   # full frame serves column requests
+    assert reports and reports[-1]['operation_type'] == 'SUMMARY'
+
+    next_key = cache.key('BTCUSDT', '1m', 'regular', NOW + 60_000)
+    assert next_key != key and cache.get(next_key) is None          # new candle -> miss
+    cache.put(next_key, _frame(next_key[3]))
+    assert cache.get(key) is None                                    # older candle dropped on put
+
+
+def test_byte_budget_evicts_lru_entries(cache):
+    for i in range(10):
+        key = cache.key(f'SYM{i}', '1m', 'regular', NOW)
+        cache.put(key, _frame(key[3]))
+    assert cache.evictions > 0 and cache._bytes <= 50_000
+
+
+def test_stale_frames_are_not_served(cache):
+    key = cache.key('ETHUSDT', '15m', 'regular', NOW)
+    cache.put(key, _frame(key[3] - 900_000))                         # missing the last closed candle
+    assert cache.get(key) is None
@@ -0,0 +1,48 @@
+# tests/test_heiken_ashi.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.heiken_ashi import add_heiken_ashi_columns, heiken_ashi_arrays
+
+
+def _reference(df):
+    """The per-row .iloc loop the three modules used before the shared kernel."""
+    ha_close = (df["open"] + df["high"] + df["low"] + df["close"]) / 4.0
+    ha_open = ha_close.copy()
+    ha_open.iloc[0] = (df["open"].iloc[0] + df["close"].iloc[0]) / 2.0
+    for i in range(1, len(df)):
+        ha_open.iloc[i] = (ha_open.iloc[i - 1] + ha_close.iloc[i - 1]) / 2.0
+    ha_high = np.maximum(df["high"].values, np.maximum(ha_open.values, ha_close.values))
+    ha_low = np.minimum(df["low"].values, np.minimum(ha_open.values, ha_close.values))
+    return ha_open.values, ha_close.values, ha_high, ha_low
+
+
+@pytest.fixture(scope='module')
+def ohlc():
+    rng = np.random.default_rng(11)
+    symbols, bars = 40, 500
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (symbols, bars)), axis=1))
+    open_ = close * (1 + rng.normal(0, 0.002, (symbols, bars)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, (symbols, bars))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, (symbols, bars))))
+    return open_, high, low, close
+
+
+def test_single_and_batched_match_the_iloc_loop(ohlc):
+    open_, high, low, close = ohlc
+    batched = heiken_ashi_arrays(open_, high, low, close)
+    for s in range(open_.shape[0]):
+        expected = _reference(pd.DataFrame({"open": open_[s], "high": high[s], "low": low[s], "close": close[s]}))
+        single = heiken_ashi_arrays(open_[s], high[s], low[s], close[s])
+        for k in range(4):
+            assert np.array_equal(single[k], expected[k]) and np.array_equal(batched[k][s], expected[k])
+
+
+def test_columns_and_empty_input(ohlc):
+    open_, high, low, close = (a[0, :50] for a in ohlc)
+    df = add_heiken_ashi_columns(pd.DataFrame({"open": open_, "high": high, "low": low, "close": close}))
+    assert set(df["ha_color"]) <= {"GREEN", "RED"}
+    assert (df["ha_color"] == "GREEN").tolist() == (df["ha_close"] >= df["ha_open"]).tolist()
+    assert all(a.shape == (0,) for a in heiken_ashi_arrays([], [], [], []))
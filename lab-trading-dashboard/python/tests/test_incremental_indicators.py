@@ -0,0 +1,86 @@
+# tests/test_incremental_indicators.py
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from FinalVersionTrading_AWS import calculate_all_indicators_optimized
+from utils import incremental_indicators
+from utils.incremental_indicators import INDICATOR_COLUMNS, SWING_FLAG_COLUMNS, IncrementalIndicatorEngine
+
+pytestmark = pytest.mark.skipif(not incremental_indicators.STREAMING_AVAILABLE,
+                                reason="TA-Lib stream handles not available")
+
+
+def _bars(total, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, total))
+    open_ = np.r_[close[0], close[:-1]] + rng.normal(0, 0.1, total)
+    return pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=total, freq='15min', tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.random(total) * 0.4,
+        'low': np.minimum(open_, close) - rng.random(total) * 0.4,
+        'close': close,
+        'volume': rng.random(total) * 1000,
+    })
+
+
+def _recompute(bars, candle):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return calculate_all_indicators_optimized(bars, candle)
+
+
+@pytest.mark.parametrize('candle', ['regular', 'heiken'])
+def test_every_column_matches_recompute_over_seen_history(candle):
+    window, steps = 500, 40
+    bars = _bars(window + steps)
+    engine = IncrementalIndicatorEngine(max_bars=window)
+    key = ('TESTUSDT', '15m', candle)
+    mismatched = set()
+    for k in range(steps):
+        got = engine.update(key, bars.iloc[k:k + window], candle)
+        # Engine history is anchored at bar 0; compare against the pipeline over it
+        ref = _recompute(bars.iloc[:k + window], candle)
+        for name in INDICATOR_COLUMNS:
+            expected = ref[name].to_numpy()[k:]
+            assert got[name].dtype == expected.dtype, name
+            if not np.array_equal(got[name], expected, equal_nan=(name not in SWING_FLAG_COLUMNS)):
+                mismatched.add(name)
+    assert not mismatched
+
+
+def test_changed_history_reseeds():
+    bars = _bars(520)
+    engine = IncrementalIndicatorEngine(max_bars=500)
+    key = ('TESTUSDT', '15m', 'regular')
+    engine.update(key, bars.iloc[:500], 'regular')
+    edited = bars.iloc[10:510].copy()
+    edited.loc[edited.index[200], 'close'] += 1.0
+    got = engine.update(key, edited, 'regular')
+    ref = _recompute(edited, 'regular')
+    assert np.array_equal(got['ema_21'], ref['ema_21'].to_numpy(), equal_nan=True)
+
+
+def test_least_recently_used_keys_are_evicted():
+    bars = _bars(300)
+    engine = IncrementalIndicatorEngine(max_bars=300, max_keys=2)
+    for symbol in ('A', 'B'):
+        engine.update((symbol, '15m', 'regular'), bars, 'regular')
+    engine.update(('A', '15m', 'regular'), bars, 'regular')   # A is now the most recent
+    engine.update(('C', '15m', 'regular'), bars, 'regular')
+    assert set(engine._states) == {('A', '15m', 'regular'), ('C', '15m', 'regular')}
+    assert engine.stats()['evictions'] == 1
+
+    one_key = engine.stats()['bytes'] // 2
+    capped = IncrementalIndicatorEngine(max_bars=300, max_bytes=int(one_key * 1.5))
+    for symbol in ('A', 'B', 'C'):
+        capped.update((symbol, '15m', 'regular'), bars, 'regular')
+    assert list(capped._states) == [('C', '15m', 'regular')]
+    assert capped.stats()['bytes'] <= int(one_key * 1.5)
+
+    capped.reset()
+    assert capped.stats() == {'keys': 0, 'bytes': 0, 'evictions': 2}
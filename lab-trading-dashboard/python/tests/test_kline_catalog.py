@@ -0,0 +1,56 @@
+# tests/test_kline_catalog.py
+
+import pandas as pd
+import pytest
+
+from utils.kline_catalog import KlineCatalog
+
+T0 = 1_700_000_000_000
+
+
+class FakeStore:
+    """In-memory stand-in for a candle store, counting round trips."""
+
+    def __init__(self, latest):
+        self.latest = dict(latest)
+        self.calls = 0
+
+    def latest_times(self):
+        self.calls += 1
+        return dict(self.latest)
+
+    def latest_time(self, symbol, interval):
+        self.calls += 1
+        return self.latest.get((symbol, interval))
+
+    def exists(self, symbol, interval):
+        self.calls += 1
+        return (symbol, interval) in self.latest
+
+
+@pytest.fixture
+def store():
+    return FakeStore({('BTCUSDT', '15m'): pd.Timestamp(T0, unit='ms'), ('ETHUSDT', '15m'): None})
+
+
+def test_fresh_series_need_no_round_trips(store):
+    catalog = KlineCatalog(store)
+    for _ in range(100):
+        assert catalog.is_fresh('BTCUSDT', '15m', T0)
+    assert store.calls == 1                                          # the initial load only
+
+    assert not catalog.is_fresh('BTCUSDT', '15m', T0 + 900_000)      # next candle: one re-check
+    assert store.calls == 2
+    catalog.note_insert('BTCUSDT', '15m', T0 + 900_000)              # insert_klines wrote it
+    assert catalog.is_fresh('BTCUSDT', '15m', T0 + 900_000) and store.calls == 2
+    assert catalog.latest_ms('BTCUSDT', '15m') == T0 + 900_000
+
+
+def test_missing_series_are_cached(store):
+    catalog = KlineCatalog(store)
+    assert catalog.exists('ETHUSDT', '15m') and not catalog.is_fresh('ETHUSDT', '15m', T0)
+    calls = store.calls
+    assert not catalog.exists('XRPUSDT', '15m') and store.calls == calls + 2
+    assert not catalog.exists('XRPUSDT', '15m') and store.calls == calls + 2   # negative answer cached
+    catalog.note_insert('XRPUSDT', '15m', T0)
+    assert catalog.exists('XRPUSDT', '15m')
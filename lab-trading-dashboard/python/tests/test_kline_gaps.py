@@ -0,0 +1,116 @@
+# tests/test_kline_gaps.py
+
+import pandas as pd
+import pytest
+
+from utils import Final_olab_database as olab_db
+from utils.frame_cache import last_closed_open_time as last_closed_open_ms
+from utils.kline_gaps import HoleBackfiller, KlineGapStats, plan_kline_fetch
+
+MINUTE = 60_000
+NOW_MS = 1_700_000_000_000 - (1_700_000_000_000 % MINUTE) + 30_000    # mid-candle
+EXPECTED = last_closed_open_ms(MINUTE, NOW_MS)
+
+
+def _kline(t):
+    return [t, '1', '1', '1', '1', '1', t + MINUTE - 1, '1', 1, '1', '1']
+
+
+def _naive(ms):
+    return pd.Timestamp(ms, unit='ms')
+
+
+class FakeSeries:
+    """Stored candle times plus an exchange that has no candles in `halted`."""
+
+    def __init__(self, stored, halted=()):
+        self.stored = set(stored)
+        self.halted = set(halted)
+        self.requests = []
+
+    def find_gaps(self, symbol, interval, interval_ms, start_ms):
+        times = sorted(t for t in self.stored if t >= start_ms)
+        return [(_naive(a), _naive(b)) for a, b in zip(times, times[1:]) if b - a > interval_ms]
+
+    def fetch_range(self, symbol, interval, start_ms, end_ms, limit):
+        self.requests.append((start_ms, end_ms))
+        return [_kline(t) for t in range(start_ms, end_ms + 1, MINUTE) if t not in self.halted][:limit]
+
+    def insert(self, symbol, interval, klines):
+        self.stored.update(int(k[0]) for k in klines)
+
+
+def test_fetch_plans():
+    assert plan_kline_fetch(EXPECTED, MINUTE, 500, NOW_MS)['mode'] == 'fresh'
+    plan = plan_kline_fetch(EXPECTED - 2 * MINUTE, MINUTE, 500, NOW_MS)
+    assert plan['mode'] == 'tail' and plan['limit'] == 2
+    assert plan['start_ms'] == EXPECTED - MINUTE and plan['end_ms'] == EXPECTED
+    assert plan_kline_fetch(None, MINUTE, 500, NOW_MS)['mode'] == 'full'
+    assert plan_kline_fetch(EXPECTED - 600 * MINUTE, MINUTE, 500, NOW_MS)['mode'] == 'full'
+
+
+def test_backfill_fills_holes():
+    missing = {EXPECTED - m * MINUTE for m in (10, 11, 12, 30)}          # holes of 3 and 1 candles
+    series = FakeSeries({EXPECTED - i * MINUTE for i in range(50)} - missing)
+    stats = KlineGapStats(report_every=0)
+    stats.record_fetch('tail', 2, 500)
+    stats.record_fetch('full', 500, 500)
+    backfiller = HoleBackfiller(series.find_gaps, series.fetch_range, series.insert, stats=stats, lookback=100)
+
+    assert backfiller.scan('BTCUSDT', '1m', MINUTE, NOW_MS) == 4
+    assert not series.find_gaps('BTCUSDT', '1m', MINUTE, 0)
+    assert backfiller.schedule('BTCUSDT', '1m', MINUTE) and not backfiller.schedule('BTCUSDT', '1m', MINUTE)
+    assert backfiller.wait_idle(5)
+    c = stats.snapshot()
+    assert c['weight_saved'] == 4 and c['holes_found'] == 2 and c['holes_filled'] == 2
+    assert c['backfill_candles'] == 4 and c['holes_empty'] == 0
+
+
+def test_empty_holes_are_not_requested_again():
+    halted = {EXPECTED - m * MINUTE for m in (20, 21)}
+    missing = halted | {EXPECTED - 22 * MINUTE}                          # one candle exists before the halt
+    series = FakeSeries({EXPECTED - i * MINUTE for i in range(50)} - missing, halted=halted)
+    stats = KlineGapStats(report_every=0)
+    backfiller = HoleBackfiller(series.find_gaps, series.fetch_range, series.insert, stats=stats, lookback=100)
+
+    assert backfiller.scan('BTCUSDT', '1m', MINUTE, NOW_MS) == 1
+    assert backfiller.scan('BTCUSDT', '1m', MINUTE, NOW_MS) == 0
+    assert series.requests == [(EXPECTED - 22 * MINUTE, EXPECTED - 20 * MINUTE),
+                               (EXPECTED - 21 * MINUTE, EXPECTED - 20 * MINUTE)]
+    c = stats.snapshot()
+    assert c['holes_found'] == 1 and c['holes_empty'] == 1 and c['holes_filled'] == 0
+
+    # Once the halt is older than the lookback window it is forgotten
+    backfiller.scan('BTCUSDT', '1m', MINUTE, NOW_MS + 200 * MINUTE)
+    assert backfiller._empty[('BTCUSDT', '1m')] == set()
+
+
+def test_failed_requests_are_retried():
+    series = FakeSeries({EXPECTED - i * MINUTE for i in range(50)} - {EXPECTED - 5 * MINUTE})
+    backfiller = HoleBackfiller(series.find_gaps, lambda *args: None, series.insert,
+                                stats=KlineGapStats(report_every=0), lookback=100)
+    backfiller.scan('BTCUSDT', '1m', MINUTE, NOW_MS)
+    backfiller.fetch_range = series.fetch_range
+    assert backfiller.scan('BTCUSDT', '1m', MINUTE, NOW_MS) == 1
+
+
+@pytest.mark.parametrize('latest_behind', [0, 2])
+def test_missing_tail_returns_the_full_page_row_count(monkeypatch, latest_behind):
+    """Fresh or tail, the frame has limit - 1 rows like the full-page path (last open candle dropped)."""
+    limit = 500
+    expected = last_closed_open_ms(MINUTE)
+    stored = [expected - i * MINUTE for i in range(1000, latest_behind - 1, -1)]
+
+    def fetch_from_db(symbol, interval, n):
+        times = (stored + [expected - i * MINUTE for i in range(latest_behind - 1, -1, -1)])[-n:]
+        return pd.DataFrame({'time': pd.to_datetime(times, unit='ms', utc=True), 'close': 1.0})
+
+    monkeypatch.setattr(olab_db.kline_catalog, 'latest_ms', lambda symbol, interval: stored[-1])
+    monkeypatch.setattr(olab_db, 'olab_fetch_kline_range',
+                        lambda symbol, interval, start, end, n: [_kline(t) for t in range(start, end + 1, MINUTE)])
+    monkeypatch.setattr(olab_db, 'olab_insert_klines', lambda *args: None)
+    monkeypatch.setattr(olab_db, 'olab_fetch_data_from_db', fetch_from_db)
+    monkeypatch.setattr(olab_db.kline_backfiller, 'schedule', lambda *args: True)
+
+    df = olab_db.olab_fetch_missing_tail('BTCUSDT', '1m', limit)
+    assert len(df) == limit - 1 and int(df['time'].iloc[-1].value // 1_000_000) == expected
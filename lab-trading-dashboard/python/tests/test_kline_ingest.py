@@ -0,0 +1,86 @@
+# tests/test_kline_ingest.py
+
+import csv
+
+import pytest
+
+from utils.candle_store import STAGE_COLUMNS, TableCandleStore
+from utils.kline_ingest import copy_ingest, stage_csv, synthetic_klines
+
+
+class FakeConnection:
+    """Raw DB-API connection recording COPY input and statements; merges report every staged row."""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.executed, self.copied = [], []
+        self.committed = self.rolled_back = self.closed = False
+        self.description = None
+        self._rows = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement):
+        if self.fail_on and self.fail_on in statement:
+            raise RuntimeError('merge failed')
+        self.executed.append(statement)
+        self.description = ('count',) if statement.lstrip().startswith('WITH') else None
+        self._rows = self._counts if self.description else []
+
+    def copy_expert(self, statement, buffer):
+        rows = list(csv.reader(buffer))
+        self.copied.append((statement, rows))
+        self._counts = [(s, i, sum(1 for r in rows if (r[0], r[1]) == (s, i))) for s, i in {(r[0], r[1]) for r in rows}]
+
+    def fetchall(self):
+        return self._rows
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSQL:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def raw_connection(self):
+        return self.conn
+
+
+BATCHES = {('BTCUSDT', '1m'): synthetic_klines(3, 60_000, 1_700_000_000_000),
+           ('ETHUSDT', '15m'): synthetic_klines(2, 900_000, 1_700_000_000_000, seed=1),
+           ('XRPUSDT', '1m'): []}
+
+
+def test_stage_csv_rows_follow_stage_columns():
+    buffer, rows = stage_csv(BATCHES)
+    parsed = list(csv.reader(buffer))
+    assert rows == 5 and all(len(row) == len(STAGE_COLUMNS) for row in parsed)
+    assert parsed[0][:3] == ['BTCUSDT', '1m', '1700000000000']
+
+
+def test_copy_ingest_stages_and_merges_in_one_transaction():
+    conn = FakeConnection()
+    summary = copy_ingest(FakeSQL(conn), TableCandleStore(None), BATCHES)
+    assert conn.committed and conn.closed and not conn.rolled_back
+    assert summary['series'] == 2 and summary['rows_staged'] == 5 and summary['rows_inserted'] == 5
+    assert summary['inserted'] == {('BTCUSDT', '1m'): 3, ('ETHUSDT', '15m'): 2}
+    assert conn.executed[0].lstrip().startswith('CREATE TEMP TABLE') and len(conn.executed) == 2
+
+
+def test_copy_ingest_rolls_back_on_failure():
+    conn = FakeConnection(fail_on='kline_ethusdt_15m')
+    with pytest.raises(RuntimeError):
+        copy_ingest(FakeSQL(conn), TableCandleStore(None), BATCHES)
+    assert conn.rolled_back and conn.closed and not conn.committed
+
+
+def test_nothing_to_ingest_opens_no_connection():
+    assert copy_ingest(FakeSQL(None), TableCandleStore(None), {('BTCUSDT', '1m'): []})['series'] == 0
@@ -0,0 +1,89 @@
+# tests/test_kline_stream.py
+
+import asyncio
+import socket
+import time
+
+import pandas as pd
+
+from utils.candle_ring import OHLCV_FIELDS
+from utils.kline_stream import (KlineReplayServer, KlineStreamIngestor, kline_message, parse_kline_message,
+                                replay_messages)
+
+MINUTE = 60_000
+START_MS = 1_700_000_000_000 - (1_700_000_000_000 % MINUTE)
+
+
+def _rows(symbol_seed, n, start):
+    return [[start + i * MINUTE, f"{100 + symbol_seed + i}", f"{101 + symbol_seed + i}", f"{99 + symbol_seed + i}",
+             f"{100.5 + symbol_seed + i}", "10", start + (i + 1) * MINUTE - 1, "1000", 5, "4", "400"]
+            for i in range(n)]
+
+
+def test_message_round_trip():
+    row = _rows(0, 1, START_MS)[0]
+    assert parse_kline_message(kline_message('BTCUSDT', '1m', row, True)) == ('BTCUSDT', '1m', row, True, row[6])
+    assert parse_kline_message('{"e": "markPriceUpdate"}') is None
+
+
+def test_replay_fills_rings_and_batches_writes():
+    symbols = [f"SYM{i}USDT" for i in range(250)]          # 250 x 2 streams -> 3 connections
+    history = {(s, '1m'): _rows(i, 30, START_MS) for i, s in enumerate(symbols)}
+    live = {(s, '1m'): _rows(i, 10, START_MS + 30 * MINUTE) for i, s in enumerate(symbols)}
+    live.update({(s, '3m'): [] for s in symbols})
+
+    def seed(seed_symbols, interval, n):
+        frames = [pd.DataFrame([r[:6] for r in history[(s, interval)]], columns=list(OHLCV_FIELDS)).assign(symbol=s)
+                  for s in seed_symbols if (s, interval) in history]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        df['time'] = pd.to_datetime(df['time'], unit='ms')
+        return df
+
+    written = []
+
+    async def _replay():
+        async with KlineReplayServer(replay_messages(live)) as server:
+            ingestor = KlineStreamIngestor({'1m': MINUTE, '3m': 3 * MINUTE}, insert_bulk=written.append, seed=seed,
+                                           ring_size=35, flush_interval=0.05, url=server.url)
+            ingestor.symbols = symbols
+            ingestor._seed_rings(symbols)
+            task = asyncio.create_task(ingestor.run())
+            deadline = time.time() + 20
+            while ingestor.stats['closed'] < 250 * 10 and time.time() < deadline:
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(0.2)
+            ingestor._stopping = True
+            for t in ingestor._tasks:
+                t.cancel()
+            await task
+            return ingestor
+
+    ingestor = asyncio.run(_replay())
+
+    assert len(ingestor.connection_urls()) == 3
+    assert ingestor.stats['closed'] == 2500 and sum(len(r) for b in written for r in b.values()) == 2500
+    assert len(written) < 2500                                               # batched, not per candle
+    window = ingestor.window('SYM7USDT', '1m', 35)
+    assert window['time'][0] == START_MS + 5 * MINUTE and window['time'][-1] == START_MS + 39 * MINUTE
+    assert ingestor.window('SYM7USDT', '1m', 41) is None                     # 30 seeded + 10 streamed
+    frame = ingestor.frame('SYM7USDT', '1m', 20, min_last_ms=START_MS + 39 * MINUTE)
+    assert frame['close'].iloc[-1] == 100.5 + 7 + 9 and str(frame['time'].dt.tz) == 'UTC'
+    assert ingestor.frame('SYM7USDT', '1m', 20, min_last_ms=START_MS + 40 * MINUTE) is None
+
+
+def test_stop_closes_the_loop():
+    with socket.socket() as s:                                               # a local port nobody listens on
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    ingestor = KlineStreamIngestor({'1m': MINUTE}, url=f"ws://127.0.0.1:{port}/stream")
+    ingestor.start(['BTCUSDT'])
+    loop = ingestor._loop
+    time.sleep(0.2)
+    ingestor.stop(timeout=5)
+    assert loop.is_closed() and not ingestor.running
+
+    ingestor.start(['BTCUSDT', 'ETHUSDT'])                                   # a restart gets a fresh loop
+    assert ingestor._loop is not loop and ingestor.running
+    ingestor.stop(timeout=5)
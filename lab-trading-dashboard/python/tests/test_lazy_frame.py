@@ -0,0 +1,172 @@
+# tests/test_lazy_frame.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import FinalVersionTrading_AWS as aws
+from core.book_profit import (BOOK_PROFIT_5M_COLUMNS, BOOK_PROFIT_15M_COLUMNS, BREAKOUT_LEVEL_COLUMNS,
+                              CLOSE_CHECK_COLUMNS, CLOSE_CONFIRM_COLUMNS)
+from utils.frame_cache import CandleFrameCache, last_closed_open_time
+from utils.lazy_frame import IndicatorRegistry, LazyIndicatorFrame
+
+FIFTEEN_MIN = 900_000
+
+# Column sets the live bot's callers pass to CalculateSignals(columns=...)
+CALLER_COLUMNS = {
+    'ema_trend': ['ha_color', 'ha_close', 'ema_9'],
+    'book_profit_15m': BOOK_PROFIT_15M_COLUMNS,
+    'book_profit_5m': BOOK_PROFIT_5M_COLUMNS,
+    'breakout_levels': BREAKOUT_LEVEL_COLUMNS,
+    'close_check': CLOSE_CHECK_COLUMNS,
+    'close_confirm': CLOSE_CONFIRM_COLUMNS,
+    'price_trend': ['price_trend_direction'],
+    'swings': ['swing_high_zone', 'swing_low_zone'],
+}
+
+
+def _candles(n=400, seed=3, last_open_ms=None):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.002, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n)))
+    if last_open_ms is None:
+        time = pd.date_range('2025-01-01', periods=n, freq='15min', tz='UTC')
+    else:
+        time = pd.date_range(end=pd.Timestamp(last_open_ms, unit='ms', tz='UTC'), periods=n, freq='15min')
+    return pd.DataFrame({'time': time, 'open': open_, 'high': high, 'low': low, 'close': close,
+                         'volume': rng.uniform(100, 1000, n)})
+
+
+@pytest.fixture(scope='module', params=['regular', 'heiken'])
+def full_frame(request):
+    return request.param, aws.calculate_all_indicators_optimized(_candles(), request.param)
+
+
+def _assert_columns_match(lazy_df, full_df, columns):
+    for column in columns:
+        pd.testing.assert_series_equal(lazy_df[column].reset_index(drop=True), full_df[column].reset_index(drop=True),
+                                       check_names=False, obj=column)
+
+
+def test_every_group_matches_the_full_pipeline(full_frame):
+    candle, full = full_frame
+    for group in aws.indicator_groups.plan(aws.indicator_groups._groups):
+        frame = aws.lazy_indicator_frame(_candles(), candle)
+        columns = aws.indicator_groups.columns_of(group)
+        frame.ensure(columns)
+        assert not frame.full, group
+        _assert_columns_match(frame.df, full, columns)
+
+
+@pytest.mark.parametrize('caller', sorted(CALLER_COLUMNS))
+def test_caller_columns_match_the_full_pipeline(full_frame, caller):
+    candle, full = full_frame
+    frame = aws.lazy_indicator_frame(_candles(), candle)
+    df = frame.to_frame(CALLER_COLUMNS[caller])
+    assert not frame.full and 'TAKEACTION' not in df.columns
+    _assert_columns_match(df, full, CALLER_COLUMNS[caller])
+
+
+def test_dependencies_resolve_without_unrelated_groups():
+    frame = aws.lazy_indicator_frame(_candles(), 'heiken')
+    frame['macd_color_signal']
+    assert frame.computed_groups == ['heiken_ashi', 'macd_color', 'two_pole_macd']
+    assert 'RSI_9' not in frame.df.columns and 'swing_high_zone' not in frame.df.columns
+
+    frame.ensure(['swing_low_zone', 'ha_close'])
+    assert frame.computed_groups == ['heiken_ashi', 'macd_color', 'swings', 'two_pole_macd']
+
+
+def _toy_registry(calls):
+    registry = IndicatorRegistry()
+
+    @registry.register('base', ('a',))
+    def _base(df, ctx):
+        calls.append('base')
+        return df.assign(a=df['x'] + 1)
+
+    @registry.register('mid', ('b',), requires=('base',))
+    def _mid(df, ctx):
+        calls.append('mid')
+        return df.assign(b=df['a'] * ctx['k'])
+
+    @registry.register('top', ('c',), requires=('mid', 'base'))
+    def _top(df, ctx):
+        calls.append('top')
+        return df.assign(c=df['b'] + df['a'])
+
+    @registry.register('other', ('d',))
+    def _other(df, ctx):
+        calls.append('other')
+        return df.assign(d=0)
+
+    return registry
+
+
+def test_plan_runs_dependencies_once_in_order():
+    calls = []
+    registry = _toy_registry(calls)
+    assert registry.plan(['top']) == ['base', 'mid', 'top']
+    assert registry.plan(['top', 'mid'], done={'base'}) == ['mid', 'top']
+
+    frame = LazyIndicatorFrame(pd.DataFrame({'x': [1, 2]}), registry, {'k': 10}, full_compute=None)
+    assert frame['c'].tolist() == [22, 33] and calls == ['base', 'mid', 'top']
+    frame.ensure(['a', 'b', 'c'])
+    assert calls == ['base', 'mid', 'top'] and 'c' in frame and 'zzz' not in frame
+
+
+def test_unregistered_columns_fall_back_to_the_full_pipeline():
+    calls = []
+    full = pd.DataFrame({'x': [1, 2], 'a': [2, 3], 'unregistered': [7, 8]})
+
+    def full_compute():
+        calls.append('full')
+        return full
+
+    frame = LazyIndicatorFrame(pd.DataFrame({'x': [1, 2]}), _toy_registry(calls), {'k': 10}, full_compute)
+    assert frame.to_frame(['a', 'unregistered']) is full and frame.full
+    frame.ensure(['d', 'unregistered'])
+    assert calls == ['full']                                          # once, and no groups after it
+
+    lazy = aws.lazy_indicator_frame(_candles(), 'regular')
+    df = lazy.to_frame(['ema_9', 'TAKEACTION'])
+    assert lazy.full and {'TAKEACTION', 'DIVERGEN_SIGNAL_LIVE', 'ema_9'} <= set(df.columns)
+
+
+def test_partial_entries_never_serve_a_full_request():
+    cache = CandleFrameCache({'15m': FIFTEEN_MIN})
+    key = cache.key('BTCUSDT', '15m', 'heiken')
+    raw = _candles(last_open_ms=key[3])
+    computed = []
+
+    def compute(columns):
+        def run():
+            computed.append(columns)
+            return aws.lazy_indicator_frame(raw, 'heiken').to_frame(columns)
+        return run
+
+    partial = cache.get_or_compute(key, compute(['ema_9']), ['ema_9'])
+    assert 'ema_9' in partial.columns and 'TAKEACTION' not in partial.columns
+    assert cache.get(key) is None and cache.get(key, ['ema_9']) is not None
+
+    full = cache.get_or_compute(key, compute(None))
+    assert computed == [['ema_9'], None] and 'TAKEACTION' in full.columns
+    assert 'TAKEACTION' in cache.get_or_compute(key, compute(['RSI_9']), ['RSI_9']).columns
+    assert computed == [['ema_9'], None]                             # the full entry serves later requests
+
+
+def test_calculate_signals_columns_then_full(monkeypatch):
+    last_open = last_closed_open_time(FIFTEEN_MIN)
+    raw = _candles(last_open_ms=last_open)
+    monkeypatch.setattr(aws, 'signal_frame_cache', CandleFrameCache(aws.INTERVAL_MS))
+    monkeypatch.setattr(aws, '_batch_candles', lambda symbol, interval: raw.copy())
+
+    partial = aws.CalculateSignals('BTCUSDT', '15m', 'heiken', columns=CALLER_COLUMNS['ema_trend'])
+    assert {'ema_9', 'ha_close'} <= set(partial.columns) and 'TAKEACTION' not in partial.columns
+
+    full = aws.CalculateSignals('BTCUSDT', '15m', 'heiken')
+    expected = aws.calculate_all_indicators_optimized(raw.copy(), 'heiken')
+    assert list(full.columns) == list(expected.columns)
+    _assert_columns_match(partial, full, CALLER_COLUMNS['ema_trend'])
@@ -0,0 +1,58 @@
+# tests/test_mark_price_slots.py
+
+import json
+import threading
+import time
+
+from utils.mark_price_slots import LatestPriceSlots, parse
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_parse_accepts_str_and_bytes():
+    frame = json.dumps([{"e": "markPriceUpdate", "E": 1_700_000_000_000 + i, "s": f"S{i}USDT", "p": f"{i}.5"}
+                        for i in range(3)])
+    assert parse(frame)[1]["p"] == "1.5" and parse(frame.encode())[2]["s"] == "S2USDT"
+
+
+def test_prices_published_during_dispatch_are_coalesced():
+    seen = []
+    gate = threading.Event()
+
+    def dispatch(symbol, price, event_ms):
+        gate.wait(2)
+        seen.append((symbol, price))
+
+    slots = LatestPriceSlots(dispatch)
+    slots.start()
+    try:
+        now_ms = time.time() * 1000
+        slots.publish('BTCUSDT', 1.0, now_ms)
+        assert _wait_for(lambda: slots.stats()['pending'] == 0)      # consumer blocked in dispatch of 1.0
+        for p in range(2, 40):
+            slots.publish('BTCUSDT', float(p), now_ms)
+        slots.publish('ETHUSDT', 7.0, now_ms)
+        gate.set()
+        assert _wait_for(lambda: len(seen) == 3)
+        assert seen[0] == ('BTCUSDT', 1.0) and sorted(seen[1:]) == [('BTCUSDT', 39.0), ('ETHUSDT', 7.0)]
+        assert slots.coalesced == 37 and slots.latest('ETHUSDT')[0] == 7.0
+        stats = slots.stats()
+        assert stats['dispatched'] == 3 and stats['dispatch_lag']['n'] == 3 and stats['receive_lag']['n'] == 40
+    finally:
+        slots.stop()
+
+
+def test_dispatch_errors_are_reported_and_counted():
+    reported = []
+
+    def dispatch(symbol, price, event_ms):
+        raise ValueError(symbol)
+
+    slots = LatestPriceSlots(dispatch, on_error=lambda error, context: reported.append((str(error), context)))
+    slots.publish('BTCUSDT', 1.0)
+    assert slots.drain() == 1 and slots.errors == 1 and reported == [('BTCUSDT', 'mark_price_slots')]
@@ -0,0 +1,49 @@
+# tests/test_pair_index.py
+
+import threading
+
+import pytest
+
+from utils.global_store import pair_uids, uid_pair
+from utils.pair_index import index_pair, index_pairs, unindex_pair, uids_for_symbol
+
+
+@pytest.fixture(autouse=True)
+def empty_index():
+    pair_uids.clear()
+    uid_pair.clear()
+    yield
+    pair_uids.clear()
+    uid_pair.clear()
+
+
+def test_index_follows_symbol_changes():
+    index_pairs({"u1": {"pair": "BTCUSDT"}, "u2": {"pair": "BTCUSDT"}, "u3": {"pair": "ETHUSDT"}})
+    assert uids_for_symbol("BTCUSDT") == {"u1", "u2"} and uids_for_symbol("XRPUSDT") == frozenset()
+
+    snapshot = uids_for_symbol("BTCUSDT")
+    index_pair("u2", {"pair": "ETHUSDT"})                            # symbol change moves the UID
+    assert snapshot == {"u1", "u2"}                                  # readers keep an immutable snapshot
+    assert uids_for_symbol("BTCUSDT") == {"u1"} and uids_for_symbol("ETHUSDT") == {"u2", "u3"}
+
+    unindex_pair("u1")
+    unindex_pair("u1")
+    assert "BTCUSDT" not in pair_uids and "u1" not in uid_pair
+
+    index_pair("u3", {})                                             # no pair any more
+    assert uids_for_symbol("ETHUSDT") == {"u2"} and "u3" not in uid_pair
+
+
+def test_concurrent_writers_leave_no_entries():
+    def churn(n):
+        for i in range(2_000):
+            uid = f"t{n}-{i}"
+            index_pair(uid, {"pair": "SOLUSDT"})
+            unindex_pair(uid)
+
+    threads = [threading.Thread(target=churn, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert "SOLUSDT" not in pair_uids and not uid_pair
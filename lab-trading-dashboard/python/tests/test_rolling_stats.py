@@ -0,0 +1,31 @@
+# tests/test_rolling_stats.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.rolling_stats import RollingPercentileRank, rolling_percentile_rank
+
+_rng = np.random.default_rng(5)
+CASES = {
+    'random': pd.Series(_rng.normal(size=2000)),
+    'ties': pd.Series(_rng.integers(0, 7, size=2000).astype(float)),
+    'nan gaps': pd.Series(np.where(_rng.random(2000) < 0.05, np.nan, _rng.random(2000))),
+    'leading nan': pd.Series(np.r_[np.full(19, np.nan), _rng.random(481)]),
+}
+
+
+@pytest.mark.parametrize('window, min_periods', [(100, None), (20, 5)])
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_matches_rolling_apply_rank(case, window, min_periods):
+    series = CASES[case]
+    expected = series.rolling(window, min_periods=min_periods).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    got = rolling_percentile_rank(series, window, min_periods)
+    assert np.array_equal(got.to_numpy(), expected.to_numpy(), equal_nan=True)
+
+
+def test_incremental_updates_match_the_series_helper():
+    series = CASES['ties']
+    ranker = RollingPercentileRank(20, 5)
+    got = [ranker.update(value) for value in series]
+    assert np.array_equal(np.array(got, dtype=float), rolling_percentile_rank(series, 20, 5).to_numpy(), equal_nan=True)
@@ -0,0 +1,43 @@
+# tests/test_segment_stats.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.segment_stats import per_bar, segment_starts, segment_stats
+
+
+def _reference(hist_abs, wave_id):
+    """The groupby loop calculate_all_indicators_optimized used before."""
+    df = pd.DataFrame({'v': hist_abs}, index=pd.RangeIndex(len(hist_abs)))
+    peak_col = np.full(len(df), np.nan)
+    curve_col = np.zeros(len(df), dtype=bool)
+    for _, grp in df.groupby(wave_id):
+        vals = grp['v'].values
+        curve = False
+        if len(vals) >= 3:
+            peak_pos = vals.argmax()
+            if 0 < peak_pos < len(vals) - 1:
+                curve = (np.diff(vals[:peak_pos + 1]) > 0).any() and (np.diff(vals[peak_pos:]) < 0).any()
+        peak_col[grp.index] = vals.max()
+        curve_col[grp.index] = curve
+    return peak_col, curve_col
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_matches_the_groupby_loop(seed):
+    rng = np.random.default_rng(seed)
+    hist = pd.Series(np.convolve(rng.normal(size=600), np.ones(8) / 8, mode='same'))
+    hist.iloc[:rng.integers(0, 40)] = np.nan
+    hist[rng.random(600) < 0.02] = 0.0
+    sign_filled = np.sign(hist).replace(0, np.nan).ffill().fillna(0)
+    wave_id = (sign_filled != sign_filled.shift(1)).cumsum()
+
+    exp_peak, exp_curve = _reference(hist.abs().values, wave_id.values)
+    stats = segment_stats(hist.abs().values, wave_id.values)
+    assert np.array_equal(per_bar(stats['peak'], stats['length']), exp_peak, equal_nan=True)
+    assert np.array_equal(per_bar(stats['is_curve'], stats['length']), exp_curve)
+
+
+def test_segment_starts():
+    assert segment_starts(np.array([1, 1, 2, 2, 2, 3])).tolist() == [0, 2, 5]
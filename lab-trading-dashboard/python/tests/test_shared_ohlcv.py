@@ -0,0 +1,79 @@
+# tests/test_shared_ohlcv.py
+
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import shared_ohlcv
+from utils.shared_ohlcv import (OHLCV_FIELDS, SharedOHLCVBatch, attach_shared_ohlcv, detach_shared_ohlcv,
+                                fetch_batch_ohlcv, shared_ohlcv_arrays, shared_ohlcv_frame)
+
+INTERVALS = ('15m', '1h', '4h')
+
+
+def _frame(seed, rows):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(size=rows))
+    times = pd.to_datetime(1_700_000_000_000 + np.arange(rows) * 900_000, unit='ms', utc=True)
+    return pd.DataFrame({'time': times, 'open': close + rng.normal(size=rows), 'high': close + 1,
+                         'low': close - 1, 'close': close, 'volume': rng.random(rows) * 1000,
+                         'quote_volume': rng.random(rows)})
+
+
+SOURCE = {(f'SYM{i}USDT', interval): _frame(i, 500 - i) for i in range(30) for interval in INTERVALS}
+
+
+def _worker_close_sum(key):
+    arrays = shared_ohlcv_arrays(*key)
+    return float(arrays['close'].sum()) if arrays is not None else None
+
+
+@pytest.fixture
+def batch():
+    frames = fetch_batch_ohlcv(lambda s, i, n: SOURCE[(s, i)].tail(n), [k[0] for k in SOURCE], INTERVALS, 500)
+    assert len(frames) == len(SOURCE)
+    with SharedOHLCVBatch(frames) as batch:
+        yield batch
+        detach_shared_ohlcv()
+
+
+def test_bulk_prefetch_skips_single_fetches():
+    fetched = []
+
+    def fetch_one(symbol, interval, limit):
+        fetched.append((symbol, interval))
+        return SOURCE[(symbol, interval)].tail(limit)
+
+    frames = fetch_batch_ohlcv(fetch_one, [k[0] for k in SOURCE], INTERVALS, 500,
+                               bulk=lambda keys, n: {key: SOURCE[key].tail(n) for key in keys if key[1] == '1h'})
+    assert len(frames) == len(SOURCE) and len(fetched) == 60 and all(key[1] != '1h' for key in fetched)
+
+
+def test_workers_read_the_published_block(batch):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2, initializer=attach_shared_ohlcv,
+                                                initargs=(batch.manifest,)) as executor:
+        worker_sums = dict(zip(SOURCE, executor.map(_worker_close_sum, SOURCE)))
+    assert all(worker_sums[key] == df['close'].sum() for key, df in SOURCE.items())
+
+
+def test_frames_and_views(batch):
+    attach_shared_ohlcv(batch.manifest)
+    for key, df in SOURCE.items():
+        got = shared_ohlcv_frame(*key)
+        assert got['time'].equals(df['time'].reset_index(drop=True))
+        assert all(np.array_equal(got[f].to_numpy(), df[f].to_numpy()) for f in OHLCV_FIELDS[1:])
+
+    views = shared_ohlcv_arrays('SYM0USDT', '15m')
+    assert np.shares_memory(views['close'], shared_ohlcv._attached[2]) and not views['close'].flags.writeable
+    assert views['close'].flags.c_contiguous
+    assert shared_ohlcv_arrays('SYM0USDT', '15m', min_time_ms=views['time'][-1] + 1) is None
+    assert shared_ohlcv_frame('MISSING', '15m') is None
+    del views
+
+
+def test_closing_the_batch_detaches(batch):
+    attach_shared_ohlcv(batch.manifest)
+    batch.close()
+    assert shared_ohlcv._attached is None
@@ -0,0 +1,341 @@
+# tests/test_signal_kernels.py
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import FinalVersionTrading_AWS as aws
+from utils.signal_kernels import (BREAKOUT_STATE_LABELS, BUY, NONE, PA_BREAK_LABELS, PA_CHANGE_LABELS,
+                                  PA_TREND_LABELS, SELL, SIGNAL_LABELS, labels_from_codes, run_bar_state_kernel,
+                                  run_live_divergence_kernel, signal_codes, sparse_signal_column, state_column)
+
+INPUTS = ('close', 'ema_100', 'swing_high_zone', 'swing_low_zone', 'RSI_9', 'two_pole_MACD_CrossOver',
+          'both_above_100', 'both_below_100', 'ema_5_8_cross_ema100_up', 'ema_5_8_cross_ema100_down',
+          'ema_5_8_cross_up', 'ema_5_8_cross_down', 'pa_swing_high', 'pa_swing_low', 'pa_swing_high_price',
+          'pa_swing_low_price', 'consolidating', 'RSI_14', 'low', 'high', 'pivot_low', 'pivot_high')
+OUTPUTS = ('ema_5_8_buy_rank', 'ema_5_8_sell_rank', 'PA_STRUCTURE_BREAK', 'PA_TREND', 'PA_TREND_CHANGE',
+           'rsi_bull_div', 'rsi_bear_div', 'RSI_30_70', 'DIVERGEN_SIGNAL', 'RSI_9_MACD', 'TAKEACTION',
+           'breakout_entry', 'breakout_long_state', 'breakout_short_state')
+
+
+def _reference(inputs):
+    """The per-row loop the kernels replaced, writing into a DataFrame the same way."""
+    df = inputs.copy()
+    for col, init in (('ema_5_8_buy_rank', 0), ('ema_5_8_sell_rank', 0), ('PA_STRUCTURE_BREAK', 'NONE'),
+                      ('PA_TREND', 'RANGE'), ('PA_TREND_CHANGE', 'NONE'), ('rsi_bull_div', False),
+                      ('rsi_bear_div', False), ('RSI_30_70', False)):
+        df[col] = init
+    for col in ('RSI_9_MACD', 'TAKEACTION', 'breakout_entry', 'breakout_long_state', 'breakout_short_state',
+                'DIVERGEN_SIGNAL'):
+        df[col] = np.nan
+    col = df.columns.get_loc
+
+    buy_regime = sell_regime = False
+    buy_count = sell_count = 0
+    state_rsi_macd, state_long, state_short = None, 'IDLE', 'IDLE'
+    prev_low_idx = prev_high_idx = None
+    pending_type, pending_level = None, np.nan
+    pa_trend = 'RANGE'
+    pa_last_high = pa_prev_high = pa_last_low = pa_prev_low = np.nan
+
+    for i in range(1, len(df)):
+        if df['ema_5_8_cross_ema100_up'].iloc[i]:
+            buy_regime, buy_count = True, 0
+        if df['ema_5_8_cross_ema100_down'].iloc[i]:
+            sell_regime, sell_count = True, 0
+        if buy_regime and not df['both_above_100'].iloc[i]:
+            buy_regime, buy_count = False, 0
+        if sell_regime and not df['both_below_100'].iloc[i]:
+            sell_regime, sell_count = False, 0
+
+        close_i, ema_i = df['close'].iloc[i], df['ema_100'].iloc[i]
+        prev_close = df['close'].iloc[i - 1]
+        last_high, last_low = df['swing_high_zone'].iloc[i], df['swing_low_zone'].iloc[i]
+        cross = df['two_pole_MACD_CrossOver'].iloc[i]
+
+        if buy_regime and df['ema_5_8_cross_up'].iloc[i] and close_i > ema_i and buy_count < 20:
+            buy_count += 1
+            df.iat[i, col('ema_5_8_buy_rank')] = buy_count
+        if sell_regime and df['ema_5_8_cross_down'].iloc[i] and close_i < ema_i and sell_count < 20:
+            sell_count += 1
+            df.iat[i, col('ema_5_8_sell_rank')] = sell_count
+
+        prev_pa_trend = pa_trend
+        if df['pa_swing_high'].iloc[i] and not np.isnan(df['pa_swing_high_price'].iloc[i]):
+            pa_prev_high, pa_last_high = pa_last_high, df['pa_swing_high_price'].iloc[i]
+        if df['pa_swing_low'].iloc[i] and not np.isnan(df['pa_swing_low_price'].iloc[i]):
+            pa_prev_low, pa_last_low = pa_last_low, df['pa_swing_low_price'].iloc[i]
+        pa_break = 'NONE'
+        if not np.isnan(pa_last_high) and close_i > pa_last_high:
+            pa_break, pa_trend = 'BREAK_UP', 'UPTREND'
+        elif not np.isnan(pa_last_low) and close_i < pa_last_low:
+            pa_break, pa_trend = 'BREAK_DOWN', 'DOWNTREND'
+        else:
+            pa_trend = 'RANGE'
+            if not np.isnan(pa_prev_high) and not np.isnan(pa_prev_low):
+                if pa_last_high > pa_prev_high and pa_last_low > pa_prev_low:
+                    pa_trend = 'UPTREND'
+                elif pa_last_high < pa_prev_high and pa_last_low < pa_prev_low:
+                    pa_trend = 'DOWNTREND'
+            if df['consolidating'].iloc[i]:
+                pa_trend = 'RANGE'
+        pa_change = 'NONE'
+        if pa_trend != prev_pa_trend:
+            pa_change = {'UPTREND': 'UP', 'DOWNTREND': 'DOWN'}.get(pa_trend, 'NONE')
+        df.iat[i, col('PA_STRUCTURE_BREAK')] = pa_break
+        df.iat[i, col('PA_TREND')] = pa_trend
+        df.iat[i, col('PA_TREND_CHANGE')] = pa_change
+
+        rsi, low, high = df['RSI_14'], df['low'], df['high']
+        if df['pivot_low'].iloc[i]:
+            if prev_low_idx is not None and 5 <= i - prev_low_idx <= 60:
+                if rsi.iloc[i] > rsi.iloc[prev_low_idx] and low.iloc[i] < low.iloc[prev_low_idx]:
+                    df.iloc[i, col('rsi_bull_div')] = True
+                    if rsi.iloc[prev_low_idx] < 30:
+                        df.iloc[i, col('RSI_30_70')] = True
+            prev_low_idx = i
+        if df['pivot_high'].iloc[i]:
+            if prev_high_idx is not None and 5 <= i - prev_high_idx <= 60:
+                if rsi.iloc[i] < rsi.iloc[prev_high_idx] and high.iloc[i] > high.iloc[prev_high_idx]:
+                    df.iloc[i, col('rsi_bear_div')] = True
+                    if rsi.iloc[prev_high_idx] > 70:
+                        df.iloc[i, col('RSI_30_70')] = True
+            prev_high_idx = i
+
+        if df['rsi_bull_div'].iloc[i]:
+            pending_type, pending_level = 'BULL', last_high
+        elif df['rsi_bear_div'].iloc[i]:
+            pending_type, pending_level = 'BEAR', last_low
+        if pending_type == 'BULL' and close_i > pending_level:
+            df.iloc[i, col('DIVERGEN_SIGNAL')] = 'BUY'
+            pending_type, pending_level = None, np.nan
+        elif pending_type == 'BEAR' and close_i < pending_level:
+            df.iloc[i, col('DIVERGEN_SIGNAL')] = 'SELL'
+            pending_type, pending_level = None, np.nan
+
+        if df['RSI_9'].iloc[i] > 70:
+            state_rsi_macd = 'SELL'
+        elif df['RSI_9'].iloc[i] < 30:
+            state_rsi_macd = 'BUY'
+        if state_rsi_macd is not None and cross == state_rsi_macd:
+            df.iloc[i, col('TAKEACTION')] = state_rsi_macd
+            state_rsi_macd = None
+        df.iloc[i, col('RSI_9_MACD')] = state_rsi_macd
+
+        if state_long == 'IDLE':
+            if close_i > ema_i and close_i > last_high and (prev_close <= ema_i or prev_close <= last_high):
+                state_long = 'WAIT_PULLBACK'
+        elif state_long == 'WAIT_PULLBACK':
+            if close_i <= ema_i:
+                state_long = 'WAIT_MACD'
+            elif close_i < ema_i * 0.99:
+                state_long = 'IDLE'
+        elif cross == 'BUY':
+            df.iloc[i, col('breakout_entry')] = 'BUY'
+            state_long = 'IDLE'
+        elif close_i < ema_i * 0.99:
+            state_long = 'IDLE'
+
+        if state_short == 'IDLE':
+            if close_i < ema_i and close_i < last_low and (prev_close >= ema_i or prev_close >= last_low):
+                state_short = 'WAIT_PULLBACK'
+        elif state_short == 'WAIT_PULLBACK':
+            if close_i >= ema_i:
+                state_short = 'WAIT_MACD'
+            elif close_i > ema_i * 0.5:
+                state_short = 'IDLE'
+        elif cross == 'SELL':
+            df.iloc[i, col('breakout_entry')] = 'SELL'
+            state_short = 'IDLE'
+        elif close_i > ema_i * 0.5:
+            state_short = 'IDLE'
+
+        df.iloc[i, col('breakout_long_state')] = state_long
+        df.iloc[i, col('breakout_short_state')] = state_short
+    return df
+
+
+def _reference_live(close, swing_high_zone, swing_low_zone, bull_live, bear_live):
+    df = pd.DataFrame({'DIVERGEN_SIGNAL_LIVE': np.nan}, index=range(len(close)))
+    pending_type, pending_level = None, np.nan
+    for i in range(len(close)):
+        if bull_live[i]:
+            pending_type, pending_level = 'BULL', swing_high_zone[i]
+        elif bear_live[i]:
+            pending_type, pending_level = 'BEAR', swing_low_zone[i]
+        if pending_type == 'BULL' and close[i] > pending_level:
+            df.iloc[i, 0] = 'BUY'
+            pending_type, pending_level = None, np.nan
+        elif pending_type == 'BEAR' and close[i] < pending_level:
+            df.iloc[i, 0] = 'SELL'
+            pending_type, pending_level = None, np.nan
+    return df['DIVERGEN_SIGNAL_LIVE']
+
+
+def _kernel(inputs):
+    """Run the kernel and build the columns the way calculate_all_indicators_optimized does."""
+    arrays = {name: inputs[name].to_numpy() for name in INPUTS}
+    arrays['two_pole_MACD_CrossOver'] = signal_codes(arrays['two_pole_MACD_CrossOver'])
+    s = run_bar_state_kernel(*arrays.values())
+    return pd.DataFrame({
+        'ema_5_8_buy_rank': s['buy_rank'], 'ema_5_8_sell_rank': s['sell_rank'],
+        'PA_STRUCTURE_BREAK': labels_from_codes(s['pa_break'], PA_BREAK_LABELS),
+        'PA_TREND': labels_from_codes(s['pa_trend'], PA_TREND_LABELS),
+        'PA_TREND_CHANGE': labels_from_codes(s['pa_change'], PA_CHANGE_LABELS),
+        'rsi_bull_div': s['bull_div'], 'rsi_bear_div': s['bear_div'], 'RSI_30_70': s['rsi_30_70'],
+        'DIVERGEN_SIGNAL': sparse_signal_column(s['div_signal']),
+        'RSI_9_MACD': state_column(s['rsi_macd_state'], SIGNAL_LABELS),
+        'TAKEACTION': sparse_signal_column(s['takeaction']),
+        'breakout_entry': sparse_signal_column(s['breakout_entry']),
+        'breakout_long_state': state_column(s['breakout_long_state'], BREAKOUT_STATE_LABELS),
+        'breakout_short_state': state_column(s['breakout_short_state'], BREAKOUT_STATE_LABELS),
+    }, index=inputs.index)
+
+
+def _cells(series):
+    # repr keeps None, NaN and the string labels apart
+    return series.dtype.kind, [v if isinstance(v, str) else repr(v) for v in series.tolist()]
+
+
+def _assert_same(expected, actual, columns):
+    for name in columns:
+        assert _cells(actual[name]) == _cells(expected[name]), name
+
+
+def _random_inputs(seed, n=400):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    ema_100 = close * (1 + rng.normal(0, 0.01, n))
+    flag = lambda p: rng.random(n) < p
+    above = flag(0.5)
+    pa_high = np.where(flag(0.7), close * 1.01, np.nan)
+    pa_low = np.where(flag(0.7), close * 0.99, np.nan)
+    return pd.DataFrame({
+        'close': close, 'ema_100': ema_100,
+        'swing_high_zone': close * (1 + rng.uniform(-0.01, 0.02, n)),
+        'swing_low_zone': close * (1 - rng.uniform(-0.01, 0.02, n)),
+        'RSI_9': rng.uniform(0, 100, n),
+        'two_pole_MACD_CrossOver': rng.choice(np.array(['BUY', 'SELL', np.nan], dtype=object), n, p=[.2, .2, .6]),
+        'both_above_100': above, 'both_below_100': ~above & flag(0.8),
+        'ema_5_8_cross_ema100_up': flag(0.1), 'ema_5_8_cross_ema100_down': flag(0.1),
+        'ema_5_8_cross_up': flag(0.3), 'ema_5_8_cross_down': flag(0.3),
+        'pa_swing_high': flag(0.15), 'pa_swing_low': flag(0.15),
+        'pa_swing_high_price': pa_high, 'pa_swing_low_price': pa_low,
+        'consolidating': flag(0.2), 'RSI_14': rng.uniform(0, 100, n),
+        'low': close * 0.995, 'high': close * 1.005,
+        'pivot_low': flag(0.08), 'pivot_high': flag(0.08),
+    })
+
+
+def _synthetic_candles(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.002, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n)))
+    return pd.DataFrame({'time': pd.date_range('2025-01-01', periods=n, freq='15min', tz='UTC'),
+                         'open': open_, 'high': high, 'low': low, 'close': close,
+                         'volume': rng.uniform(100, 1000, n)})
+
+
+@pytest.fixture(scope='module', params=['regular', 'heiken'])
+def indicator_frame(request):
+    return request.param, aws.calculate_all_indicators_optimized(_synthetic_candles(), request.param)
+
+
+def _pipeline_inputs(df, candle):
+    prefix = 'ha_' if candle == 'heiken' else ''
+    rsi = df['RSI_14']
+    inputs = df[[c for c in INPUTS if c in df.columns and c not in ('close', 'low', 'high')]].copy()
+    for name in ('close', 'low', 'high'):
+        inputs[name] = df[prefix + name]
+    inputs['both_above_100'] = (df['ema_5'] > df['ema_100']) & (df['ema_8'] > df['ema_100'])
+    inputs['both_below_100'] = (df['ema_5'] < df['ema_100']) & (df['ema_8'] < df['ema_100'])
+    inputs['pivot_low'] = rsi == rsi.rolling(11, center=True).min()
+    inputs['pivot_high'] = rsi == rsi.rolling(11, center=True).max()
+    return inputs[list(INPUTS)]
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_kernel_matches_the_row_loop(seed):
+    inputs = _random_inputs(seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)          # str into a float column upcasts
+        expected = _reference(inputs)
+    actual = _kernel(inputs)
+    _assert_same(expected, actual, OUTPUTS)
+    # The random inputs reach every branch, including the breakout entries
+    assert set(actual['breakout_entry'].dropna()) == {'BUY', 'SELL'}
+    assert {'WAIT_PULLBACK', 'WAIT_MACD'} <= set(actual['breakout_long_state'].dropna())
+    assert actual['DIVERGEN_SIGNAL'].notna().any() and actual['TAKEACTION'].notna().any()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_live_divergence_matches_the_row_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = 300
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    args = (close, close + rng.uniform(-1, 3, n), close - rng.uniform(-1, 3, n), rng.random(n) < 0.05,
+            rng.random(n) < 0.05)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        expected = _reference_live(*args)
+    actual = pd.Series(sparse_signal_column(run_live_divergence_kernel(*args)))
+    assert _cells(actual) == _cells(expected) and actual.notna().any()
+
+
+# Event counts from the row-loop implementation on _synthetic_candles(500, seed=0)
+PINNED = {
+    'regular': {'TAKEACTION': 12, 'DIVERGEN_SIGNAL': 4, 'DIVERGEN_SIGNAL_LIVE': 4, 'rsi_bull_div': 5,
+                'rsi_bear_div': 4, 'RSI_30_70': 2, 'ema_5_8_sell_rank': 11, 'RSI_9_MACD': 166},
+    'heiken': {'TAKEACTION': 22, 'DIVERGEN_SIGNAL': 4, 'DIVERGEN_SIGNAL_LIVE': 4, 'rsi_bull_div': 5,
+               'rsi_bear_div': 4, 'RSI_30_70': 8, 'ema_5_8_sell_rank': 9, 'RSI_9_MACD': 315},
+}
+
+
+def test_pipeline_frames(indicator_frame):
+    candle, df = indicator_frame
+    inputs = _pipeline_inputs(df, candle)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        expected = _reference(inputs)
+        live = _reference_live(inputs['close'].to_numpy(), df['swing_high_zone'].to_numpy(),
+                               df['swing_low_zone'].to_numpy(), df['rsi_bull_div_live'].to_numpy(dtype=bool),
+                               df['rsi_bear_div_live'].to_numpy(dtype=bool))
+    _assert_same(expected, df, OUTPUTS)
+    assert _cells(df['DIVERGEN_SIGNAL_LIVE']) == _cells(live.set_axis(df.index))
+
+    counts = {name: int((df[name] != 0).sum()) if df[name].dtype.kind in 'bi' else int(df[name].map(
+        lambda v: isinstance(v, str)).sum()) for name in PINNED[candle]}
+    assert counts == PINNED[candle]
+    assert df['breakout_entry'].dtype == np.float64 and df['breakout_entry'].isna().all()
+    assert df['RSI_9_MACD'].dtype == object and df['breakout_long_state'].isna().sum() == 1
+
+
+def test_sparse_signal_column():
+    quiet = sparse_signal_column(np.zeros(4, np.int8))
+    assert quiet.dtype == np.float64 and np.isnan(quiet).all()
+    fired = sparse_signal_column(np.array([NONE, BUY, NONE, SELL], np.int8))
+    assert fired.dtype == object and fired[1] == 'BUY' and fired[3] == 'SELL'
+    assert isinstance(fired[0], float) and np.isnan(fired[0]) and np.isnan(fired[2])
+
+
+@pytest.mark.parametrize('codes', [[0, 0, 1, 0, 2, 0], [0, 0, 0, 0], [2, 0, 0, 1], [0, 1, 1, 1]])
+def test_state_column_matches_pandas_setitem(codes):
+    frame = pd.DataFrame({'state': np.nan}, index=range(len(codes)))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        for i in range(1, len(codes)):
+            frame.iloc[i, 0] = SIGNAL_LABELS[codes[i]]
+    out = pd.Series(state_column(np.array(codes, np.int8), SIGNAL_LABELS))
+    assert _cells(out) == _cells(frame['state'])
+
+
+def test_signal_codes_round_trip():
+    labels = np.array(['BUY', np.nan, 'SELL', None, 'NONE'], dtype=object)
+    codes = signal_codes(labels)
+    assert codes.tolist() == [BUY, NONE, SELL, NONE, NONE] and codes.dtype == np.int8
+    assert labels_from_codes(codes, SIGNAL_LABELS).tolist() == ['BUY', None, 'SELL', None, None]
+    assert labels_from_codes([0, 1, 2], BREAKOUT_STATE_LABELS).dtype == object
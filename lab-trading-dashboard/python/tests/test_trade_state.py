@@ -0,0 +1,67 @@
+# tests/test_trade_state.py
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.trade_state import TradeStateStore
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeTable:
+    """unique_id -> updated_at, answering the two queries refresh() makes."""
+
+    def __init__(self, rows):
+        self.rows = dict(rows)
+        self.since = []
+
+    def fetch_all(self, sql, params):
+        self.since.append(params.get('since'))
+        return [(uid, ts) for uid, ts in self.rows.items()
+                if 'since' not in params or (ts is not None and ts >= params['since'])]
+
+
+@pytest.fixture
+def db():
+    return FakeTable({'u1': T0, 'u2': T0 + timedelta(minutes=5), 'u3': None})
+
+
+@pytest.fixture
+def store(db):
+    return TradeStateStore(db.fetch_all, sync_interval=0)
+
+
+def test_diff_sync_picks_up_outside_changes(db, store):
+    assert store.updated_at('m2', 'u1') is None                      # nothing loaded yet: caller falls back
+    assert store.refresh('m2') == 2 and store.updated_at('m2', 'u2') == T0 + timedelta(minutes=5)
+    assert store.refresh('m2') == 0 and db.since[-1] == T0 + timedelta(minutes=5)   # diff only
+
+    db.rows['u1'] = T0 + timedelta(minutes=30)                      # investment added from the dashboard
+    assert store.refresh('m2') == 1 and store.updated_at('m2', 'u1') == db.rows['u1']
+    assert store.version('m2', 'u1') == 2
+
+
+def test_local_writes_win_over_older_snapshots(db, store):
+    store.refresh('m2')
+    db.rows['u2'] = T0 + timedelta(minutes=40)                      # bot write: DB and memory move together
+    store.note_write('m2', 'u2', db.rows['u2'])
+    assert store.updated_at('m2', 'u2') == db.rows['u2'] and store.refresh('m2') == 0
+
+    def racing_fetch(sql, params):                                   # the bot writes u2 while the diff runs
+        rows = db.fetch_all(sql, params)
+        db.rows['u2'] = T0 + timedelta(minutes=1)
+        store.note_write('m2', 'u2', db.rows['u2'])
+        return rows + [('u2', T0 + timedelta(minutes=40))]
+
+    store.fetch_all = racing_fetch
+    store.refresh('m2')
+    assert store.updated_at('m2', 'u2') == T0 + timedelta(minutes=1)  # the older DB snapshot does not undo it
+
+
+def test_forget_and_table_validation(store):
+    store.refresh('m2')
+    store.forget('m2', 'u1')
+    assert store.updated_at('m2', 'u1') is None and store.version('m2', 'u1') == 0
+    with pytest.raises(ValueError):
+        store.updated_at('m2; drop table m2', 'u1')
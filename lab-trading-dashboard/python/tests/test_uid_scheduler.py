@@ -0,0 +1,138 @@
+# tests/test_uid_scheduler.py
+
+import threading
+import time
+
+import pytest
+
+from utils.uid_scheduler import CoalescingUIDScheduler, latency_summary
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def runs():
+    return {}
+
+
+@pytest.fixture
+def scheduler_factory():
+    made = []
+
+    def make(handler, **kwargs):
+        scheduler = CoalescingUIDScheduler(handler, **kwargs)
+        scheduler.start()
+        made.append(scheduler)
+        return scheduler
+    yield make
+    for scheduler in made:
+        scheduler.stop()
+
+
+def test_burst_while_running_keeps_only_the_latest_price(scheduler_factory, runs):
+    gate = threading.Event()
+    overlap = []
+    running = set()
+
+    def handler(uid, price):
+        if uid in running:
+            overlap.append(uid)
+        running.add(uid)
+        if uid == 'slow':
+            gate.wait(2)
+        runs.setdefault(uid, []).append(price)
+        running.discard(uid)
+
+    scheduler = scheduler_factory(handler, workers=4, idle_interval=60)
+    scheduler.submit('slow', 1.0)
+    assert _wait_for(lambda: 'slow' in scheduler._running)
+    for p in range(2, 50):
+        scheduler.submit('slow', float(p))
+    gate.set()
+    assert _wait_for(lambda: len(runs.get('slow', [])) == 2)
+    assert runs['slow'] == [1.0, 49.0] and not overlap
+    assert scheduler.stats()['dropped_stale'] == 47
+
+
+def test_unchanged_price_is_not_scheduled(scheduler_factory, runs):
+    scheduler = scheduler_factory(lambda uid, price: runs.setdefault(uid, []).append(price), idle_interval=60)
+    scheduler.submit('a', 10.0)
+    assert _wait_for(lambda: runs.get('a') == [10.0] and not scheduler._running)
+    assert scheduler.submit('a', 10.0) is False
+    assert scheduler.stats()['skipped_unchanged'] == 1
+
+
+def test_handler_returning_false_drops_the_uid(scheduler_factory, runs):
+    def handler(uid, price):
+        runs.setdefault(uid, []).append(price)
+        scheduler.wake_after(uid, 60)                  # a timer set before the handler gives up
+        return False
+
+    scheduler = scheduler_factory(handler, idle_interval=0.1)
+    scheduler.submit('gone', 5.0)
+    assert _wait_for(lambda: not scheduler.is_scheduled('gone') and scheduler.stats()['timers'] == 0)
+    time.sleep(0.3)                                    # the idle sweeper does not bring it back
+    assert runs['gone'] == [5.0]
+    assert scheduler.wake_after('gone', 0.01) is False
+
+
+def test_idle_uids_are_woken_without_a_price(scheduler_factory, runs):
+    scheduler = scheduler_factory(lambda uid, price: runs.setdefault(uid, []).append(price), idle_interval=0.2)
+    scheduler.submit('a', 10.0)
+    assert _wait_for(lambda: None in runs.get('a', []))
+    assert runs['a'][0] == 10.0
+
+
+def test_wake_after_runs_on_time_and_replaces_the_previous_timer(scheduler_factory):
+    times = []
+    scheduler = scheduler_factory(lambda uid, price: times.append(time.monotonic()), idle_interval=60)
+    scheduler.wake('u')
+    assert _wait_for(lambda: len(times) == 1 and not scheduler._running)
+    started = time.monotonic()
+    scheduler.wake_after('u', 0.5)
+    scheduler.wake_after('u', 0.1)                     # replaces the 0.5 s timer
+    assert _wait_for(lambda: len(times) == 2)
+    assert 0.08 <= times[1] - started < 0.4
+    time.sleep(0.6)
+    assert len(times) == 2 and scheduler.stats()['timers'] == 0
+
+    scheduler.wake_after('u', 0.2)
+    scheduler.discard('u')
+    time.sleep(0.4)
+    assert len(times) == 2
+
+
+def test_handler_can_rearm_its_own_timer(scheduler_factory):
+    passes = []
+
+    def handler(uid, price):
+        passes.append(time.monotonic())
+        scheduler.wake_after(uid, 0.05)
+
+    scheduler = scheduler_factory(handler, idle_interval=60)
+    scheduler.wake('u')
+    assert _wait_for(lambda: len(passes) >= 5)
+
+
+def test_mark_records_latency_inside_a_job(scheduler_factory):
+    def handler(uid, price):
+        scheduler.mark('trade_action')
+
+    scheduler = scheduler_factory(handler, idle_interval=60)
+    scheduler.mark('trade_action')                     # outside a job: ignored
+    scheduler.submit('a', 1.0, time.time() * 1000)
+    assert _wait_for(lambda: scheduler.stats().get('trade_action', {}).get('from_event', {}).get('n') == 1)
+    assert scheduler.stats()['trade_action']['from_receive']['n'] == 1
+
+
+def test_latency_summary():
+    assert latency_summary([]) == {'n': 0}
+    summary = latency_summary([float(v) for v in range(1, 101)])
+    assert summary == {'n': 100, 'p50_ms': 51.0, 'p99_ms': 100.0, 'max_ms': 100.0}
@@ -0,0 +1,81 @@
+# tests/test_worker_pool.py
+
+import os
+import time
+
+import pytest
+
+from utils.worker_pool import WarmWorkerPool
+
+_worker_state = {}
+
+
+def _init(tag):
+    _worker_state['tag'] = tag
+    _worker_state['inits'] = _worker_state.get('inits', 0) + 1
+
+
+def _task(x):
+    if x == 'crash':
+        os._exit(1)
+    if x == 'hang':
+        time.sleep(600)
+    return os.getpid(), _worker_state['inits'], x * 2
+
+
+@pytest.fixture
+def pool():
+    pool = WarmWorkerPool(2, initializer=_init, initargs=('warm',), name='test_pool',
+                          max_consecutive_crashes=2, health_timeout=2)
+    yield pool
+    pool.shutdown(terminate=True)
+
+
+def _alive(pids):
+    alive = set()
+    for pid in pids:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            continue
+        with open(f'/proc/{pid}/stat') as f:
+            if f.read().split()[2] != 'Z':
+                alive.add(pid)
+    return alive
+
+
+def test_workers_stay_warm_across_batches(pool):
+    first = pool.run_batch(_task, [1, 2, 3, 4], timeout=30)
+    second = pool.run_batch(_task, [5, 6, 7, 8], timeout=30)
+    pids = {r[0] for r in first['results'].values()} | {r[0] for r in second['results'].values()}
+    assert first['completed'] == 4 and second['completed'] == 4
+    assert len(pids) <= 2
+    assert all(r[1] == 1 for r in second['results'].values())     # initializer ran once per worker
+    assert pool.health_check()
+
+
+def test_crash_replaces_pool_then_falls_back_to_threads(pool):
+    crashed = pool.run_batch(_task, [1, 'crash', 2], timeout=30)
+    assert crashed['crashes'] >= 1 and pool.restarts == 1
+    after = pool.run_batch(_task, [9, 10], timeout=30)
+    assert after['completed'] == 2 and not pool.use_threads
+
+    pool.run_batch(_task, ['crash'], timeout=30)
+    assert not pool.use_threads                                     # a success in between reset the count
+    pool.run_batch(_task, ['crash'], timeout=30)
+    assert pool.use_threads
+
+
+def test_restart_terminates_hung_workers(pool):
+    pids = {r[0] for r in pool.run_batch(_task, [1, 2, 3, 4], timeout=30)['results'].values()}
+    summary = pool.run_batch(_task, ['hang', 'hang'], timeout=0.5)
+    assert summary['timeouts'] == 2 and pool.restarts == 1         # health check found no free worker
+    assert _alive(pids) == set()
+    assert pool.run_batch(_task, [3], timeout=30)['completed'] == 1
+
+
+def test_shutdown_terminate_stops_busy_workers(pool):
+    pids = {r[0] for r in pool.run_batch(_task, [1, 2, 3, 4], timeout=30)['results'].values()}
+    pool.submit(_task, 'hang')
+    pool.shutdown(wait=False, terminate=True)
+    assert _alive(pids) == set() and not pool.stats()['running']
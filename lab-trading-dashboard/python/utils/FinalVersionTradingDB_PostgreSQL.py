@@ -16,6 +16,14 @@ import logging
 import re
 from psycopg2.errors import UniqueViolation
 from sqlalchemy.exc import IntegrityError
+from utils.candle_store import (FRAME_COLUMN_NAMES, HISTORY_CHUNK_ROWS, OHLCV_COLUMNS, bulk_arrays,
+                                history_chunks, kline_records, make_candle_store)
+from utils.candle_disk_cache import CACHE_COLUMNS, CANDLE_CACHE_DIR, CANDLE_SOURCE, CandleDiskCache
+from utils.binance_weight import PRIORITY_BACKFILL, PRIORITY_SCANNER, BinanceWeightExhausted, get_scheduler
+from utils.kline_catalog import KlineCatalog
+from utils.kline_ingest import copy_ingest
+from utils.kline_gaps import HoleBackfiller, KlineGapStats, plan_kline_fetch
+from utils.heiken_ashi import add_heiken_ashi_columns
 
 
 # from main_binance import CandleColor  # Importing the CandleColor function
@@ -45,7 +53,6 @@ from datetime import datetime, timezone
 weight_tracker = {
     'current_weight': 0,
     'last_reset_time': None,
-    'weight_threshold': 1800,  # 75% of 2400
     'max_weight_1m': 2400
 }
 
@@ -87,23 +94,12 @@ def log_api_limit_error(symbol, interval, error_message):
     except Exception as e:
         print(f"❌ Failed to log API limit error: {e}")
 
-def can_make_api_call():
-    """Check if we can make an API call based on weight usage"""
-    now_utc = datetime.now(timezone.utc)
-    
-    # Check if 1 minute has passed - reset weight
-    if (weight_tracker['last_reset_time'] is None or 
-        (now_utc - weight_tracker['last_reset_time']).total_seconds() >= 60):
-        
-        weight_tracker['current_weight'] = 0
-        weight_tracker['last_reset_time'] = now_utc
-        print(f"🔄 Weight reset at {now_utc.strftime('%H:%M:%S')} UTC")
-    
-    # Check if weight exceeds threshold
-    if weight_tracker['current_weight'] >= weight_tracker['weight_threshold']:
+def can_make_api_call(priority=PRIORITY_SCANNER):
+    """Check if we can make an API call: the host-wide weight budget (all processes) has room for `priority`"""
+    weight_tracker['current_weight'] = binance_scheduler.used()
+    if not binance_scheduler.can_call(priority):
         print(f"⚠️ Weight limit reached: {weight_tracker['current_weight']}/{weight_tracker['max_weight_1m']}")
         return False
-    
     return True
 
 def update_weight_from_headers(symbol,interval):
@@ -118,13 +114,18 @@ def update_weight_from_headers(symbol,interval):
                 print(f"📊 Weight updated: {symbol}-{interval} -> {weight_tracker['current_weight']}/{weight_tracker['max_weight_1m']} ({percentage:.1f}%)")
                 
                 # Log if weight limit is reached
-                if weight_tracker['current_weight'] >= weight_tracker['weight_threshold']:
+                if weight_tracker['current_weight'] >= binance_scheduler.caps[PRIORITY_SCANNER]:
                     log_weight_limit_reached("GLOBAL", "ALL", weight_tracker['current_weight'])
                     
     except Exception as e:
         print(f"⚠️ Failed to update weight from headers: {e}")
 
-# Simple rate limiter for basic request limiting
+# Host-wide weight scheduler shared by every process: per-minute request weight.
+# Requests reserve their endpoint weight inside the client's session (see setup_header_capture).
+binance_scheduler = get_scheduler()
+
+# Simple rate limiter for basic request limiting: the weight budget is per
+# minute, this keeps each process's kline calls from bursting within a second
 class SimpleRateLimiter:
     def __init__(self, max_per_sec=3):
         self.max_per_sec = max_per_sec
@@ -222,8 +223,9 @@ def setup_header_capture(client):
             client._last_response = response
             return response
         
-        # Monkey patch the request method
+        # Monkey patch the request method, then route it through the shared weight scheduler
         client.session.request = request_with_headers
+        get_scheduler().instrument(client, PRIORITY_SCANNER, timeout=10)
         # print("✅ Header capture setup complete")
         
     except Exception as e:
@@ -284,6 +286,26 @@ class SQLAccessHelper:
                     raise e
         raise Exception("Failed to get database connection after retries")
 
+    def raw_connection(self):
+        """DB-API (psycopg2) connection from this process's engine, for COPY; caller closes it."""
+        self._ensure_engine()
+        return self.engine.raw_connection()
+
+    def stream(self, sql_query, params=None, chunk_size=50_000):
+        """
+        Yield (columns, rows) chunks of at most `chunk_size` rows read through a
+        server-side cursor, so large reads never sit in memory at once. Holds
+        its own connection (not connection_lock) for the whole iteration and
+        raises on failure; close the generator to release it early.
+        """
+        self._ensure_engine()
+        with self._get_connection_with_retry() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                text(optimize_sql_query(sql_query)), params or {})
+            columns = list(result.keys())
+            for rows in result.partitions(chunk_size):
+                yield columns, rows
+
     def fetch_dataframe(self, sql_query, params=None):
         try:
             with self.connection_lock:
@@ -429,6 +451,9 @@ class SQLAccessHelper:
         return False
 
 sql_helper = SQLAccessHelper(engine)
+candle_store = make_candle_store(sql_helper)   # kline reads/writes (per-table or partitioned storage)
+kline_catalog = KlineCatalog(candle_store)     # series existence + latest candle time, kept in memory
+candle_disk_cache = CandleDiskCache(CANDLE_CACHE_DIR, INTERVAL_MS)   # local columnar copy (CANDLE_SOURCE=disk)
 
 def switch_api_key():
     global current_api_index, client
@@ -441,6 +466,14 @@ def switch_api_key():
     
     print(f"🔁 Switched API key to {current_api_index}")
 
+def init_process_resources():
+    """Fresh DB engine and Binance client for a newly started worker process."""
+    global client
+    sql_helper._ensure_engine()
+    creds = API_KEYS[current_api_index]
+    client = UMFutures(key=creds['api_key'], secret=creds['api_secret'])
+    setup_header_capture(client)
+
 # --- Logger ---
 def log_db_error(error, context, pair):
     error_message = f"Error in {context}: {error}"
@@ -484,13 +517,7 @@ def write_db_insert_debug_log(message):
 # --- Utility Functions ---
 def table_exists(symbol, interval):
     try:
-        # PostgreSQL syntax for checking table existence
-        sql = f"""
-        SELECT COUNT(*) FROM information_schema.tables 
-        WHERE table_name = 'kline_{symbol.lower()}_{interval}'
-        """
-        result = sql_helper.fetch_one(sql)
-        return result[0] > 0 if result else False
+        return kline_catalog.exists(symbol, interval)
     except Exception as e:
         log_db_error(e, "❌  table_exists Error for", symbol)            
         print(f"❌ table_exists Error for {symbol}-{interval}: {e}")
@@ -498,28 +525,14 @@ def table_exists(symbol, interval):
 
 def is_data_up_to_date(symbol, interval):
     cache_key = f"{symbol}-{interval}"
+    now = int(time.time() * 1000)
 
     try:
-        if not table_exists(symbol, interval):
-            return False
-
-        sql = f"SELECT MAX(time) FROM kline_{symbol.lower()}_{interval}"
-        row = sql_helper.fetch_one(sql)
-        latest_time_db = row[0] if row and row[0] else None
-        if not latest_time_db:
-            return False
-
-        now = int(time.time() * 1000)
         interval_ms = INTERVAL_MS[interval]
         expected_time = now - (now % interval_ms)
 
-        # Convert latest_time_db to milliseconds if it's a datetime object
-        if hasattr(latest_time_db, 'timestamp'):
-            latest_time_ms = int(latest_time_db.timestamp() * 1000)
-        else:
-            latest_time_ms = latest_time_db
-
-        result = latest_time_ms >= expected_time - interval_ms
+        # Answered from the in-process catalog; the DB is only read when the series looks stale
+        result = kline_catalog.is_fresh(symbol, interval, expected_time - interval_ms)
 
         # Update cache when database is accessible
         if result:
@@ -545,63 +558,81 @@ def is_data_up_to_date(symbol, interval):
 
         return False
 
-def fetch_history_db(symbol, interval, limit):
+def fetch_history_db(symbol, interval, limit=None, start_time=None, end_time=None, columns=None, source=None):
+    """
+    Candles oldest first, filtered in SQL: the newest `limit` (None: all)
+    with start_time <= time < end_time. `columns` projects the read, e.g.
+    OHLCV_COLUMNS for backtests ('time' is always included). source='disk'
+    (default: CANDLE_SOURCE) reads the local candle cache after syncing it.
+    """
+    if (source or CANDLE_SOURCE) == 'disk':
+        df = read_candle_cache(symbol, interval, limit, start_time, end_time, columns)
+        if df is not None and not df.empty:
+            return df
+
     try:
-        # PostgreSQL syntax: LIMIT instead of TOP
-        sql = f"SELECT * FROM kline_{symbol.lower()}_{interval} ORDER BY time DESC"
-        df = sql_helper.fetch_dataframe(sql)
+        df = candle_store.fetch_history(symbol, interval, limit, start_time, end_time, columns)
 
         if df.empty:
             return df
 
         # The time column is already a proper timestamp, no need to convert from milliseconds
         df['time'] = pd.to_datetime(df['time'], utc=True)
-        df = df.rename(columns={
-            'open': 'open', 'high': 'high', 'low': 'low',
-            'close': 'close', 'volume': 'volume', 'quotevolume': 'quote_volume',
-            'numtrades': 'num_trades', 'takerbuybasevolume': 'taker_base_vol', 'takerbuyquotevolume': 'taker_quote_vol'
-        })
-        return df[::-1]
+        return df.rename(columns=FRAME_COLUMN_NAMES)
     except Exception as e:
         log_db_error(e, "❌  fetch_history_db Error for", symbol)   
         print(f"❌ fetch_history_db Error for {symbol}-{interval}: {e}")
         return pd.DataFrame()
 
-def fetch_history_db_range(symbol, interval, start_time, end_time):
+def fetch_history_db_range(symbol, interval, start_time, end_time, columns=None, source=None):
+    return fetch_history_db(symbol, interval, None, start_time, end_time, columns, source)
+
+def stream_history_db(symbol, interval, start_time=None, end_time=None, columns=None,
+                      chunk_size=HISTORY_CHUNK_ROWS, as_arrays=False):
+    """
+    Generator over the candles in [start_time, end_time), oldest first, in
+    chunks of `chunk_size` rows read through a server-side cursor: DataFrames
+    shaped like fetch_history_db, or {column: ndarray} with time as epoch ms
+    when as_arrays=True. Memory stays bounded by one chunk.
+    """
     try:
-        table_name = f"kline_{symbol.lower()}_{interval}"
-        sql = f"""
-            SELECT *
-            FROM {table_name}
-            WHERE time >= :start_time AND time < :end_time
-            ORDER BY time ASC
-        """
-        params = {
-            "start_time": pd.Timestamp(start_time).tz_convert(None) if isinstance(start_time, pd.Timestamp) and start_time.tzinfo else pd.Timestamp(start_time),
-            "end_time": pd.Timestamp(end_time).tz_convert(None) if isinstance(end_time, pd.Timestamp) and end_time.tzinfo else pd.Timestamp(end_time)
-        }
-        df = sql_helper.fetch_dataframe(sql, params=params)
+        chunks = candle_store.iter_history(symbol, interval, start_time, end_time, columns, chunk_size)
+        yield from history_chunks(chunks, as_arrays)
+    except Exception as e:
+        log_db_error(e, "❌  stream_history_db Error for", symbol)
+        print(f"❌ stream_history_db Error for {symbol}-{interval}: {e}")
 
-        if df.empty:
-            return df
+def sync_candle_cache(symbol, interval):
+    """Append the candles stored after the cached last one (and any hole the DB has filled since) to the local cache."""
+    try:
+        cached = candle_disk_cache.last_time(symbol, interval)
+        latest = kline_catalog.latest_ms(symbol, interval)
+        if (cached is not None and latest is not None and latest <= cached
+                and not candle_disk_cache.holes_due(symbol, interval)):
+            return 0
+        return candle_disk_cache.sync(
+            symbol, interval,
+            lambda s, i, start_time, end_time=None: stream_history_db(
+                s, i, start_time=start_time, end_time=end_time, columns=list(CACHE_COLUMNS)),
+        )
+    except Exception as e:
+        log_db_error(e, "❌  sync_candle_cache Error for", symbol)
+        print(f"❌ sync_candle_cache Error for {symbol}-{interval}: {e}")
+        return 0
 
-        df['time'] = pd.to_datetime(df['time'], utc=True)
-        df = df.rename(columns={
-            'open': 'open', 'high': 'high', 'low': 'low',
-            'close': 'close', 'volume': 'volume', 'quotevolume': 'quote_volume',
-            'numtrades': 'num_trades', 'takerbuybasevolume': 'taker_base_vol', 'takerbuyquotevolume': 'taker_quote_vol'
-        })
-        return df
+def read_candle_cache(symbol, interval, limit=None, start_time=None, end_time=None, columns=None):
+    """Candles from the local cache (synced first), None when it has nothing for the series."""
+    sync_candle_cache(symbol, interval)
+    try:
+        return candle_disk_cache.read(symbol, interval, limit, start_time, end_time, columns)
     except Exception as e:
-        log_db_error(e, "❌  fetch_history_db_range Error for", symbol)   
-        print(f"❌ fetch_history_db_range Error for {symbol}-{interval}: {e}")
-        return pd.DataFrame()
+        log_db_error(e, "❌  read_candle_cache Error for", symbol)
+        print(f"❌ read_candle_cache Error for {symbol}-{interval}: {e}")
+        return None
 
 def fetch_time_bounds(symbol, interval):
     try:
-        table_name = f"kline_{symbol.lower()}_{interval}"
-        sql = f"SELECT MIN(time) AS min_time, MAX(time) AS max_time FROM {table_name}"
-        df = sql_helper.fetch_dataframe(sql)
+        df = candle_store.time_bounds(symbol, interval)
         if df.empty or pd.isna(df.iloc[0]['min_time']) or pd.isna(df.iloc[0]['max_time']):
             return None, None
         min_time = pd.to_datetime(df.iloc[0]['min_time'], utc=True)
@@ -614,9 +645,7 @@ def fetch_time_bounds(symbol, interval):
 
 def fetch_data_from_db(symbol, interval, limit):
     try:
-        # PostgreSQL syntax: LIMIT instead of TOP
-        sql = f"SELECT * FROM kline_{symbol.lower()}_{interval} ORDER BY time DESC LIMIT {limit}"
-        df = sql_helper.fetch_dataframe(sql)
+        df = candle_store.fetch_latest(symbol, interval, limit)
 
         if df.empty:
             return df
@@ -638,28 +667,82 @@ def fetch_data_from_db(symbol, interval, limit):
 # --- INSERT KLINES (PostgreSQL compatible) ---
 def insert_klines(symbol, interval, klines):
     try:
-        table_name = f"kline_{symbol.lower()}_{interval}"
-        records = []
-        for k in klines:
-            records.append({
-                "time": k[0], "open": float(k[1]), "high": float(k[2]), "low": float(k[3]),
-                "close": float(k[4]), "volume": float(k[5]), "closetime": k[6], "quotevolume": float(k[7]),
-                "numtrades": int(k[8]), "takerbuybasevolume": float(k[9]), "takerbuyquotevolume": float(k[10])
-            })
-
-        # PostgreSQL syntax: INSERT ... ON CONFLICT instead of WHERE NOT EXISTS
-        sql = f"""
-        INSERT INTO {table_name} (time, open, high, low, close, volume, closetime, quotevolume, numtrades, takerbuybasevolume, takerbuyquotevolume)
-        VALUES (to_timestamp(:time/1000.0), :open, :high, :low, :close, :volume, :closetime, :quotevolume, :numtrades, :takerbuybasevolume, :takerbuyquotevolume)
-        ON CONFLICT (time) DO NOTHING
-        """
-
-        sql_helper.execute_many(sql, records, autocommit=True)
+        if candle_store.insert(symbol, interval, kline_records(klines)) and klines:
+            kline_catalog.note_insert(symbol, interval, max(int(k[0]) for k in klines))
         # print(f"✅ Successfully inserted klines for {symbol}-{interval}")
     except Exception as e:
         log_db_error(e, "❌ Insert Klines Error for", symbol)
         print(f"❌ Insert Klines Error for {symbol}-{interval}: {e}")
 
+def insert_klines_bulk(batches):
+    """
+    Insert kline pages for many series at once: {(symbol, interval): klines}.
+    COPY into a temp stage + one merge per chunk (utils/kline_ingest.py);
+    falls back to insert_klines per series if the bulk path fails.
+    """
+    try:
+        summary = copy_ingest(sql_helper, candle_store, batches)
+        for (symbol, interval), klines in batches.items():
+            if klines:
+                kline_catalog.note_insert(symbol, interval, max(int(k[0]) for k in klines))
+        return summary
+    except Exception as e:
+        log_db_error(e, "❌ Bulk Insert Klines Error for", f"{len(batches)} series")
+        print(f"❌ Bulk Insert Klines Error ({len(batches)} series), falling back to per-series inserts: {e}")
+        for (symbol, interval), klines in batches.items():
+            if klines:
+                insert_klines(symbol, interval, klines)
+        return None
+
+
+# --- Gap-aware kline fetching (utils/kline_gaps.py) ---
+kline_gap_stats = KlineGapStats()
+
+def fetch_kline_range(symbol, interval, start_ms, end_ms, limit, priority=PRIORITY_SCANNER):
+    """Candles opened between start_ms and end_ms (inclusive) from Binance, weight scheduled at `priority`."""
+    binance_limiter.acquire()
+    with binance_scheduler.priority(priority):
+        klines = client.klines(symbol=symbol, interval=interval, startTime=start_ms, endTime=end_ms, limit=limit)
+    update_weight_from_headers(symbol, interval)
+    return [k[:-1] for k in klines]
+
+kline_backfiller = HoleBackfiller(
+    find_gaps=lambda symbol, interval, interval_ms, start_ms: candle_store.find_gaps(
+        symbol, interval, interval_ms, pd.Timestamp(start_ms, unit='ms')),
+    fetch_range=lambda symbol, interval, start_ms, end_ms, limit: fetch_kline_range(
+        symbol, interval, start_ms, end_ms, limit, PRIORITY_BACKFILL),
+    insert=insert_klines,
+    can_call=lambda: can_make_api_call(PRIORITY_BACKFILL),
+    stats=kline_gap_stats,
+)
+
+def fetch_missing_tail(symbol, interval, limit):
+    """
+    Request only the closed candles after the newest stored one, then serve
+    the latest `limit` - 1 candles from the DB (the full-page path drops the
+    still-open last candle of its `limit`). Returns None when a full page is
+    needed (empty series, gap wider than `limit`, or an incomplete tail).
+    """
+    interval_ms = INTERVAL_MS.get(interval)
+    if interval_ms is None:
+        return None
+    plan = plan_kline_fetch(kline_catalog.latest_ms(symbol, interval), interval_ms, limit)
+    if plan['mode'] == 'full':
+        return None
+    if plan['mode'] == 'tail':
+        print(f"🌐 Making API call for {symbol}-{interval} ({plan['missing']} missing candles)")
+        klines = fetch_kline_range(symbol, interval, plan['start_ms'], plan['end_ms'], plan['limit'])
+        kline_gap_stats.record_fetch('tail', plan['limit'], limit)
+        if not klines or int(klines[-1][0]) != plan['end_ms']:
+            return None
+        insert_klines(symbol, interval, klines)
+
+    df = fetch_data_from_db(symbol, interval, limit - 1)
+    if df is None or df.empty or int(df['time'].iloc[-1].value // 1_000_000) != plan['expected_ms']:
+        return None
+    kline_backfiller.schedule(symbol, interval, interval_ms)
+    return df
+
 def insert_or_update_pair_status(pair_status_data):
     try:
         # PostgreSQL syntax: INSERT ... ON CONFLICT instead of MERGE
@@ -823,15 +906,21 @@ def fetch_single_pair_from_db(pair):
         return None
 
 # --- Fetch Data Safe (From DB or Binance if outdated) ---
-def fetch_data_safe(symbol, interval, limit):
+def fetch_data_safe(symbol, interval, limit, source=None):
     """
-    Fetch data with smart weight tracking that monitors Binance usage
+    Fetch data with smart weight tracking that monitors Binance usage.
+    source='disk' (default: CANDLE_SOURCE) serves up-to-date series from the
+    local candle cache, which only reads the candles it does not have yet.
     """
     try:
         # 1. Check if data is up to date in DB first
         if is_data_up_to_date(symbol, interval):
             # print(f"✅ Fetching {symbol}-{interval} from database")
-            df = fetch_data_from_db(symbol, interval, limit)
+            df = None
+            if (source or CANDLE_SOURCE) == 'disk':
+                df = read_candle_cache(symbol, interval, limit)
+            if df is None or df.empty:
+                df = fetch_data_from_db(symbol, interval, limit)
             # Update cache on successful database fetch
             if df is not None and not df.empty:
                 cache_key = f"{symbol}-{interval}"
@@ -847,12 +936,16 @@ def fetch_data_safe(symbol, interval, limit):
             log_weight_limit_reached(symbol, interval, weight_tracker['current_weight'])
             return None
 
-        # 3. Apply basic rate limiting
-        binance_limiter.acquire()
+        # 3. Fetch only the missing candles when the stored series is just behind
+        df = fetch_missing_tail(symbol, interval, limit)
+        if df is not None:
+            return df
 
-        # 4. Make API call
+        # 4. Make API call (rate limited; weight reserved by the shared scheduler in the client session)
+        binance_limiter.acquire()
         print(f"🌐 Making API call for {symbol}-{interval}")
         klines = client.klines(symbol=symbol, interval=interval, limit=limit)
+        kline_gap_stats.record_fetch('full', limit, limit)
         
         # 5. Update weight from response headers
         update_weight_from_headers(symbol,interval)
@@ -886,6 +979,11 @@ def fetch_data_safe(symbol, interval, limit):
 
         return result_df
 
+    except BinanceWeightExhausted as e:
+        # Shared budget used up or IP banned: nothing was sent, like the 429 branch
+        print(f"⚠️ Weight limit reached, returning None for {symbol}-{interval}: {e}")
+        log_weight_limit_reached(symbol, interval, binance_scheduler.used())
+        return None
     except Exception as e:
         error_str = str(e)
         
@@ -915,12 +1013,16 @@ def fetch_data_safe_for_machines(symbol, interval, limit):
             log_weight_limit_reached(symbol, interval, weight_tracker['current_weight'])
             return None
 
-        # 3. Apply basic rate limiting
-        binance_limiter.acquire()
+        # 3. Fetch only the missing candles when the stored series is just behind
+        df = fetch_missing_tail(symbol, interval, limit)
+        if df is not None:
+            return df
 
-        # 4. Make API call
+        # 4. Make API call (rate limited; weight reserved by the shared scheduler in the client session)
+        binance_limiter.acquire()
         print(f"🌐 Making API call for {symbol}-{interval} (machines)")
         klines = client.klines(symbol=symbol, interval=interval, limit=limit)
+        kline_gap_stats.record_fetch('full', limit, limit)
 
         # 5. Update weight from response headers
         update_weight_from_headers(symbol,interval)
@@ -954,6 +1056,11 @@ def fetch_data_safe_for_machines(symbol, interval, limit):
 
         return result_df
 
+    except BinanceWeightExhausted as e:
+        # Shared budget used up or IP banned: nothing was sent, like the 429 branch
+        print(f"⚠️ Weight limit reached, returning None for {symbol}-{interval}: {e}")
+        log_weight_limit_reached(symbol, interval, binance_scheduler.used())
+        return None
     except Exception as e:
         error_str = str(e)
         if "429" in error_str or "Too many requests" in error_str:
@@ -2079,52 +2186,38 @@ def update_database_to_release_hedge(unique_id, commission, signal, pl_after_com
         log_db_error(outer_e, "update_database_to_release_hedge", machine_id)
         print(f"❌ update_database_to_release_hedge Global Error for {machine_id}: {outer_e}")
 
-def bulk_fetch_kline_data(symbols, interval, limit):
+def bulk_fetch_klines(symbols, limits, columns=OHLCV_COLUMNS, as_arrays=False):
     """
-    Fetches the latest kline data for a list of symbols in a single bulk query.
+    Newest limits[interval] candles of every symbol for each interval in
+    `limits` ({interval: limit}) with one query. Series without stored
+    candles are skipped. Returns a long frame (symbol, interval, time, columns;
+    oldest first per series) or, with as_arrays=True,
+    {(symbol, interval): {column: ndarray}} with time as epoch ms.
     """
-    if not symbols:
-        return pd.DataFrame()
-    
+    series = [(symbol, interval) for symbol in dict.fromkeys(symbols) for interval in limits
+              if kline_catalog.exists(symbol, interval)]
+    if not series:
+        return {} if as_arrays else pd.DataFrame()
+
     try:
-        # Reduce limit for squeeze calculation (only need ~25 candles for 20-period calculations)
-        actual_limit = min(limit, 30)  # Squeeze only needs 20-25 candles max
-        
-        # Build more efficient query - fetch only essential columns
-        union_queries = []
-        for symbol in symbols:
-            table_name = f"kline_{symbol.lower()}_{interval}"
-            query_part = f"""
-            (SELECT '{symbol}' as symbol, 
-                    time, 
-                    open as open,
-                    high as high, 
-                    low as low,
-                    close as close,
-                    volume
-             FROM {table_name} 
-             ORDER BY time DESC
-             LIMIT {actual_limit})
-            """
-            union_queries.append(query_part)
-        
-        # Use simpler query structure
-        full_query = " UNION ALL ".join(union_queries)
-        sql = f"SELECT * FROM ({full_query}) AS bulkdata ORDER BY symbol, time ASC"
-        
-        df = sql_helper.fetch_dataframe(sql)
-        if df.empty:
-            return df
-        
-        # Convert time
-        df['time'] = pd.to_datetime(df['time'], unit='ms', utc=True)
-        
-        return df[['symbol', 'time', 'open', 'high', 'low', 'close', 'volume']]
-        
+        df = candle_store.fetch_latest_bulk(series, limits, columns)
+        if as_arrays:
+            return bulk_arrays(df)
+        if not df.empty:
+            df['time'] = pd.to_datetime(df['time'], utc=True)
+        return df
     except Exception as e:
-        log_db_error(e, "❌ bulk_fetch_kline_data Error", f"Symbols: {','.join(symbols)}")
-        print(f"❌ bulk_fetch_kline_data Error for symbols: {e}")
-        return pd.DataFrame()
+        log_db_error(e, "❌ bulk_fetch_klines Error", f"Symbols: {len(symbols)}, intervals: {','.join(limits)}")
+        print(f"❌ bulk_fetch_klines Error: {e}")
+        return {} if as_arrays else pd.DataFrame()
+
+def bulk_fetch_kline_data(symbols, interval, limit=30):
+    """
+    Latest OHLCV candles of `symbols` for one interval in a single bulk query
+    (squeeze detection: ~25 candles cover the 20-period calculations).
+    """
+    df = bulk_fetch_klines(symbols, {interval: limit})
+    return df.drop(columns='interval') if not df.empty else df
 
 def bulk_update_squeeze_status(updates):
     """
@@ -2959,27 +3052,9 @@ def convertToHenkin(df):
         # Ensure ascending time
         df = df.sort_values("time").copy()
 
-        # Pine: ha_close = (o + h + l + c) / 4
-        ha_close = (df["open"] + df["high"] + df["low"] + df["close"]) / 4.0
-
-        # Pine: ha_open[0] = (open[0] + close[0]) / 2
-        ha_open = ha_close.copy()
-        ha_open.iloc[0] = (df["open"].iloc[0] + df["close"].iloc[0]) / 2.0
-
-        # Pine: ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2
-        for i in range(1, len(df)):
-            ha_open.iloc[i] = (ha_open.iloc[i-1] + ha_close.iloc[i-1]) / 2.0
-
-        # Pine: ha_high = max(high, ha_open, ha_close); ha_low = min(low, ha_open, ha_close)
-        ha_high = np.maximum(df["high"].values, np.maximum(ha_open.values, ha_close.values))
-        ha_low  = np.minimum(df["low"].values,  np.minimum(ha_open.values, ha_close.values))
-
-        df["ha_open"]  = ha_open
-        df["ha_close"] = ha_close
-        df["ha_high"]  = ha_high
-        df["ha_low"]   = ha_low
-        df["ha_color"] = np.where(df["ha_close"] >= df["ha_open"], "GREEN", "RED")
-        return df
+        # Pine: ha_close = (o + h + l + c) / 4, ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2,
+        # ha_high/ha_low = max/min(high/low, ha_open, ha_close) -- shared kernel
+        return add_heiken_ashi_columns(df)
         
     except Exception as e:
         print(f"Error in convertToHenkin: {e}")        
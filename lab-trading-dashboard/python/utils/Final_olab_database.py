@@ -16,6 +16,13 @@ import logging
 import re
 from psycopg2.errors import UniqueViolation
 from sqlalchemy.exc import IntegrityError
+from utils.candle_store import OHLCV_COLUMNS, bulk_arrays, kline_records, make_candle_store
+from utils.binance_weight import PRIORITY_BACKFILL, PRIORITY_SCANNER, BinanceWeightExhausted, get_scheduler
+from utils.kline_catalog import KlineCatalog
+from utils.kline_ingest import copy_ingest
+from utils.kline_gaps import HoleBackfiller, KlineGapStats, plan_kline_fetch
+from utils.heiken_ashi import add_heiken_ashi_columns
+from utils.trade_state import TradeStateStore
 
 
 # from main_binance import CandleColor  # Importing the CandleColor function
@@ -46,7 +53,6 @@ from datetime import datetime, timezone
 weight_tracker = {
     'current_weight': 0,
     'last_reset_time': None,
-    'weight_threshold': 1800,  # 75% of 2400
     'max_weight_1m': 2400
 }
 
@@ -88,23 +94,12 @@ def olab_log_api_limit_error(symbol, interval, error_message):
     except Exception as e:
         print(f"❌ Failed to log API limit error: {e}")
 
-def olab_can_make_api_call():
-    """Check if we can make an API call based on weight usage"""
-    now_utc = datetime.now(timezone.utc)
-    
-    # Check if 1 minute has passed - reset weight
-    if (weight_tracker['last_reset_time'] is None or 
-        (now_utc - weight_tracker['last_reset_time']).total_seconds() >= 60):
-        
-        weight_tracker['current_weight'] = 0
-        weight_tracker['last_reset_time'] = now_utc
-        print(f"🔄 Weight reset at {now_utc.strftime('%H:%M:%S')} UTC")
-    
-    # Check if weight exceeds threshold
-    if weight_tracker['current_weight'] >= weight_tracker['weight_threshold']:
+def olab_can_make_api_call(priority=PRIORITY_SCANNER):
+    """Check if we can make an API call: the host-wide weight budget (all processes) has room for `priority`"""
+    weight_tracker['current_weight'] = binance_scheduler.used()
+    if not binance_scheduler.can_call(priority):
         print(f"⚠️ Weight limit reached: {weight_tracker['current_weight']}/{weight_tracker['max_weight_1m']}")
         return False
-    
     return True
 
 def olab_update_weight_from_headers(symbol,interval):
@@ -119,13 +114,18 @@ def olab_update_weight_from_headers(symbol,interval):
                 print(f"📊 Weight updated: {symbol}-{interval} -> {weight_tracker['current_weight']}/{weight_tracker['max_weight_1m']} ({percentage:.1f}%)")
                 
                 # Log if weight limit is reached
-                if weight_tracker['current_weight'] >= weight_tracker['weight_threshold']:
+                if weight_tracker['current_weight'] >= binance_scheduler.caps[PRIORITY_SCANNER]:
                     olab_log_weight_limit_reached("GLOBAL", "ALL", weight_tracker['current_weight'])
                     
     except Exception as e:
         print(f"⚠️ Failed to update weight from headers: {e}")
 
-# Simple rate limiter for basic request limiting
+# Host-wide weight scheduler shared by every process: per-minute request weight.
+# Requests reserve their endpoint weight inside the client's session (see olab_setup_header_capture).
+binance_scheduler = get_scheduler()
+
+# Simple rate limiter for basic request limiting: the weight budget is per
+# minute, this keeps each process's kline calls from bursting within a second
 class SimpleRateLimiter:
     def __init__(self, max_per_sec=3):
         self.max_per_sec = max_per_sec
@@ -218,8 +218,9 @@ def olab_setup_header_capture(client):
             client._last_response = response
             return response
         
-        # Monkey patch the request method
+        # Monkey patch the request method, then route it through the shared weight scheduler
         client.session.request = request_with_headers
+        get_scheduler().instrument(client, PRIORITY_SCANNER, timeout=10)
         print("✅ Header capture setup complete")
         
     except Exception as e:
@@ -280,6 +281,26 @@ class SQLAccessHelper:
                     raise e
         raise Exception("Failed to get database connection after retries")
 
+    def raw_connection(self):
+        """DB-API (psycopg2) connection from this process's engine, for COPY; caller closes it."""
+        self._ensure_engine()
+        return self.engine.raw_connection()
+
+    def stream(self, sql_query, params=None, chunk_size=50_000):
+        """
+        Yield (columns, rows) chunks of at most `chunk_size` rows read through a
+        server-side cursor, so large reads never sit in memory at once. Holds
+        its own connection (not connection_lock) for the whole iteration and
+        raises on failure; close the generator to release it early.
+        """
+        self._ensure_engine()
+        with self._get_connection_with_retry() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                text(optimize_sql_query(sql_query)), params or {})
+            columns = list(result.keys())
+            for rows in result.partitions(chunk_size):
+                yield columns, rows
+
     def fetch_dataframe(self, sql_query, params=None):
         try:
             with self.connection_lock:
@@ -308,6 +329,21 @@ class SQLAccessHelper:
             print(f"❌ SQL Execute Error: {e}")
             return 0
 
+    def execute_checked(self, sql_query, params=None, tag=""):
+        """Run one statement in its own transaction; rowcount, or None on failure (execute() returns 0 for both)."""
+        try:
+            with self.connection_lock:
+                self._ensure_engine()
+                optimized_query = olab_optimize_sql_query(sql_query)
+                cleaned_params = olab_clean_timestamp_values(params or {})
+                with self._get_connection_with_retry() as conn:
+                    with conn.begin():
+                        return conn.execute(text(optimized_query), cleaned_params).rowcount
+        except Exception as e:
+            olab_log_db_error(e, "❌ SQL Execute Checked Error", tag or 'execute_checked')
+            print(f"❌ SQL Execute Checked Error | Tag: {tag} | Error: {e}")
+            return None
+
     def execute_many(self, sql_query, param_list, autocommit=False):
         try:
             with self.connection_lock:
@@ -461,6 +497,11 @@ class SQLAccessHelper:
         return False
 
 sql_helper = SQLAccessHelper(engine)
+candle_store = make_candle_store(sql_helper)   # kline reads/writes (per-table or partitioned storage)
+kline_catalog = KlineCatalog(candle_store)     # series existence + latest candle time, kept in memory
+trade_state = TradeStateStore(                  # updated_at per UID, written through + diff-synced from the DB
+    sql_helper.fetch_all, sync_interval=int(os.getenv('TRADE_STATE_SYNC_SECONDS', 15)),
+    on_error=lambda e, context: olab_log_db_error(e, context, 'trade_state'))
 
 def olab_switch_api_key():
     global current_api_index, client
@@ -516,13 +557,7 @@ def olab_write_db_insert_debug_log(message):
 # --- Utility Functions ---
 def olab_table_exists(symbol, interval):
     try:
-        # PostgreSQL syntax for checking table existence
-        sql = f"""
-        SELECT COUNT(*) FROM information_schema.tables 
-        WHERE table_name = 'kline_{symbol.lower()}_{interval}'
-        """
-        result = sql_helper.fetch_one(sql)
-        return result[0] > 0 if result else False
+        return kline_catalog.exists(symbol, interval)
     except Exception as e:
         olab_log_db_error(e, "❌  olab_table_exists Error for", symbol)            
         print(f"❌ olab_table_exists Error for {symbol}-{interval}: {e}")
@@ -530,28 +565,14 @@ def olab_table_exists(symbol, interval):
 
 def olab_is_data_up_to_date(symbol, interval):
     cache_key = f"{symbol}-{interval}"
+    now = int(time.time() * 1000)
 
     try:
-        if not olab_table_exists(symbol, interval):
-            return False
-
-        sql = f"SELECT MAX(time) FROM kline_{symbol.lower()}_{interval}"
-        row = sql_helper.fetch_one(sql)
-        latest_time_db = row[0] if row and row[0] else None
-        if not latest_time_db:
-            return False
-
-        now = int(time.time() * 1000)
         interval_ms = INTERVAL_MS[interval]
         expected_time = now - (now % interval_ms)
 
-        # Convert latest_time_db to milliseconds if it's a datetime object
-        if hasattr(latest_time_db, 'timestamp'):
-            latest_time_ms = int(latest_time_db.timestamp() * 1000)
-        else:
-            latest_time_ms = latest_time_db
-
-        result = latest_time_ms >= expected_time - interval_ms
+        # Answered from the in-process catalog; the DB is only read when the series looks stale
+        result = kline_catalog.is_fresh(symbol, interval, expected_time - interval_ms)
 
         # Update cache when database is accessible
         if result:
@@ -579,9 +600,7 @@ def olab_is_data_up_to_date(symbol, interval):
 
 def olab_fetch_data_from_db(symbol, interval, limit):
     try:
-        # PostgreSQL syntax: LIMIT instead of TOP
-        sql = f"SELECT * FROM kline_{symbol.lower()}_{interval} ORDER BY time DESC LIMIT {limit}"
-        df = sql_helper.fetch_dataframe(sql)
+        df = candle_store.fetch_latest(symbol, interval, limit)
 
         if df.empty:
             return df
@@ -603,28 +622,82 @@ def olab_fetch_data_from_db(symbol, interval, limit):
 # --- INSERT KLINES (PostgreSQL compatible) ---
 def olab_insert_klines(symbol, interval, klines):
     try:
-        table_name = f"kline_{symbol.lower()}_{interval}"
-        records = []
-        for k in klines:
-            records.append({
-                "time": k[0], "open": float(k[1]), "high": float(k[2]), "low": float(k[3]),
-                "close": float(k[4]), "volume": float(k[5]), "closetime": k[6], "quotevolume": float(k[7]),
-                "numtrades": int(k[8]), "takerbuybasevolume": float(k[9]), "takerbuyquotevolume": float(k[10])
-            })
-
-        # PostgreSQL syntax: INSERT ... ON CONFLICT instead of WHERE NOT EXISTS
-        sql = f"""
-        INSERT INTO {table_name} (time, open, high, low, close, volume, closetime, quotevolume, numtrades, takerbuybasevolume, takerbuyquotevolume)
-        VALUES (to_timestamp(:time/1000.0), :open, :high, :low, :close, :volume, :closetime, :quotevolume, :numtrades, :takerbuybasevolume, :takerbuyquotevolume)
-        ON CONFLICT (time) DO NOTHING
-        """
-
-        sql_helper.execute_many(sql, records, autocommit=True)
+        if candle_store.insert(symbol, interval, kline_records(klines)) and klines:
+            kline_catalog.note_insert(symbol, interval, max(int(k[0]) for k in klines))
         # print(f"✅ Successfully inserted klines for {symbol}-{interval}")
     except Exception as e:
         olab_log_db_error(e, "❌ Insert Klines Error for", symbol)
         print(f"❌ Insert Klines Error for {symbol}-{interval}: {e}")
 
+def olab_insert_klines_bulk(batches):
+    """
+    Insert kline pages for many series at once: {(symbol, interval): klines}.
+    COPY into a temp stage + one merge per chunk (utils/kline_ingest.py);
+    falls back to olab_insert_klines per series if the bulk path fails.
+    """
+    try:
+        summary = copy_ingest(sql_helper, candle_store, batches)
+        for (symbol, interval), klines in batches.items():
+            if klines:
+                kline_catalog.note_insert(symbol, interval, max(int(k[0]) for k in klines))
+        return summary
+    except Exception as e:
+        olab_log_db_error(e, "❌ Bulk Insert Klines Error for", f"{len(batches)} series")
+        print(f"❌ Bulk Insert Klines Error ({len(batches)} series), falling back to per-series inserts: {e}")
+        for (symbol, interval), klines in batches.items():
+            if klines:
+                olab_insert_klines(symbol, interval, klines)
+        return None
+
+
+# --- Gap-aware kline fetching (utils/kline_gaps.py) ---
+kline_gap_stats = KlineGapStats()
+
+def olab_fetch_kline_range(symbol, interval, start_ms, end_ms, limit, priority=PRIORITY_SCANNER):
+    """Candles opened between start_ms and end_ms (inclusive) from Binance, weight scheduled at `priority`."""
+    binance_limiter.acquire()
+    with binance_scheduler.priority(priority):
+        klines = client.klines(symbol=symbol, interval=interval, startTime=start_ms, endTime=end_ms, limit=limit)
+    olab_update_weight_from_headers(symbol, interval)
+    return [k[:-1] for k in klines]
+
+kline_backfiller = HoleBackfiller(
+    find_gaps=lambda symbol, interval, interval_ms, start_ms: candle_store.find_gaps(
+        symbol, interval, interval_ms, pd.Timestamp(start_ms, unit='ms')),
+    fetch_range=lambda symbol, interval, start_ms, end_ms, limit: olab_fetch_kline_range(
+        symbol, interval, start_ms, end_ms, limit, PRIORITY_BACKFILL),
+    insert=olab_insert_klines,
+    can_call=lambda: olab_can_make_api_call(PRIORITY_BACKFILL),
+    stats=kline_gap_stats,
+)
+
+def olab_fetch_missing_tail(symbol, interval, limit):
+    """
+    Request only the closed candles after the newest stored one, then serve
+    the latest `limit` - 1 candles from the DB (the full-page path drops the
+    still-open last candle of its `limit`). Returns None when a full page is
+    needed (empty series, gap wider than `limit`, or an incomplete tail).
+    """
+    interval_ms = INTERVAL_MS.get(interval)
+    if interval_ms is None:
+        return None
+    plan = plan_kline_fetch(kline_catalog.latest_ms(symbol, interval), interval_ms, limit)
+    if plan['mode'] == 'full':
+        return None
+    if plan['mode'] == 'tail':
+        print(f"🌐 Making API call for {symbol}-{interval} ({plan['missing']} missing candles)")
+        klines = olab_fetch_kline_range(symbol, interval, plan['start_ms'], plan['end_ms'], plan['limit'])
+        kline_gap_stats.record_fetch('tail', plan['limit'], limit)
+        if not klines or int(klines[-1][0]) != plan['end_ms']:
+            return None
+        olab_insert_klines(symbol, interval, klines)
+
+    df = olab_fetch_data_from_db(symbol, interval, limit - 1)
+    if df is None or df.empty or int(df['time'].iloc[-1].value // 1_000_000) != plan['expected_ms']:
+        return None
+    kline_backfiller.schedule(symbol, interval, interval_ms)
+    return df
+
 def olab_insert_or_update_pair_status(pair_status_data):
     try:
         # PostgreSQL syntax: INSERT ... ON CONFLICT instead of MERGE
@@ -812,12 +885,16 @@ def olab_fetch_data_safe(symbol, interval, limit):
             olab_log_weight_limit_reached(symbol, interval, weight_tracker['current_weight'])
             return None
 
-        # 3. Apply basic rate limiting
-        binance_limiter.acquire()
+        # 3. Fetch only the missing candles when the stored series is just behind
+        df = olab_fetch_missing_tail(symbol, interval, limit)
+        if df is not None:
+            return df
 
-        # 4. Make API call
+        # 4. Make API call (rate limited; weight reserved by the shared scheduler in the client session)
+        binance_limiter.acquire()
         print(f"🌐 Making API call for {symbol}-{interval}")
         klines = client.klines(symbol=symbol, interval=interval, limit=limit)
+        kline_gap_stats.record_fetch('full', limit, limit)
         
         # 5. Update weight from response headers
         olab_update_weight_from_headers(symbol,interval)
@@ -851,6 +928,11 @@ def olab_fetch_data_safe(symbol, interval, limit):
 
         return result_df
 
+    except BinanceWeightExhausted as e:
+        # Shared budget used up or IP banned: nothing was sent, like the 429 branch
+        print(f"⚠️ Weight limit reached, returning None for {symbol}-{interval}: {e}")
+        olab_log_weight_limit_reached(symbol, interval, binance_scheduler.used())
+        return None
     except Exception as e:
         error_str = str(e)
         
@@ -879,12 +961,16 @@ def olab_fetch_data_safe_for_machines(symbol, interval, limit):
             olab_log_weight_limit_reached(symbol, interval, weight_tracker['current_weight'])
             return None
 
-        # 3. Apply basic rate limiting
-        binance_limiter.acquire()
+        # 3. Fetch only the missing candles when the stored series is just behind
+        df = olab_fetch_missing_tail(symbol, interval, limit)
+        if df is not None:
+            return df
 
-        # 4. Make API call
+        # 4. Make API call (rate limited; weight reserved by the shared scheduler in the client session)
+        binance_limiter.acquire()
         print(f"🌐 Making API call for {symbol}-{interval} (machines)")
         klines = client.klines(symbol=symbol, interval=interval, limit=limit)
+        kline_gap_stats.record_fetch('full', limit, limit)
 
         # 5. Update weight from response headers
         olab_update_weight_from_headers(symbol,interval)
@@ -918,6 +1004,11 @@ def olab_fetch_data_safe_for_machines(symbol, interval, limit):
 
         return result_df
 
+    except BinanceWeightExhausted as e:
+        # Shared budget used up or IP banned: nothing was sent, like the 429 branch
+        print(f"⚠️ Weight limit reached, returning None for {symbol}-{interval}: {e}")
+        olab_log_weight_limit_reached(symbol, interval, binance_scheduler.used())
+        return None
     except Exception as e:
         error_str = str(e)
         if "429" in error_str or "Too many requests" in error_str:
@@ -1570,6 +1661,66 @@ def olab_update_table_from_all_pairs(all_pairs, machine_id):
         olab_log_db_error(outer_e, "olab_update_table_from_all_pairs", machine_id)
         print(f"❌ olab_update_table_from_all_pairs Global Error for {machine_id}: {outer_e}")
 
+# Columns olab_update_table_from_all_pairs writes back from all_pairs
+TRADE_UPDATE_COLUMNS = (
+    'operator_trade_time', 'investment', 'interval', 'stop_price', 'save_price', 'min_comm', 'hedge', 'action',
+    'buy_qty', 'buy_price', 'buy_pl', 'sell_qty', 'sell_price', 'sell_pl', 'commission', 'pl_after_comm',
+    'commision_journey', 'profit_journey', 'min_profit', 'hedge_order_size', 'hedge_1_1_bool', 'added_qty',
+    'min_comm_after_hedge', 'type', 'signalfrom', 'operator_close_time', 'min_close', 'close_price',
+    'hedge_swing_high_point', 'hedge_swing_low_point', 'hedge_buy_pl', 'hedge_sell_pl', 'temp_high_point',
+    'temp_low_point', 'updated_at',
+)
+_trade_column_types = {}
+
+def olab_trade_column_types(table):
+    """{column: data_type} of a machine trade table, read once from information_schema."""
+    types = _trade_column_types.get(table)
+    if types is None:
+        rows = sql_helper.fetch_all(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table",
+            {"table": table})
+        types = {name: data_type for name, data_type in rows or []}
+        if types:
+            _trade_column_types[table] = types
+    return types
+
+def olab_flush_trade_rows(machine_id, rows, columns):
+    """
+    Write `columns` of every row (all_pairs items, booleans as ints) with one
+    UPDATE ... FROM (VALUES ...) in one transaction. Each value is cast to its
+    column type. Returns rows updated, None when the statement failed.
+    """
+    if not rows or not columns:
+        return 0
+    table = machine_id.lower()
+    if not re.match(r'^[a-z0-9_]+$', table):
+        raise ValueError(f"Invalid machine table: {table}")
+    types = olab_trade_column_types(table)
+    names = ('unique_id', 'pair') + tuple(columns)
+
+    def cell(column, i):
+        data_type = types.get(column)
+        if data_type and data_type not in ('USER-DEFINED', 'ARRAY'):
+            return f"CAST(:{column}_{i} AS {data_type})"
+        return f":{column}_{i}"
+
+    values, params = [], {}
+    for i, row in enumerate(rows):
+        values.append("(" + ", ".join(cell(column, i) for column in names) + ")")
+        params.update({f"{column}_{i}": row.get(column) for column in names})
+
+    update_query = f"""
+    UPDATE {table} AS t SET {", ".join(f'"{column}" = v."{column}"' for column in columns)}
+    FROM (VALUES {", ".join(values)}) AS v({", ".join(f'"{column}"' for column in names)})
+    WHERE t.unique_id = v.unique_id AND t.pair = v.pair AND t.type NOT IN ('close', 'hedge_close')
+    """
+    return sql_helper.execute_checked(update_query, params, tag='olab_flush_trade_rows')
+
+def olab_db_reachable():
+    """True when a trivial query succeeds (tells a bad row from a lost connection)."""
+    return sql_helper.fetch_one("SELECT 1") is not None
+
 def olab_convert_boolean_to_int(data_dict):
     """
     Convert boolean values to integers for PostgreSQL compatibility.
@@ -1643,6 +1794,7 @@ def olab_update_single_uid_in_table(uid, all_pairs, machine_id):
                 with open('log_event/updatedb-error-single.txt', 'a', encoding="utf-8") as f:
                     f.write(f"No update occurred for UID: {uid}\n")
             else:
+                trade_state.note_write(machine_id.lower(), uid, item.get('updated_at'))
                 with open('log_event/updatedb.txt', 'a', encoding="utf-8") as f:
                     f.write(f"Updated UID: {uid} | Rows affected: {rows_updated}\n")
 
@@ -2450,52 +2602,38 @@ def olab_update_database_to_release_hedge(unique_id, commission, signal, pl_afte
         olab_log_db_error(outer_e, "olab_update_database_to_release_hedge", machine_id)
         print(f"❌ olab_update_database_to_release_hedge Global Error for {machine_id}: {outer_e}")
 
-def olab_bulk_fetch_kline_data(symbols, interval, limit):
+def olab_bulk_fetch_klines(symbols, limits, columns=OHLCV_COLUMNS, as_arrays=False):
     """
-    Fetches the latest kline data for a list of symbols in a single bulk query.
+    Newest limits[interval] candles of every symbol for each interval in
+    `limits` ({interval: limit}) with one query. Series without stored
+    candles are skipped. Returns a long frame (symbol, interval, time, columns;
+    oldest first per series) or, with as_arrays=True,
+    {(symbol, interval): {column: ndarray}} with time as epoch ms.
     """
-    if not symbols:
-        return pd.DataFrame()
-    
+    series = [(symbol, interval) for symbol in dict.fromkeys(symbols) for interval in limits
+              if kline_catalog.exists(symbol, interval)]
+    if not series:
+        return {} if as_arrays else pd.DataFrame()
+
     try:
-        # Reduce limit for squeeze calculation (only need ~25 candles for 20-period calculations)
-        actual_limit = min(limit, 30)  # Squeeze only needs 20-25 candles max
-        
-        # Build more efficient query - fetch only essential columns
-        union_queries = []
-        for symbol in symbols:
-            table_name = f"kline_{symbol.lower()}_{interval}"
-            query_part = f"""
-            (SELECT '{symbol}' as symbol, 
-                    time, 
-                    open as open,
-                    high as high, 
-                    low as low,
-                    close as close,
-                    volume
-             FROM {table_name} 
-             ORDER BY time DESC
-             LIMIT {actual_limit})
-            """
-            union_queries.append(query_part)
-        
-        # Use simpler query structure
-        full_query = " UNION ALL ".join(union_queries)
-        sql = f"SELECT * FROM ({full_query}) AS bulkdata ORDER BY symbol, time ASC"
-        
-        df = sql_helper.fetch_dataframe(sql)
-        if df.empty:
-            return df
-        
-        # Convert time
-        df['time'] = pd.to_datetime(df['time'], unit='ms', utc=True)
-        
-        return df[['symbol', 'time', 'open', 'high', 'low', 'close', 'volume']]
-        
+        df = candle_store.fetch_latest_bulk(series, limits, columns)
+        if as_arrays:
+            return bulk_arrays(df)
+        if not df.empty:
+            df['time'] = pd.to_datetime(df['time'], utc=True)
+        return df
     except Exception as e:
-        olab_log_db_error(e, "❌ olab_bulk_fetch_kline_data Error", f"Symbols: {','.join(symbols)}")
-        print(f"❌ olab_bulk_fetch_kline_data Error for symbols: {e}")
-        return pd.DataFrame()
+        olab_log_db_error(e, "❌ olab_bulk_fetch_klines Error", f"Symbols: {len(symbols)}, intervals: {','.join(limits)}")
+        print(f"❌ olab_bulk_fetch_klines Error: {e}")
+        return {} if as_arrays else pd.DataFrame()
+
+def olab_bulk_fetch_kline_data(symbols, interval, limit=30):
+    """
+    Latest OHLCV candles of `symbols` for one interval in a single bulk query
+    (squeeze detection: ~25 candles cover the 20-period calculations).
+    """
+    df = olab_bulk_fetch_klines(symbols, {interval: limit})
+    return df.drop(columns='interval') if not df.empty else df
 
 def bulk_olab_update_squeeze_status(updates):
     """
@@ -3332,27 +3470,9 @@ def olab_convert_to_henkin(df):
         # Ensure ascending time
         df = df.sort_values("time").copy()
 
-        # Pine: ha_close = (o + h + l + c) / 4
-        ha_close = (df["open"] + df["high"] + df["low"] + df["close"]) / 4.0
-
-        # Pine: ha_open[0] = (open[0] + close[0]) / 2
-        ha_open = ha_close.copy()
-        ha_open.iloc[0] = (df["open"].iloc[0] + df["close"].iloc[0]) / 2.0
-
-        # Pine: ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2
-        for i in range(1, len(df)):
-            ha_open.iloc[i] = (ha_open.iloc[i-1] + ha_close.iloc[i-1]) / 2.0
-
-        # Pine: ha_high = max(high, ha_open, ha_close); ha_low = min(low, ha_open, ha_close)
-        ha_high = np.maximum(df["high"].values, np.maximum(ha_open.values, ha_close.values))
-        ha_low  = np.minimum(df["low"].values,  np.minimum(ha_open.values, ha_close.values))
-
-        df["ha_open"]  = ha_open
-        df["ha_close"] = ha_close
-        df["ha_high"]  = ha_high
-        df["ha_low"]   = ha_low
-        df["ha_color"] = np.where(df["ha_close"] >= df["ha_open"], "GREEN", "RED")
-        return df
+        # Pine: ha_close = (o + h + l + c) / 4, ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2,
+        # ha_high/ha_low = max/min(high/low, ha_open, ha_close) -- shared kernel
+        return add_heiken_ashi_columns(df)
         
     except Exception as e:
         print(f"Error in convertToHenkin: {e}")        
@@ -0,0 +1,321 @@
+# utils/binance_weight.py
+
+"""
+Shared, weight-aware Binance request scheduler.
+
+Binance limits request weight per IP per minute (X-MBX-USED-WEIGHT-1M). The
+per-module weight_tracker dicts only saw their own process, so a dozen pool
+workers each assumed the whole 2400 budget. Here every process on the host
+shares one budget:
+
+- a small int64 block in multiprocessing.shared_memory holds the current
+  minute window, weight used in it (reservations and the exchange's own
+  X-MBX-USED-WEIGHT-1M count, whichever is higher), a ban deadline after
+  429/418, and counters
+- processes reserve weight in leases of LEASE_WEIGHT under a file lock (slow
+  path); requests then take tokens from the local lease with deque pops,
+  which need no lock (fast path)
+- priorities cap how much of the window each class may use:
+  PRIORITY_ORDER (live-bot orders) > PRIORITY_SCANNER (klines) >
+  PRIORITY_BACKFILL (hole backfills), so backfills stop first and orders
+  keep headroom instead of everything stopping at a fixed 1800
+- instrument(client) hooks a UMFutures client's session: each request
+  reserves its endpoint's weight (ENDPOINT_WEIGHTS) before it is sent and
+  feeds the response headers back
+
+Without fcntl (Windows) the lock is per process only.
+"""
+
+import collections
+import contextlib
+import contextvars
+import os
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from urllib.parse import urlparse
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: no cross-process lock
+    fcntl = None
+
+BINANCE_WEIGHT_LIMIT = int(os.getenv('BINANCE_WEIGHT_LIMIT', '2400'))   # request weight per minute (IP)
+BINANCE_WEIGHT_BLOCK = os.getenv('BINANCE_WEIGHT_BLOCK', 'lab_binance_weight')
+
+PRIORITY_ORDER, PRIORITY_SCANNER, PRIORITY_BACKFILL = 0, 1, 2
+PRIORITY_NAMES = {PRIORITY_ORDER: 'order', PRIORITY_SCANNER: 'scanner', PRIORITY_BACKFILL: 'backfill'}
+PRIORITY_SHARE = {PRIORITY_ORDER: 0.98, PRIORITY_SCANNER: 0.90, PRIORITY_BACKFILL: 0.70}   # of the limit
+
+LEASE_WEIGHT = 20       # weight reserved per slow-path visit
+BAN_DEFAULT_S = 60      # 429/418 without Retry-After
+
+# GET weights of USD-M futures endpoints (POST/DELETE order endpoints: 1)
+ENDPOINT_WEIGHTS = {
+    '/fapi/v1/exchangeInfo': 1, '/fapi/v1/premiumIndex': 1, '/fapi/v1/leverage': 1, '/fapi/v1/order': 1,
+    '/fapi/v1/batchOrders': 5, '/fapi/v1/allOrders': 5, '/fapi/v1/userTrades': 5,
+    '/fapi/v2/positionRisk': 5, '/fapi/v3/positionRisk': 5, '/fapi/v2/account': 5, '/fapi/v3/account': 5,
+    '/fapi/v2/balance': 5, '/fapi/v3/balance': 5, '/fapi/v1/income': 30, '/fapi/v1/positionSide/dual': 30,
+}
+
+# Shared block slots
+_WINDOW, _USED, _REPORTED, _BANNED_UNTIL, _REQUESTS, _WEIGHT, _REJECTED, _THROTTLED = range(8)
+_SLOTS = 8
+
+_priority = contextvars.ContextVar('binance_priority', default=None)
+
+
+def endpoint_weight(method, path, params=None):
+    """Request weight of a futures REST call."""
+    params = params or {}
+    if path in ('/fapi/v1/klines', '/fapi/v1/continuousKlines', '/fapi/v1/markPriceKlines'):
+        limit = int(params.get('limit', 500))
+        return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+    if path == '/fapi/v1/depth':
+        limit = int(params.get('limit', 500))
+        return 2 if limit <= 50 else 5 if limit <= 100 else 10 if limit <= 500 else 20
+    if path == '/fapi/v1/openOrders' and method == 'GET':
+        return 1 if params.get('symbol') else 40
+    if path in ('/fapi/v1/ticker/price', '/fapi/v2/ticker/price', '/fapi/v1/ticker/bookTicker'):
+        return 1 if params.get('symbol') else 2
+    if path == '/fapi/v1/ticker/24hr':
+        return 1 if params.get('symbol') else 40
+    if method != 'GET':
+        return 5 if path == '/fapi/v1/batchOrders' else 1
+    return ENDPOINT_WEIGHTS.get(path, 1)
+
+
+class BinanceWeightExhausted(Exception):
+    """The minute's weight budget for this priority is used up (or the IP is banned)."""
+
+
+class BinanceWeightScheduler:
+    """Host-wide weight budget in shared memory with per-process leases."""
+
+    def __init__(self, name=BINANCE_WEIGHT_BLOCK, limit=BINANCE_WEIGHT_LIMIT, lease=LEASE_WEIGHT):
+        self.name = name
+        self.limit = limit
+        self.lease_weight = lease
+        self.caps = {priority: int(limit * share) for priority, share in PRIORITY_SHARE.items()}
+        self._shm = self._attach(name)
+        self._state = np.ndarray((_SLOTS,), dtype=np.int64, buffer=self._shm.buf)
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._open_lock()
+        self._lease = (None, collections.deque())    # (window, tokens), replaced as a whole
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @staticmethod
+    def _attach(name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=_SLOTS * 8)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name)
+        # The block outlives any one process: take it back out of the resource
+        # tracker, which would unlink it when the process that attached it exits
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+    def _open_lock(self):
+        self._thread_lock = threading.Lock()
+        self._lock_file = open(self._lock_path, 'a+') if fcntl is not None else None
+
+    def _after_fork(self):
+        """flock is per open file: the child needs its own descriptor, and starts without a lease."""
+        self._open_lock()
+        self._lease = (None, collections.deque())
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if self._lock_file is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _roll_window(self, now):
+        """Start a new minute window when the clock passed the stored one (call under the lock)."""
+        window = int(now // 60)
+        if self._state[_WINDOW] != window:
+            self._state[_WINDOW] = window
+            self._state[_USED] = 0
+            self._state[_REPORTED] = 0
+        return window
+
+    # ------------------------------------------------------------ acquire
+    def try_acquire(self, weight, priority=PRIORITY_SCANNER, now=None):
+        """Reserve `weight` for one request now; False when the budget (or a ban) does not allow it."""
+        now = time.time() if now is None else now
+        state = self._state
+        if state[_BANNED_UNTIL] > now * 1000:
+            state[_REJECTED] += 1
+            return False
+        window = int(now // 60)
+        lease_window, tokens = self._lease
+        if lease_window == window and (priority == PRIORITY_ORDER or state[_USED] <= self.caps[priority]):
+            taken = 0
+            try:
+                while taken < weight:
+                    tokens.pop()
+                    taken += 1
+                return True
+            except IndexError:
+                tokens.extend([1] * taken)
+        return self._acquire_slow(weight, priority, now)
+
+    def _acquire_slow(self, weight, priority, now):
+        with self._locked():
+            window = self._roll_window(now)
+            state = self._state
+            headroom = self.caps[priority] - int(state[_USED])
+            if headroom < weight:
+                state[_REJECTED] += 1
+                return False
+            grant = min(max(weight, self.lease_weight), headroom)
+            state[_USED] += grant
+            state[_REQUESTS] += 1
+            state[_WEIGHT] += grant
+            lease_window, tokens = self._lease
+            if lease_window != window:
+                tokens = collections.deque()
+                self._lease = (window, tokens)
+            tokens.extend([1] * (grant - weight))
+            return True
+
+    def acquire(self, weight, priority=PRIORITY_SCANNER, timeout=None):
+        """try_acquire, waiting up to `timeout` seconds (None: until the next window allows it)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.time()
+            if self.try_acquire(weight, priority, now):
+                return True
+            wake = max((int(now // 60) + 1) * 60, self._state[_BANNED_UNTIL] / 1000) - now
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wake = min(wake, remaining)
+            time.sleep(max(wake, 0.01))
+
+    def can_call(self, priority=PRIORITY_SCANNER, weight=1):
+        """Whether a request of `weight` would currently be admitted (no reservation)."""
+        now = time.time()
+        if self._state[_BANNED_UNTIL] > now * 1000:
+            return False
+        window = int(now // 60)
+        if int(self._state[_WINDOW]) != window:
+            return True
+        used = int(self._state[_USED])
+        if used + weight <= self.caps[priority]:
+            return True
+        lease_window, tokens = self._lease
+        return used <= self.caps[priority] and lease_window == window and len(tokens) >= weight
+
+    # ------------------------------------------------------------ feedback
+    def observe(self, headers, status_code=200, now=None):
+        """Feed a response back: X-MBX-USED-WEIGHT-1M raises the window's usage, 429/418 start a ban."""
+        now = time.time() if now is None else now
+        reported = headers.get('X-MBX-USED-WEIGHT-1M') if headers is not None else None
+        banned = status_code in (418, 429)
+        if reported is None and not banned:
+            return
+        reported = int(reported) if reported is not None else None
+        if not banned and reported <= self._state[_USED] and self._state[_WINDOW] == int(now // 60):
+            return   # nothing new; skip the lock
+        with self._locked():
+            self._roll_window(now)
+            state = self._state
+            if reported is not None:
+                state[_REPORTED] = max(int(state[_REPORTED]), reported)
+                state[_USED] = max(int(state[_USED]), reported)
+            if banned:
+                retry_after = headers.get('Retry-After') if headers is not None else None
+                seconds = int(retry_after) if retry_after and str(retry_after).isdigit() else BAN_DEFAULT_S
+                state[_BANNED_UNTIL] = max(int(state[_BANNED_UNTIL]), int((now + seconds) * 1000))
+                state[_THROTTLED] += 1
+
+    # ------------------------------------------------------------ priority
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """Requests made inside the block (this thread / task) use `priority`."""
+        token = _priority.set(priority)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    def instrument(self, client, priority=PRIORITY_SCANNER, timeout=None):
+        """
+        Route every request of a UMFutures `client` through the scheduler:
+        reserve the endpoint weight first (waiting up to `timeout`, then
+        raising BinanceWeightExhausted), observe the response headers after.
+        `priority` applies unless a priority() block overrides it.
+        """
+        session = client.session
+        if getattr(session, '_weight_scheduled', False):
+            return client
+        send = session.request
+
+        def request(method, url, *args, **kwargs):
+            level = _priority.get()
+            level = priority if level is None else level
+            weight = endpoint_weight(method.upper(), urlparse(url).path, _query(url, kwargs.get('params')))
+            if not self.acquire(weight, level, timeout=timeout):
+                raise BinanceWeightExhausted(
+                    f"{PRIORITY_NAMES[level]} request {urlparse(url).path} (weight {weight}) deferred: "
+                    f"{self.used()}/{self.limit} used")
+            response = send(method, url, *args, **kwargs)
+            self.observe(response.headers, response.status_code)
+            return response
+
+        session.request = request
+        session._weight_scheduled = True
+        return client
+
+    # ------------------------------------------------------------ reporting
+    def used(self):
+        if int(self._state[_WINDOW]) != int(time.time() // 60):
+            return 0
+        return int(self._state[_USED])
+
+    def stats(self):
+        state = self._state
+        return {'used': self.used(), 'limit': self.limit, 'reported': int(state[_REPORTED]),
+                'caps': {PRIORITY_NAMES[p]: cap for p, cap in self.caps.items()},
+                'lease': len(self._lease[1]), 'leases': int(state[_REQUESTS]), 'weight_reserved': int(state[_WEIGHT]),
+                'rejected': int(state[_REJECTED]), 'throttled': int(state[_THROTTLED]),
+                'banned_for_s': max(0.0, round(state[_BANNED_UNTIL] / 1000 - time.time(), 1))}
+
+    def reset(self):
+        """Clear the shared block (self-check / manual recovery)."""
+        with self._locked():
+            self._state[:] = 0
+        self._lease = (None, collections.deque())
+
+
+def _query(url, params):
+    """Request parameters from `params` (str or dict) or the URL query string."""
+    query = params if params is not None else urlparse(url).query
+    if isinstance(query, dict):
+        return query
+    return dict(part.split('=', 1) for part in str(query or '').split('&') if '=' in part)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process's BinanceWeightScheduler (attached to the host-wide block)."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = BinanceWeightScheduler()
+    return _scheduler
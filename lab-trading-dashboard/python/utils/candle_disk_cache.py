@@ -0,0 +1,301 @@
+# utils/candle_disk_cache.py
+
+"""
+Local columnar on-disk candle cache.
+
+Backtests and cold starts used to pull the whole history of a series from
+the remote Postgres every run. CandleDiskCache keeps a copy per
+(symbol, interval) under CANDLE_CACHE_DIR:
+
+    <root>/<SYMBOL>_<interval>/time.bin, open.bin, ..., meta.json
+
+- one raw little-endian file per column (time: int64 epoch ms, num_trades:
+  int64, everything else float64), so every column is one contiguous array
+- reads map the files with np.memmap (read-only, zero-copy); a range is a
+  searchsorted slice on the time column, and the returned frame wraps the
+  mapped slices
+- sync() appends only the candles newer than the cached last candle (read
+  from the DB through the streaming history reader), so repeated backtests
+  over the same history stop costing DB bandwidth
+- meta.json holds the committed row count and is replaced atomically after
+  the column files are appended; bytes past it (an interrupted append) are
+  ignored and overwritten by the next append
+- holes (consecutive cached candles more than one interval apart) are
+  re-checked every `hole_recheck_seconds`; when the DB has since filled one
+  (e.g. HoleBackfiller), the series is rewritten from that hole on into a new
+  generation of column files (<column>.<gen>.bin) and meta.json is switched
+  to it. Files are never shrunk under a committed row count, and replaced
+  generations are unlinked, which leaves other processes' maps valid
+
+Writers (append, rewrite, discard) hold an flock on <root>/.locks/<series>
+plus a per-series lock in this process, so the bot's processes can share one
+cache. Without fcntl (Windows) the lock is per process only. Reads take no
+lock.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:        # Windows: per-process locking only
+    fcntl = None
+
+CANDLE_SOURCE = os.getenv('CANDLE_SOURCE', 'db')   # 'disk': fetch_data_safe / fetch_history_db read the cache
+CANDLE_CACHE_DIR = os.getenv('CANDLE_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'candle_cache'))
+
+# Frame column -> on-disk dtype (order = fetch_data_safe's frame)
+CACHE_COLUMNS = {
+    'time': np.int64, 'open': np.float64, 'high': np.float64, 'low': np.float64, 'close': np.float64,
+    'volume': np.float64, 'quote_volume': np.float64, 'num_trades': np.int64,
+    'taker_base_vol': np.float64, 'taker_quote_vol': np.float64,
+}
+
+_SERIES_RE = re.compile(r'^[A-Z0-9]+$')
+
+
+def _column_file(directory, column, gen=0):
+    return os.path.join(directory, f"{column}.bin" if not gen else f"{column}.{gen}.bin")
+
+
+class CandleDiskCache:
+    """Append-only per-series column files, read through np.memmap."""
+
+    def __init__(self, root=CANDLE_CACHE_DIR, intervals_ms=None, hole_recheck_seconds=3600):
+        self.root = root
+        self.intervals_ms = dict(intervals_ms or {})
+        self.hole_recheck_seconds = hole_recheck_seconds
+        self._lock = threading.Lock()
+        self._series_locks = {}
+        self._maps = {}     # (symbol, interval) -> ((gen, rows), {column: memmap})
+        self.hits = self.rows_synced = self.rewrites = 0
+
+    def path(self, symbol, interval):
+        if not _SERIES_RE.match(symbol) or not re.match(r'^\d+[mhdwM]$', interval):
+            raise ValueError(f"Invalid series: {symbol}-{interval}")
+        return os.path.join(self.root, f"{symbol}_{interval}")
+
+    @contextmanager
+    def _writer(self, symbol, interval):
+        """Exclusive write access to one series, across threads and processes."""
+        key = (symbol, interval)
+        with self._lock:
+            thread_lock = self._series_locks.setdefault(key, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_dir = os.path.join(self.root, '.locks')
+            os.makedirs(lock_dir, exist_ok=True)
+            with open(os.path.join(lock_dir, f"{symbol}_{interval}.lock"), 'a+') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _meta(self, symbol, interval):
+        try:
+            with open(os.path.join(self.path(symbol, interval), 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rows': 0, 'last_time': None}
+
+    def _commit(self, directory, meta):
+        tmp = os.path.join(directory, f"meta.json.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, 'meta.json'))
+
+    def rows(self, symbol, interval):
+        return self._meta(symbol, interval)['rows']
+
+    def last_time(self, symbol, interval):
+        """Open time (ms) of the newest cached candle, None when the series is not cached."""
+        return self._meta(symbol, interval)['last_time']
+
+    # ------------------------------------------------------------ writes
+    def append(self, symbol, interval, df):
+        """
+        Append a candle frame (fetch_data_safe columns, oldest first); rows not
+        newer than the cached last candle are skipped. Returns rows appended.
+        """
+        if df is None or df.empty:
+            return 0
+        with self._writer(symbol, interval):
+            directory = self.path(symbol, interval)
+            meta = self._meta(symbol, interval)
+            appended = self._write_rows(directory, interval, meta, df)
+            if appended:
+                self._commit(directory, meta)
+                self._maps.pop((symbol, interval), None)
+            return appended
+
+    def _write_rows(self, directory, interval, meta, df):
+        """Append df's rows newer than meta['last_time'] to meta's generation; updates meta in place."""
+        times = pd.to_datetime(df['time'], utc=True).to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        start = 0 if meta['last_time'] is None else int(np.searchsorted(times, meta['last_time'], side='right'))
+        if start >= len(times):
+            return 0
+        os.makedirs(directory, exist_ok=True)
+        gen = meta.get('gen', 0)
+        for column, dtype in CACHE_COLUMNS.items():
+            values = times if column == 'time' else df[column].to_numpy()
+            path = _column_file(directory, column, gen)
+            with open(path, 'r+b' if meta['rows'] and os.path.exists(path) else 'wb') as f:
+                f.seek(meta['rows'] * np.dtype(dtype).itemsize)
+                f.truncate()   # only uncommitted bytes: meta is read under the writer lock
+                f.write(np.ascontiguousarray(values[start:], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+        meta.update(rows=meta['rows'] + len(times) - start, last_time=int(times[-1]),
+                    interval_ms=self.intervals_ms.get(interval))
+        return len(times) - start
+
+    def sync(self, symbol, interval, read_since):
+        """
+        Append the candles the DB has after the cached last candle, then
+        rewrite from the oldest hole the DB has filled since (see holes()).
+        read_since(symbol, interval, start_time, end_time=None) yields candle
+        frames, oldest first, with start_time <= time < end_time (None: no
+        bound). Returns rows appended or rewritten.
+        """
+        last = self.last_time(symbol, interval)
+        start_time = None if last is None else pd.Timestamp(last + 1, unit='ms', tz='UTC')
+        appended = 0
+        for chunk in read_since(symbol, interval, start_time):
+            appended += self.append(symbol, interval, chunk)
+        appended += self._resync_holes(symbol, interval, read_since)
+        self.rows_synced += appended
+        return appended
+
+    def holes(self, symbol, interval):
+        """[(after_ms, before_ms)] open times around each gap in the cached series (interval known)."""
+        interval_ms = self.intervals_ms.get(interval)
+        maps = self.arrays(symbol, interval)
+        if not interval_ms or maps is None:
+            return []
+        times = np.asarray(maps['time'])
+        gaps = np.flatnonzero(np.diff(times) != interval_ms)
+        return [(int(times[i]), int(times[i + 1])) for i in gaps]
+
+    def holes_due(self, symbol, interval):
+        """True when the series' holes have not been re-checked for hole_recheck_seconds."""
+        meta = self._meta(symbol, interval)
+        return bool(meta['rows']) and time.time() - meta.get('holes_checked_at', 0) >= self.hole_recheck_seconds
+
+    def _resync_holes(self, symbol, interval, read_since):
+        if not self.holes_due(symbol, interval):
+            return 0
+        rewritten = 0
+        for after, before in self.holes(symbol, interval):
+            chunks = read_since(symbol, interval, pd.Timestamp(after + 1, unit='ms', tz='UTC'),
+                                pd.Timestamp(before, unit='ms', tz='UTC'))
+            if any(chunk is not None and not chunk.empty for chunk in chunks):
+                # Everything after the hole is read again, which covers later filled holes too
+                rewritten = self._rewrite_after(symbol, interval, after, read_since)
+                break
+        with self._writer(symbol, interval):
+            directory = self.path(symbol, interval)
+            meta = self._meta(symbol, interval)
+            if meta['rows']:
+                meta['holes_checked_at'] = time.time()
+                self._commit(directory, meta)
+        return rewritten
+
+    def _rewrite_after(self, symbol, interval, after_ms, read_since):
+        """Copy the cached rows up to after_ms into a new generation, append the DB's rows after it, switch."""
+        with self._writer(symbol, interval):
+            directory = self.path(symbol, interval)
+            old = self._meta(symbol, interval)
+            old_gen = old.get('gen', 0)
+            current = self.arrays(symbol, interval)
+            keep = int(np.searchsorted(current['time'], after_ms, side='right'))
+            meta = dict(old, gen=old_gen + 1, rows=keep, last_time=int(current['time'][keep - 1]))
+            for column, dtype in CACHE_COLUMNS.items():
+                with open(_column_file(directory, column, meta['gen']), 'wb') as f:
+                    f.write(np.ascontiguousarray(current[column][:keep], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+            rewritten = 0
+            for chunk in read_since(symbol, interval, pd.Timestamp(after_ms + 1, unit='ms', tz='UTC')):
+                if chunk is not None and not chunk.empty:
+                    rewritten += self._write_rows(directory, interval, meta, chunk)
+            self._commit(directory, meta)
+            self._maps.pop((symbol, interval), None)
+            for column in CACHE_COLUMNS:
+                try:
+                    os.remove(_column_file(directory, column, old_gen))   # open maps keep their pages
+                except FileNotFoundError:
+                    pass
+            self.rewrites += 1
+            return rewritten
+
+    def discard(self, symbol, interval):
+        with self._writer(symbol, interval):
+            self._maps.pop((symbol, interval), None)
+            directory = self.path(symbol, interval)
+            if os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+                os.rmdir(directory)
+
+    # ------------------------------------------------------------- reads
+    def arrays(self, symbol, interval):
+        """Read-only memmaps {column: array} of the whole cached series, None when not cached."""
+        key = (symbol, interval)
+        for attempt in range(2):
+            meta = self._meta(symbol, interval)
+            rows, gen = meta['rows'], meta.get('gen', 0)
+            if not rows:
+                return None
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == (gen, rows):
+                return cached[1]
+            directory = self.path(symbol, interval)
+            try:
+                maps = {column: np.memmap(_column_file(directory, column, gen),
+                                          dtype=np.dtype(dtype).newbyteorder('<'), mode='r', shape=(rows,))
+                        for column, dtype in CACHE_COLUMNS.items()}
+            except FileNotFoundError:
+                if attempt:
+                    raise
+                continue   # another process switched generations between meta and open
+            self._maps[key] = ((gen, rows), maps)
+            return maps
+
+    def read(self, symbol, interval, limit=None, start_time=None, end_time=None, columns=None):
+        """
+        Cached candles with start_time <= time < end_time (newest `limit` of
+        them), oldest first, as a frame shaped like fetch_history_db. Value
+        columns wrap the mapped files; None when the series is not cached.
+        """
+        maps = self.arrays(symbol, interval)
+        if maps is None:
+            return None
+        times = maps['time']
+        lo = 0 if start_time is None else int(np.searchsorted(times, _to_ms(start_time), side='left'))
+        hi = len(times) if end_time is None else int(np.searchsorted(times, _to_ms(end_time), side='left'))
+        if limit:
+            lo = max(lo, hi - int(limit))
+        self.hits += 1
+        selected = [c for c in CACHE_COLUMNS if c != 'time' and (columns is None or c in columns)]
+        data = {'time': pd.to_datetime(np.asarray(times[lo:hi]), unit='ms', utc=True)}
+        data.update({column: np.asarray(maps[column][lo:hi]) for column in selected})
+        return pd.DataFrame(data, copy=False)
+
+    def stats(self):
+        series = [name for name in os.listdir(self.root)] if os.path.isdir(self.root) else []
+        series = [name for name in series if not name.startswith('.')]
+        return {'series': len(series), 'hits': self.hits, 'rows_synced': self.rows_synced,
+                'rewrites': self.rewrites}
+
+
+def _to_ms(value):
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.value // 1_000_000
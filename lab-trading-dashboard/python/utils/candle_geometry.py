@@ -0,0 +1,84 @@
+# utils/candle_geometry.py
+
+"""
+Candle geometry features shared by the signal functions.
+
+add_candle_geometry() writes body, upper/lower wick, range and body ratio for
+the regular candle ('candle_*') and for the Heiken Ashi candle ('ha_*') in one
+vectorized pass. Consumers (candle strength, HA decision, candle labels,
+tdfi_breakout) read these columns instead of repeating the math.
+
+body_ratio is body / range, NaN when the range is not positive.
+"""
+
+import numpy as np
+import pandas as pd
+
+GEOMETRY_FIELDS = ('body', 'upper_wick', 'lower_wick', 'range', 'body_ratio')
+
+# kind -> (column prefix, open, high, low, close)
+CANDLE_KINDS = {
+    'regular': ('candle', 'open', 'high', 'low', 'close'),
+    'heiken': ('ha', 'ha_open', 'ha_high', 'ha_low', 'ha_close'),
+}
+
+
+def geometry_column(kind, field):
+    """Column name of one geometry field, e.g. ('heiken', 'body') -> 'ha_body'."""
+    return f"{CANDLE_KINDS[kind][0]}_{field}"
+
+
+def candle_geometry_arrays(open_, high, low, close):
+    """Body, wicks, range and body ratio of each candle as float arrays."""
+    o = np.asarray(open_, dtype=np.float64)
+    h = np.asarray(high, dtype=np.float64)
+    l = np.asarray(low, dtype=np.float64)
+    c = np.asarray(close, dtype=np.float64)
+
+    body = np.abs(c - o)
+    rng = h - l
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(rng > 0, body / rng, np.nan)
+    return {
+        'body': body,
+        'upper_wick': h - np.maximum(o, c),
+        'lower_wick': np.minimum(o, c) - l,
+        'range': rng,
+        'body_ratio': ratio,
+    }
+
+
+def add_candle_geometry(df, kinds=('regular', 'heiken')):
+    """Add the geometry columns for every kind whose OHLC columns are present."""
+    for kind in kinds:
+        prefix, o, h, l, c = CANDLE_KINDS[kind]
+        if not all(col in df.columns for col in (o, h, l, c)):
+            continue
+        geometry = candle_geometry_arrays(df[o], df[h], df[l], df[c])
+        for field in GEOMETRY_FIELDS:
+            df[f"{prefix}_{field}"] = geometry[field]
+    return df
+
+
+def candle_geometry(df, kind='regular'):
+    """
+    Geometry of `df` as Series keyed by field. Reads the precomputed columns
+    when add_candle_geometry() already ran, otherwise computes them.
+    """
+    columns = [geometry_column(kind, field) for field in GEOMETRY_FIELDS]
+    if all(col in df.columns for col in columns):
+        return {field: df[col] for field, col in zip(GEOMETRY_FIELDS, columns)}
+
+    _, o, h, l, c = CANDLE_KINDS[kind]
+    geometry = candle_geometry_arrays(df[o], df[h], df[l], df[c])
+    return {field: pd.Series(values, index=df.index) for field, values in geometry.items()}
+
+
+def body_ratio_of_row(row, kind='heiken'):
+    """Body ratio of a single row (NaN when the range is not positive)."""
+    column = geometry_column(kind, 'body_ratio')
+    if column in row:
+        return row[column]
+    _, o, h, l, c = CANDLE_KINDS[kind]
+    total_range = row[h] - row[l]
+    return abs(row[c] - row[o]) / total_range if total_range > 0 else np.nan
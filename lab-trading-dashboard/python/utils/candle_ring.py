@@ -0,0 +1,274 @@
+# utils/candle_ring.py
+
+"""
+In-memory ring buffers of OHLCV candles.
+
+OHLCVRing holds the latest `capacity` closed candles of one series in a
+single float64 matrix (rows: time ms, open, high, low, close, volume). Every
+candle is written twice, at slot p and p + capacity, so the newest n candles
+are always one contiguous slice:
+
+- append() is O(1) (two column writes, no reallocation)
+- window(n) returns read-only views into the matrix, no copy
+- a window of n candles stays valid for the next `capacity - n` appends;
+  CandleRingStore sizes rings as `window + headroom` for that reason. Copy a
+  window that has to outlive that.
+
+CandleRingStore keeps one ring per (symbol, interval). Its frame() adapter
+wraps the views in a DataFrame (copy=False) with fetch_data_safe's OHLCV
+columns, oldest first on a RangeIndex, for callers that still expect frames.
+fetch() reads through the rings: once a series is loaded, each newly closed
+candle costs a read of only the candles closed since instead of the full
+500-row window. Every fetch() result has that layout, whichever path served it.
+
+A series that restarts (replace, or a frame that does not join onto the ring)
+gets a new ring, so views already handed out keep their candles. Rings not
+used for a while are evicted once the store holds more than `max_series`.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.frame_cache import last_closed_open_time
+
+OHLCV_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+
+class OHLCVRing:
+    """Fixed-capacity ring of closed candles for one (symbol, interval)."""
+
+    def __init__(self, capacity, interval_ms):
+        self.capacity = capacity
+        self.interval_ms = interval_ms
+        self._data = np.zeros((len(OHLCV_FIELDS), 2 * capacity), dtype=np.float64)
+        self._count = 0    # candles appended since the last clear
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    @property
+    def last_time(self):
+        """Open time (ms) of the newest candle, None when empty."""
+        if not self._count:
+            return None
+        return int(self._data[0, (self._count - 1) % self.capacity])
+
+    def clear(self):
+        self._count = 0
+
+    def append(self, candle):
+        """Append (time_ms, open, high, low, close, volume); a repeat of the newest open time replaces it."""
+        last = self.last_time
+        if last is not None and candle[0] <= last:
+            if candle[0] == last:
+                slot = (self._count - 1) % self.capacity
+                self._data[:, slot] = candle
+                self._data[:, slot + self.capacity] = candle
+            return False
+        slot = self._count % self.capacity
+        self._data[:, slot] = candle
+        self._data[:, slot + self.capacity] = candle
+        self._count += 1
+        return True
+
+    def extend(self, times_ms, open_, high, low, close, volume):
+        """Append columns (oldest first); rows not newer than the ring's newest candle are skipped."""
+        last = self.last_time
+        times_ms = np.asarray(times_ms, dtype=np.float64)
+        start = 0 if last is None else int(np.searchsorted(times_ms, last, side='right'))
+        columns = [times_ms] + [np.asarray(c, dtype=np.float64) for c in (open_, high, low, close, volume)]
+        if start > 0 and times_ms[start - 1] == last:
+            self.append(tuple(c[start - 1] for c in columns))   # refresh the newest candle
+        for i in range(start, len(times_ms)):
+            self.append(tuple(c[i] for c in columns))
+        return len(times_ms) - start
+
+    def window(self, n, min_last_ms=None):
+        """
+        Read-only views {field: array} of the newest `n` candles when the ring
+        holds n contiguous candles (and the newest opened at `min_last_ms` or
+        later), else None.
+        """
+        if n <= 0 or n > len(self):
+            return None
+        end = (self._count - 1) % self.capacity + self.capacity + 1
+        view = self._data[:, end - n:end]
+        times = view[0]
+        if times[-1] - times[0] != (n - 1) * self.interval_ms:
+            return None
+        if min_last_ms is not None and times[-1] < min_last_ms:
+            return None
+        view = view.view()
+        view.setflags(write=False)
+        return {field: view[i] for i, field in enumerate(OHLCV_FIELDS)}
+
+
+def ohlcv_frame(arrays):
+    """DataFrame over window() views (time as UTC datetimes, price/volume columns not copied)."""
+    data = {'time': pd.to_datetime(arrays['time'].astype(np.int64), unit='ms', utc=True)}
+    data.update({field: arrays[field] for field in OHLCV_FIELDS[1:]})
+    return pd.DataFrame(data, copy=False)
+
+
+def ohlcv_columns(df):
+    """{field: array} of a candle frame sorted oldest first (time as int64 ms, OHLCV as float64)."""
+    df = df.sort_values('time')
+    times = pd.to_datetime(df['time'], utc=True).to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    columns = {'time': times}
+    columns.update({field: df[field].to_numpy(dtype=np.float64) for field in OHLCV_FIELDS[1:]})
+    return columns
+
+
+class CandleRingStore:
+    """One OHLCVRing per (symbol, interval), sized `window + headroom`; max_series=None never evicts."""
+
+    def __init__(self, intervals_ms, window=500, headroom=64, max_series=1024):
+        self.intervals_ms = dict(intervals_ms)
+        self.window_size = window
+        self.capacity = window + headroom
+        self.max_series = max_series
+        self._rings = {}
+        self._used = {}    # (symbol, interval) -> monotonic time of the last access
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self.hits = self.top_ups = self.full_reads = self.evictions = 0
+
+    def ring(self, symbol, interval, create=True):
+        key = (symbol, interval)
+        ring = self._rings.get(key)
+        if ring is None and create and interval in self.intervals_ms:
+            with self._lock:
+                ring = self._rings.get(key)
+                if ring is None:
+                    ring = self._rings[key] = OHLCVRing(self.capacity, self.intervals_ms[interval])
+                    self._used[key] = time.monotonic()
+                    self._evict()
+        if ring is not None:
+            self._used[key] = time.monotonic()
+        return ring
+
+    def _evict(self):
+        """Drop least recently used series beyond max_series (caller holds _lock)."""
+        while self.max_series and len(self._rings) > self.max_series:
+            key = min(self._rings, key=lambda k: self._used.get(k, 0))
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key):
+        self._rings.pop(key, None)
+        self._used.pop(key, None)
+        self._fetch_locks.pop(key, None)
+
+    def discard(self, symbol, interval=None):
+        with self._lock:
+            for key in [k for k in self._rings if k[0] == symbol and (interval is None or k[1] == interval)]:
+                self._drop(key)
+
+    def keys(self):
+        return list(self._rings)
+
+    def last_time(self, symbol, interval):
+        ring = self.ring(symbol, interval, create=False)
+        return ring.last_time if ring is not None else None
+
+    def append(self, symbol, interval, candle):
+        ring = self.ring(symbol, interval)
+        return ring.append(candle) if ring is not None else False
+
+    def load(self, symbol, interval, df, replace=False):
+        """
+        Append a candle frame (time + OHLCV columns). With replace=True, or
+        when the frame does not join onto the ring's newest candle, the series
+        restarts from the frame in a new ring (views of the old one are left
+        as they are). Returns candles appended.
+        """
+        ring = self.ring(symbol, interval)
+        if ring is None or df is None or df.empty:
+            return 0
+        columns = ohlcv_columns(df)
+        times = columns['time']
+        last = ring.last_time
+        if last is not None and (replace or times[0] > last + ring.interval_ms):
+            ring = OHLCVRing(self.capacity, ring.interval_ms)
+            with self._lock:
+                self._rings[(symbol, interval)] = ring
+        return ring.extend(*(columns[field] for field in OHLCV_FIELDS))
+
+    def window(self, symbol, interval, n=None, min_last_ms=None):
+        ring = self.ring(symbol, interval, create=False)
+        if ring is None:
+            return None
+        return ring.window(n or self.window_size, min_last_ms)
+
+    def frame(self, symbol, interval, n=None, min_last_ms=None):
+        arrays = self.window(symbol, interval, n, min_last_ms)
+        return ohlcv_frame(arrays) if arrays is not None else None
+
+    def fetch(self, symbol, interval, fetch, n=None, now_ms=None):
+        """
+        The newest `n` closed candles through `fetch(symbol, interval, limit)`
+        (fetch_data_safe): no read when the ring is current, a read of the
+        candles closed since (plus one overlapping) when it is a few behind,
+        and a full read otherwise. Always time + OHLCV, oldest first, on a
+        RangeIndex (None when the read failed).
+        """
+        n = n or self.window_size
+        interval_ms = self.intervals_ms.get(interval)
+        if interval_ms is None:
+            return self._as_frame(fetch(symbol, interval, n))
+        expected = last_closed_open_time(interval_ms, now_ms)
+        df = self.frame(symbol, interval, n, min_last_ms=expected)
+        if df is not None:
+            self.hits += 1
+            return df
+
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault((symbol, interval), threading.Lock())
+        with fetch_lock:   # one reader per series; the others get its result from the ring
+            df = self.frame(symbol, interval, n, min_last_ms=expected)
+            if df is not None:
+                self.hits += 1
+                return df
+            return self._read_through(symbol, interval, fetch, n, interval_ms, expected)
+
+    def _read_through(self, symbol, interval, fetch, n, interval_ms, expected):
+        last = self.last_time(symbol, interval)
+        missing = (expected - last) // interval_ms if last is not None else n
+        if 0 < missing < n:
+            recent = fetch(symbol, interval, missing + 1)
+            if recent is not None and not recent.empty and 'time' in recent.columns:
+                self.load(symbol, interval, recent)
+                df = self.frame(symbol, interval, n, min_last_ms=expected)
+                if df is not None:
+                    self.top_ups += 1
+                    return df
+
+        self.full_reads += 1
+        df = fetch(symbol, interval, n)
+        if df is None or df.empty or 'time' not in df.columns:
+            return df
+        self.load(symbol, interval, df, replace=True)
+        ring = self.ring(symbol, interval, create=False)
+        framed = self.frame(symbol, interval, min(n, len(ring))) if ring is not None and len(ring) else None
+        # Fewer candles than the window, or a hole in them: a copy in the same layout
+        return framed if framed is not None else self._as_frame(df)
+
+    @staticmethod
+    def _as_frame(df):
+        if df is None or df.empty or 'time' not in df.columns:
+            return df
+        return ohlcv_frame(ohlcv_columns(df))
+
+    def stats(self):
+        rings = list(self._rings.values())
+        return {'series': len(rings), 'capacity': self.capacity,
+                'mb': round(sum(r.nbytes for r in rings) / (1024 * 1024), 2),
+                'hits': self.hits, 'top_ups': self.top_ups, 'full_reads': self.full_reads,
+                'evictions': self.evictions}
@@ -0,0 +1,666 @@
+# utils/candle_store.py
+
+"""
+Data-access layer for kline storage.
+
+The DB modules (FinalVersionTradingDB_PostgreSQL, Final_olab_database,
+backtestdb) read and write candles through a store object instead of building
+`kline_{symbol}_{interval}` SQL themselves. Two backends:
+
+- TableCandleStore       : the existing layout, one table per symbol/interval
+- PartitionedCandleStore : one `candles` table partitioned by interval (LIST),
+                           optionally sub-partitioned by month on open_time,
+                           keyed by (symbol_id, interval, open_time); symbols
+                           live in `candle_symbols`
+
+Both return frames with the legacy column names (time, open, ..., quotevolume,
+numtrades, ...) so the fetch_* functions post-process them unchanged.
+make_candle_store() picks the backend from CANDLE_STORAGE ('tables' by
+default, 'partitioned' after running utils/migrate_candles.py).
+
+Times are stored as naive UTC in both backends: writes convert epoch ms with
+utc_timestamp_sql() so the result does not depend on the session TimeZone, and
+the time bounds readers pass in go through _naive_utc().
+
+Store methods raise on bad input; the DB module wrappers keep their own
+try/except + log_db_error handling.
+"""
+
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+KLINE_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume', 'closetime',
+                 'quotevolume', 'numtrades', 'takerbuybasevolume', 'takerbuyquotevolume')
+VALUE_COLUMNS = KLINE_COLUMNS[1:]
+OHLCV_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+# Stored column -> name used in the frames the DB modules return
+FRAME_COLUMN_NAMES = {'quotevolume': 'quote_volume', 'numtrades': 'num_trades',
+                      'takerbuybasevolume': 'taker_base_vol', 'takerbuyquotevolume': 'taker_quote_vol'}
+_STORED_COLUMN_NAMES = {frame: stored for stored, frame in FRAME_COLUMN_NAMES.items()}
+
+HISTORY_CHUNK_ROWS = 50_000   # rows per chunk of the streaming history reader
+
+# Staging table used by the COPY ingestion path (utils/kline_ingest.py)
+STAGE_TABLE = 'kline_stage'
+STAGE_COLUMNS = ('symbol', 'interval', 'time_ms') + VALUE_COLUMNS
+
+CANDLE_STORAGE = os.getenv('CANDLE_STORAGE', 'tables')
+
+_SYMBOL_RE = re.compile(r'^[A-Za-z0-9_]+$')
+_INTERVAL_RE = re.compile(r'^[0-9]+[mhdwM]$')
+_TABLE_RE = re.compile(r'^kline_([a-z0-9_]+)_([0-9]+[mhdw])$')
+
+
+def _check(symbol, interval):
+    if not _SYMBOL_RE.match(symbol or ''):
+        raise ValueError(f"Unsafe symbol: {symbol!r}")
+    if not _INTERVAL_RE.match(interval or ''):
+        raise ValueError(f"Unsafe interval: {interval!r}")
+
+
+def kline_table_name(symbol, interval):
+    _check(symbol, interval)
+    return f"kline_{symbol.lower()}_{interval}"
+
+
+def parse_kline_table(table_name):
+    """'kline_btcusdt_15m' -> ('BTCUSDT', '15m'); None for other tables."""
+    match = _TABLE_RE.match(table_name)
+    if not match:
+        return None
+    return match.group(1).upper(), match.group(2)
+
+
+def kline_records(klines):
+    """Binance kline rows -> insert parameter dicts (time in ms)."""
+    return [{
+        "time": k[0], "open": float(k[1]), "high": float(k[2]), "low": float(k[3]),
+        "close": float(k[4]), "volume": float(k[5]), "closetime": k[6], "quotevolume": float(k[7]),
+        "numtrades": int(k[8]), "takerbuybasevolume": float(k[9]), "takerbuyquotevolume": float(k[10])
+    } for k in klines]
+
+
+def utc_timestamp_sql(ms_expr):
+    """SQL turning an epoch-ms expression into a naive UTC TIMESTAMP, whatever the session TimeZone."""
+    return f"(to_timestamp({ms_expr}/1000.0) AT TIME ZONE 'UTC')"
+
+
+def _naive_utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_convert(None) if ts.tzinfo else ts
+
+
+def _projection(columns):
+    """Stored value columns to read ('time' is always read first); accepts frame names like quote_volume."""
+    if columns is None:
+        return list(VALUE_COLUMNS)
+    projected = []
+    for column in columns:
+        column = _STORED_COLUMN_NAMES.get(column, column)
+        if column == 'time' or column in projected:
+            continue
+        if column not in VALUE_COLUMNS:
+            raise ValueError(f"Unknown kline column: {column!r}")
+        projected.append(column)
+    return projected
+
+
+def _time_bounds_sql(column, start_time, end_time):
+    """(' AND ...' clause, params) for start_time <= column < end_time; either bound may be None."""
+    clause, params = '', {}
+    if start_time is not None:
+        clause += f" AND {column} >= :start_time"
+        params['start_time'] = _naive_utc(start_time)
+    if end_time is not None:
+        clause += f" AND {column} < :end_time"
+        params['end_time'] = _naive_utc(end_time)
+    return clause, params
+
+
+def bulk_arrays(df):
+    """
+    Long frame from fetch_latest_bulk -> {(symbol, interval): {column: ndarray}}
+    (time as epoch ms int64, values float64). Series are contiguous runs of
+    the sorted frame, so each array is a slice of one column array.
+    """
+    if df is None or df.empty:
+        return {}
+    symbols, intervals = df['symbol'].to_numpy(), df['interval'].to_numpy()
+    starts = np.flatnonzero((symbols[1:] != symbols[:-1]) | (intervals[1:] != intervals[:-1])) + 1
+    bounds = zip(np.concatenate(([0], starts)), np.concatenate((starts, [len(df)])))
+    columns = {'time': pd.to_datetime(df['time'], utc=True).astype('int64').to_numpy() // 1_000_000}
+    columns.update({column: df[column].to_numpy(dtype=np.float64)
+                    for column in df.columns if column not in ('symbol', 'interval', 'time')})
+    return {(symbols[start], intervals[start]): {column: values[start:end] for column, values in columns.items()}
+            for start, end in bounds}
+
+
+def history_chunks(chunks, as_arrays=False):
+    """
+    (columns, rows) chunks from SQLAccessHelper.stream -> DataFrames with
+    frame column names, or {column: ndarray} with time as epoch ms (int64).
+    """
+    for columns, rows in chunks:
+        df = pd.DataFrame.from_records(rows, columns=columns).rename(columns=FRAME_COLUMN_NAMES)
+        df['time'] = pd.to_datetime(df['time'], utc=True)
+        if not as_arrays:
+            yield df
+            continue
+        arrays = {column: df[column].to_numpy() for column in df.columns if column != 'time'}
+        arrays['time'] = df['time'].astype('int64').to_numpy() // 1_000_000
+        yield arrays
+
+
+class TableCandleStore:
+    """One table per symbol/interval (kline_{symbol}_{interval})."""
+
+    backend = 'tables'
+
+    def __init__(self, sql):
+        self.sql = sql
+
+    def list_series(self):
+        """[(symbol, interval, table_name)] for every kline_* table."""
+        rows = self.sql.fetch_all(
+            "SELECT table_name FROM information_schema.tables WHERE table_name LIKE 'kline\\_%'"
+        ) or []
+        series = []
+        for (name,) in rows:
+            parsed = parse_kline_table(name)
+            if parsed:
+                series.append((*parsed, name))
+        return series
+
+    def latest_times(self, chunk_size=200):
+        """{(symbol, interval): latest candle time} for every kline_* table (one query per chunk)."""
+        latest = {}
+        series = self.list_series()
+        for start in range(0, len(series), chunk_size):
+            chunk = series[start:start + chunk_size]
+            query = " UNION ALL ".join(
+                f"SELECT '{table_name}' AS table_name, MAX(time) AS latest FROM {table_name}"
+                for _, _, table_name in chunk
+            )
+            names = {table_name: (symbol, interval) for symbol, interval, table_name in chunk}
+            for table_name, value in self.sql.fetch_all(query) or []:
+                latest[names[table_name]] = value
+        return latest
+
+    def exists(self, symbol, interval):
+        result = self.sql.fetch_one(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = :table_name",
+            {"table_name": kline_table_name(symbol, interval)},
+        )
+        return result[0] > 0 if result else False
+
+    def latest_time(self, symbol, interval):
+        row = self.sql.fetch_one(f"SELECT MAX(time) FROM {kline_table_name(symbol, interval)}")
+        return row[0] if row and row[0] else None
+
+    def fetch_latest(self, symbol, interval, limit):
+        """Newest `limit` candles, newest first."""
+        return self.sql.fetch_dataframe(
+            f"SELECT * FROM {kline_table_name(symbol, interval)} ORDER BY time DESC LIMIT {int(limit)}"
+        )
+
+    def fetch_all(self, symbol, interval):
+        """Every candle, newest first."""
+        return self.sql.fetch_dataframe(f"SELECT * FROM {kline_table_name(symbol, interval)} ORDER BY time DESC")
+
+    def fetch_range(self, symbol, interval, start_time, end_time):
+        """Candles with start_time <= time < end_time, oldest first."""
+        return self.sql.fetch_dataframe(
+            f"""
+            SELECT *
+            FROM {kline_table_name(symbol, interval)}
+            WHERE time >= :start_time AND time < :end_time
+            ORDER BY time ASC
+            """,
+            params={"start_time": _naive_utc(start_time), "end_time": _naive_utc(end_time)},
+        )
+
+    def history_sql(self, symbol, interval, limit=None, start_time=None, end_time=None, columns=None):
+        """
+        (sql, params) reading the candles in [start_time, end_time), oldest
+        first; with `limit` only the newest `limit` of them.
+        """
+        table_name = kline_table_name(symbol, interval)
+        select = ", ".join(['time'] + _projection(columns))
+        bounds, params = _time_bounds_sql('time', start_time, end_time)
+        where = f" WHERE TRUE{bounds}" if bounds else ""
+        if limit:
+            return (f"SELECT * FROM (SELECT {select} FROM {table_name}{where} ORDER BY time DESC LIMIT {int(limit)}) h "
+                    f"ORDER BY time ASC", params)
+        return f"SELECT {select} FROM {table_name}{where} ORDER BY time ASC", params
+
+    def fetch_history(self, symbol, interval, limit=None, start_time=None, end_time=None, columns=None):
+        sql, params = self.history_sql(symbol, interval, limit, start_time, end_time, columns)
+        return self.sql.fetch_dataframe(sql, params=params or None)
+
+    def iter_history(self, symbol, interval, start_time=None, end_time=None, columns=None, chunk_size=HISTORY_CHUNK_ROWS):
+        """(columns, rows) chunks of the range through a server-side cursor."""
+        sql, params = self.history_sql(symbol, interval, None, start_time, end_time, columns)
+        return self.sql.stream(sql, params, chunk_size)
+
+    def time_bounds(self, symbol, interval):
+        return self.sql.fetch_dataframe(
+            f"SELECT MIN(time) AS min_time, MAX(time) AS max_time FROM {kline_table_name(symbol, interval)}"
+        )
+
+    def find_gaps(self, symbol, interval, interval_ms, start_time):
+        """
+        Interior holes since `start_time`: [(last candle before, first candle
+        after)] for every pair of neighbours more than one interval apart.
+        """
+        return self.sql.fetch_all(
+            f"""
+            SELECT prev_time, time FROM (
+                SELECT time, LAG(time) OVER (ORDER BY time) AS prev_time
+                FROM {kline_table_name(symbol, interval)}
+                WHERE time >= :start_time
+            ) t
+            WHERE time - prev_time > :step_ms * INTERVAL '1 millisecond'
+            ORDER BY time
+            """,
+            {"start_time": _naive_utc(start_time), "step_ms": int(interval_ms)},
+        ) or []
+
+    def row_count(self, symbol, interval):
+        """Exact number of stored candles; 0 when the table does not exist."""
+        table_name = kline_table_name(symbol, interval)
+        exists_rows = self.sql.fetch_all(f"SELECT to_regclass('public.{table_name}')")
+        if not exists_rows or exists_rows[0][0] is None:
+            return 0
+        count_rows = self.sql.fetch_all(f'SELECT COUNT(*)::bigint FROM public."{table_name}";')
+        return int(count_rows[0][0])
+
+    def insert(self, symbol, interval, records):
+        sql = f"""
+        INSERT INTO {kline_table_name(symbol, interval)} (time, open, high, low, close, volume, closetime, quotevolume, numtrades, takerbuybasevolume, takerbuyquotevolume)
+        VALUES ({utc_timestamp_sql(':time')}, :open, :high, :low, :close, :volume, :closetime, :quotevolume, :numtrades, :takerbuybasevolume, :takerbuyquotevolume)
+        ON CONFLICT (time) DO NOTHING
+        """
+        return self.sql.execute_many(sql, records, autocommit=True)
+
+    def create_series_sql(self, symbol, interval):
+        """DDL of one kline table (same columns and conflict key the inserts expect)."""
+        return f"""
+        CREATE TABLE IF NOT EXISTS {kline_table_name(symbol, interval)} (
+            time TIMESTAMP PRIMARY KEY,
+            open DOUBLE PRECISION, high DOUBLE PRECISION, low DOUBLE PRECISION, close DOUBLE PRECISION,
+            volume DOUBLE PRECISION, closetime BIGINT, quotevolume DOUBLE PRECISION, numtrades INTEGER,
+            takerbuybasevolume DOUBLE PRECISION, takerbuyquotevolume DOUBLE PRECISION
+        )"""
+
+    def merge_stage_sql(self, keys):
+        """
+        Statements moving the staged rows of every (symbol, interval) in `keys`
+        into its table: a single INSERT ... SELECT per table, chained as CTEs so
+        it is one statement. It returns (symbol, interval, inserted rows) per key.
+        """
+        columns = ", ".join(VALUE_COLUMNS)
+        ctes, counts = [], []
+        for i, (symbol, interval) in enumerate(keys):
+            ctes.append(f"""
+            i{i} AS (
+                INSERT INTO {kline_table_name(symbol, interval)} (time, {columns})
+                SELECT {utc_timestamp_sql('time_ms')}, {columns}
+                FROM {STAGE_TABLE}
+                WHERE symbol = '{symbol}' AND interval = '{interval}'
+                ON CONFLICT (time) DO NOTHING
+                RETURNING 1
+            )""")
+            counts.append(f"SELECT '{symbol}', '{interval}', (SELECT COUNT(*) FROM i{i})")
+        return ["WITH " + ",".join(ctes) + "\n" + " UNION ALL ".join(counts)]
+
+    def fetch_latest_many(self, symbols, interval, limit):
+        """Newest `limit` OHLCV candles of every symbol: symbol + OHLCV columns, oldest first per symbol."""
+        df = self.fetch_latest_bulk([(symbol, interval) for symbol in symbols], {interval: limit})
+        return df.drop(columns='interval', errors='ignore')
+
+    def fetch_latest_bulk(self, series, limits, columns=OHLCV_COLUMNS):
+        """
+        Newest limits[interval] candles of every (symbol, interval) in one
+        statement: symbol, interval + `columns`, ordered by symbol, interval,
+        time. Each series is its own table here, so that is one branch per
+        table; symbol/interval labels are bind parameters. Every table must exist.
+        """
+        select = ", ".join(['time'] + _projection(columns))
+        branches, params = [], {}
+        for i, (symbol, interval) in enumerate(series):
+            params[f"s{i}"], params[f"i{i}"] = symbol, interval
+            branches.append(
+                f"(SELECT :s{i} AS symbol, :i{i} AS interval, {select} FROM {kline_table_name(symbol, interval)} "
+                f"ORDER BY time DESC LIMIT {int(limits[interval])})"
+            )
+        if not branches:
+            return pd.DataFrame()
+        return self.sql.fetch_dataframe(
+            f"SELECT * FROM ({' UNION ALL '.join(branches)}) AS bulkdata ORDER BY symbol, interval, time ASC", params=params
+        )
+
+
+class PartitionedCandleStore:
+    """
+    Single `candles` table: LIST partitions per interval, optional monthly RANGE
+    sub-partitions on open_time, primary key (symbol_id, interval, open_time).
+    """
+
+    backend = 'partitioned'
+
+    def __init__(self, sql, table='candles', symbols_table='candle_symbols'):
+        self.sql = sql
+        self.table = table
+        self.symbols_table = symbols_table
+        self._symbol_ids = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------- schema
+    def partition_name(self, interval):
+        # '1M' (month) and '1m' (minute) would collide as lower-case identifiers
+        return f"{self.table}_{interval.replace('M', 'mo')}"
+
+    def schema_sql(self, intervals, time_partition_intervals=(), months=()):
+        """
+        DDL for the parent table, symbol table and one partition per interval.
+        Intervals in `time_partition_intervals` get monthly sub-partitions for
+        `months` (first-of-month Timestamps) plus a DEFAULT partition.
+        """
+        statements = [
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.symbols_table} (
+                symbol_id SERIAL PRIMARY KEY,
+                symbol TEXT NOT NULL UNIQUE
+            )""",
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                symbol_id INTEGER NOT NULL,
+                interval TEXT NOT NULL,
+                open_time TIMESTAMP NOT NULL,
+                open DOUBLE PRECISION,
+                high DOUBLE PRECISION,
+                low DOUBLE PRECISION,
+                close DOUBLE PRECISION,
+                volume DOUBLE PRECISION,
+                closetime BIGINT,
+                quotevolume DOUBLE PRECISION,
+                numtrades INTEGER,
+                takerbuybasevolume DOUBLE PRECISION,
+                takerbuyquotevolume DOUBLE PRECISION,
+                PRIMARY KEY (symbol_id, interval, open_time)
+            ) PARTITION BY LIST (interval)""",
+        ]
+        for interval in intervals:
+            _check('X', interval)
+            partition = self.partition_name(interval)
+            if interval in time_partition_intervals:
+                statements.append(
+                    f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {self.table} "
+                    f"FOR VALUES IN ('{interval}') PARTITION BY RANGE (open_time)"
+                )
+                statements.append(f"CREATE TABLE IF NOT EXISTS {partition}_default PARTITION OF {partition} DEFAULT")
+                for month in months:
+                    start = pd.Timestamp(month).to_period('M').start_time
+                    end = start + pd.offsets.MonthBegin(1)
+                    statements.append(
+                        f"CREATE TABLE IF NOT EXISTS {partition}_{start:%Y%m} PARTITION OF {partition} "
+                        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                    )
+            else:
+                statements.append(
+                    f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {self.table} FOR VALUES IN ('{interval}')"
+                )
+        return statements
+
+    def create_schema(self, intervals, time_partition_intervals=(), months=()):
+        for statement in self.schema_sql(intervals, time_partition_intervals, months):
+            self.sql.execute(statement, autocommit=True)
+
+    # ------------------------------------------------------------ symbols
+    def symbol_id(self, symbol, create=False):
+        """Integer id of `symbol` (cached per process); None when unknown and not created."""
+        _check(symbol, '1m')
+        cached = self._symbol_ids.get(symbol)
+        if cached is not None:
+            return cached
+        with self._lock:
+            if create:
+                self.sql.execute(
+                    f"INSERT INTO {self.symbols_table} (symbol) VALUES (:symbol) ON CONFLICT (symbol) DO NOTHING",
+                    {"symbol": symbol}, autocommit=True,
+                )
+            row = self.sql.fetch_one(f"SELECT symbol_id FROM {self.symbols_table} WHERE symbol = :symbol", {"symbol": symbol})
+            if row:
+                self._symbol_ids[symbol] = row[0]
+                return row[0]
+        return None
+
+    def _where(self, symbol, interval):
+        _check(symbol, interval)
+        symbol_id = self.symbol_id(symbol)
+        return symbol_id, {"symbol_id": symbol_id, "interval": interval}
+
+    @property
+    def _select(self):
+        return "open_time AS time, " + ", ".join(VALUE_COLUMNS)
+
+    # ------------------------------------------------------------- reads
+    def list_series(self):
+        rows = self.sql.fetch_all(
+            f"SELECT DISTINCT s.symbol, c.interval FROM {self.table} c JOIN {self.symbols_table} s USING (symbol_id)"
+        ) or []
+        return [(symbol, interval, self.table) for symbol, interval in rows]
+
+    def latest_times(self):
+        rows = self.sql.fetch_all(
+            f"SELECT s.symbol, c.interval, MAX(c.open_time) FROM {self.table} c "
+            f"JOIN {self.symbols_table} s USING (symbol_id) GROUP BY s.symbol, c.interval"
+        ) or []
+        return {(symbol, interval): value for symbol, interval, value in rows}
+
+    def exists(self, symbol, interval):
+        symbol_id, params = self._where(symbol, interval)
+        if symbol_id is None:
+            return False
+        row = self.sql.fetch_one(
+            f"SELECT 1 FROM {self.table} WHERE symbol_id = :symbol_id AND interval = :interval LIMIT 1", params
+        )
+        return bool(row)
+
+    def latest_time(self, symbol, interval):
+        symbol_id, params = self._where(symbol, interval)
+        if symbol_id is None:
+            return None
+        row = self.sql.fetch_one(
+            f"SELECT MAX(open_time) FROM {self.table} WHERE symbol_id = :symbol_id AND interval = :interval", params
+        )
+        return row[0] if row and row[0] else None
+
+    def _fetch(self, symbol, interval, tail='', extra_params=None):
+        symbol_id, params = self._where(symbol, interval)
+        if symbol_id is None:
+            return pd.DataFrame()
+        params.update(extra_params or {})
+        return self.sql.fetch_dataframe(
+            f"SELECT {self._select} FROM {self.table} WHERE symbol_id = :symbol_id AND interval = :interval {tail}",
+            params=params,
+        )
+
+    def fetch_latest(self, symbol, interval, limit):
+        return self._fetch(symbol, interval, f"ORDER BY open_time DESC LIMIT {int(limit)}")
+
+    def fetch_all(self, symbol, interval):
+        return self._fetch(symbol, interval, "ORDER BY open_time DESC")
+
+    def fetch_range(self, symbol, interval, start_time, end_time):
+        return self._fetch(
+            symbol, interval,
+            "AND open_time >= :start_time AND open_time < :end_time ORDER BY open_time ASC",
+            {"start_time": _naive_utc(start_time), "end_time": _naive_utc(end_time)},
+        )
+
+    def history_sql(self, symbol, interval, limit=None, start_time=None, end_time=None, columns=None):
+        """Same as TableCandleStore.history_sql; None when the symbol is unknown."""
+        symbol_id, params = self._where(symbol, interval)
+        if symbol_id is None:
+            return None, None
+        select = ", ".join(['open_time AS time'] + _projection(columns))
+        bounds, bound_params = _time_bounds_sql('open_time', start_time, end_time)
+        params.update(bound_params)
+        base = f"SELECT {select} FROM {self.table} WHERE symbol_id = :symbol_id AND interval = :interval{bounds}"
+        if limit:
+            return f"SELECT * FROM ({base} ORDER BY open_time DESC LIMIT {int(limit)}) h ORDER BY time ASC", params
+        return f"{base} ORDER BY open_time ASC", params
+
+    def fetch_history(self, symbol, interval, limit=None, start_time=None, end_time=None, columns=None):
+        sql, params = self.history_sql(symbol, interval, limit, start_time, end_time, columns)
+        return self.sql.fetch_dataframe(sql, params=params) if sql else pd.DataFrame()
+
+    def iter_history(self, symbol, interval, start_time=None, end_time=None, columns=None, chunk_size=HISTORY_CHUNK_ROWS):
+        sql, params = self.history_sql(symbol, interval, None, start_time, end_time, columns)
+        return self.sql.stream(sql, params, chunk_size) if sql else iter(())
+
+    def time_bounds(self, symbol, interval):
+        symbol_id, params = self._where(symbol, interval)
+        if symbol_id is None:
+            return pd.DataFrame()
+        return self.sql.fetch_dataframe(
+            f"SELECT MIN(open_time) AS min_time, MAX(open_time) AS max_time FROM {self.table} "
+            f"WHERE symbol_id = :symbol_id AND interval = :interval",
+            params=params,
+        )
+
+    def find_gaps(self, symbol, interval, interval_ms, start_time):
+        symbol_id, params = self._where(symbol, interval)
+        if symbol_id is None:
+            return []
+        params.update({"start_time": _naive_utc(start_time), "step_ms": int(interval_ms)})
+        return self.sql.fetch_all(
+            f"""
+            SELECT prev_time, open_time FROM (
+                SELECT open_time, LAG(open_time) OVER (ORDER BY open_time) AS prev_time
+                FROM {self.table}
+                WHERE symbol_id = :symbol_id AND interval = :interval AND open_time >= :start_time
+            ) t
+            WHERE open_time - prev_time > :step_ms * INTERVAL '1 millisecond'
+            ORDER BY open_time
+            """,
+            params,
+        ) or []
+
+    def row_count(self, symbol, interval):
+        symbol_id, params = self._where(symbol, interval)
+        if symbol_id is None:
+            return 0
+        row = self.sql.fetch_one(
+            f"SELECT COUNT(*)::bigint FROM {self.table} WHERE symbol_id = :symbol_id AND interval = :interval", params
+        )
+        return int(row[0]) if row else 0
+
+    def fetch_latest_many(self, symbols, interval, limit):
+        df = self.fetch_latest_bulk([(symbol, interval) for symbol in symbols], {interval: limit})
+        return df.drop(columns='interval', errors='ignore')
+
+    def fetch_latest_bulk(self, series, limits, columns=OHLCV_COLUMNS):
+        """
+        Same as TableCandleStore.fetch_latest_bulk as one parameterized LATERAL
+        query (the SQL text does not depend on the symbols); unknown series
+        return no rows.
+        """
+        series = list(series)
+        for symbol, interval in series:
+            _check(symbol, interval)
+        if not series:
+            return pd.DataFrame()
+        projected = _projection(columns)
+        return self.sql.fetch_dataframe(
+            f"""
+            SELECT k.symbol, k.interval, c.time, {", ".join(f"c.{column}" for column in projected)}
+            FROM unnest(CAST(:symbols AS text[]), CAST(:intervals AS text[]), CAST(:limits AS integer[]))
+                 AS k(symbol, interval, n)
+            JOIN {self.symbols_table} s ON s.symbol = k.symbol
+            CROSS JOIN LATERAL (
+                SELECT open_time AS time, {", ".join(projected)}
+                FROM {self.table}
+                WHERE symbol_id = s.symbol_id AND interval = k.interval
+                ORDER BY open_time DESC
+                LIMIT k.n
+            ) c
+            ORDER BY k.symbol, k.interval, c.time ASC
+            """,
+            params={"symbols": [symbol for symbol, _ in series], "intervals": [interval for _, interval in series],
+                    "limits": [int(limits[interval]) for _, interval in series]},
+        )
+
+    # ------------------------------------------------------------ writes
+    def insert(self, symbol, interval, records):
+        _check(symbol, interval)
+        symbol_id = self.symbol_id(symbol, create=True)
+        if symbol_id is None:
+            return False
+        sql = f"""
+        INSERT INTO {self.table} (symbol_id, interval, open_time, open, high, low, close, volume, closetime, quotevolume, numtrades, takerbuybasevolume, takerbuyquotevolume)
+        VALUES (:symbol_id, :interval, {utc_timestamp_sql(':time')}, :open, :high, :low, :close, :volume, :closetime, :quotevolume, :numtrades, :takerbuybasevolume, :takerbuyquotevolume)
+        ON CONFLICT (symbol_id, interval, open_time) DO NOTHING
+        """
+        rows = [{**record, "symbol_id": symbol_id, "interval": interval} for record in records]
+        return self.sql.execute_many(sql, rows, autocommit=True)
+
+    def merge_stage_sql(self, keys):
+        """
+        Statements moving every staged row into `candles` (symbols first); the
+        last one returns (symbol, interval, inserted rows) per series.
+        """
+        for symbol, interval in keys:
+            _check(symbol, interval)
+        columns = ", ".join(VALUE_COLUMNS)
+        return [
+            f"""
+            INSERT INTO {self.symbols_table} (symbol)
+            SELECT DISTINCT symbol FROM {STAGE_TABLE}
+            ON CONFLICT (symbol) DO NOTHING
+            """,
+            f"""
+            WITH inserted AS (
+                INSERT INTO {self.table} (symbol_id, interval, open_time, {columns})
+                SELECT s.symbol_id, st.interval, {utc_timestamp_sql('st.time_ms')}, {", ".join(f"st.{c}" for c in VALUE_COLUMNS)}
+                FROM {STAGE_TABLE} st
+                JOIN {self.symbols_table} s ON s.symbol = st.symbol
+                ON CONFLICT (symbol_id, interval, open_time) DO NOTHING
+                RETURNING symbol_id, interval
+            )
+            SELECT s.symbol, i.interval, COUNT(*)
+            FROM inserted i JOIN {self.symbols_table} s USING (symbol_id)
+            GROUP BY s.symbol, i.interval
+            """,
+        ]
+
+    def migrate_sql(self, table_name, symbol_id, interval):
+        """
+        Server-side copy of one legacy kline table (idempotent via ON CONFLICT).
+        Legacy `time` is read as wall time in the :legacy_tz bind parameter
+        ('UTC' for tables written by TableCandleStore) and stored as naive UTC.
+        """
+        _check('X', interval)
+        columns = ", ".join(VALUE_COLUMNS)
+        return f"""
+        INSERT INTO {self.table} (symbol_id, interval, open_time, {columns})
+        SELECT {int(symbol_id)}, '{interval}', (time AT TIME ZONE :legacy_tz) AT TIME ZONE 'UTC', {columns}
+        FROM {table_name}
+        ON CONFLICT (symbol_id, interval, open_time) DO NOTHING
+        """
+
+
+def make_candle_store(sql, backend=None):
+    """Store for `sql` (a SQLAccessHelper) using `backend` or CANDLE_STORAGE."""
+    backend = backend or CANDLE_STORAGE
+    if backend == 'partitioned':
+        return PartitionedCandleStore(sql)
+    if backend != 'tables':
+        print(f"⚠️ Unknown CANDLE_STORAGE '{backend}', using per-table storage")
+    return TableCandleStore(sql)
@@ -1,18 +1,157 @@
 # utils/db_updater.py
 
+"""
+Periodic write-back of all_pairs to the machine table.
+
+Each cycle used to SELECT COUNT(*) and UPDATE all 35 columns for every UID,
+one round trip at a time, changed or not. TradeRowDiff remembers the values
+last flushed per UID, so a cycle finds the UIDs and columns that changed
+since and writes them with one UPDATE ... FROM (VALUES ...) in one
+transaction (olab_flush_trade_rows). The statement covers the union of the
+changed columns.
+
+When the statement fails and the DB still answers, the rows are written in
+halves down to single rows, so one bad row (e.g. a value its column rejects)
+no longer fails every cycle: the rows the DB rejects are logged and
+quarantined until their values change. When the DB does not answer the rows
+stay dirty for the next cycle.
+"""
+
 import time
 import traceback
 import threading
 from utils.global_store import all_pairs, all_pairs_lock, shutdown_event
 from utils.logger import log_error, log_info
-from utils.Final_olab_database import olab_update_table_from_all_pairs, olab_update_tmux_log
+from utils.Final_olab_database import (
+    TRADE_UPDATE_COLUMNS, olab_convert_boolean_to_int, olab_db_reachable, olab_flush_trade_rows,
+    olab_update_tmux_log, trade_state,
+)
 from machine_id import get_machine_id
 
+
+def _same(a, b):
+    return a == b or (a != a and b != b)   # NaN == NaN
+
+
+class TradeRowDiff:
+    """Last flushed value of every column per UID."""
+
+    def __init__(self, columns=TRADE_UPDATE_COLUMNS):
+        self.columns = tuple(columns)
+        self._flushed = {}   # uid -> {column: value}
+        self._quarantined = {}   # uid -> {column: value} of the row the DB rejected
+
+    def diff(self, pairs):
+        """{uid: (row, changed columns)} for UIDs that changed since their last flush."""
+        dirty = {}
+        for uid, item in list(pairs.items()):
+            if not item or not item.get('unique_id'):
+                continue
+            row = olab_convert_boolean_to_int(dict(item))
+            if any(column not in row for column in self.columns):
+                continue   # incomplete row: the full UPDATE used to fail on it too
+            bad = self._quarantined.get(uid)
+            if bad is not None and all(_same(row[c], bad[c]) for c in self.columns):
+                continue   # same values the DB rejected: retry once the row changes
+            last = self._flushed.get(uid)
+            changed = [c for c in self.columns if last is None or not _same(row[c], last[c])]
+            if changed:
+                dirty[uid] = (row, changed)
+        return dirty
+
+    def mark_flushed(self, dirty):
+        for uid, (row, _) in dirty.items():
+            self._flushed[uid] = {c: row[c] for c in self.columns}
+            self._quarantined.pop(uid, None)
+
+    def quarantine(self, uid, row):
+        self._quarantined[uid] = {c: row[c] for c in self.columns}
+
+    def quarantined(self):
+        return list(self._quarantined)
+
+    def prune(self, pairs):
+        for store in (self._flushed, self._quarantined):
+            for uid in [uid for uid in store if uid not in pairs]:
+                del store[uid]
+
+
 class DBUpdater:
     def __init__(self, interval_seconds=20):
         self.interval = interval_seconds
         self.running = True
         self.last_successful_update = time.time()
+        self.diff = TradeRowDiff()
+        self._flush_lock = threading.Lock()
+        self.last_cycle_ms = None
+        self.last_rows_written = 0
+        self.rows_written = self.cycles = self.failed_cycles = 0
+
+    def flush(self, machine_id):
+        """Write the UIDs/columns changed since the last flush; False when nothing could be written."""
+        if not self._flush_lock.acquire(blocking=False):
+            log_info("⏳ DBUpdater.flush: previous flush still running, skipping cycle")
+            return False
+        try:
+            started = time.perf_counter()
+            dirty = self.diff.diff(all_pairs)
+            written = self._write(machine_id, dirty)
+            rejected = []
+            if written is None:
+                if not olab_db_reachable():
+                    self.cycles += 1
+                    self.failed_cycles += 1
+                    log_error(Exception(f"Flush of {len(dirty)} UIDs failed, DB unreachable"),
+                              "DBUpdater.flush", machine_id)
+                    return False
+                written, rejected = self._bisect(machine_id, dirty)
+                for uid in rejected:
+                    self.diff.quarantine(uid, dirty.pop(uid)[0])
+                    log_error(Exception(f"Row rejected by {machine_id}; quarantined until it changes"),
+                              "DBUpdater.flush", uid)
+            self.last_cycle_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.cycles += 1
+            self.diff.mark_flushed(dirty)
+            self.diff.prune(all_pairs)
+            self.last_rows_written = written
+            self.rows_written += written
+            log_info(f"✅ DB flush: {len(dirty)} dirty UIDs, {written} rows written, "
+                     f"{len(rejected)} quarantined in {self.last_cycle_ms} ms")
+            return True
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, machine_id, dirty):
+        """One statement over `dirty`; rows written, None when it failed."""
+        if not dirty:
+            return 0
+        columns = [c for c in self.diff.columns if any(c in changed for _, changed in dirty.values())]
+        written = olab_flush_trade_rows(machine_id, [row for row, _ in dirty.values()], columns)
+        if written is not None:
+            # setlastpairPrice reads updated_at from trade_state; show it our write now
+            for uid, (row, _) in dirty.items():
+                trade_state.note_write(machine_id.lower(), uid, row['updated_at'])
+        return written
+
+    def _bisect(self, machine_id, dirty):
+        """Write a failed `dirty` in halves; (rows written, UIDs whose single-row write failed)."""
+        if len(dirty) == 1:
+            return 0, list(dirty)
+        uids = list(dirty)
+        written, rejected = 0, []
+        for part in (uids[:len(uids) // 2], uids[len(uids) // 2:]):
+            half = {uid: dirty[uid] for uid in part}
+            result = self._write(machine_id, half)
+            if result is None:
+                result, bad = self._bisect(machine_id, half)
+                rejected.extend(bad)
+            written += result
+        return written, rejected
+
+    def stats(self):
+        return {'cycles': self.cycles, 'failed_cycles': self.failed_cycles, 'last_cycle_ms': self.last_cycle_ms,
+                'last_rows_written': self.last_rows_written, 'rows_written': self.rows_written,
+                'quarantined': self.diff.quarantined()}
 
     def stop(self):
         """Stop the DB updater gracefully"""
@@ -32,10 +171,10 @@ class DBUpdater:
                 # ✅ Add timeout protection
                 
                 machine_id = get_machine_id() or 'UNKNOWN'
+                result = {}
                 with all_pairs_lock:
                     update_thread = threading.Thread(
-                        target= olab_update_table_from_all_pairs, 
-                        args=(all_pairs, machine_id)
+                        target=lambda: result.update(ok=self.flush(machine_id))
                     )
                 update_thread.daemon = True
                 update_thread.start()
@@ -46,6 +185,9 @@ class DBUpdater:
                 if update_thread.is_alive():
                     log_error(Exception("DB Update timeout"), "DBUpdater.run", "timeout")
                     consecutive_errors += 1
+                elif not result.get('ok'):
+                    consecutive_errors += 1
+                    log_info(f"⚠️ DB Update All Pairs failed ({consecutive_errors} in a row)")
                 else:
                     # Success
                     consecutive_errors = 0
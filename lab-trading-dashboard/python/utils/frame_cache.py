@@ -0,0 +1,181 @@
+# utils/frame_cache.py
+
+"""
+Per-process LRU cache of computed indicator frames.
+
+Entries are keyed by (symbol, interval, candle, last closed candle open time),
+so a frame is reused by every caller within the same candle and is replaced
+automatically once the next candle closes. Memory is capped by a byte budget
+(least recently used frames are evicted first). Hit/miss counters are pushed
+to a reporter callable (log_cache_performance in the trading scripts) every
+`report_every` lookups.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def last_closed_open_time(interval_ms, now_ms=None):
+    """Open time (ms) of the most recent fully closed candle."""
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return now_ms - (now_ms % interval_ms) - interval_ms
+
+
+def frame_nbytes(df):
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+class CandleFrameCache:
+    """Thread-safe LRU of DataFrames with a byte budget and hit/miss counters."""
+
+    def __init__(self, interval_ms, max_bytes=256 * 1024 * 1024, name='calculate_signals',
+                 reporter=None, report_every=500):
+        self.interval_ms = interval_ms
+        self.max_bytes = max_bytes
+        self.name = name
+        self.reporter = reporter
+        self.report_every = report_every
+
+        self._entries = OrderedDict()   # (base_key, columns_key) -> (df, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lookups_since_report = 0
+
+    # ------------------------------------------------------------------ keys
+    def key(self, symbol, interval, candle, now_ms=None):
+        """Base key for the current candle, or None when the interval is unknown."""
+        interval_ms = self.interval_ms.get(interval)
+        if not interval_ms:
+            return None
+        return (symbol, interval, candle, last_closed_open_time(interval_ms, now_ms))
+
+    @staticmethod
+    def _columns_key(columns):
+        return None if columns is None else frozenset(columns)
+
+    def is_current(self, base_key, df):
+        """True when `df` already contains the last closed candle of `base_key`."""
+        try:
+            last_time = pd.Timestamp(df['time'].iloc[-1])
+            if last_time.tzinfo is None:
+                last_time = last_time.tz_localize('UTC')
+            return last_time.value // 1_000_000 >= base_key[3]
+        except Exception:
+            return False
+
+    # --------------------------------------------------------------- lookups
+    def get(self, base_key, columns=None):
+        """Cached frame (a copy) for the key, or None. A full frame serves any column request."""
+        if base_key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get((base_key, None))
+            hit_key = (base_key, None)
+            if entry is None and columns is not None:
+                hit_key = (base_key, self._columns_key(columns))
+                entry = self._entries.get(hit_key)
+            if entry is not None:
+                self._entries.move_to_end(hit_key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._lookups_since_report += 1
+            due = self._lookups_since_report >= self.report_every
+            if due:
+                self._lookups_since_report = 0
+        if due:
+            self.report()
+        return entry[0].copy() if entry is not None else None
+
+    def put(self, base_key, df, columns=None):
+        """Store `df`; older candles of the same (symbol, interval, candle) are dropped."""
+        if base_key is None or df is None or df.empty or not self.is_current(base_key, df):
+            return
+        nbytes = frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            return
+        entry_key = (base_key, self._columns_key(columns))
+        with self._lock:
+            stale = [k for k in self._entries if k[0][:3] == base_key[:3] and k[0][3] < base_key[3]]
+            for k in stale:
+                self._bytes -= self._entries.pop(k)[1]
+            old = self._entries.pop(entry_key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[entry_key] = (df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def get_or_compute(self, base_key, compute, columns=None):
+        """
+        Cached frame for the key, or compute() it once (concurrent callers for the
+        same key wait for the first one) and cache the result.
+        """
+        cached = self.get(base_key, columns)
+        if cached is not None or base_key is None:
+            return cached if cached is not None else compute()
+
+        entry_key = (base_key, self._columns_key(columns))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(entry_key, threading.Lock())
+        try:
+            with key_lock:
+                with self._lock:
+                    entry = self._entries.get((base_key, None)) or self._entries.get(entry_key)
+                if entry is not None:
+                    return entry[0].copy()
+                df = compute()
+                if df is not None:
+                    self.put(base_key, df, columns)
+                    return df.copy()
+                return df
+        finally:
+            with self._lock:
+                self._key_locks.pop(entry_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # ----------------------------------------------------------------- stats
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_mb': round(self._bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate_percent': round(100.0 * self.hits / lookups, 2) if lookups else 0.0,
+            }
+
+    def report(self):
+        """Push the counters to the reporter (log_cache_performance)."""
+        if self.reporter is None:
+            return
+        stats = self.stats()
+        try:
+            self.reporter(
+                cache_type=self.name,
+                operation_type='SUMMARY',
+                cache_key=f"entries={stats['entries']} hits={stats['hits']} misses={stats['misses']} evictions={stats['evictions']}",
+                cache_size_mb=stats['size_mb'],
+                hit_rate_percent=stats['hit_rate_percent'],
+            )
+        except Exception as e:
+            print(f"❌ Error reporting {self.name} cache stats: {e}")
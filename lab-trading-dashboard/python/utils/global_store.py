@@ -20,6 +20,9 @@ analysis_tracker = {}
 all_pairs = {}
 all_pairs_locks  = {}
 all_pairs_lock = Lock()  # Added missing lock for all_pairs
+pair_uids = {}   # symbol -> frozenset of UIDs in all_pairs (see utils/pair_index.py)
+uid_pair = {}    # UID -> indexed symbol
+pair_uids_lock = Lock()
 analysis_tracker_locks = {}
 # utils/global_store.py
 
@@ -0,0 +1,348 @@
+# utils/incremental_indicators.py
+
+"""
+Incremental indicator state for calculate_all_indicators_optimized.
+
+State is kept per (symbol, interval, candle). The first call for a key seeds a
+TA-Lib stream handle for every base indicator on the frame it is given; later
+calls only step the handles over the candles that closed since the previous
+call, so each indicator costs O(1) per new bar instead of a full recompute.
+
+TA-Lib stream handles are bit-identical to the function API for the same bar,
+so the columns returned here equal a full recompute over every bar the engine
+has seen for that key. Note that EMA-type values therefore carry the warm-up
+of the key's first frame rather than of the latest 500-candle window only, so
+they differ from calculate_all_indicators_optimized over that window; callers
+opt in per call (state_key) and CalculateSignals only does so when
+INCREMENTAL_INDICATORS=1.
+
+Keys are evicted least recently used once more than `max_keys` are held or
+their buffers exceed `max_bytes` (each key holds ~1 MB at max_bars=1000).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import talib
+    from talib import stream as talib_stream
+    from talib import MA_Type
+    # Older TA-Lib wrappers only expose "last value" stream functions
+    STREAMING_AVAILABLE = hasattr(talib_stream.EMA, "open_and_fill")
+except ImportError:
+    talib = None
+    talib_stream = None
+    MA_Type = None
+    STREAMING_AVAILABLE = False
+
+from utils.heiken_ashi import heiken_ashi_arrays
+from utils.logger import log_error
+
+
+# (output columns, TA-Lib function, inputs, parameters) in the same order and
+# with the same periods as calculate_all_indicators_optimized. "src" is the
+# close of the selected candle type; high/low/close are always the raw candle.
+STREAM_SPECS = (
+    (('RSI_9',), 'RSI', ('src',), {'timeperiod': 9}),
+    (('RSI_14',), 'RSI', ('src',), {'timeperiod': 14}),
+    (('RSI_5',), 'RSI', ('src',), {'timeperiod': 5}),
+    (('RSI_21',), 'RSI', ('src',), {'timeperiod': 21}),
+    (('ema_5',), 'EMA', ('src',), {'timeperiod': 5}),
+    (('ema_8',), 'EMA', ('src',), {'timeperiod': 8}),
+    (('ema_9',), 'EMA', ('src',), {'timeperiod': 9}),
+    (('ema_14',), 'EMA', ('src',), {'timeperiod': 14}),
+    (('ema_21',), 'EMA', ('src',), {'timeperiod': 21}),
+    (('ema_39',), 'EMA', ('src',), {'timeperiod': 39}),
+    (('ema_50',), 'EMA', ('src',), {'timeperiod': 50}),
+    (('ema_100',), 'EMA', ('src',), {'timeperiod': 200}),
+    (('MACD', 'MACD_Signal', 'MACD_Histogram'), 'MACD', ('src',),
+     {'fastperiod': 12, 'slowperiod': 26, 'signalperiod': 9}),
+    (('BOLL_upper_band', 'BOLL_middle_band', 'BOLL_lower_band'), 'BBANDS', ('src',),
+     {'timeperiod': 20, 'nbdevup': 2, 'nbdevdn': 2, 'matype': 0}),
+    (('two_pole_macd', 'two_pole_Signal_Line', 'two_pole_macdhist'), 'MACD', ('src',),
+     {'fastperiod': 13, 'slowperiod': 21, 'signalperiod': 9}),
+    (('lower_two_pole_macd', 'lower_two_pole_Signal_Line', 'lower_two_pole_macdhist'), 'MACD', ('src',),
+     {'fastperiod': 5, 'slowperiod': 8, 'signalperiod': 9}),
+    (('34_144_9_macd', '34_144_9_Signal_Line', '34_144_9_macdhist'), 'MACD', ('src',),
+     {'fastperiod': 34, 'slowperiod': 144, 'signalperiod': 9}),
+    (('200_macd', '200_Signal_Line', '200_macdhist'), 'MACD', ('src',),
+     {'fastperiod': 100, 'slowperiod': 200, 'signalperiod': 50}),
+    (('ADX',), 'ADX', ('high', 'low', 'close'), {'timeperiod': 14}),
+    (('ema8_high',), 'EMA', ('high',), {'timeperiod': 8}),
+    (('ema8_low',), 'EMA', ('low',), {'timeperiod': 8}),
+    (('ema34_high',), 'EMA', ('high',), {'timeperiod': 34}),
+    (('ema34_low',), 'EMA', ('low',), {'timeperiod': 34}),
+    (('ema144_close',), 'EMA', ('close',), {'timeperiod': 144}),
+    (('ema233_close',), 'EMA', ('close',), {'timeperiod': 233}),
+    # STOCHRSI(14, 134, 3) fast %K, then the two extra SMA(3) smoothings
+    (('stochrsi_k_raw', None), 'STOCHRSI', ('src',),
+     {'timeperiod': 14, 'fastk_period': 134, 'fastd_period': 3, 'fastd_matype': 0}),
+    (('stochrsi_k',), 'SMA', ('stochrsi_k_raw',), {'timeperiod': 3}),
+    (('stochrsi_d',), 'SMA', ('stochrsi_k',), {'timeperiod': 3}),
+)
+
+HA_COLUMNS = ('ha_open', 'ha_close', 'ha_high', 'ha_low')
+SWING_FLAG_COLUMNS = ('swing_high', 'swing_low')
+SWING_ZONE_COLUMNS = ('swing_high_zone', 'swing_low_zone')
+SWING_WINDOW = 5
+
+FLOAT_COLUMNS = list(HA_COLUMNS) + [
+    name for names, _, _, _ in STREAM_SPECS for name in names if name
+] + list(SWING_ZONE_COLUMNS)
+INDICATOR_COLUMNS = FLOAT_COLUMNS + list(SWING_FLAG_COLUMNS)
+
+
+def _swings(src_high, src_low):
+    """Centered swing flags and forward-filled zones, as in calculate_all_indicators_optimized."""
+    window = SWING_WINDOW * 2 + 1
+    sh, sl = pd.Series(src_high), pd.Series(src_low)
+    is_high = (sh == sh.rolling(window, center=True).max()).to_numpy()
+    is_low = (sl == sl.rolling(window, center=True).min()).to_numpy()
+    return {
+        'swing_high': is_high,
+        'swing_low': is_low,
+        'swing_high_zone': pd.Series(np.where(is_high, sh, np.nan)).ffill().to_numpy(),
+        'swing_low_zone': pd.Series(np.where(is_low, sl, np.nan)).ffill().to_numpy(),
+    }
+
+
+class _SeriesState:
+    """Stream handles plus the retained output history for one key."""
+
+    def __init__(self, candle, times, o, h, l, c, max_bars):
+        self.candle = candle
+        self.lock = threading.Lock()
+        self.last_ohlc = (o[-1], h[-1], l[-1], c[-1])
+        self.total_bars = len(times)
+
+        cols = dict(zip(HA_COLUMNS, heiken_ashi_arrays(o, h, l, c)))
+        self.ha_prev = (cols['ha_open'][-1], cols['ha_close'][-1])
+
+        if candle == 'heiken':
+            src, src_high, src_low = cols['ha_close'], cols['ha_high'], cols['ha_low']
+        else:
+            src, src_high, src_low = c, h, l
+        inputs = {'src': src, 'high': h, 'low': l, 'close': c}
+
+        # open_and_fill returns the batch series over the seed history as well
+        self.handles = []
+        for names, func, args, params in STREAM_SPECS:
+            series = [np.asarray(inputs[arg] if arg in inputs else cols[arg], dtype=float) for arg in args]
+            handle, out = getattr(talib_stream, func).open_and_fill(*series, **params)
+            if not isinstance(out, tuple):
+                out = (out,)
+            for name, values in zip(names, out):
+                if name:
+                    cols[name] = values
+            self.handles.append((names, args, handle))
+
+        cols.update(_swings(src_high, src_low))
+        cols['time'] = times
+        cols['high'], cols['low'], cols['close'] = h, l, c   # raw candles, to validate the next frame's overlap
+        cols['src_high'] = src_high
+        cols['src_low'] = src_low
+
+        # Column buffers with spare room at the end; `start:end` is the retained history
+        self.max_bars = max(max_bars, len(times), 2 * SWING_WINDOW + 1)
+        capacity = 2 * self.max_bars
+        self.start, self.end = 0, len(times)
+        self.buffers = {}
+        for name, values in cols.items():
+            buf = np.empty(capacity, dtype=np.asarray(values).dtype)
+            buf[:self.end] = values
+            self.buffers[name] = buf
+
+    @property
+    def nbytes(self):
+        return sum(buf.nbytes for buf in self.buffers.values())
+
+    @property
+    def times(self):
+        return self.buffers['time'][self.start:self.end]
+
+    def window(self, n):
+        """Copies of the last `n` retained rows of every indicator column."""
+        return {name: self.buffers[name][self.end - n:self.end].copy() for name in INDICATOR_COLUMNS}
+
+    def _make_room(self):
+        size = self.end - self.start
+        keep = min(size, self.max_bars)
+        for buf in self.buffers.values():
+            buf[:keep] = buf[self.end - keep:self.end]
+        self.start, self.end = 0, keep
+
+    def _update_swings(self):
+        """Confirm the swing flag `SWING_WINDOW` bars back and re-ffill the zones after it."""
+        bufs, last = self.buffers, self.end - 1
+        bufs['swing_high'][last] = False
+        bufs['swing_low'][last] = False
+        for zone_col in SWING_ZONE_COLUMNS:
+            bufs[zone_col][last] = bufs[zone_col][last - 1]
+
+        if self.total_bars < 2 * SWING_WINDOW + 1:
+            return
+        pivot = last - SWING_WINDOW
+        lo, hi = pivot - SWING_WINDOW, pivot + SWING_WINDOW + 1
+        for flag_col, zone_col, values, pick in (
+            ('swing_high', 'swing_high_zone', bufs['src_high'], max),
+            ('swing_low', 'swing_low_zone', bufs['src_low'], min),
+        ):
+            level = values[pivot]
+            if level != pick(values[lo:hi]):
+                continue
+            bufs[flag_col][pivot] = True
+            bufs[zone_col][pivot:self.end] = level
+
+    def append(self, time_ns, o, h, l, c):
+        prev_open, prev_close = self.ha_prev
+        ha_close = (((o + h) + l) + c) / 4.0
+        ha_open = (prev_open + prev_close) / 2.0
+        ha_high = max(h, max(ha_open, ha_close))
+        ha_low = min(l, min(ha_open, ha_close))
+        self.ha_prev = (ha_open, ha_close)
+        bar = {'time': time_ns, 'ha_open': ha_open, 'ha_close': ha_close, 'ha_high': ha_high,
+               'ha_low': ha_low, 'high': h, 'low': l, 'close': c}
+
+        if self.candle == 'heiken':
+            bar['src'], bar['src_high'], bar['src_low'] = ha_close, ha_high, ha_low
+        else:
+            bar['src'], bar['src_high'], bar['src_low'] = c, h, l
+
+        for names, args, handle in self.handles:
+            value = handle.update(*(bar[arg] for arg in args))
+            if not isinstance(value, tuple):
+                value = (value,)
+            for name, v in zip(names, value):
+                if name:
+                    bar[name] = v
+
+        if self.end == len(self.buffers['time']):
+            self._make_room()
+        row = self.end
+        self.end += 1
+        for name, buf in self.buffers.items():
+            if name in bar:
+                buf[row] = bar[name]
+        self.total_bars += 1
+        self._update_swings()
+        self.last_ohlc = (o, h, l, c)
+
+
+class IncrementalIndicatorEngine:
+    """
+    Keeps indicator state per (symbol, interval, candle) key and returns the
+    indicator columns for a candle frame, stepping only the bars that closed
+    since the previous call for that key.
+    """
+
+    def __init__(self, max_bars=1000, max_keys=64, max_bytes=64 * 1024 * 1024):
+        self.max_bars = max_bars
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self._states = OrderedDict()   # least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._states.clear()
+                self._bytes = 0
+            else:
+                state = self._states.pop(key, None)
+                if state is not None:
+                    self._bytes -= state.nbytes
+
+    def _seed(self, key, candle, times, o, h, l, c):
+        state = _SeriesState(candle, times, o, h, l, c, self.max_bars)
+        with self._lock:
+            old = self._states.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._states[key] = state
+            self._bytes += state.nbytes
+            while len(self._states) > 1 and (len(self._states) > self.max_keys or self._bytes > self.max_bytes):
+                _, evicted = self._states.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return state
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._states), 'bytes': self._bytes, 'evictions': self.evictions}
+
+    def _advance(self, state, times, o, h, l, c):
+        """Step `state` to the end of the frame; False when it cannot continue from it."""
+        retained = state.times
+        last_time = retained[-1]
+        pos = int(np.searchsorted(times, last_time))
+        if pos >= len(times) or times[pos] != last_time:
+            # Either a gap bigger than this frame or a rewind
+            return False
+        if state.last_ohlc != (o[pos], h[pos], l[pos], c[pos]):
+            # The overlapping candle changed underneath us
+            return False
+        if len(retained) <= pos or retained[-1 - pos] != times[0]:
+            # The frame reaches back before the retained history
+            return False
+        overlap = slice(state.end - pos - 1, state.end)
+        if not (np.array_equal(state.buffers['time'][overlap], times[:pos + 1])
+                and np.array_equal(state.buffers['close'][overlap], c[:pos + 1])
+                and np.array_equal(state.buffers['high'][overlap], h[:pos + 1])
+                and np.array_equal(state.buffers['low'][overlap], l[:pos + 1])):
+            # An older candle was filled in or corrected since the previous call
+            return False
+        for i in range(pos + 1, len(times)):
+            state.append(times[i], o[i], h[i], l[i], c[i])
+        return True
+
+    def update(self, key, df, candle='regular'):
+        """
+        Return a dict of indicator arrays aligned with `df` (sorted ascending by
+        'time'), or None when the engine is unavailable for this frame and the
+        caller should recompute. Unknown keys, gaps larger than the frame,
+        rewinds and changed history all reseed the key from `df`.
+        """
+        if not STREAMING_AVAILABLE or df is None or df.empty:
+            return None
+        try:
+            time_col = df['time']
+            if not pd.api.types.is_datetime64_any_dtype(time_col):
+                time_col = pd.to_datetime(time_col, utc=True)
+            times = time_col.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            o = df['open'].to_numpy(dtype=float)
+            h = df['high'].to_numpy(dtype=float)
+            l = df['low'].to_numpy(dtype=float)
+            c = df['close'].to_numpy(dtype=float)
+
+            with self._lock:
+                state = self._states.get(key)
+                if state is not None:
+                    self._states.move_to_end(key)
+
+            advanced = False
+            if state is not None and state.candle == candle:
+                with state.lock:
+                    advanced = self._advance(state, times, o, h, l, c)
+            if not advanced:
+                state = self._seed(key, candle, times, o, h, l, c)
+
+            with state.lock:
+                return state.window(len(times))
+        except talib.InsufficientHistory:
+            # Too few candles to open every handle yet; the caller recomputes
+            self.reset(key)
+            return None
+        except Exception as e:
+            print(f"❌ Error in IncrementalIndicatorEngine.update for {key}: {e}")
+            log_error(e, "IncrementalIndicatorEngine.update", key[0] if key else None)
+            self.reset(key)
+            return None
+
+
+# Shared per-process engine used by CalculateSignals
+indicator_engine = IncrementalIndicatorEngine()
@@ -0,0 +1,132 @@
+# utils/kline_catalog.py
+
+"""
+In-process catalog of stored kline series and their latest candle time.
+
+The first lookup loads every series and its MAX(time) from the candle store
+in bulk (store.latest_times()). After that:
+
+- exists()/is_fresh() answer from memory; a fresh series costs no DB round trip
+- insert_klines reports what it wrote (note_insert), so this process never
+  has to re-read what it inserted itself
+- a series that looks stale is re-read once from the DB before the caller
+  goes to the API (another process may have inserted it)
+- unknown series are re-checked at most every `missing_ttl` seconds, and the
+  whole catalog is reloaded every `reload_every` seconds to pick up new tables
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+
+def to_ms(value):
+    """DB timestamp (naive = UTC) or epoch ms -> epoch ms; None stays None."""
+    if value is None or (not isinstance(value, (int, float)) and pd.isna(value)):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.value // 1_000_000
+
+
+class KlineCatalog:
+    """Thread-safe {(symbol, interval): latest candle ms} with lazy refresh."""
+
+    def __init__(self, store, reload_every=900, missing_ttl=60):
+        self.store = store
+        self.reload_every = reload_every
+        self.missing_ttl = missing_ttl
+
+        self._latest = {}     # (symbol, interval) -> latest ms (None: series exists but is empty)
+        self._missing = {}    # (symbol, interval) -> monotonic time of the last negative check
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.db_checks = 0
+        self.memory_hits = 0
+
+    # ---------------------------------------------------------------- loading
+    def load(self):
+        """(Re)load every series from the store in bulk."""
+        latest = {key: to_ms(value) for key, value in self.store.latest_times().items()}
+        with self._lock:
+            self._latest = latest
+            self._missing.clear()
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+        return len(latest)
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.reload_every:
+            self.load()
+
+    def refresh(self, symbol, interval):
+        """Re-read one series from the DB; returns its latest ms (None when missing/empty)."""
+        key = (symbol, interval)
+        self.db_checks += 1
+        latest = to_ms(self.store.latest_time(symbol, interval))
+        if latest is None and not self.store.exists(symbol, interval):
+            with self._lock:
+                self._latest.pop(key, None)
+                self._missing[key] = time.monotonic()
+            return None
+        with self._lock:
+            self._latest[key] = latest
+            self._missing.pop(key, None)
+        return latest
+
+    # ---------------------------------------------------------------- lookups
+    def exists(self, symbol, interval):
+        self._ensure_loaded()
+        key = (symbol, interval)
+        with self._lock:
+            if key in self._latest:
+                self.memory_hits += 1
+                return True
+            checked = self._missing.get(key)
+        if checked is not None and time.monotonic() - checked < self.missing_ttl:
+            self.memory_hits += 1
+            return False
+        self.refresh(symbol, interval)
+        with self._lock:
+            return key in self._latest
+
+    def latest_ms(self, symbol, interval):
+        self._ensure_loaded()
+        with self._lock:
+            return self._latest.get((symbol, interval))
+
+    def is_fresh(self, symbol, interval, min_time_ms):
+        """
+        True when the series has a candle at or after `min_time_ms`. Answered
+        from memory when it does; otherwise re-checked against the DB once.
+        """
+        if not self.exists(symbol, interval):
+            return False
+        latest = self.latest_ms(symbol, interval)
+        if latest is not None and latest >= min_time_ms:
+            self.memory_hits += 1
+            return True
+        latest = self.refresh(symbol, interval)
+        return latest is not None and latest >= min_time_ms
+
+    # ---------------------------------------------------------------- updates
+    def note_insert(self, symbol, interval, latest_ms):
+        """Record candles written by this process (insert_klines)."""
+        if latest_ms is None:
+            return
+        key = (symbol, interval)
+        with self._lock:
+            current = self._latest.get(key)
+            self._latest[key] = latest_ms if current is None else max(current, int(latest_ms))
+            self._missing.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'series': len(self._latest), 'missing': len(self._missing), 'loads': self.loads,
+                    'db_checks': self.db_checks, 'memory_hits': self.memory_hits}
@@ -0,0 +1,222 @@
+# utils/kline_gaps.py
+
+"""
+Gap-aware kline fetching.
+
+When a series is stale, fetch_data_safe used to pull the full `limit` page
+(500 candles, request weight 5) and re-insert every row even if only the last
+one or two candles were missing. Here:
+
+- plan_kline_fetch() compares the DB's latest stored candle with the last
+  closed candle expected for the interval (INTERVAL_MS) and returns either a
+  'tail' plan (startTime/endTime covering only the missing candles) or a
+  'full' plan (no data yet, or the gap is wider than the page)
+- HoleBackfiller scans recent history for interior holes (neighbours more than
+  one interval apart, see candle_store.find_gaps) on a background thread and
+  fills each hole with a bounded startTime/endTime request; ranges the
+  exchange answers with no candles (e.g. a trading halt) are remembered and
+  not requested again
+- KlineGapStats counts requests, candles and the API weight saved compared to
+  always requesting the full page
+"""
+
+import os
+import queue
+import threading
+import time
+
+from utils.binance_weight import endpoint_weight
+from utils.frame_cache import last_closed_open_time as last_closed_open_ms
+from utils.kline_catalog import to_ms
+
+MAX_KLINES_PER_REQUEST = 1000
+
+
+def plan_kline_fetch(latest_ms, interval_ms, limit, now_ms=None):
+    """
+    What to request for a series whose newest stored candle opened at
+    `latest_ms` (None: nothing stored). Returns a dict with 'mode':
+
+    - 'fresh': nothing missing
+    - 'tail' : request start_ms..end_ms (only the missing closed candles)
+    - 'full' : request the latest `limit` candles as before
+    """
+    expected_ms = last_closed_open_ms(interval_ms, now_ms)
+    if latest_ms is None:
+        return {'mode': 'full', 'limit': limit, 'missing': limit, 'expected_ms': expected_ms}
+    missing = (expected_ms - int(latest_ms)) // interval_ms
+    if missing <= 0:
+        return {'mode': 'fresh', 'limit': 0, 'missing': 0, 'expected_ms': expected_ms}
+    if missing >= limit:
+        return {'mode': 'full', 'limit': limit, 'missing': missing, 'expected_ms': expected_ms}
+    return {'mode': 'tail', 'limit': missing, 'missing': missing, 'expected_ms': expected_ms,
+            'start_ms': int(latest_ms) + interval_ms, 'end_ms': expected_ms}
+
+
+def holes_from_gaps(gaps, interval_ms):
+    """[(prev_time, next_time)] from find_gaps -> [(first missing ms, last missing ms)]."""
+    holes = []
+    for prev_time, next_time in gaps:
+        start_ms, end_ms = to_ms(prev_time) + interval_ms, to_ms(next_time) - interval_ms
+        if end_ms >= start_ms:
+            holes.append((start_ms, end_ms))
+    return holes
+
+
+class KlineGapStats:
+    """Thread-safe counters for tail fetches and hole backfills (summary printed every `report_every` fetches)."""
+
+    def __init__(self, report_every=100):
+        self.report_every = report_every
+        self._lock = threading.Lock()
+        self.counts = {
+            'tail_fetches': 0, 'full_fetches': 0, 'tail_candles': 0,
+            'weight_used': 0, 'weight_saved': 0,
+            'holes_found': 0, 'holes_filled': 0, 'holes_empty': 0, 'backfill_candles': 0, 'backfill_weight': 0,
+        }
+
+    def record_fetch(self, mode, limit, full_limit):
+        weight = endpoint_weight('GET', '/fapi/v1/klines', {'limit': limit})
+        with self._lock:
+            self.counts[f"{mode}_fetches"] += 1
+            self.counts['weight_used'] += weight
+            if mode == 'tail':
+                self.counts['tail_candles'] += limit
+                self.counts['weight_saved'] += max(endpoint_weight('GET', '/fapi/v1/klines', {'limit': full_limit}) - weight, 0)
+            fetches = self.counts['tail_fetches'] + self.counts['full_fetches']
+        if self.report_every and fetches % self.report_every == 0:
+            print(self.summary())
+
+    def record_backfill(self, found=0, filled=0, empty=0, candles=0, weight=0):
+        with self._lock:
+            self.counts['holes_found'] += found
+            self.counts['holes_filled'] += filled
+            self.counts['holes_empty'] += empty
+            self.counts['backfill_candles'] += candles
+            self.counts['backfill_weight'] += weight
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def summary(self):
+        c = self.snapshot()
+        return (f"📉 Kline gap fetcher: {c['tail_fetches']} tail / {c['full_fetches']} full fetches, "
+                f"{c['tail_candles']} tail candles, API weight used {c['weight_used']}, saved {c['weight_saved']}; "
+                f"holes {c['holes_filled']}/{c['holes_found']} filled, {c['holes_empty']} empty on the exchange "
+                f"({c['backfill_candles']} candles, weight {c['backfill_weight']})")
+
+
+class HoleBackfiller:
+    """
+    Background thread filling interior holes of recently fetched series.
+
+    find_gaps(symbol, interval, interval_ms, start_ms) -> [(prev_time, next_time)]
+    fetch_range(symbol, interval, start_ms, end_ms, limit) -> Binance kline rows or None
+                 ([] marks the range as empty on the exchange, None is a
+                 failed request that is retried on the next scan)
+    insert(symbol, interval, klines)
+    can_call() -> False while the API weight budget is exhausted
+    """
+
+    def __init__(self, find_gaps, fetch_range, insert, can_call=lambda: True, stats=None,
+                 lookback=1000, rescan_every=3600, max_holes_per_scan=20, name='kline_backfill'):
+        self.find_gaps = find_gaps
+        self.fetch_range = fetch_range
+        self.insert = insert
+        self.can_call = can_call
+        self.stats = stats or KlineGapStats()
+        self.lookback = lookback
+        self.rescan_every = rescan_every
+        self.max_holes_per_scan = max_holes_per_scan
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._last_scan = {}
+        self._empty = {}          # (symbol, interval) -> {(start_ms, end_ms)} with no candles on the exchange
+        self._lock = threading.Lock()
+        self._thread = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Forked workers start with an empty queue (the parent's thread does not exist there)."""
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, symbol, interval, interval_ms):
+        """Queue a hole scan unless one is pending or ran within `rescan_every` seconds."""
+        key = (symbol, interval)
+        now = time.monotonic()
+        with self._lock:
+            if key in self._pending or now - self._last_scan.get(key, -self.rescan_every) < self.rescan_every:
+                return False
+            self._pending.add(key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        self._queue.put((symbol, interval, interval_ms))
+        return True
+
+    def _run(self):
+        while True:
+            symbol, interval, interval_ms = self._queue.get()
+            try:
+                self.scan(symbol, interval, interval_ms)
+            except Exception as e:
+                print(f"❌ {self.name}: hole scan failed for {symbol}-{interval}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard((symbol, interval))
+                    self._last_scan[(symbol, interval)] = time.monotonic()
+                self._queue.task_done()
+
+    def scan(self, symbol, interval, interval_ms, now_ms=None):
+        """Find and fill the holes in the last `lookback` candles; returns candles inserted."""
+        start_ms = last_closed_open_ms(interval_ms, now_ms) - self.lookback * interval_ms
+        holes = holes_from_gaps(self.find_gaps(symbol, interval, interval_ms, start_ms), interval_ms)
+        with self._lock:
+            empty = {hole for hole in self._empty.get((symbol, interval), ()) if hole[1] >= start_ms}
+            self._empty[(symbol, interval)] = empty
+        holes = [hole for hole in holes if hole not in empty]
+        self.stats.record_backfill(found=len(holes))
+        inserted = 0
+        for hole_start, hole_end in holes[:self.max_holes_per_scan]:
+            filled = True
+            cursor = hole_start
+            while cursor <= hole_end:
+                if not self.can_call():
+                    print(f"⚠️ {self.name}: weight limit reached, postponing holes of {symbol}-{interval}")
+                    return inserted
+                limit = min((hole_end - cursor) // interval_ms + 1, MAX_KLINES_PER_REQUEST)
+                klines = self.fetch_range(symbol, interval, cursor, hole_end, limit)
+                self.stats.record_backfill(weight=endpoint_weight('GET', '/fapi/v1/klines', {'limit': limit}))
+                if klines is not None and not klines:
+                    # Exchange has no candles there (e.g. trading halt): what is left of the hole stays a gap
+                    with self._lock:
+                        empty.add((cursor, hole_end))
+                    self.stats.record_backfill(empty=1)
+                if not klines:
+                    filled = False
+                    break
+                self.insert(symbol, interval, klines)
+                inserted += len(klines)
+                self.stats.record_backfill(candles=len(klines))
+                cursor = int(klines[-1][0]) + interval_ms
+            if filled:
+                self.stats.record_backfill(filled=1)
+        if holes:
+            print(f"🧩 {self.name}: {symbol}-{interval} {len(holes)} holes, {inserted} candles backfilled")
+        return inserted
+
+    def wait_idle(self, timeout=None):
+        """Block until the queue is drained (used by the tests)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
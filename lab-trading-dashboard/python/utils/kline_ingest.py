@@ -0,0 +1,191 @@
+# utils/kline_ingest.py
+
+"""
+COPY-based bulk kline ingestion.
+
+copy_ingest() takes Binance kline pages for many (symbol, interval) series at
+once and, in a single transaction on one connection:
+
+1. creates a temp staging table (dropped on commit)
+2. streams every row into it with COPY ... FROM STDIN (CSV)
+3. merges it into the candle store with INSERT ... SELECT ... ON CONFLICT
+   DO NOTHING (one statement per chunk of series, see merge_stage_sql)
+
+insert_klines (execute_many with one parameter set per row) stays the path
+for single live pages; this is for backfills of hundreds of series.
+
+    python -m utils.kline_ingest --benchmark --db main --symbols 50 --candles 500
+
+benchmarks both paths on scratch kline_bench* tables (dropped afterwards).
+"""
+
+import argparse
+import csv
+import importlib
+import io
+import sys
+import time
+
+import numpy as np
+
+from utils.candle_store import STAGE_COLUMNS, STAGE_TABLE, TableCandleStore, kline_records
+
+MERGE_CHUNK = 200   # series per merge statement (tables backend)
+
+STAGE_DDL = f"""
+CREATE TEMP TABLE {STAGE_TABLE} (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    time_ms BIGINT NOT NULL,
+    open DOUBLE PRECISION, high DOUBLE PRECISION, low DOUBLE PRECISION, close DOUBLE PRECISION,
+    volume DOUBLE PRECISION, closetime BIGINT, quotevolume DOUBLE PRECISION, numtrades INTEGER,
+    takerbuybasevolume DOUBLE PRECISION, takerbuyquotevolume DOUBLE PRECISION
+) ON COMMIT DROP
+"""
+
+
+def stage_csv(batches):
+    """CSV buffer of every kline in {(symbol, interval): klines} in STAGE_COLUMNS order."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = 0
+    for (symbol, interval), klines in batches.items():
+        for k in klines:
+            writer.writerow((symbol, interval, int(k[0])) + tuple(k[1:11]))
+            rows += 1
+    buffer.seek(0)
+    return buffer, rows
+
+
+def copy_ingest(sql, store, batches):
+    """
+    Stage and merge all `batches` in one transaction. Returns
+    {'rows_staged', 'rows_inserted', 'series', 'elapsed_ms', 'inserted': {(symbol, interval): n}}.
+    Raises on failure (the transaction is rolled back).
+    """
+    batches = {key: klines for key, klines in batches.items() if klines}
+    started = time.perf_counter()
+    summary = {'rows_staged': 0, 'rows_inserted': 0, 'series': len(batches), 'elapsed_ms': 0, 'inserted': {}}
+    if not batches:
+        return summary
+
+    buffer, summary['rows_staged'] = stage_csv(batches)
+    keys = list(batches)
+    statements = []
+    if store.backend == 'tables':
+        for start in range(0, len(keys), MERGE_CHUNK):
+            statements.extend(store.merge_stage_sql(keys[start:start + MERGE_CHUNK]))
+    else:
+        statements.extend(store.merge_stage_sql(keys))
+
+    conn = sql.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(STAGE_DDL)
+        cursor.copy_expert(f"COPY {STAGE_TABLE} ({', '.join(STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        for statement in statements:
+            cursor.execute(statement)
+            if cursor.description is None:
+                continue
+            for symbol, interval, inserted in cursor.fetchall():
+                summary['inserted'][(symbol, interval)] = int(inserted)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    summary['rows_inserted'] = sum(summary['inserted'].values())
+    summary['elapsed_ms'] = int((time.perf_counter() - started) * 1000)
+    return summary
+
+
+# ------------------------------------------------------------------ benchmark
+def synthetic_klines(n, interval_ms, start_ms, seed=0):
+    """`n` Binance-shaped kline rows (strings for prices, as the API returns them)."""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(size=n))
+    rows = []
+    for i in range(n):
+        open_time = start_ms + i * interval_ms
+        c = close[i]
+        rows.append([open_time, f"{c + 0.1:.4f}", f"{c + 1:.4f}", f"{c - 1:.4f}", f"{c:.4f}", f"{rng.random() * 1000:.3f}",
+                     open_time + interval_ms - 1, f"{rng.random() * 1e5:.2f}", int(rng.integers(1, 500)),
+                     f"{rng.random() * 500:.3f}", f"{rng.random() * 5e4:.2f}", "0"])
+    return rows
+
+
+def benchmark(sql, n_symbols=50, intervals=('1m', '15m'), candles=500, keep=False):
+    """
+    Time execute_many inserts (insert_klines path) against copy_ingest on the
+    same synthetic pages, each into freshly truncated kline_bench* tables.
+    """
+    store = TableCandleStore(sql)
+    interval_ms = {'1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+                   '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+    start_ms = 1_700_000_000_000
+    batches = {
+        (f"BENCH{i}", interval): synthetic_klines(candles, interval_ms[interval], start_ms, seed=i)
+        for i in range(n_symbols) for interval in intervals
+    }
+    total_rows = sum(len(k) for k in batches.values())
+    tables = [f"kline_bench{i}_{interval}" for i in range(n_symbols) for interval in intervals]
+
+    for symbol, interval in batches:
+        sql.execute(store.create_series_sql(symbol, interval), autocommit=True)
+    truncate = f"TRUNCATE {', '.join(tables)}"
+
+    try:
+        sql.execute(truncate, autocommit=True)
+        started = time.perf_counter()
+        for (symbol, interval), klines in batches.items():
+            store.insert(symbol, interval, kline_records(klines))
+        execute_many_s = time.perf_counter() - started
+
+        sql.execute(truncate, autocommit=True)
+        started = time.perf_counter()
+        summary = copy_ingest(sql, store, batches)
+        copy_s = time.perf_counter() - started
+    finally:
+        if not keep:
+            sql.execute(f"DROP TABLE IF EXISTS {', '.join(tables)}", autocommit=True)
+
+    result = {
+        'series': len(batches),
+        'rows': total_rows,
+        'execute_many_s': round(execute_many_s, 2),
+        'execute_many_rows_per_s': int(total_rows / execute_many_s) if execute_many_s else 0,
+        'copy_s': round(copy_s, 2),
+        'copy_rows_per_s': int(total_rows / copy_s) if copy_s else 0,
+        'copy_rows_inserted': summary['rows_inserted'],
+        'speedup': round(execute_many_s / copy_s, 1) if copy_s else 0.0,
+    }
+    print(f"📊 {result['series']} series / {total_rows} rows: execute_many {result['execute_many_s']}s "
+          f"({result['execute_many_rows_per_s']} rows/s) vs COPY {result['copy_s']}s "
+          f"({result['copy_rows_per_s']} rows/s) -> {result['speedup']}x")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="COPY kline ingestion benchmark")
+    parser.add_argument('--benchmark', action='store_true', help='run the execute_many vs COPY benchmark')
+    parser.add_argument('--db', choices=['main', 'olab', 'backtest'], default='main')
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--intervals', default='1m,15m')
+    parser.add_argument('--candles', type=int, default=500)
+    parser.add_argument('--keep', action='store_true', help='keep the kline_bench* tables')
+    args = parser.parse_args(argv)
+
+    if not args.benchmark:
+        parser.print_help()
+        return 0
+    modules = {'main': 'utils.FinalVersionTradingDB_PostgreSQL', 'olab': 'utils.Final_olab_database', 'backtest': 'utils.backtestdb'}
+    db = importlib.import_module(modules[args.db])
+    benchmark(db.sql_helper, args.symbols, tuple(i.strip() for i in args.intervals.split(',') if i.strip()),
+              args.candles, args.keep)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+# utils/kline_stream.py
+
+"""
+WebSocket kline ingestor.
+
+KlineStreamIngestor subscribes to combined `<symbol>@kline_<interval>`
+streams (at most 200 streams per connection) and, on its own asyncio loop:
+
+- keeps the latest `ring_size` closed OHLCV candles per stream in a NumPy
+  ring buffer (utils/candle_ring.py), seeded from the DB at start so windows
+  are usable immediately
+- collects closed candles and writes them to the DB in batches
+  (insert_bulk, e.g. insert_klines_bulk) every `flush_interval` seconds or
+  once `flush_rows` are pending
+- reconnects with backoff; candles missed while disconnected are picked up by
+  the gap-aware REST fetcher (utils/kline_gaps.py)
+
+window()/frame() serve the latest closed candles from memory, so the scanner
+only falls back to REST when a stream is missing or behind.
+
+KlineReplayServer is a local stand-in for the Binance stream endpoint that
+replays recorded kline messages, for testing without network access.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+from utils.candle_ring import OHLCV_FIELDS, CandleRingStore
+
+BINANCE_STREAM_URL = "wss://fstream.binance.com/stream"
+MAX_STREAMS_PER_CONNECTION = 200
+
+
+def stream_name(symbol, interval):
+    return f"{symbol.lower()}@kline_{interval}"
+
+
+def parse_kline_message(message):
+    """
+    Combined-stream kline payload -> (symbol, interval, row, closed, event_ms),
+    None for anything else. `row` is shaped like a REST kline without the
+    trailing ignore field, so it can go straight to insert_klines.
+    """
+    data = json.loads(message) if isinstance(message, (str, bytes)) else message
+    data = data.get('data', data)
+    if not isinstance(data, dict) or data.get('e') != 'kline':
+        return None
+    k = data['k']
+    row = [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T'], k['q'], k['n'], k['V'], k['Q']]
+    return data['s'], k['i'], row, bool(k['x']), data.get('E')
+
+
+def kline_message(symbol, interval, row, closed, event_ms=None):
+    """Inverse of parse_kline_message (used to build replay data)."""
+    return json.dumps({'stream': stream_name(symbol, interval), 'data': {
+        'e': 'kline', 'E': event_ms if event_ms is not None else row[6], 's': symbol,
+        'k': {'t': row[0], 'T': row[6], 's': symbol, 'i': interval, 'o': row[1], 'c': row[4], 'h': row[2],
+              'l': row[3], 'v': row[5], 'n': row[8], 'x': closed, 'q': row[7], 'V': row[9], 'Q': row[10]},
+    }})
+
+
+class KlineStreamIngestor:
+    """Combined kline streams -> ring buffers + batched DB writes."""
+
+    def __init__(self, intervals_ms, insert_bulk=None, seed=None, ring_size=500, flush_interval=1.0,
+                 flush_rows=2000, url=BINANCE_STREAM_URL, name='kline_stream', on_error=None):
+        self.intervals_ms = dict(intervals_ms)   # interval -> ms, the intervals to subscribe
+        self.insert_bulk = insert_bulk           # callable({(symbol, interval): [rows]})
+        self.seed = seed                         # callable(symbols, interval, n) -> long frame (symbol, time, OHLCV)
+        self.ring_size = ring_size
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.url = url
+        self.name = name
+        self.on_error = on_error
+
+        self.symbols = []
+        self.candles = CandleRingStore(self.intervals_ms, window=ring_size, max_series=None)   # rings mark subscriptions
+        self._pending = {}
+        self._pending_rows = 0
+        self._loop = None
+        self._thread = None
+        self._tasks = []
+        self._flush_event = None
+        self._stopping = False
+        self.stats = {'messages': 0, 'closed': 0, 'rows_written': 0, 'flushes': 0, 'flush_errors': 0,
+                      'reconnects': 0, 'last_message_at': None, 'last_lag_ms': None}
+
+    # ------------------------------------------------------------- streams
+    def streams(self):
+        return [stream_name(symbol, interval) for symbol in self.symbols for interval in self.intervals_ms]
+
+    def connection_urls(self):
+        streams = self.streams()
+        return [f"{self.url}?streams={'/'.join(streams[i:i + MAX_STREAMS_PER_CONNECTION])}"
+                for i in range(0, len(streams), MAX_STREAMS_PER_CONNECTION)]
+
+    def _seed_rings(self, symbols):
+        for interval in self.intervals_ms:
+            for symbol in symbols:
+                self.candles.ring(symbol, interval)
+            if self.seed is None or not symbols:
+                continue
+            try:
+                df = self.seed(symbols, interval, self.ring_size)
+            except Exception as e:
+                self._report(e, f"seed {interval}")
+                continue
+            if df is None or df.empty:
+                continue
+            df = df.astype({field: float for field in OHLCV_FIELDS[1:]})
+            for symbol, group in df.groupby('symbol', sort=False):
+                if self.candles.ring(symbol, interval, create=False) is not None:
+                    self.candles.load(symbol, interval, group.sort_values('time'))
+
+    # ------------------------------------------------------------ messages
+    def handle_message(self, message):
+        parsed = parse_kline_message(message)
+        if parsed is None:
+            return
+        symbol, interval, row, closed, event_ms = parsed
+        self.stats['messages'] += 1
+        self.stats['last_message_at'] = time.time()
+        if event_ms is not None:
+            self.stats['last_lag_ms'] = int(time.time() * 1000) - int(event_ms)
+        ring = self.candles.ring(symbol, interval, create=False)
+        if ring is None or not closed:
+            return
+        ring.append((float(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5])))
+        self.stats['closed'] += 1
+        self._pending.setdefault((symbol, interval), []).append(row)
+        self._pending_rows += 1
+        if self._pending_rows >= self.flush_rows and self._flush_event is not None:
+            self._flush_event.set()
+
+    async def _listen(self, url):
+        backoff = 1
+        while not self._stopping:
+            try:
+                async with websockets.connect(url, ping_interval=20, max_size=None) as ws:
+                    print(f"✅ {self.name}: connected ({url.count('/') - 2} streams)")
+                    backoff = 1
+                    async for message in ws:
+                        self.handle_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._report(e, 'listen')
+            if self._stopping:
+                break
+            self.stats['reconnects'] += 1
+            print(f"🔄 {self.name}: reconnecting in {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+            if self._stopping:
+                break
+
+    async def flush(self):
+        """Write every pending closed candle in one insert_bulk call."""
+        if not self._pending:
+            return 0
+        batch, self._pending, rows, self._pending_rows = self._pending, {}, self._pending_rows, 0
+        if self.insert_bulk is None:
+            return rows
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.insert_bulk, batch)
+            self.stats['rows_written'] += rows
+            self.stats['flushes'] += 1
+        except Exception as e:
+            self.stats['flush_errors'] += 1
+            self._report(e, 'flush')
+        return rows
+
+    async def run(self):
+        """Listen on every connection and flush until stop()."""
+        self._stopping = False
+        self._flush_event = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._listen(url)) for url in self.connection_urls()]
+        flusher = asyncio.create_task(self._flusher())
+        try:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            self._stopping = True
+            self._flush_event.set()
+            await flusher
+
+    # ------------------------------------------------------------ lifecycle
+    def start(self, symbols):
+        """Seed the rings and run the ingestor on a daemon thread with its own event loop."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self.symbols = sorted(set(symbols))
+        self._seed_rings(self.symbols)
+        self._loop = asyncio.new_event_loop()
+
+        def _run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.run())
+
+        self._thread = threading.Thread(target=_run, name=self.name, daemon=True)
+        self._thread.start()
+        print(f"🚀 {self.name}: {len(self.streams())} streams on {len(self.connection_urls())} connections")
+        return self
+
+    def stop(self, timeout=10):
+        if self._loop is None:
+            return
+        self._stopping = True
+
+        def _cancel():
+            for task in self._tasks:
+                task.cancel()
+
+        self._loop.call_soon_threadsafe(_cancel)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._thread is not None and self._thread.is_alive():
+            print(f"⚠️ {self.name}: loop thread still running after {timeout}s, leaving its loop open")
+        else:
+            self._loop.close()
+        self._loop = self._thread = None
+        print(f"🛑 {self.name}: stopped ({self.stats['rows_written']} candles written)")
+
+    def resubscribe(self, symbols):
+        """Restart the connections when the symbol list changed; returns True when it did."""
+        symbols = sorted(set(symbols))
+        if symbols == self.symbols:
+            return False
+        self.stop()
+        for symbol in set(self.symbols) - set(symbols):
+            self.candles.discard(symbol)
+        self.start(symbols)
+        return True
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # ------------------------------------------------------------- readers
+    def window(self, symbol, interval, limit, min_last_ms=None):
+        """Zero-copy views of the last `limit` closed candles, None when missing, short or behind."""
+        return self.candles.window(symbol, interval, limit, min_last_ms)
+
+    def frame(self, symbol, interval, limit, min_last_ms=None):
+        """The same window as an OHLCV DataFrame (time as UTC datetimes)."""
+        return self.candles.frame(symbol, interval, limit, min_last_ms)
+
+    def _report(self, error, context):
+        print(f"❌ {self.name} {context}: {error}")
+        if self.on_error is not None:
+            try:
+                self.on_error(error, f"{self.name} {context}")
+            except Exception:
+                pass
+
+
+class KlineReplayServer:
+    """
+    Local stand-in for the Binance combined stream endpoint. Each client gets
+    the recorded messages of the streams in its `?streams=` query, in order,
+    `delay` seconds apart; the connection then stays open until closed.
+
+        async with KlineReplayServer(messages) as server:
+            ingestor = KlineStreamIngestor(..., url=server.url)
+    """
+
+    def __init__(self, messages, delay=0.0, host='127.0.0.1', port=0):
+        self.messages = list(messages)
+        self.delay = delay
+        self.host = host
+        self.port = port
+        self.url = None
+        self._server = None
+
+    async def _handler(self, connection):
+        query = parse_qs(urlparse(connection.request.path).query)
+        wanted = set('/'.join(query.get('streams', [])).split('/'))
+        for message in self.messages:
+            if json.loads(message).get('stream') in wanted:
+                await connection.send(message)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+        await connection.wait_closed()
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        port = next(iter(self._server.sockets)).getsockname()[1]
+        self.url = f"ws://{self.host}:{port}/stream"
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+def replay_messages(klines_by_stream):
+    """{(symbol, interval): REST kline rows} -> interleaved messages (one forming update + the close per candle)."""
+    events = []
+    for (symbol, interval), rows in klines_by_stream.items():
+        for row in rows:
+            events.append((int(row[0]), 0, kline_message(symbol, interval, row, False, int(row[0]) + 1)))
+            events.append((int(row[6]), 1, kline_message(symbol, interval, row, True, int(row[6]) + 1)))
+    return [message for _, _, message in sorted(events, key=lambda e: (e[0], e[1]))]
@@ -0,0 +1,128 @@
+# utils/lazy_frame.py
+
+"""
+Column-on-demand indicator frames.
+
+An IndicatorRegistry maps each column group (e.g. 'rsi', 'swings') to the
+function that adds it, the columns it produces and the groups it depends on.
+LazyIndicatorFrame wraps a prepared OHLCV frame and runs a group (after its
+dependencies) the first time one of its columns is read. A column that no
+group produces falls back to the full pipeline once, so callers always get
+the same values as the eager path.
+
+Group functions take (df, ctx) and return the frame; ctx is whatever the
+pipeline passes (candle type, OHLC column names, incremental engine output).
+full_compute is a zero-argument callable returning the complete frame.
+"""
+
+
+class IndicatorRegistry:
+    """Column groups with their produced columns and group dependencies."""
+
+    def __init__(self):
+        self._groups = {}   # name -> (fn, produces, requires)
+        self._owner = {}    # column -> group name
+
+    def register(self, name, produces, requires=()):
+        """Decorator registering `fn(df, ctx)` as the producer of `produces`."""
+        def decorator(fn):
+            self._groups[name] = (fn, tuple(produces), tuple(requires))
+            for column in produces:
+                self._owner[column] = name
+            return fn
+        return decorator
+
+    def group_of(self, column):
+        return self._owner.get(column)
+
+    def columns_of(self, group):
+        return self._groups[group][1]
+
+    def plan(self, groups, done=()):
+        """Groups to run (dependencies first) so that all of `groups` are computed."""
+        order, seen = [], set(done)
+
+        def visit(group):
+            if group in seen:
+                return
+            seen.add(group)
+            for dependency in self._groups[group][2]:
+                visit(dependency)
+            order.append(group)
+
+        for group in groups:
+            visit(group)
+        return order
+
+    def run(self, group, df, ctx):
+        return self._groups[group][0](df, ctx)
+
+
+class LazyIndicatorFrame:
+    """
+    Prepared OHLCV frame whose indicator columns are computed on first access.
+
+    frame['ema_9'] runs only the groups 'ema_9' needs; frame.ensure([...]) does
+    the same for several columns; frame.df is the DataFrame computed so far.
+    """
+
+    def __init__(self, df, registry, ctx, full_compute):
+        self._df = df
+        self._registry = registry
+        self._ctx = ctx
+        self._full_compute = full_compute
+        self._done = set()
+        self.full = False
+
+    @property
+    def df(self):
+        return self._df
+
+    @property
+    def empty(self):
+        return self._df.empty
+
+    @property
+    def computed_groups(self):
+        return sorted(self._done)
+
+    def __len__(self):
+        return len(self._df)
+
+    def __contains__(self, column):
+        return column in self._df.columns or self._registry.group_of(column) is not None
+
+    def __getitem__(self, key):
+        self.ensure([key] if isinstance(key, str) else key)
+        return self._df[key]
+
+    def ensure(self, columns):
+        """Compute whatever is missing for `columns`; unknown columns trigger the full pipeline."""
+        if self.full:
+            return self
+        groups = []
+        for column in columns:
+            if column in self._df.columns:
+                continue
+            group = self._registry.group_of(column)
+            if group is None:
+                return self.materialize()
+            groups.append(group)
+        for group in self._registry.plan(groups, done=self._done):
+            self._df = self._registry.run(group, self._df, self._ctx)
+            self._done.add(group)
+        return self
+
+    def materialize(self):
+        """Run the full pipeline (once) and return self."""
+        if not self.full:
+            self._df = self._full_compute()
+            self.full = True
+        return self
+
+    def to_frame(self, columns=None):
+        if columns is None:
+            self.materialize()
+        else:
+            self.ensure(columns)
+        return self._df
@@ -37,6 +37,7 @@ from keys1 import api, secret
 from binance.um_futures import UMFutures
 import time
 from binance.error import ClientError
+from utils.binance_weight import PRIORITY_ORDER, get_scheduler
 import datetime
 import logging
 import numpy as np
@@ -148,6 +149,8 @@ init(autoreset=True)
 try:
     # client = UMFutures(key=api, secret=secret, base_url="https://testnet.binancefuture.com")
     client = UMFutures(key=api, secret=secret)
+    # Orders come first in the host-wide weight budget shared with the scanner/backfill processes
+    get_scheduler().instrument(client, PRIORITY_ORDER, timeout=10)
     volume = 50  # volume for one order (if 10 and leverage 10, then 1 USDT per position)
     sl = 0.006
     tp = 0.003
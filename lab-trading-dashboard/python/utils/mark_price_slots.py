@@ -0,0 +1,136 @@
+# utils/mark_price_slots.py
+
+"""
+Latest-value slots between the mark-price socket and price dispatch.
+
+mark_price_listener used to run handle_price_update (JSON parse, tracker
+locks, scheduling) inline in its `async for message in ws` loop, so slow
+dispatch blocked the event loop and the socket buffer backed up. Now the
+listener only parses the frame and publishes each symbol's price into its
+slot; a consumer thread dispatches:
+
+- one slot per symbol holding (price, event_ms, received_at); publish()
+  swaps the tuple in (one dict store, atomic under the GIL), so a reader never
+  sees a torn value and a newer price simply replaces an undispatched one
+  (counted as coalesced)
+- the consumer takes the set of dirty symbols and calls
+  dispatch(symbol, price, event_ms) once per symbol with its latest price
+- parse() uses orjson when it is installed, json otherwise
+- stats(): receive lag (socket -> publish) and dispatch lag (-> dispatch)
+  against the exchange event time E, p50 / p99 / max
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+from utils.uid_scheduler import latency_summary
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def parse(message):
+    """Decode a socket frame (str or bytes)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(message)
+    return json.loads(message)
+
+
+class LatestPriceSlots:
+    """Per-symbol latest mark price, drained by one dispatch thread."""
+
+    def __init__(self, dispatch=None, name='mark_price_slots', on_error=None, lag_samples=4096):
+        self.dispatch = dispatch
+        self.name = name
+        self.on_error = on_error   # callable(error, context) for log_error
+        self._slots = {}           # symbol -> (price, event_ms, received_at)
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self._receive_lag = deque(maxlen=lag_samples)
+        self._dispatch_lag = deque(maxlen=lag_samples)
+        self.published = self.dispatched = self.coalesced = self.errors = 0
+
+    # -------------------------------------------------------------- lifecycle
+    def start(self, dispatch=None):
+        """Start the consumer once; later calls are no-ops."""
+        with self._dirty_lock:
+            if dispatch is not None and self.dispatch is None:
+                self.dispatch = dispatch
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._consume, daemon=True, name=self.name)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    # --------------------------------------------------------------- producer
+    def publish(self, symbol, price, event_ms=None):
+        now = time.time()
+        self._slots[symbol] = (price, event_ms, now)
+        with self._dirty_lock:
+            if symbol in self._dirty:
+                self.coalesced += 1
+            else:
+                self._dirty.add(symbol)
+        self.published += 1
+        if event_ms:
+            self._receive_lag.append(now * 1000 - event_ms)
+        self._wakeup.set()
+
+    def latest(self, symbol):
+        """(price, event_ms, received_at) of the newest published price, None when never seen."""
+        return self._slots.get(symbol)
+
+    # --------------------------------------------------------------- consumer
+    def _consume(self):
+        while not self._stopping:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.drain()
+
+    def drain(self):
+        """Dispatch the latest price of every symbol published since the last drain."""
+        with self._dirty_lock:
+            symbols, self._dirty = self._dirty, set()
+        for symbol in symbols:
+            price, event_ms, _ = self._slots[symbol]
+            try:
+                self.dispatch(symbol, price, event_ms)
+            except Exception as e:
+                self.errors += 1
+                self._report(e)
+            self.dispatched += 1
+            if event_ms:
+                self._dispatch_lag.append(time.time() * 1000 - event_ms)
+        return len(symbols)
+
+    # ---------------------------------------------------------------- metrics
+    def stats(self):
+        return {'symbols': len(self._slots), 'pending': len(self._dirty), 'published': self.published,
+                'dispatched': self.dispatched, 'coalesced': self.coalesced, 'errors': self.errors,
+                'orjson': ORJSON_AVAILABLE,
+                'receive_lag': latency_summary(list(self._receive_lag)),
+                'dispatch_lag': latency_summary(list(self._dispatch_lag))}
+
+    def _report(self, error):
+        if self.on_error is not None:
+            try:
+                self.on_error(error, self.name)
+                return
+            except Exception:
+                pass
+        print(f"❌ {self.name} dispatch error: {error}")
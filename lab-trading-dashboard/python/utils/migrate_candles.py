@@ -0,0 +1,131 @@
+# utils/migrate_candles.py
+
+"""
+Migrate the per-pair kline_{symbol}_{interval} tables into the partitioned
+`candles` table (see utils/candle_store.py).
+
+    python -m utils.migrate_candles --db main
+    python -m utils.migrate_candles --db main --time-partition 1m,3m,5m --verify --apply
+
+Without --apply the tool only prints the DDL and the tables it would copy.
+Each legacy table is copied server-side with one INSERT ... SELECT ... ON
+CONFLICT DO NOTHING, so the tool can be re-run (or run per symbol/interval)
+without duplicating rows. Legacy `time` values are read as wall time in
+--legacy-timezone (default UTC, what the table backend writes) and stored as
+naive UTC like every other candle write. Legacy tables are left in place; switch readers over
+with CANDLE_STORAGE=partitioned once the counts match.
+"""
+
+import argparse
+import importlib
+import sys
+import time
+
+import pandas as pd
+
+from utils.candle_store import PartitionedCandleStore, TableCandleStore
+
+DB_MODULES = {
+    'main': 'utils.FinalVersionTradingDB_PostgreSQL',
+    'olab': 'utils.Final_olab_database',
+    'backtest': 'utils.backtestdb',
+}
+
+
+def _months_between(min_time, max_time):
+    if min_time is None or pd.isna(min_time) or max_time is None or pd.isna(max_time):
+        return []
+    return list(pd.period_range(pd.Timestamp(min_time).to_period('M'), pd.Timestamp(max_time).to_period('M'), freq='M').start_time)
+
+
+def plan_migration(legacy, symbols=None, intervals=None):
+    """Legacy (symbol, interval, table) series selected by the filters."""
+    series = legacy.list_series()
+    if symbols:
+        series = [s for s in series if s[0] in symbols]
+    if intervals:
+        series = [s for s in series if s[1] in intervals]
+    return sorted(series)
+
+
+def migrate(sql, interval_ms, symbols=None, intervals=None, time_partition=(), dry_run=True, verify=False,
+            legacy_timezone='UTC'):
+    """Create the partitioned schema and copy every selected legacy table. Returns a summary dict."""
+    legacy = TableCandleStore(sql)
+    target = PartitionedCandleStore(sql)
+    series = plan_migration(legacy, symbols, intervals)
+    print(f"📦 {len(series)} kline tables selected for migration")
+
+    months = set()
+    for symbol, interval, _ in series:
+        if interval in time_partition:
+            bounds = legacy.time_bounds(symbol, interval)
+            if not bounds.empty:
+                months.update(_months_between(bounds.iloc[0]['min_time'], bounds.iloc[0]['max_time']))
+
+    all_intervals = sorted(set(interval_ms) | {s[1] for s in series}, key=lambda i: interval_ms.get(i, 0))
+    ddl = target.schema_sql(all_intervals, time_partition, sorted(months))
+    if dry_run:
+        for statement in ddl:
+            print(" ".join(statement.split()))
+        for symbol, interval, table_name in series:
+            print(f"🔎 would copy {table_name} -> {target.table} ({symbol}, {interval}, time in {legacy_timezone})")
+        print("ℹ️ Dry run only, re-run with --apply to migrate")
+        return {'tables': len(series), 'rows': 0, 'mismatches': [], 'dry_run': True}
+
+    target.create_schema(all_intervals, time_partition, sorted(months))
+
+    started = time.time()
+    total_rows = 0
+    mismatches = []
+    for i, (symbol, interval, table_name) in enumerate(series, 1):
+        try:
+            symbol_id = target.symbol_id(symbol, create=True)
+            rows = sql.execute(target.migrate_sql(table_name, symbol_id, interval),
+                               {'legacy_tz': legacy_timezone}, autocommit=True)
+            total_rows += max(rows or 0, 0)
+            line = f"✅ [{i}/{len(series)}] {table_name}: {rows} rows"
+            if verify:
+                legacy_count = legacy.row_count(symbol, interval)
+                new_count = target.row_count(symbol, interval)
+                if legacy_count != new_count:
+                    mismatches.append((table_name, legacy_count, new_count))
+                    line = f"⚠️ [{i}/{len(series)}] {table_name}: {legacy_count} legacy rows vs {new_count} migrated"
+            print(line)
+        except Exception as e:
+            print(f"❌ Migration failed for {table_name}: {e}")
+            mismatches.append((table_name, None, None))
+
+    elapsed = time.time() - started
+    print(f"📊 Migrated {total_rows} rows from {len(series)} tables in {elapsed:.1f}s"
+          f"{f', {len(mismatches)} mismatches' if mismatches else ''}")
+    return {'tables': len(series), 'rows': total_rows, 'mismatches': mismatches, 'dry_run': False}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate kline_* tables into the partitioned candles table")
+    parser.add_argument('--db', choices=sorted(DB_MODULES), default='main', help="which database module's connection to use")
+    parser.add_argument('--symbols', default='', help='comma-separated symbols (default: all)')
+    parser.add_argument('--intervals', default='', help='comma-separated intervals (default: all)')
+    parser.add_argument('--time-partition', default='', help='intervals to sub-partition by month, e.g. 1m,3m,5m')
+    parser.add_argument('--apply', action='store_true', help='create the schema and copy the rows (default: dry run)')
+    parser.add_argument('--legacy-timezone', default='UTC', help='time zone the legacy kline time column was written in')
+    parser.add_argument('--verify', action='store_true', help='compare row counts after each table')
+    args = parser.parse_args(argv)
+
+    db = importlib.import_module(DB_MODULES[args.db])
+    split = lambda value: [v.strip() for v in value.split(',') if v.strip()]
+    summary = migrate(
+        db.sql_helper, db.INTERVAL_MS,
+        symbols={s.upper() for s in split(args.symbols)} or None,
+        intervals=set(split(args.intervals)) or None,
+        time_partition=tuple(split(args.time_partition)),
+        dry_run=not args.apply,
+        verify=args.verify,
+        legacy_timezone=args.legacy_timezone,
+    )
+    return 1 if summary['mismatches'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# utils/pair_index.py
+
+"""
+Reverse index symbol -> UIDs trading it.
+
+handle_price_update used to copy all_pairs under the global lock and scan
+every UID for each of the ~300 symbols in a !markPrice@arr frame. The index
+is kept next to all_pairs (index_pair where a UID is added, unindex_pair in
+deleteFromGlobalList), so a price update touches only the UIDs of its symbol
+and symbols without trades cost one dict lookup.
+
+Writers swap in a new frozenset under pair_uids_lock (copy-on-write);
+readers take no lock.
+"""
+
+from utils.global_store import pair_uids, uid_pair, pair_uids_lock
+
+_EMPTY = frozenset()
+
+
+def index_pair(uid, pdata):
+    """Map uid to pdata['pair'], moving it when the UID changed symbol."""
+    symbol = (pdata or {}).get("pair")
+    with pair_uids_lock:
+        old = uid_pair.get(uid)
+        if old == symbol:
+            return
+        if old is not None:
+            _remove(old, uid)
+        if symbol:
+            uid_pair[uid] = symbol
+            pair_uids[symbol] = pair_uids.get(symbol, _EMPTY) | {uid}
+        else:
+            uid_pair.pop(uid, None)
+
+
+def index_pairs(uid_map):
+    for uid, pdata in uid_map.items():
+        index_pair(uid, pdata)
+
+
+def unindex_pair(uid):
+    with pair_uids_lock:
+        symbol = uid_pair.pop(uid, None)
+        if symbol is not None:
+            _remove(symbol, uid)
+
+
+def _remove(symbol, uid):
+    remaining = pair_uids.get(symbol, _EMPTY) - {uid}
+    if remaining:
+        pair_uids[symbol] = remaining
+    else:
+        pair_uids.pop(symbol, None)
+
+
+def uids_for_symbol(symbol):
+    """UIDs currently trading symbol (an immutable snapshot, safe to iterate)."""
+    return pair_uids.get(symbol, _EMPTY)
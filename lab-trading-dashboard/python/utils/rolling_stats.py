@@ -0,0 +1,65 @@
+# utils/rolling_stats.py
+
+"""
+Rolling statistics shared by the indicator pipeline.
+
+RollingPercentileRank keeps the current window in a sorted list, so each new
+value costs two binary searches plus one insert/remove in the list instead of a
+new pandas Series per window. Results match
+
+    series.rolling(window, min_periods).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+
+exactly, including the 'average' method for ties and NaN handling.
+"""
+
+import bisect
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class RollingPercentileRank:
+    """Streaming percentile rank of the newest value within the last `window` values."""
+
+    def __init__(self, window, min_periods=None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self._values = deque()
+        self._sorted = []
+
+    def update(self, value):
+        """Push one value and return its percentile rank (NaN until min_periods valid values)."""
+        value = float(value)
+        is_nan = math.isnan(value)
+        self._values.append(value)
+        if not is_nan:
+            bisect.insort(self._sorted, value)
+        if len(self._values) > self.window:
+            oldest = self._values.popleft()
+            if not math.isnan(oldest):
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+
+        count = len(self._sorted)
+        if count < self.min_periods or count == 0 or is_nan:
+            return np.nan
+
+        less = bisect.bisect_left(self._sorted, value)
+        equal = bisect.bisect_right(self._sorted, value, lo=less) - less
+        # pandas 'average' rank: integer rank sum of the tie group / group size, then / count
+        rank = (equal * less + equal * (equal + 1) // 2) / equal
+        return rank / count
+
+
+def rolling_percentile_rank(values, window, min_periods=None):
+    """
+    Percentile rank of each value within its trailing `window`.
+    Accepts a Series (returns a Series on the same index) or an array-like.
+    """
+    ranker = RollingPercentileRank(window, min_periods)
+    data = values.to_numpy(dtype=float) if isinstance(values, pd.Series) else np.asarray(values, dtype=float)
+    out = np.fromiter((ranker.update(v) for v in data.tolist()), dtype=float, count=len(data))
+    if isinstance(values, pd.Series):
+        return pd.Series(out, index=values.index, name=values.name)
+    return out
@@ -0,0 +1,75 @@
+# utils/segment_stats.py
+
+"""
+Per-segment statistics for wave-style signals (e.g. MACD histogram waves).
+
+A segment is a run of consecutive bars sharing the same id. All stats are
+computed for every segment at once with ufunc.reduceat and prefix sums, so
+there is no groupby and no per-wave DataFrame write. NaN handling follows
+NumPy's max/argmax on the segment slice: a NaN makes the peak NaN and the
+first NaN is the peak position.
+"""
+
+import numpy as np
+
+
+def segment_starts(segment_ids):
+    """Start index of every run of equal consecutive ids."""
+    ids = np.asarray(segment_ids)
+    if len(ids) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+
+
+def segment_stats(values, segment_ids, min_curve_len=3):
+    """
+    Stats per segment of `values` (float array, one segment per run of ids):
+
+    - start, length : segment bounds
+    - peak          : max value in the segment
+    - peak_pos      : offset of the first max inside the segment
+    - is_curve      : at least `min_curve_len` bars, peak strictly inside the
+                      segment, some rise before the peak and some fall after
+    """
+    vals = np.asarray(values, dtype=np.float64)
+    n = len(vals)
+    starts = segment_starts(segment_ids)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return {'start': empty, 'length': empty, 'peak': np.zeros(0),
+                'peak_pos': empty, 'is_curve': np.zeros(0, dtype=bool)}
+
+    lengths = np.diff(np.r_[starts, n])
+    seg_of_bar = np.repeat(np.arange(len(starts)), lengths)
+
+    peak = np.maximum.reduceat(vals, starts)
+
+    # First bar equal to the segment peak (a NaN peak matches its first NaN)
+    bar_peak = peak[seg_of_bar]
+    is_peak = (vals == bar_peak) | (np.isnan(vals) & np.isnan(bar_peak))
+    positions = np.where(is_peak, np.arange(n), n)
+    peak_abs_pos = np.minimum.reduceat(positions, starts)
+    peak_pos = peak_abs_pos - starts
+
+    # Prefix counts of rising / falling steps; step j is vals[j] -> vals[j + 1]
+    steps = np.diff(vals)
+    rises = np.r_[0, np.cumsum(steps > 0)]
+    falls = np.r_[0, np.cumsum(steps < 0)]
+    ends = starts + lengths - 1
+    rise_before = rises[peak_abs_pos] - rises[starts] > 0
+    fall_after = falls[ends] - falls[peak_abs_pos] > 0
+
+    is_curve = (
+        (lengths >= min_curve_len)
+        & (peak_pos > 0)
+        & (peak_pos < lengths - 1)
+        & rise_before
+        & fall_after
+    )
+    return {'start': starts, 'length': lengths, 'peak': peak,
+            'peak_pos': peak_pos, 'is_curve': is_curve}
+
+
+def per_bar(segment_values, lengths):
+    """Broadcast one value per segment back onto every bar of that segment."""
+    return np.repeat(np.asarray(segment_values), lengths)
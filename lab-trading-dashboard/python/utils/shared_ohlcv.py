@@ -0,0 +1,199 @@
+# utils/shared_ohlcv.py
+
+"""
+Batch OHLCV store in multiprocessing.shared_memory.
+
+The parent process fetches the candles of a whole batch once
+(fetch_batch_ohlcv) and publishes them with SharedOHLCVBatch: one shared
+block holding a float64 matrix of shape (len(OHLCV_FIELDS), total_rows).
+Every series (symbol, interval) is a contiguous slice of rows, so each field
+of each series is a contiguous float64 array. Only the small manifest (block
+name + row offsets) is sent to the workers.
+
+Workers call attach_shared_ohlcv(manifest) (ProcessPoolExecutor initializer)
+or ensure_shared_ohlcv(manifest) per task (persistent pools) and read zero-copy, read-only views with shared_ohlcv_arrays() or a DataFrame
+adapter with shared_ohlcv_frame(). Anything not in the batch returns None so
+the caller falls back to the DB.
+
+time is stored as epoch milliseconds (exact in float64).
+"""
+
+import concurrent.futures
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+OHLCV_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+_attached = None   # worker side: (SharedMemory, manifest, matrix)
+_attach_lock = threading.Lock()
+
+
+def _time_ms(series):
+    times = pd.to_datetime(series, utc=True)
+    return (times.astype('int64') // 1_000_000).to_numpy(dtype=np.float64)
+
+
+def fetch_batch_ohlcv(fetch, symbols, intervals, limit, max_workers=8, bulk=None):
+    """
+    {(symbol, interval): frame} for every pair of the batch, fetched once with
+    fetch(symbol, interval, limit) (fetch_data_safe). Failed fetches are skipped.
+    bulk(keys, limit) -> {key: frame}, when given, goes first (e.g. one query
+    for every series already current in the DB); fetch covers the rest.
+    """
+    keys = [(symbol, interval) for symbol in dict.fromkeys(symbols) for interval in intervals]
+    frames = {}
+    if bulk is not None and keys:
+        try:
+            frames.update(bulk(keys, limit) or {})
+        except Exception as e:
+            print(f"❌ Bulk OHLCV prefetch failed, fetching per series: {e}")
+        keys = [key for key in keys if key not in frames]
+    if not keys:
+        return frames
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+        futures = {executor.submit(fetch, symbol, interval, limit): (symbol, interval) for symbol, interval in keys}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"❌ Batch OHLCV fetch failed for {futures[future]}: {e}")
+                continue
+            if df is not None and not df.empty and all(col in df.columns for col in OHLCV_FIELDS):
+                frames[futures[future]] = df
+    return frames
+
+
+class SharedOHLCVBatch:
+    """Parent-side owner of one shared OHLCV block; close() releases it."""
+
+    def __init__(self, frames):
+        series = {}
+        total_rows = 0
+        for key, df in frames.items():
+            series[key] = (total_rows, len(df))
+            total_rows += len(df)
+
+        nbytes = max(total_rows, 1) * len(OHLCV_FIELDS) * np.dtype(np.float64).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        matrix = np.ndarray((len(OHLCV_FIELDS), total_rows), dtype=np.float64, buffer=self.shm.buf)
+        for key, df in frames.items():
+            start, rows = series[key]
+            matrix[0, start:start + rows] = _time_ms(df['time'])
+            for i, field in enumerate(OHLCV_FIELDS[1:], 1):
+                matrix[i, start:start + rows] = pd.to_numeric(df[field]).to_numpy(dtype=np.float64)
+        del matrix
+
+        self.manifest = {'name': self.shm.name, 'total_rows': total_rows, 'series': series}
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def __len__(self):
+        return len(self.manifest['series'])
+
+    def close(self):
+        """Detach this process (if attached) and unlink the block."""
+        if self.shm is None:
+            return
+        if _attached is not None and _attached[1]['name'] == self.manifest['name']:
+            detach_shared_ohlcv()
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"❌ Error releasing shared OHLCV block {self.manifest['name']}: {e}")
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def publish_ohlcv(frames):
+    """SharedOHLCVBatch for `frames`, or None when there is nothing to share or it fails."""
+    if not frames:
+        return None
+    try:
+        return SharedOHLCVBatch(frames)
+    except Exception as e:
+        print(f"❌ Error publishing shared OHLCV batch: {e}")
+        return None
+
+
+# ---------------------------------------------------------------- worker side
+def attach_shared_ohlcv(manifest):
+    """Attach this process to a published batch (use as executor initializer)."""
+    global _attached
+    detach_shared_ohlcv()
+    if not manifest:
+        return
+    try:
+        shm = shared_memory.SharedMemory(name=manifest['name'])
+        matrix = np.ndarray((len(OHLCV_FIELDS), manifest['total_rows']), dtype=np.float64, buffer=shm.buf)
+        matrix.flags.writeable = False
+        _attached = (shm, manifest, matrix)
+    except Exception as e:
+        print(f"❌ Error attaching shared OHLCV block: {e}")
+        _attached = None
+
+
+def ensure_shared_ohlcv(manifest):
+    """
+    Attach to `manifest` unless already attached to it (long-lived workers get
+    the manifest with each task); None detaches.
+    """
+    with _attach_lock:
+        current = _attached[1]['name'] if _attached is not None else None
+        wanted = manifest['name'] if manifest else None
+        if current != wanted:
+            attach_shared_ohlcv(manifest)
+
+
+def detach_shared_ohlcv():
+    global _attached
+    if _attached is None:
+        return
+    shm = _attached[0]
+    _attached = None
+    try:
+        shm.close()
+    except BufferError:
+        pass   # views still referenced; the mapping goes away with them
+
+
+def shared_ohlcv_arrays(symbol, interval, min_time_ms=None):
+    """
+    Read-only views {field: array} of the series, or None when it is not in the
+    attached batch or its last candle is older than `min_time_ms`.
+    """
+    if _attached is None:
+        return None
+    _, manifest, matrix = _attached
+    bounds = manifest['series'].get((symbol, interval))
+    if bounds is None or bounds[1] == 0:
+        return None
+    start, rows = bounds
+    if min_time_ms is not None and matrix[0, start + rows - 1] < min_time_ms:
+        return None
+    return {field: matrix[i, start:start + rows] for i, field in enumerate(OHLCV_FIELDS)}
+
+
+def shared_ohlcv_frame(symbol, interval, min_time_ms=None):
+    """
+    The series as a DataFrame shaped like fetch_data_safe's output (time as UTC
+    datetimes, oldest first); price/volume columns wrap the shared views.
+    """
+    arrays = shared_ohlcv_arrays(symbol, interval, min_time_ms)
+    if arrays is None:
+        return None
+    data = {'time': pd.to_datetime(arrays['time'].astype(np.int64), unit='ms', utc=True)}
+    data.update({field: arrays[field] for field in OHLCV_FIELDS[1:]})
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,359 @@
+# utils/signal_kernels.py
+
+"""
+Array kernels for the bar-by-bar state machines in calculate_all_indicators_optimized
+(ema 5/8 regime ranks, PA trend, RSI divergence, DIVERGEN_SIGNAL, RSI_9_MACD /
+TAKEACTION, breakout long/short and DIVERGEN_SIGNAL_LIVE).
+
+The kernels only see numbers: float arrays, bool arrays and small int codes for
+the string states. They are compiled with numba when it is installed; without
+it they run as plain loops over Python lists, which is still far cheaper than
+per-row DataFrame access. The caller turns the codes back into the original
+labels once per column with the helpers at the bottom of this module.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# Signal codes shared by the kernels
+NONE, BUY, SELL = 0, 1, 2
+
+# PA_STRUCTURE_BREAK / PA_TREND / PA_TREND_CHANGE codes
+PA_BREAK_LABELS = ('NONE', 'BREAK_UP', 'BREAK_DOWN')
+PA_TREND_LABELS = ('RANGE', 'UPTREND', 'DOWNTREND')
+PA_CHANGE_LABELS = ('NONE', 'UP', 'DOWN')
+
+# breakout_long_state / breakout_short_state codes
+BREAKOUT_STATE_LABELS = ('IDLE', 'WAIT_PULLBACK', 'WAIT_MACD')
+IDLE, WAIT_PULLBACK, WAIT_MACD = 0, 1, 2
+
+SIGNAL_LABELS = (None, 'BUY', 'SELL')
+
+
+def _bar_state_kernel(close, ema_100, swing_high_zone, swing_low_zone, rsi_9, macd_cross,
+                      both_above_100, both_below_100, cross_ema100_up, cross_ema100_down,
+                      ema58_cross_up, ema58_cross_down,
+                      pa_sh, pa_sl, pa_sh_price, pa_sl_price, consolidating,
+                      rsi_14, low, high, pivot_low, pivot_high,
+                      range_lower, range_upper, rsi_oversold, rsi_overbought, max_rank):
+    n = len(close)
+    buy_rank = np.zeros(n, np.int64)
+    sell_rank = np.zeros(n, np.int64)
+    pa_break_out = np.zeros(n, np.int8)
+    pa_trend_out = np.zeros(n, np.int8)
+    pa_change_out = np.zeros(n, np.int8)
+    bull_div = np.zeros(n, np.bool_)
+    bear_div = np.zeros(n, np.bool_)
+    rsi_30_70 = np.zeros(n, np.bool_)
+    div_signal = np.zeros(n, np.int8)
+    rsi_macd_state = np.zeros(n, np.int8)
+    takeaction = np.zeros(n, np.int8)
+    breakout_entry = np.zeros(n, np.int8)
+    long_state_out = np.zeros(n, np.int8)
+    short_state_out = np.zeros(n, np.int8)
+
+    buy_regime = False
+    sell_regime = False
+    buy_count = 0
+    sell_count = 0
+
+    pa_trend = 0
+    nan = np.nan
+    pa_last_high = nan
+    pa_prev_high = nan
+    pa_last_low = nan
+    pa_prev_low = nan
+
+    prev_low_idx = -1
+    prev_high_idx = -1
+    pending_div = NONE
+    pending_level = nan
+
+    state_rsi_macd = NONE
+    state_long = IDLE
+    state_short = IDLE
+
+    for i in range(1, n):
+        close_i = close[i]
+        ema_i = ema_100[i]
+        prev_close = close[i - 1]
+        last_high = swing_high_zone[i]
+        last_low = swing_low_zone[i]
+        cross = macd_cross[i]
+
+        # ----- ema 5/8 regimes vs ema 100 -----
+        if cross_ema100_up[i]:
+            buy_regime = True
+            buy_count = 0
+        if cross_ema100_down[i]:
+            sell_regime = True
+            sell_count = 0
+        if buy_regime and not both_above_100[i]:
+            buy_regime = False
+            buy_count = 0
+        if sell_regime and not both_below_100[i]:
+            sell_regime = False
+            sell_count = 0
+        if buy_regime:
+            if ema58_cross_up[i] and close_i > ema_i and buy_count < max_rank:
+                buy_count += 1
+                buy_rank[i] = buy_count
+        if sell_regime:
+            if ema58_cross_down[i] and close_i < ema_i and sell_count < max_rank:
+                sell_count += 1
+                sell_rank[i] = sell_count
+
+        # ----- PA trend (confirmed swings + structure break) -----
+        prev_pa_trend = pa_trend
+        if pa_sh[i] and pa_sh_price[i] == pa_sh_price[i]:
+            pa_prev_high = pa_last_high
+            pa_last_high = pa_sh_price[i]
+        if pa_sl[i] and pa_sl_price[i] == pa_sl_price[i]:
+            pa_prev_low = pa_last_low
+            pa_last_low = pa_sl_price[i]
+
+        pa_break = 0
+        if pa_last_high == pa_last_high and close_i > pa_last_high:
+            pa_break = 1
+            pa_trend = 1
+        elif pa_last_low == pa_last_low and close_i < pa_last_low:
+            pa_break = 2
+            pa_trend = 2
+        else:
+            if pa_prev_high == pa_prev_high and pa_prev_low == pa_prev_low:
+                if pa_last_high > pa_prev_high and pa_last_low > pa_prev_low:
+                    pa_trend = 1
+                elif pa_last_high < pa_prev_high and pa_last_low < pa_prev_low:
+                    pa_trend = 2
+                else:
+                    pa_trend = 0
+            else:
+                pa_trend = 0
+            if consolidating[i]:
+                pa_trend = 0
+
+        pa_break_out[i] = pa_break
+        pa_trend_out[i] = pa_trend
+        if pa_trend != prev_pa_trend:
+            pa_change_out[i] = pa_trend
+
+        # ----- RAW RSI divergence -----
+        if pivot_low[i]:
+            if prev_low_idx >= 0:
+                dist = i - prev_low_idx
+                if range_lower <= dist <= range_upper:
+                    if rsi_14[i] > rsi_14[prev_low_idx] and low[i] < low[prev_low_idx]:
+                        bull_div[i] = True
+                        if rsi_14[prev_low_idx] < rsi_oversold:
+                            rsi_30_70[i] = True
+            prev_low_idx = i
+        if pivot_high[i]:
+            if prev_high_idx >= 0:
+                dist = i - prev_high_idx
+                if range_lower <= dist <= range_upper:
+                    if rsi_14[i] < rsi_14[prev_high_idx] and high[i] > high[prev_high_idx]:
+                        bear_div[i] = True
+                        if rsi_14[prev_high_idx] > rsi_overbought:
+                            rsi_30_70[i] = True
+            prev_high_idx = i
+
+        # ----- divergence -> structure break (RAW) -----
+        if bull_div[i]:
+            pending_div = BUY
+            pending_level = last_high
+        elif bear_div[i]:
+            pending_div = SELL
+            pending_level = last_low
+        if pending_div == BUY:
+            if close_i > pending_level:
+                div_signal[i] = BUY
+                pending_div = NONE
+                pending_level = nan
+        elif pending_div == SELL:
+            if close_i < pending_level:
+                div_signal[i] = SELL
+                pending_div = NONE
+                pending_level = nan
+
+        # ----- RSI -> MACD TAKEACTION -----
+        if rsi_9[i] > 70:
+            state_rsi_macd = SELL
+        elif rsi_9[i] < 30:
+            state_rsi_macd = BUY
+        if state_rsi_macd != NONE and cross == state_rsi_macd:
+            takeaction[i] = state_rsi_macd
+            state_rsi_macd = NONE
+        rsi_macd_state[i] = state_rsi_macd
+
+        # ----- long breakout -> pullback -> MACD BUY -----
+        breakout_long = (close_i > ema_i and close_i > last_high
+                         and (prev_close <= ema_i or prev_close <= last_high))
+        if state_long == IDLE:
+            if breakout_long:
+                state_long = WAIT_PULLBACK
+        elif state_long == WAIT_PULLBACK:
+            if close_i <= ema_i:
+                state_long = WAIT_MACD
+            elif close_i < ema_i * 0.99:
+                state_long = IDLE
+        elif state_long == WAIT_MACD:
+            if cross == BUY:
+                breakout_entry[i] = BUY
+                state_long = IDLE
+            elif close_i < ema_i * 0.99:
+                state_long = IDLE
+
+        # ----- short breakout -> pullback -> MACD SELL -----
+        breakout_short = (close_i < ema_i and close_i < last_low
+                          and (prev_close >= ema_i or prev_close >= last_low))
+        if state_short == IDLE:
+            if breakout_short:
+                state_short = WAIT_PULLBACK
+        elif state_short == WAIT_PULLBACK:
+            if close_i >= ema_i:
+                state_short = WAIT_MACD
+            elif close_i > ema_i * 0.5:
+                state_short = IDLE
+        elif state_short == WAIT_MACD:
+            if cross == SELL:
+                breakout_entry[i] = SELL
+                state_short = IDLE
+            elif close_i > ema_i * 0.5:
+                state_short = IDLE
+
+        long_state_out[i] = state_long
+        short_state_out[i] = state_short
+
+    return (buy_rank, sell_rank, pa_break_out, pa_trend_out, pa_change_out,
+            bull_div, bear_div, rsi_30_70, div_signal, rsi_macd_state, takeaction,
+            breakout_entry, long_state_out, short_state_out)
+
+
+def _live_divergence_kernel(close, swing_high_zone, swing_low_zone, bull_live, bear_live):
+    n = len(close)
+    signal = np.zeros(n, np.int8)
+    pending_div = NONE
+    pending_level = np.nan
+    for i in range(n):
+        if bull_live[i]:
+            pending_div = BUY
+            pending_level = swing_high_zone[i]
+        elif bear_live[i]:
+            pending_div = SELL
+            pending_level = swing_low_zone[i]
+
+        if pending_div == BUY and close[i] > pending_level:
+            signal[i] = BUY
+            pending_div = NONE
+            pending_level = np.nan
+        elif pending_div == SELL and close[i] < pending_level:
+            signal[i] = SELL
+            pending_div = NONE
+            pending_level = np.nan
+    return signal
+
+
+if NUMBA_AVAILABLE:
+    _bar_state_compiled = njit(cache=True)(_bar_state_kernel)
+    _live_divergence_compiled = njit(cache=True)(_live_divergence_kernel)
+
+
+def _prepare(arrays):
+    # numba wants contiguous typed arrays; the Python loop is fastest on lists
+    if NUMBA_AVAILABLE:
+        return [np.ascontiguousarray(a) for a in arrays]
+    return [np.asarray(a).tolist() for a in arrays]
+
+
+def run_bar_state_kernel(close, ema_100, swing_high_zone, swing_low_zone, rsi_9, macd_cross,
+                         both_above_100, both_below_100, cross_ema100_up, cross_ema100_down,
+                         ema58_cross_up, ema58_cross_down,
+                         pa_sh, pa_sl, pa_sh_price, pa_sl_price, consolidating,
+                         rsi_14, low, high, pivot_low, pivot_high,
+                         range_lower=5, range_upper=60, rsi_oversold=30, rsi_overbought=70, max_rank=20):
+    """
+    Run the main per-bar state machine. Float inputs are float64 arrays, flags
+    bool arrays, macd_cross an int code array (NONE/BUY/SELL). Returns a dict
+    of output code/flag arrays keyed by purpose.
+    """
+    floats = [np.asarray(a, dtype=np.float64) for a in (
+        close, ema_100, swing_high_zone, swing_low_zone, rsi_9)]
+    flags = [np.asarray(a, dtype=np.bool_) for a in (
+        both_above_100, both_below_100, cross_ema100_up, cross_ema100_down,
+        ema58_cross_up, ema58_cross_down, pa_sh, pa_sl)]
+    pa_prices = [np.asarray(a, dtype=np.float64) for a in (pa_sh_price, pa_sl_price)]
+    tail = [np.asarray(consolidating, dtype=np.bool_),
+            np.asarray(rsi_14, dtype=np.float64), np.asarray(low, dtype=np.float64),
+            np.asarray(high, dtype=np.float64),
+            np.asarray(pivot_low, dtype=np.bool_), np.asarray(pivot_high, dtype=np.bool_)]
+    args = _prepare(floats + [np.asarray(macd_cross, dtype=np.int8)] + flags + pa_prices + tail)
+
+    kernel = _bar_state_compiled if NUMBA_AVAILABLE else _bar_state_kernel
+    out = kernel(*args, range_lower, range_upper, float(rsi_oversold), float(rsi_overbought), max_rank)
+    names = ('buy_rank', 'sell_rank', 'pa_break', 'pa_trend', 'pa_change',
+             'bull_div', 'bear_div', 'rsi_30_70', 'div_signal', 'rsi_macd_state', 'takeaction',
+             'breakout_entry', 'breakout_long_state', 'breakout_short_state')
+    return dict(zip(names, out))
+
+
+def run_live_divergence_kernel(close, swing_high_zone, swing_low_zone, bull_live, bear_live):
+    """DIVERGEN_SIGNAL_LIVE codes: arm on a live divergence, fire on the structure break."""
+    args = _prepare([np.asarray(close, dtype=np.float64),
+                     np.asarray(swing_high_zone, dtype=np.float64),
+                     np.asarray(swing_low_zone, dtype=np.float64),
+                     np.asarray(bull_live, dtype=np.bool_),
+                     np.asarray(bear_live, dtype=np.bool_)])
+    kernel = _live_divergence_compiled if NUMBA_AVAILABLE else _live_divergence_kernel
+    return kernel(*args)
+
+
+def signal_codes(labels):
+    """'BUY'/'SELL'/anything else -> BUY/SELL/NONE codes."""
+    labels = np.asarray(labels)
+    return np.where(labels == 'BUY', BUY, np.where(labels == 'SELL', SELL, NONE)).astype(np.int8)
+
+
+def labels_from_codes(codes, labels):
+    """Object column of `labels[code]` for every bar."""
+    return np.asarray(labels, dtype=object)[np.asarray(codes)]
+
+
+def sparse_signal_column(codes):
+    """
+    Column that started as NaN and only had 'BUY'/'SELL' written into it:
+    float NaN when nothing fired, else object with NaN on the quiet bars.
+    """
+    codes = np.asarray(codes)
+    if not codes.any():
+        return np.full(len(codes), np.nan)
+    out = np.full(len(codes), np.nan, dtype=object)
+    out[codes == BUY] = 'BUY'
+    out[codes == SELL] = 'SELL'
+    return out
+
+
+def state_column(codes, labels, start=1):
+    """
+    Column that started as NaN and had labels[code] written into every bar from
+    `start` on, where a None label is a cleared state. Matches pandas setitem:
+    None stays NaN until the first string turns the column into object dtype.
+    """
+    codes = np.asarray(codes)
+    label_arr = np.asarray(labels, dtype=object)
+    written = codes[start:]
+    is_str = np.array([label is not None for label in labels])[written]
+    if not is_str.any():
+        return np.full(len(codes), np.nan)
+    out = np.full(len(codes), np.nan, dtype=object)
+    values = label_arr[written]
+    # Before the first string the column was still float, so None was stored as NaN
+    first_str = int(np.argmax(is_str))
+    values[:first_str] = np.nan
+    out[start:] = values
+    return out
@@ -0,0 +1,156 @@
+# utils/trade_state.py
+
+"""
+In-memory trade state (updated_at + version per UID), synced from the DB.
+
+setlastpairPrice used to run `SELECT updated_at FROM <machine> WHERE
+unique_id = :uid` on every call, under the UID's all_pairs lock and before
+its 120 s throttle. TradeStateStore keeps that column in memory instead:
+
+- updated_at(table, uid) is a dict read (None when the UID has not been seen
+  yet; callers fall back to all_pairs)
+- note_write(table, uid, updated_at) is called by the bot's own writes
+  (olab_update_single_uid_in_table and DBUpdater's flushes), so they are
+  visible immediately
+- a background thread diffs each table every `sync_interval` seconds with one
+  query for rows whose updated_at moved past the newest value already seen
+  (the first pass loads every open trade), which picks up changes made
+  outside the bot, e.g. investment added from the dashboard
+- a local write is what the DB holds afterwards, so it always applies; a
+  diff row fetched before a later local write of the same UID is skipped.
+  Every change bumps the UID's version
+"""
+
+import re
+import threading
+import time
+
+_TABLE_RE = re.compile(r'^[a-z0-9_]+$')
+
+
+def _newer(candidate, current):
+    if current is None:
+        return True
+    try:
+        return candidate > current
+    except TypeError:          # naive vs aware datetime: trust the incoming value
+        return True
+
+
+class TradeStateStore:
+    """updated_at/version per (table, uid), written through and diff-synced from the DB."""
+
+    def __init__(self, fetch_all, sync_interval=15, name='trade_state', on_error=None):
+        self.fetch_all = fetch_all   # fetch_all(sql, params) -> rows (sql_helper.fetch_all)
+        self.sync_interval = sync_interval
+        self.name = name
+        self.on_error = on_error     # callable(error, context) for log_error
+        self._lock = threading.Lock()
+        self._state = {}             # table -> {uid: (updated_at, version)}
+        self._watermark = {}         # table -> newest DB updated_at seen
+        self._written = {}           # (table, uid) -> monotonic time of the last local write
+        self._thread = None
+        self.syncs = self.rows_synced = self.changes = self.local_writes = self.misses = 0
+        self.last_sync_ms = None
+
+    # ------------------------------------------------------------------ reads
+    def updated_at(self, table, uid):
+        entry = self._table(table).get(uid)
+        if entry is None:
+            self.misses += 1
+            return None
+        return entry[0]
+
+    def version(self, table, uid):
+        entry = self._table(table).get(uid)
+        return entry[1] if entry is not None else 0
+
+    def _table(self, table):
+        state = self._state.get(table)
+        if state is None:
+            if not _TABLE_RE.match(table or ''):
+                raise ValueError(f"Invalid trade table: {table}")
+            with self._lock:
+                state = self._state.setdefault(table, {})
+            self.start()
+        return state
+
+    # ----------------------------------------------------------------- writes
+    def note_write(self, table, uid, updated_at):
+        """Record a value the bot just wrote to the DB."""
+        if updated_at is None:
+            return
+        state = self._table(table)
+        with self._lock:
+            self.local_writes += 1
+            self._written[(table, uid)] = time.monotonic()
+            self._apply(state, uid, updated_at)
+
+    def forget(self, table, uid):
+        with self._lock:
+            self._state.get(table, {}).pop(uid, None)
+            self._written.pop((table, uid), None)
+
+    def _apply(self, state, uid, updated_at):
+        entry = state.get(uid)
+        if entry is not None and entry[0] == updated_at:
+            return False
+        state[uid] = (updated_at, (entry[1] if entry else 0) + 1)
+        self.changes += 1
+        return True
+
+    # ------------------------------------------------------------------- sync
+    def refresh(self, table):
+        """One diff pass over table; returns the number of UIDs whose updated_at changed."""
+        state = self._table(table)
+        since = self._watermark.get(table)
+        started = time.perf_counter()
+        fetched_at = time.monotonic()
+        if since is None:
+            rows = self.fetch_all(
+                f"SELECT unique_id, updated_at FROM {table} WHERE type NOT IN ('close', 'hedge_close')", {})
+        else:
+            rows = self.fetch_all(
+                f"SELECT unique_id, updated_at FROM {table} WHERE updated_at >= :since", {"since": since})
+        changed = 0
+        with self._lock:
+            for uid, updated_at in rows or []:
+                if updated_at is None or self._written.get((table, uid), 0) > fetched_at:
+                    continue
+                changed += self._apply(state, uid, updated_at)
+                if _newer(updated_at, self._watermark.get(table)):
+                    self._watermark[table] = updated_at
+            self.syncs += 1
+            self.rows_synced += len(rows or [])
+        self.last_sync_ms = round((time.perf_counter() - started) * 1000, 2)
+        return changed
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None or not self.sync_interval:
+                return
+            self._thread = threading.Thread(target=self._sync_loop, daemon=True, name=self.name)
+        self._thread.start()
+
+    def _sync_loop(self):
+        while True:
+            for table in list(self._state):
+                try:
+                    self.refresh(table)
+                except Exception as e:
+                    self._report(e)
+            time.sleep(self.sync_interval)
+
+    def stats(self):
+        return {'tables': len(self._state), 'uids': sum(len(s) for s in self._state.values()),
+                'syncs': self.syncs, 'rows_synced': self.rows_synced, 'changes': self.changes,
+                'local_writes': self.local_writes, 'misses': self.misses, 'last_sync_ms': self.last_sync_ms}
+
+    def _report(self, error):
+        if self.on_error is not None:
+            try:
+                self.on_error(error, self.name)
+                return
+            except Exception:
+                pass
+        print(f"❌ {self.name} sync error: {error}")
@@ -0,0 +1,269 @@
+# utils/uid_scheduler.py
+
+"""
+Event-driven scheduling of per-UID trade work.
+
+The live bot used to run one thread per UID, each waking every second to poll
+analysis_tracker[uid]["Current_Price"] whether or not the price moved.
+CoalescingUIDScheduler runs the same per-UID step from a bounded pool of
+worker threads, and only when there is something to do:
+
+- submit(uid, price, event_ms) : a mark price; UIDs whose price did not move
+                                 since their last run are not scheduled
+- wake(uid)                    : run once regardless of price (new UID,
+                                 hedge_release, ...)
+- wake_after(uid, delay)       : run once `delay` seconds from now; each call
+                                 replaces the UID's previous timer (the
+                                 handler re-arms it with the pause the old
+                                 per-UID loop slept between passes)
+- one pending slot per UID: a price arriving while the UID is queued or
+  running replaces the pending one (stale intermediate prices are dropped and
+  counted), so the queue never holds more than one entry per UID
+- a UID runs on one worker at a time; a price that arrived meanwhile
+  re-queues it when the run ends
+- UIDs idle for `idle_interval` seconds are woken by the sweeper, so
+  time-based checks still run on quiet symbols
+- handler(uid, price) returning False drops the UID (trade gone)
+- mark(label) inside the handler records the latency from the mark price
+  (exchange event time and local receive time) to that point; stats()
+  reports p50 / p99 / max per label
+"""
+
+import heapq
+import threading
+import time
+from collections import deque
+
+_NO_PRICE = object()
+
+
+def latency_summary(samples):
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+    return {'n': len(ordered), 'p50_ms': pick(0.50), 'p99_ms': pick(0.99), 'max_ms': round(ordered[-1], 2)}
+
+
+class CoalescingUIDScheduler:
+    """Latest-price-wins queue of UIDs drained by a bounded worker pool."""
+
+    def __init__(self, handler=None, workers=8, idle_interval=5.0, name='uid_scheduler',
+                 on_error=None, latency_samples=4096):
+        self.handler = handler
+        self.workers = workers
+        self.idle_interval = idle_interval
+        self.name = name
+        self.on_error = on_error   # callable(error, context, uid) for log_error
+
+        self._cv = threading.Condition()
+        self._ready = deque()      # UIDs waiting for a worker (each at most once)
+        self._pending = {}         # uid -> (price, event_ms, received_at) not yet taken by a worker
+        self._queued = set()
+        self._running = set()
+        self._known = set()
+        self._last_price = {}
+        self._last_run = {}
+        self._threads = []
+        self._stopping = False
+        self._timer_cv = threading.Condition()   # sweeper wait; workers alone wait on _cv, so notify() always reaches one
+        self._timers = []          # heap of (due, uid); entries no longer in _due are stale
+        self._due = {}             # uid -> monotonic time of its current timer
+        self._local = threading.local()
+        self._latency = {}         # label -> deque of (since_event_ms, since_received_ms)
+        self._latency_samples = latency_samples
+        self.submitted = self.skipped_unchanged = self.dropped_stale = self.runs = self.errors = 0
+
+    # -------------------------------------------------------------- lifecycle
+    def start(self, handler=None):
+        """Start the pool and the idle sweeper once; later calls are no-ops."""
+        with self._cv:
+            if handler is not None and self.handler is None:
+                self.handler = handler
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [threading.Thread(target=self._worker, daemon=True, name=f"{self.name}-{i}")
+                             for i in range(self.workers)]
+            self._threads.append(threading.Thread(target=self._sweeper, daemon=True, name=f"{self.name}-sweeper"))
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=5):
+        with self._cv:
+            self._stopping = True
+            self._cv.notify_all()
+        with self._timer_cv:
+            self._timer_cv.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    # ------------------------------------------------------------- producers
+    def submit(self, uid, price, event_ms=None):
+        """Schedule uid for `price`; False when the price has not moved or a pending one was replaced."""
+        with self._cv:
+            self.submitted += 1
+            self._known.add(uid)
+            if uid not in self._pending and price == self._last_price.get(uid):
+                self.skipped_unchanged += 1
+                return False
+            return self._enqueue(uid, (price, event_ms, time.time()))
+
+    def wake(self, uid):
+        """Schedule uid once with the price it already has."""
+        with self._cv:
+            self._known.add(uid)
+            if uid in self._pending:
+                return False
+            return self._enqueue(uid, (_NO_PRICE, None, time.time()))
+
+    def is_scheduled(self, uid):
+        """True from the first submit/wake of uid until it is discarded or its handler returns False."""
+        return uid in self._known
+
+    def wake_after(self, uid, delay):
+        """Schedule uid once, `delay` seconds from now, replacing its previous timer."""
+        if uid not in self._known:
+            return False
+        if delay <= 0:
+            return self.wake(uid)
+        due = time.monotonic() + delay
+        with self._timer_cv:
+            self._due[uid] = due
+            heapq.heappush(self._timers, (due, uid))
+            if self._timers[0][0] == due:
+                self._timer_cv.notify()
+        return True
+
+    def discard(self, uid):
+        with self._cv:
+            self._known.discard(uid)
+            self._pending.pop(uid, None)
+            self._last_price.pop(uid, None)
+            self._last_run.pop(uid, None)
+        with self._timer_cv:
+            self._due.pop(uid, None)
+
+    def _enqueue(self, uid, job):
+        replaced = uid in self._pending
+        if replaced:
+            self.dropped_stale += 1
+        self._pending[uid] = job
+        if uid not in self._queued and uid not in self._running:
+            self._queued.add(uid)
+            self._ready.append(uid)
+            self._cv.notify()
+        return not replaced
+
+    # -------------------------------------------------------------- consumers
+    def _worker(self):
+        while True:
+            with self._cv:
+                while not self._ready and not self._stopping:
+                    self._cv.wait()
+                if self._stopping:
+                    return
+                uid = self._ready.popleft()
+                self._queued.discard(uid)
+                job = self._pending.pop(uid, None)
+                if job is None or uid not in self._known:
+                    continue
+                self._running.add(uid)
+
+            price, event_ms, received_at = job
+            self._local.job = (event_ms, received_at)
+            keep = True
+            try:
+                keep = self.handler(uid, None if price is _NO_PRICE else price) is not False
+            except Exception as e:
+                self.errors += 1
+                self._report(e, uid)
+            finally:
+                self._local.job = None
+                with self._cv:
+                    self.runs += 1
+                    self._running.discard(uid)
+                    if not keep:
+                        self._known.discard(uid)
+                        self._pending.pop(uid, None)
+                    elif uid in self._known:
+                        self._last_run[uid] = time.monotonic()
+                        if price is not _NO_PRICE:
+                            self._last_price[uid] = price
+                        if uid in self._pending and uid not in self._queued:
+                            self._queued.add(uid)
+                            self._ready.append(uid)
+                            self._cv.notify()
+                if not keep:
+                    with self._timer_cv:
+                        self._due.pop(uid, None)
+
+    def _sweeper(self):
+        """Fire due timers, and every idle_interval / 2 wake the UIDs idle for idle_interval."""
+        sweep_every = max(self.idle_interval / 2, 0.05)
+        next_sweep = time.monotonic() + sweep_every
+        while True:
+            with self._timer_cv:
+                while not self._stopping:
+                    now = time.monotonic()
+                    wait = next_sweep - now
+                    if self._timers:
+                        wait = min(wait, self._timers[0][0] - now)
+                    if wait <= 0:
+                        break
+                    self._timer_cv.wait(wait)
+                if self._stopping:
+                    return
+                fired = []
+                while self._timers and self._timers[0][0] <= now:
+                    due, uid = heapq.heappop(self._timers)
+                    if self._due.get(uid) == due:
+                        del self._due[uid]
+                        fired.append(uid)
+            for uid in fired:
+                self.wake(uid)
+
+            if now >= next_sweep:
+                next_sweep = now + sweep_every
+                with self._cv:
+                    cutoff = now - self.idle_interval
+                    idle = [uid for uid in self._known if self._last_run.get(uid, 0) < cutoff
+                            and uid not in self._queued and uid not in self._running]
+                for uid in idle:
+                    self.wake(uid)
+
+    # ---------------------------------------------------------------- metrics
+    def mark(self, label='trade_action'):
+        """Record the latency from the current job's mark price to now (no-op outside a job)."""
+        job = getattr(self._local, 'job', None)
+        if job is None:
+            return
+        event_ms, received_at = job
+        now = time.time()
+        since_event = now * 1000 - event_ms if event_ms else None
+        samples = self._latency.get(label)
+        if samples is None:
+            samples = self._latency.setdefault(label, deque(maxlen=self._latency_samples))
+        samples.append((since_event, (now - received_at) * 1000))
+
+    def stats(self):
+        with self._cv:
+            stats = {'workers': self.workers, 'uids': len(self._known), 'ready': len(self._ready),
+                     'running': len(self._running), 'submitted': self.submitted,
+                     'skipped_unchanged': self.skipped_unchanged, 'dropped_stale': self.dropped_stale,
+                     'runs': self.runs, 'errors': self.errors, 'timers': len(self._due)}
+        for label, samples in list(self._latency.items()):
+            samples = list(samples)
+            stats[label] = {'from_receive': latency_summary([r for _, r in samples]),
+                            'from_event': latency_summary([e for e, _ in samples if e is not None])}
+        return stats
+
+    def _report(self, error, uid):
+        if self.on_error is not None:
+            try:
+                self.on_error(error, self.name, uid)
+                return
+            except Exception:
+                pass
+        print(f"❌ {self.name} handler error for {uid}: {error}")
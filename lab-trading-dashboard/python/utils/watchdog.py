@@ -43,10 +43,8 @@ def start_watchdog():
                             # Clean up old thread and queue
                             message_queues.pop(uid, None)
                             active_threads.pop(uid, None)
-                            # Start a new worker thread
-                            new_thread = threading.Thread(target=ws_handler.worker, args=(uid,), daemon=True)
-                            new_thread.start()
-                            active_threads[uid] = new_thread
+                            # Start a new worker thread (a scheduler wake-up in event mode)
+                            ws_handler.start_worker(uid)
                             log_info(f"✅ Watchdog restarted worker for UID: {uid}")
 
             except Exception as e:
@@ -0,0 +1,199 @@
+# utils/worker_pool.py
+
+"""
+Long-lived worker pool for the signal loops.
+
+WarmWorkerPool keeps one ProcessPoolExecutor alive across batches, so workers
+pay the process start, module imports and the per-worker initializer (DB
+engine, Binance client) once and keep their indicator caches between batches.
+
+- submit(fn, ...)       : Future, rebuilding the executor first if it broke
+- run_batch(fn, items)  : run fn(item, *args) for every item and count
+                          completed / errors / timeouts / crashes
+- health_check()        : ping every worker; a broken or unresponsive pool is
+                          replaced
+- after `max_consecutive_crashes` batches with crashes in a row the pool
+  falls back to a ThreadPoolExecutor (same as the old per-batch logic)
+
+A worker crash breaks a ProcessPoolExecutor as a whole, so crash replacement
+means shutting the broken executor down and starting a fresh one. The old
+executor's processes are terminated (then killed if they do not exit), so a
+hung worker does not outlive its pool.
+"""
+
+import concurrent.futures
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+
+def _ping():
+    return os.getpid()
+
+
+class WarmWorkerPool:
+    """Persistent process pool with health checks and crash replacement."""
+
+    def __init__(self, max_workers, initializer=None, initargs=(), name='worker_pool',
+                 max_consecutive_crashes=3, health_timeout=30, on_error=None):
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.name = name
+        self.max_consecutive_crashes = max_consecutive_crashes
+        self.health_timeout = health_timeout
+        self.on_error = on_error   # callable(error, context) for log_error
+
+        self._executor = None
+        self._lock = threading.RLock()
+        self.use_threads = False
+        self.consecutive_crashes = 0
+        self.restarts = 0
+        self.tasks_submitted = 0
+        self.started_at = None
+
+    # -------------------------------------------------------------- lifecycle
+    @property
+    def executor_type(self):
+        return 'ThreadPoolExecutor' if self.use_threads else 'ProcessPoolExecutor'
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                executor_class = (concurrent.futures.ThreadPoolExecutor if self.use_threads
+                                  else concurrent.futures.ProcessPoolExecutor)
+                self._executor = executor_class(max_workers=self.max_workers,
+                                                initializer=self.initializer, initargs=self.initargs)
+                self.started_at = time.time()
+                print(f"🚀 {self.name}: started {self.executor_type} with {self.max_workers} workers")
+            return self._executor
+
+    def restart(self, reason=''):
+        """Replace the executor (broken pool, hung workers or crash fallback)."""
+        with self._lock:
+            old, self._executor = self._executor, None
+            self.restarts += 1
+        print(f"🔄 {self.name}: replacing worker pool{f' ({reason})' if reason else ''}")
+        if old is not None:
+            try:
+                self._terminate(old)
+            except Exception as e:
+                self._report(e, 'restart')
+        return self.start()
+
+    def shutdown(self, wait=True, terminate=False):
+        """Stop the executor; terminate=True kills its processes instead of letting running tasks finish."""
+        with self._lock:
+            old, self._executor = self._executor, None
+        if old is not None:
+            if terminate:
+                self._terminate(old)
+            else:
+                old.shutdown(wait=wait, cancel_futures=True)
+            print(f"🛑 {self.name}: worker pool stopped")
+
+    def _terminate(self, executor, timeout=5):
+        """Shut `executor` down without waiting and stop its worker processes (threads cannot be killed)."""
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.time() + timeout
+        for process in processes:
+            process.join(max(deadline - time.time(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join(1)
+
+    # ------------------------------------------------------------------ tasks
+    def submit(self, fn, *args, **kwargs):
+        """Submit one task; a broken executor is replaced and the submit retried once."""
+        executor = self.start()
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except (BrokenProcessPool, RuntimeError) as e:
+            executor = self.restart(f"submit failed: {e}")
+            future = executor.submit(fn, *args, **kwargs)
+        self.tasks_submitted += 1
+        return future
+
+    def run_batch(self, fn, items, *args, timeout=None, label=lambda item: str(item)):
+        """
+        Run fn(item, *args) for every item and wait up to `timeout` seconds for
+        the whole batch. Returns counters and the per-item results.
+        """
+        started = time.time()
+        futures = {self.submit(fn, item, *args): item for item in items}
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+
+        summary = {'completed': 0, 'errors': 0, 'timeouts': len(not_done), 'crashes': 0,
+                   'results': {}, 'executor_type': self.executor_type, 'worker_count': self.max_workers}
+        for future in not_done:
+            print(f"⏰ {self.name}: timeout for {label(futures[future])} after {timeout}s")
+        for future in done:
+            item = futures[future]
+            try:
+                summary['results'][label(item)] = future.result()
+                summary['completed'] += 1
+            except BrokenProcessPool as e:
+                summary['crashes'] += 1
+                print(f"💥 {self.name}: process crash for {label(item)}: {e}")
+                self._report(e, f"run_batch {label(item)}")
+            except Exception as e:
+                print(f"❌ {self.name}: error for {label(item)}: {e}")
+                self._report(e, f"run_batch {label(item)}")
+        summary['errors'] = len(done) - summary['completed']
+
+        if summary['crashes']:
+            self.consecutive_crashes += 1
+            print(f"⚠️ {self.name}: consecutive crashed batches {self.consecutive_crashes}/{self.max_consecutive_crashes}")
+            if self.consecutive_crashes >= self.max_consecutive_crashes and not self.use_threads:
+                self.use_threads = True
+            self.restart('worker crashed')
+        else:
+            self.consecutive_crashes = 0
+            if not_done:
+                self.health_check()
+
+        summary['elapsed_ms'] = int((time.time() - started) * 1000)
+        return summary
+
+    # ----------------------------------------------------------------- health
+    def health_check(self):
+        """Ping every worker; replace the pool when it is broken or does not answer in time."""
+        if self._executor is None:
+            return True
+        try:
+            futures = [self._executor.submit(_ping) for _ in range(self.max_workers)]
+            done, not_done = concurrent.futures.wait(futures, timeout=self.health_timeout)
+            if not_done:
+                raise TimeoutError(f"{len(not_done)}/{len(futures)} workers did not answer in {self.health_timeout}s")
+            for future in done:
+                future.result()
+            return True
+        except Exception as e:
+            print(f"⚠️ {self.name}: health check failed: {e}")
+            self._report(e, 'health_check')
+            self.restart('health check failed')
+            return False
+
+    def stats(self):
+        return {
+            'executor_type': self.executor_type,
+            'workers': self.max_workers,
+            'running': self._executor is not None,
+            'restarts': self.restarts,
+            'tasks_submitted': self.tasks_submitted,
+            'consecutive_crashes': self.consecutive_crashes,
+            'uptime_s': round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+        }
+
+    def _report(self, error, context):
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(error, f"{self.name} {context}")
+        except Exception:
+            pass
@@ -24,7 +24,13 @@ from FinalVersionTrading_AWS import (
     log_system_health,
     log_error,
     MAIN_SIGNAL_DETECTOR_ID,
-    shutdown_requested
+    shutdown_requested,
+    get_signal_worker_pool,
+    check_signal_worker_pool,
+    shutdown_signal_worker_pool,
+    start_kline_stream,
+    refresh_kline_stream,
+    stop_kline_stream
 )
 
 # Import pagination functions
@@ -276,7 +282,7 @@ def main_runner():
     
     print("🚀 Starting Trading Bot Runner with Memory Management and Pagination...")
     print(f"⏰ Session started at: {start_time.strftime('%Y-%m-%d %H:%M:%S IST')}")
-    print("📊 Each cycle will process pairs in batches and then exit to release memory")
+    print("📊 Each cycle will process pairs in batches on a warm worker pool kept across cycles")
     print("⏰ 20 second pause between cycles")
     print("🎯 Will process all pairs once and then exit automatically")
     print()
@@ -293,6 +299,11 @@ def main_runner():
     
     # Initialize pagination state
     initialize_pagination_state()
+
+    # Start the warm worker pool once; every batch submits to it
+    get_signal_worker_pool().start()
+    # Closed candles arrive over WebSocket; REST is only the fallback
+    start_kline_stream()
     
     cycle_number = 1
     
@@ -304,6 +315,8 @@ def main_runner():
             if success:
                 # Clean up memory after successful cycle
                 force_garbage_collection()
+                check_signal_worker_pool()
+                refresh_kline_stream()
                 print(f"⏰ Cycle #{cycle_number} total time: {cycle_time:.2f}s")
 
                 # Update pagination offsets for next cycle
@@ -337,6 +350,9 @@ def main_runner():
             log_error(e, "main_runner", machine_id=MAIN_SIGNAL_DETECTOR_ID)
             time.sleep(30)
     
+    shutdown_signal_worker_pool()
+    stop_kline_stream()
+
     # Record end time
     end_time = get_ist_time()
     total_time_seconds = (end_time - start_time).total_seconds()